@@ -0,0 +1,84 @@
+"""Throughput of many small uploads: sequential /upload/ vs /upload/batch/.
+
+Uploads ``--files`` objects of ``--file-size`` bytes three ways: one
+``POST /upload/`` per file, one ``POST /upload/batch/`` with every file as a
+multipart part, and one batch request carrying a tar archive.
+
+    python -m benchmarks.bench_batch_upload --files 1000 --file-size 10240 --latency-ms 20
+"""
+import argparse
+import io
+import os
+import tarfile
+import time
+
+import httpx
+
+from benchmarks import harness
+
+
+BUCKET = "bench-bucket"
+
+
+def _tar_archive(files) -> bytes:
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w") as tar_file:
+        for name, body in files:
+            info = tarfile.TarInfo(name)
+            info.size = len(body)
+            tar_file.addfile(info, io.BytesIO(body))
+    return buffer.getvalue()
+
+
+def _timed_run(label: str, count: int, func) -> dict:
+    started = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - started
+    run = {"mode": label, "elapsed_s": round(elapsed, 2), "files_per_s": round(count / elapsed, 1)}
+    print(run, flush=True)
+    return run
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=1000)
+    parser.add_argument("--file-size", type=int, default=10 * 1024)
+    parser.add_argument("--max-workers", type=int, default=16,
+                        help="max_workers passed to /upload/batch/")
+    parser.add_argument("--latency-ms", type=float, default=20.0,
+                        help="artificial S3 round-trip latency added by the moto server")
+    parser.add_argument("--output", help="write the JSON results to this file")
+    args = parser.parse_args()
+
+    files = [(f"file-{i:05d}.bin", os.urandom(args.file_size)) for i in range(args.files)]
+    results = {"config": vars(args), "runs": []}
+    with harness.moto_server(args.latency_ms) as endpoint_url:
+        harness.s3_client(endpoint_url).create_bucket(Bucket=BUCKET)
+        with harness.app_server(endpoint_url) as (base_url, _), \
+                httpx.Client(base_url=base_url, timeout=600) as http:
+
+            def sequential():
+                for name, body in files:
+                    http.post("/upload/", params={"bucket": BUCKET},
+                              files={"file_upload": ("seq/" + name, body)}).raise_for_status()
+
+            def batch(**request):
+                response = http.post("/upload/batch/", **request)
+                response.raise_for_status()
+                if response.json()["failed_count"]:
+                    raise RuntimeError(response.json())
+
+            params = {"bucket": BUCKET, "max_workers": args.max_workers}
+            results["runs"].append(_timed_run("sequential /upload/", args.files, sequential))
+            results["runs"].append(_timed_run("/upload/batch/ files", args.files, lambda: batch(
+                params={**params, "prefix": "batch/"},
+                files=[("files", (name, body)) for name, body in files])))
+            archive = _tar_archive(files)
+            results["runs"].append(_timed_run("/upload/batch/ tar", args.files, lambda: batch(
+                params={**params, "prefix": "tar/"}, files={"archive": ("files.tar", archive)})))
+
+    harness.write_results(args.output, results)
+
+
+if __name__ == "__main__":
+    main()
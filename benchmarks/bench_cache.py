@@ -0,0 +1,61 @@
+"""Latency of repeated /list/ calls with the metadata cache on and off.
+
+Seeds a bucket on a moto server with artificial latency, then issues the
+same listing ``--requests`` times against the app started once with
+``S3_SERVICE_CACHE_ENABLED=true`` and once with ``false``.
+
+    python -m benchmarks.bench_cache --keys 2000 --requests 200 --latency-ms 50
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from benchmarks import harness
+
+
+BUCKET = "bench-bucket"
+
+
+def _repeated_listing(base_url: str, requests: int, prefix: str) -> dict:
+    samples = []
+    with httpx.Client(base_url=base_url, timeout=120) as http:
+        for _ in range(requests):
+            started = time.perf_counter()
+            response = http.get("/list/", params={"bucket": BUCKET, "prefix": prefix})
+            response.raise_for_status()
+            samples.append(time.perf_counter() - started)
+        stats = http.get("/stats/cache/").json()
+    return {**harness.percentiles(samples), "listing_cache": stats["listing"]}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--keys", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=50.0,
+                        help="artificial S3 round-trip latency added by the moto server")
+    parser.add_argument("--output", help="write the JSON results to this file")
+    args = parser.parse_args()
+
+    results = {"config": vars(args), "runs": {}}
+    with harness.moto_server(args.latency_ms) as endpoint_url:
+        client = harness.s3_client(endpoint_url)
+        client.create_bucket(Bucket=BUCKET)
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            list(pool.map(lambda i: client.put_object(Bucket=BUCKET, Key=f"dashboard/{i:06d}.json",
+                                                      Body=b"{}"), range(args.keys)))
+
+        for enabled in ("false", "true"):
+            env = {"S3_SERVICE_CACHE_ENABLED": enabled}
+            with harness.app_server(endpoint_url, extra_env=env) as (base_url, _):
+                run = _repeated_listing(base_url, args.requests, "dashboard/")
+            results["runs"][f"cache_{enabled}"] = run
+            print(f"cache_enabled={enabled}", run, flush=True)
+
+    harness.write_results(args.output, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""CPU cost of upload compression against the bytes it saves.
+
+Compresses and decompresses synthetic log, JSON and incompressible corpora
+chunk by chunk, exactly as the upload and download paths do, with every
+available codec. No S3 round trips are involved. ``break_even_mb_s`` is the
+bytes saved per CPU second spent compressing: on links slower than that,
+compressing shortens the upload even on a single core.
+
+    python -m benchmarks.bench_compression --size-mb 32
+"""
+import argparse
+import json
+import random
+import time
+
+import my_compression
+from benchmarks import harness
+
+
+MIB = 1024 * 1024
+CHUNK_SIZE = 256 * 1024
+LEVELS = {my_compression.GZIP: (1, 6, 9), my_compression.ZSTD: (1, 3, 9)}
+
+
+def _logs(size: int, rng: random.Random) -> bytes:
+    lines, total = [], 0
+    while total < size:
+        line = (f"2024-05-{rng.randint(1, 28):02d}T{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:"
+                f"{rng.randint(0, 59):02d}Z {rng.choice(['INFO', 'INFO', 'INFO', 'WARN', 'ERROR'])} "
+                f"{rng.choice(['GET', 'PUT', 'DELETE'])} /upload/{rng.randint(0, 99999)} "
+                f"{rng.choice([200, 200, 200, 204, 404, 500])} {rng.randint(1, 900)}ms\n").encode()
+        lines.append(line)
+        total += len(line)
+    return b"".join(lines)[:size]
+
+
+def _json(size: int, rng: random.Random) -> bytes:
+    records, total = [], 0
+    while total < size:
+        record = json.dumps({"id": rng.randint(0, 10 ** 9), "bucket": "media-bucket",
+                             "key": f"users/{rng.randint(0, 5000)}/photo-{rng.randint(0, 10 ** 6)}.jpg",
+                             "size": rng.randint(1, 10 ** 7), "tags": rng.sample(
+                                 ["raw", "edited", "public", "private", "archived"], 2)}).encode() + b"\n"
+        records.append(record)
+        total += len(record)
+    return b"".join(records)[:size]
+
+
+def _chunks(data: bytes):
+    view = memoryview(data)
+    return (view[i:i + CHUNK_SIZE] for i in range(0, len(data), CHUNK_SIZE))
+
+
+def _run(corpus: str, data: bytes, encoding: str, level: int) -> dict:
+    started = time.process_time()
+    compressed = b"".join(my_compression.compress_chunks(_chunks(data), encoding, level))
+    compress_cpu = time.process_time() - started
+    started = time.process_time()
+    size = sum(len(chunk) for chunk in my_compression.decompress_chunks(_chunks(compressed), encoding))
+    decompress_cpu = time.process_time() - started
+    assert size == len(data)
+
+    saved = len(data) - len(compressed)
+    run = {
+        "corpus": corpus, "encoding": encoding, "level": level,
+        "ratio": round(len(data) / len(compressed), 2),
+        "saved_mb": round(saved / MIB, 1),
+        "compress_cpu_ms_per_mb": round(compress_cpu * 1000 / (len(data) / MIB), 2),
+        "decompress_cpu_ms_per_mb": round(decompress_cpu * 1000 / (len(data) / MIB), 2),
+        "break_even_mb_s": round(saved / MIB / compress_cpu, 1) if compress_cpu and saved > 0 else 0.0,
+    }
+    print(run, flush=True)
+    return run
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=32, help="size of each corpus")
+    parser.add_argument("--output", help="write the JSON results to this file")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    size = args.size_mb * MIB
+    corpora = {"logs": _logs(size, rng), "json": _json(size, rng), "random": rng.randbytes(size)}
+    results = {"config": {**vars(args), "encodings": my_compression.available_encodings()}, "runs": []}
+    for corpus, data in corpora.items():
+        for encoding in my_compression.available_encodings():
+            for level in LEVELS[encoding]:
+                results["runs"].append(_run(corpus, data, encoding, level))
+
+    harness.write_results(args.output, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Latency of hot-object downloads with the disk cache on and off.
+
+Seeds ``--objects`` objects on a moto server with artificial latency, then
+downloads them through ``/download/stream/`` with a skewed (Zipf-like)
+popularity, so a few assets take most requests, against the app started
+once with ``S3_SERVICE_DISK_CACHE_ENABLED=true`` and once with ``false``.
+
+    python -m benchmarks.bench_disk_cache --objects 50 --object-kb 512 --requests 500 --latency-ms 20
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from benchmarks import harness
+
+
+BUCKET = "bench-bucket"
+
+
+def _downloads(base_url: str, keys: list, clients: int) -> dict:
+    samples = []
+
+    def fetch(key: str) -> int:
+        with httpx.Client(base_url=base_url, timeout=120) as http:
+            started = time.perf_counter()
+            response = http.get("/download/stream/", params={"bucket": BUCKET, "object_name": key})
+            response.raise_for_status()
+            samples.append(time.perf_counter() - started)
+            return len(response.content)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        total = sum(pool.map(fetch, keys))
+    elapsed = time.perf_counter() - started
+    with httpx.Client(base_url=base_url) as http:
+        disk = http.get("/stats/cache/").json()["disk"]
+    return {**harness.percentiles(samples), "requests_per_s": round(len(keys) / elapsed, 1),
+            "mb_per_s": round(total / elapsed / 1024 / 1024, 1), "disk_cache": disk}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--objects", type=int, default=50)
+    parser.add_argument("--object-kb", type=int, default=512)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=20.0,
+                        help="artificial S3 round-trip latency added by the moto server")
+    parser.add_argument("--output", help="write the JSON results to this file")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    names = [f"assets/{i:04d}.bin" for i in range(args.objects)]
+    weights = [1 / (rank + 1) for rank in range(args.objects)]
+    keys = rng.choices(names, weights, k=args.requests)
+
+    results = {"config": vars(args), "runs": {}}
+    with harness.moto_server(args.latency_ms) as endpoint_url:
+        client = harness.s3_client(endpoint_url)
+        client.create_bucket(Bucket=BUCKET)
+        body = os.urandom(args.object_kb * 1024)
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            list(pool.map(lambda name: client.put_object(Bucket=BUCKET, Key=name, Body=body), names))
+
+        for enabled in ("false", "true"):
+            with tempfile.TemporaryDirectory() as cache_dir:
+                env = {"S3_SERVICE_DISK_CACHE_ENABLED": enabled, "S3_SERVICE_DISK_CACHE_DIR": cache_dir}
+                with harness.app_server(endpoint_url, extra_env=env) as (base_url, _):
+                    run = _downloads(base_url, keys, args.clients)
+            results["runs"][f"disk_cache_{enabled}"] = run
+            print(f"disk_cache_enabled={enabled}", run, flush=True)
+
+    harness.write_results(args.output, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Time-to-first-byte and peak memory of /list/ on a large bucket.
+
+Compares the buffered JSON listing with the streamed NDJSON listing
+(``stream=true``), each with keys only and with ``detail=true``. Each mode
+runs in a fresh app process so the reported peak RSS belongs to that mode
+alone.
+
+    python -m benchmarks.bench_list --keys 100000
+"""
+import argparse
+import time
+
+import httpx
+
+from benchmarks import harness
+
+
+BUCKET = "bench-bucket"
+
+MODES = {
+    "json": {"bucket": BUCKET},
+    "ndjson": {"bucket": BUCKET, "stream": "true"},
+    "json-detail": {"bucket": BUCKET, "detail": "true"},
+    "ndjson-detail": {"bucket": BUCKET, "stream": "true", "detail": "true"},
+}
+
+
+def measure(base_url: str, params: dict) -> dict:
+    started = time.perf_counter()
+    first_byte = None
+    size = 0
+    with httpx.stream("GET", f"{base_url}/list/", params=params, timeout=None) as response:
+        for chunk in response.iter_raw():
+            if first_byte is None:
+                first_byte = time.perf_counter() - started
+            size += len(chunk)
+    return {
+        "status": response.status_code,
+        "ttfb_s": round(first_byte or 0.0, 3),
+        "total_s": round(time.perf_counter() - started, 3),
+        "response_mb": round(size / 1024 / 1024, 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--keys", type=int, default=100_000)
+    parser.add_argument("--modes", nargs="+", choices=sorted(MODES), default=sorted(MODES))
+    parser.add_argument("--output", help="write the JSON results to this file")
+    args = parser.parse_args()
+
+    results = {"config": vars(args), "modes": {}}
+    with harness.in_process_moto_server() as endpoint_url:
+        harness.s3_client(endpoint_url).create_bucket(Bucket=BUCKET)
+        harness.seed_objects(BUCKET, (f"keys/{i:08d}.bin" for i in range(args.keys)))
+        for mode in args.modes:
+            with harness.app_server(endpoint_url) as (base_url, proc):
+                baseline_rss = harness.peak_rss_mb(proc.pid)
+                result = measure(base_url, MODES[mode])
+                result["app_peak_rss_mb"] = harness.peak_rss_mb(proc.pid)
+                result["app_rss_growth_mb"] = round(result["app_peak_rss_mb"] - baseline_rss, 1)
+            results["modes"][mode] = result
+
+    harness.write_results(args.output, results)
+
+
+if __name__ == "__main__":
+    main()
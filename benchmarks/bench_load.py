@@ -0,0 +1,93 @@
+"""Latency of the API under many concurrent clients.
+
+Each client uploads a small object, lists the bucket and deletes the object,
+in a loop. Every request's latency is recorded and p50/p95/p99 are reported
+per route and overall.
+
+    python -m benchmarks.bench_load --clients 200 --rounds 5 --latency-ms 20
+
+Point ``--app-dir`` at a checkout of another revision (for example a
+``git worktree``) to compare before and after a change.
+"""
+import argparse
+import asyncio
+import time
+from collections import defaultdict
+
+import httpx
+
+from benchmarks import harness
+
+
+BUCKET = "bench-bucket"
+
+
+async def _client_loop(http: httpx.AsyncClient, client_id: int, rounds: int, payload: bytes,
+                       samples: dict) -> None:
+    for round_number in range(rounds):
+        object_name = f"load/{client_id}-{round_number}.bin"
+        requests = [
+            ("upload", "POST", "/upload/", {"bucket": BUCKET},
+             {"files": {"file_upload": (object_name, payload)}}),
+            ("list", "GET", "/list/", {"bucket": BUCKET}, {}),
+            ("delete", "DELETE", "/delete/", {"bucket": BUCKET, "object_name": object_name}, {}),
+        ]
+        for route, method, path, params, kwargs in requests:
+            started = time.perf_counter()
+            try:
+                response = await http.request(method, path, params=params, **kwargs)
+                ok = response.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            samples[route].append(time.perf_counter() - started)
+            if not ok:
+                samples["errors"].append(route)
+
+
+async def run_load(base_url: str, clients: int, rounds: int, payload_size: int) -> dict:
+    samples = defaultdict(list)
+    payload = b"x" * payload_size
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as http:
+        started = time.perf_counter()
+        await asyncio.gather(*[
+            _client_loop(http, client_id, rounds, payload, samples) for client_id in range(clients)
+        ])
+        elapsed = time.perf_counter() - started
+
+    errors = samples.pop("errors", [])
+    all_samples = [sample for route_samples in samples.values() for sample in route_samples]
+    return {
+        "requests": len(all_samples),
+        "errors": len(errors),
+        "elapsed_s": round(elapsed, 2),
+        "req_per_s": round(len(all_samples) / elapsed, 1),
+        "overall": harness.percentiles(all_samples),
+        "routes": {route: harness.percentiles(route_samples) for route, route_samples in samples.items()},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--payload-size", type=int, default=4096)
+    parser.add_argument("--latency-ms", type=float, default=20.0,
+                        help="artificial S3 round-trip latency added by the moto server")
+    parser.add_argument("--app-dir", default=harness.REPO_ROOT,
+                        help="checkout whose main:app is benchmarked")
+    parser.add_argument("--output", help="write the JSON results to this file")
+    args = parser.parse_args()
+
+    with harness.moto_server(args.latency_ms) as endpoint_url:
+        harness.s3_client(endpoint_url).create_bucket(Bucket=BUCKET)
+        with harness.app_server(endpoint_url, app_dir=args.app_dir) as (base_url, proc):
+            results = asyncio.run(run_load(base_url, args.clients, args.rounds, args.payload_size))
+            results["app_peak_rss_mb"] = harness.peak_rss_mb(proc.pid)
+
+    results["config"] = vars(args)
+    harness.write_results(args.output, results)
+
+
+if __name__ == "__main__":
+    main()
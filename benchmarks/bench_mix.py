@@ -0,0 +1,207 @@
+"""Throughput and latency of mixed upload/download/list/delete workloads.
+
+For every object size in ``--sizes-kb`` and every workload in ``--mixes`` a
+fresh app process is started, ``--seed-objects`` objects of that size are
+written, and ``--clients`` concurrent clients pick operations at random with
+the mix's weights for ``--duration`` seconds. Each run reports req/s, MB/s,
+p50/p95/p99 latency (overall and per operation) and the app's peak RSS.
+
+    python -m benchmarks.bench_mix --sizes-kb 4 256 4096 --mixes balanced read-heavy --output new.json
+
+Compare two result files with :mod:`benchmarks.compare`. A mix can also be
+given as weights, e.g. ``--mixes upload=1,download=3``.
+
+``--workers 1 2 4`` runs every mix under the pre-fork server with each
+worker count and reports the speedup over the first count:
+
+    python -m benchmarks.bench_mix --sizes-kb 4 --workers 1 2 4 --clients 64
+"""
+import argparse
+import asyncio
+import random
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+import httpx
+
+from benchmarks import harness
+
+
+BUCKET = "bench-bucket"
+OPERATIONS = ("upload", "download", "list", "delete")
+
+MIXES = {
+    "balanced": {"upload": 25, "download": 25, "list": 25, "delete": 25},
+    "read-heavy": {"upload": 10, "download": 70, "list": 15, "delete": 5},
+    "write-heavy": {"upload": 60, "download": 15, "list": 5, "delete": 20},
+}
+
+
+def parse_mix(value: str) -> Dict[str, int]:
+    """Return the weights of a named mix or of ``op=weight,op=weight``."""
+    if value in MIXES:
+        return MIXES[value]
+    weights = {}
+    for item in value.split(","):
+        operation, _, weight = item.partition("=")
+        if operation not in OPERATIONS or not weight.isdigit():
+            raise argparse.ArgumentTypeError(f"bad mix {value!r}; use a name or op=weight,op=weight")
+        weights[operation] = int(weight)
+    return weights
+
+
+def mix_name(weights: Dict[str, int]) -> str:
+    return next((name for name, mix in MIXES.items() if mix == weights),
+                ",".join(f"{operation}={weight}" for operation, weight in weights.items()))
+
+
+class _Recorder:
+    """Latency samples, bytes and errors per operation."""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.bytes: Dict[str, int] = defaultdict(int)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    def summary(self, elapsed: float) -> dict:
+        every_sample = [sample for samples in self.samples.values() for sample in samples]
+        total_bytes = sum(self.bytes.values())
+        return {
+            "requests": len(every_sample),
+            "errors": sum(self.errors.values()),
+            "elapsed_s": round(elapsed, 2),
+            "req_per_s": round(len(every_sample) / elapsed, 1),
+            "mb_per_s": round(total_bytes / 1024 / 1024 / elapsed, 2),
+            "latency_ms": harness.percentiles(every_sample),
+            "operations": {
+                operation: {
+                    "requests": len(samples),
+                    "errors": self.errors[operation],
+                    "req_per_s": round(len(samples) / elapsed, 1),
+                    "mb_per_s": round(self.bytes[operation] / 1024 / 1024 / elapsed, 2),
+                    "latency_ms": harness.percentiles(samples),
+                }
+                for operation, samples in sorted(self.samples.items())
+            },
+        }
+
+
+async def _request(http: httpx.AsyncClient, operation: str, client_id: int, sequence: int,
+                   payload: bytes, seeded: List[str], uploaded: List[str], prefix: str,
+                   rng: random.Random) -> int:
+    """Run one operation and return the body bytes it moved; raise on failure."""
+    if operation == "upload":
+        object_name = f"{prefix}/client-{client_id}/{sequence}.bin"
+        response = await http.put("/upload/stream/", params={"bucket": BUCKET, "object_name": object_name},
+                                  content=payload)
+        response.raise_for_status()
+        uploaded.append(object_name)
+        return len(payload)
+    if operation == "download":
+        response = await http.get("/download/stream/",
+                                  params={"bucket": BUCKET, "object_name": rng.choice(seeded)})
+        response.raise_for_status()
+        return len(response.content)
+    if operation == "list":
+        response = await http.get("/list/", params={"bucket": BUCKET, "prefix": f"{prefix}/seed/",
+                                                    "max_keys": 100})
+        response.raise_for_status()
+        return 0
+    # Deletes remove this client's own uploads; without one the key does not
+    # exist, which S3 answers like any other delete
+    object_name = uploaded.pop() if uploaded else f"{prefix}/client-{client_id}/missing-{sequence}.bin"
+    response = await http.delete("/delete/", params={"bucket": BUCKET, "object_name": object_name})
+    response.raise_for_status()
+    return 0
+
+
+async def _client_loop(http: httpx.AsyncClient, client_id: int, weights: Dict[str, int], deadline: float,
+                       payload: bytes, seeded: List[str], prefix: str, recorder: _Recorder) -> None:
+    rng = random.Random(client_id)
+    operations, operation_weights = list(weights), list(weights.values())
+    uploaded: List[str] = []
+    sequence = 0
+    while time.perf_counter() < deadline:
+        operation = rng.choices(operations, operation_weights)[0]
+        sequence += 1
+        started = time.perf_counter()
+        try:
+            recorder.bytes[operation] += await _request(http, operation, client_id, sequence, payload,
+                                                        seeded, uploaded, prefix, rng)
+        except httpx.HTTPError:
+            recorder.errors[operation] += 1
+        recorder.samples[operation].append(time.perf_counter() - started)
+
+
+async def run_mix(base_url: str, weights: Dict[str, int], clients: int, duration: float,
+                  payload: bytes, seeded: List[str], prefix: str) -> dict:
+    recorder = _Recorder()
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=300) as http:
+        started = time.perf_counter()
+        await asyncio.gather(*[
+            _client_loop(http, client_id, weights, started + duration, payload, seeded, prefix, recorder)
+            for client_id in range(clients)
+        ])
+        elapsed = time.perf_counter() - started
+    return recorder.summary(elapsed)
+
+
+def seed(endpoint_url: str, prefix: str, count: int, payload: bytes) -> List[str]:
+    s3 = harness.s3_client(endpoint_url)
+    keys = [f"{prefix}/seed/{i:05d}.bin" for i in range(count)]
+    for key in keys:
+        s3.put_object(Bucket=BUCKET, Key=key, Body=payload)
+    return keys
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes-kb", type=int, nargs="+", default=[4, 256, 4096])
+    parser.add_argument("--mixes", type=parse_mix, nargs="+", default=[MIXES["balanced"]],
+                        help=f"named mixes ({', '.join(MIXES)}) or op=weight,op=weight")
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per run")
+    parser.add_argument("--seed-objects", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=20.0,
+                        help="artificial S3 round-trip latency added by the moto server")
+    parser.add_argument("--workers", type=int, nargs="+",
+                        help="run under my_server with these worker counts instead of plain uvicorn")
+    parser.add_argument("--app-dir", default=harness.REPO_ROOT,
+                        help="checkout whose main:app is benchmarked")
+    parser.add_argument("--output", help="write the JSON results to this file")
+    args = parser.parse_args()
+
+    results = {"config": {**vars(args), "mixes": [mix_name(weights) for weights in args.mixes]},
+               "environment": harness.environment(args.app_dir), "runs": []}
+    with harness.moto_server(args.latency_ms) as endpoint_url:
+        harness.s3_client(endpoint_url).create_bucket(Bucket=BUCKET)
+        for size_kb in args.sizes_kb:
+            payload = random.Random(size_kb).randbytes(size_kb * 1024)
+            prefix = f"mix-{size_kb}kb"
+            seeded = seed(endpoint_url, prefix, args.seed_objects, payload)
+            for weights in args.mixes:
+                name = mix_name(weights)
+                baseline = None
+                for workers in args.workers or [None]:
+                    with harness.app_server(endpoint_url, app_dir=args.app_dir, workers=workers) as \
+                            (base_url, proc):
+                        run = asyncio.run(run_mix(base_url, weights, args.clients, args.duration, payload,
+                                                  seeded, prefix))
+                        run["app_peak_rss_mb"] = harness.peak_rss_mb(proc.pid, children=True)
+                    run_name = f"{name}/{size_kb}kb" + (f"/{workers}w" if workers else "")
+                    if workers:
+                        baseline = baseline or (workers, run["req_per_s"])
+                        speedup = run["req_per_s"] / baseline[1] if baseline[1] else 0.0
+                        run.update(workers=workers, speedup=round(speedup, 2),
+                                   scaling_efficiency=round(speedup * baseline[0] / workers, 2))
+                    results["runs"].append({"name": run_name, "mix": name, "object_kb": size_kb, **run})
+                    print(f"{run_name}: {run['req_per_s']} req/s, {run['mb_per_s']} MB/s, "
+                          f"p99 {run['latency_ms']['p99']} ms", flush=True)
+
+    harness.write_results(args.output, results)
+
+
+if __name__ == "__main__":
+    main()
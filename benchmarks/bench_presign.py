@@ -0,0 +1,62 @@
+"""Presigned URL signatures per second.
+
+Signs ``--count`` URLs in process, with no S3 round trips involved:
+botocore's ``generate_presigned_url`` directly, the service with reuse
+disabled, and the service answering repeated requests for the same objects
+from its signature cache.
+
+    python -m benchmarks.bench_presign --count 20000 --distinct-keys 100
+"""
+import argparse
+import time
+
+import boto3
+
+import my_services
+from benchmarks import harness
+
+
+BUCKET = "bench-bucket"
+
+
+def _rate(label: str, count: int, func) -> dict:
+    started = time.perf_counter()
+    for i in range(count):
+        func(i)
+    elapsed = time.perf_counter() - started
+    run = {"mode": label, "signatures_per_s": round(count / elapsed),
+           "us_per_signature": round(elapsed / count * 1e6, 1)}
+    print(run, flush=True)
+    return run
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=20000)
+    parser.add_argument("--distinct-keys", type=int, default=100,
+                        help="objects the repeated requests are spread over")
+    parser.add_argument("--output", help="write the JSON results to this file")
+    args = parser.parse_args()
+
+    client = boto3.client("s3", region_name="us-east-1", aws_access_key_id="bench",
+                          aws_secret_access_key="bench", config=my_services.build_client_config())
+    my_services.s3_client = client
+    keys = [f"media/{i:06d}.mp4" for i in range(args.distinct_keys)]
+
+    results = {"config": vars(args), "runs": [
+        _rate("botocore generate_presigned_url", args.count, lambda i: client.generate_presigned_url(
+            "put_object", Params={"Bucket": BUCKET, "Key": keys[i % len(keys)]}, ExpiresIn=900)),
+    ]}
+    my_services.settings.presign_reuse_seconds = 0
+    results["runs"].append(_rate("service, reuse disabled", args.count, lambda i: (
+        my_services.presign_upload_url(BUCKET, keys[i % len(keys)], 900))))
+    my_services.settings.presign_reuse_seconds = 60
+    results["runs"].append(_rate("service, repeated objects", args.count, lambda i: (
+        my_services.presign_upload_url(BUCKET, keys[i % len(keys)], 900))))
+    results["presign_cache"] = my_services.get_cache_stats()["presign"]
+
+    harness.write_results(args.output, results)
+
+
+if __name__ == "__main__":
+    main()
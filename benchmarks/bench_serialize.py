@@ -0,0 +1,126 @@
+"""Cost of rendering large listing responses, validated versus raw.
+
+The listing is built in process from synthetic ``list_objects_v2`` pages,
+so S3 and the network are left out and only the response path is timed.
+Every path runs through a FastAPI app over ASGI:
+
+- ``validated``: a dict returned under ``response_model``, which FastAPI
+  validates into models and dumps again (the path before ``my_json``),
+- ``raw-pydantic``: a ``RawJSONResponse`` rendered by pydantic-core, as
+  without orjson,
+- ``raw-orjson``: a ``RawJSONResponse`` rendered by orjson, if installed.
+
+Each path is timed for plain key lists and for ``detail`` listings.
+
+    python -m benchmarks.bench_serialize --keys 10000 100000 --requests 10
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, List
+
+import httpx
+from fastapi import FastAPI
+
+from benchmarks import harness
+
+import my_json
+import my_schemas
+import my_services
+
+
+PATHS = ("validated", "raw-pydantic", "raw-orjson")
+
+
+class _PydanticJSONResponse(my_json.RawJSONResponse):
+
+    def render(self, content) -> bytes:
+        return my_json.pydantic_dumps(content)
+
+
+def fake_pages(keys: int, page_size: int = 1000) -> Iterator[dict]:
+    """Yield ``list_objects_v2`` pages shaped like botocore's."""
+    rng = random.Random(keys)
+    epoch = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    for start in range(0, keys, page_size):
+        yield {'Contents': [{'Key': f"logs/{i // 1000:04d}/{i:08d}.log", 'Size': rng.randrange(1 << 20),
+                             'ETag': f'"{rng.getrandbits(128):032x}"',
+                             'LastModified': epoch + timedelta(seconds=rng.randrange(10 ** 7)),
+                             'StorageClass': 'STANDARD'}
+                            for i in range(start, min(keys, start + page_size))],
+               'IsTruncated': start + page_size < keys}
+
+
+def listing(pages: List[dict], detail: bool) -> List[dict]:
+    entries = []
+    for page in pages:
+        entries.extend(my_services.listing_entries(page, detail))
+    return [{"bucket_name": "bench-bucket", "files": [] if detail else entries, "prefix": None,
+             "common_prefixes": [], "is_truncated": False, "next_continuation_token": None,
+             "objects": entries if detail else None}]
+
+
+def bench_app(pages: List[dict]) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/validated/", response_model=List[my_schemas.FileListResponse])
+    async def validated(detail: bool = False):
+        return listing(pages, detail)
+
+    @app.get("/raw-pydantic/")
+    async def raw_pydantic(detail: bool = False):
+        return _PydanticJSONResponse(listing(pages, detail))
+
+    @app.get("/raw-orjson/")
+    async def raw_orjson(detail: bool = False):
+        return my_json.RawJSONResponse(listing(pages, detail))
+
+    return app
+
+
+async def measure(app: FastAPI, path: str, detail: bool, requests: int) -> dict:
+    samples, size = [], 0
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        for _ in range(requests):
+            started = time.perf_counter()
+            response = await http.get(f"/{path}/", params={"detail": detail})
+            response.raise_for_status()
+            samples.append(time.perf_counter() - started)
+            size = len(response.content)
+    return {**harness.percentiles(samples, (50, 95)), "response_mb": round(size / 1024 / 1024, 2)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--keys", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--requests", type=int, default=10, help="responses timed per path")
+    parser.add_argument("--paths", nargs="+", choices=PATHS, default=list(PATHS))
+    parser.add_argument("--output", help="write the JSON results to this file")
+    args = parser.parse_args()
+    if my_json.orjson is None and "raw-orjson" in args.paths:
+        print("orjson is not installed; skipping raw-orjson", flush=True)
+        args.paths.remove("raw-orjson")
+
+    results = {"config": vars(args), "environment": harness.environment(), "runs": []}
+    for keys in args.keys:
+        app = bench_app(list(fake_pages(keys)))
+        for detail in (False, True):
+            baseline = None
+            for path in args.paths:
+                run = asyncio.run(measure(app, path, detail, args.requests))
+                baseline = baseline or run["p50"]
+                name = f"{path}/{keys}" + ("/detail" if detail else "")
+                results["runs"].append({"name": name, "path": path, "keys": keys, "detail": detail,
+                                        "latency_ms": {"p50": run["p50"], "p95": run["p95"]},
+                                        "response_mb": run["response_mb"],
+                                        "speedup": round(baseline / run["p50"], 2) if run["p50"] else 0.0})
+                print(f"{name}: p50 {run['p50']} ms, {run['response_mb']} MB", flush=True)
+
+    harness.write_results(args.output, results)
+
+
+if __name__ == "__main__":
+    main()
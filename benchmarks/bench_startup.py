@@ -0,0 +1,163 @@
+"""Time to first request of a freshly started app process.
+
+Each run starts the app against a moto server and measures, from the moment
+the process is spawned:
+
+- ``listening_ms``: the port accepts connections,
+- ``ready_ms``: ``/ready/`` answers 200 (checkouts without it count as
+  ready once listening),
+- ``first_request_ms``: the first ``/list/`` call after that has returned,
+  i.e. what a client behind a readiness-gated load balancer waits for.
+
+``first_list_latency_ms`` is that first call on its own. ``import_ms`` is
+the time ``import main`` takes in a fresh interpreter, less the
+interpreter's own startup. Every scenario runs ``--runs`` times and
+reports medians:
+
+- ``no-model-cache``: botocore data parsed from its own files,
+- ``cold-model-cache``: an empty model cache, filled by the run,
+- ``warm-model-cache``: a model cache left by an earlier run.
+
+    python -m benchmarks.bench_startup --runs 10 --output startup.json
+
+``--workers 4`` also times the pre-fork server, until every worker is ready.
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, Optional
+
+import httpx
+
+from benchmarks import harness
+
+
+BUCKET = "bench-bucket"
+SCENARIOS = ("no-model-cache", "cold-model-cache", "warm-model-cache")
+
+
+def _wait(check, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not check():
+        if time.monotonic() > deadline:
+            raise TimeoutError("app did not start")
+        time.sleep(0.002)
+
+
+def _accepts(port: int) -> bool:
+    try:
+        with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+            return True
+    except OSError:
+        return False
+
+
+def _ready(http: httpx.Client, ports) -> bool:
+    for port in ports:
+        try:
+            status = http.get(f"http://127.0.0.1:{port}/ready/").status_code
+        except httpx.TransportError:
+            return False
+        if status not in (200, 404):
+            return False
+    return True
+
+
+def start_once(endpoint_url: str, app_dir: str, env: Dict[str, str], workers: Optional[int]) -> dict:
+    port = harness.free_port()
+    extra_args = []
+    ports = [port]
+    if workers:
+        # Reach every worker through its own port to wait until all are ready
+        health_port = harness.free_port()
+        extra_args = ["--health-port", str(health_port)]
+        ports = [health_port + n for n in range(workers)]
+    started = time.perf_counter()
+    proc = subprocess.Popen(harness.app_command(port, app_dir, workers, extra_args), cwd=app_dir,
+                            env=harness.app_env(endpoint_url, env))
+    try:
+        _wait(lambda: _accepts(port))
+        listening = time.perf_counter()
+        with httpx.Client(timeout=30) as http:
+            _wait(lambda: _ready(http, ports))
+            ready = time.perf_counter()
+            response = http.get(f"http://127.0.0.1:{port}/list/", params={"bucket": BUCKET})
+            response.raise_for_status()
+            done = time.perf_counter()
+    finally:
+        proc.terminate()
+        proc.wait()
+    return {"listening_ms": (listening - started) * 1000, "ready_ms": (ready - started) * 1000,
+            "first_request_ms": (done - started) * 1000, "first_list_latency_ms": (done - ready) * 1000}
+
+
+def import_ms(app_dir: str, env: Dict[str, str]) -> float:
+    def timed(code: str) -> float:
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=app_dir,
+                       env={**os.environ, **harness.MOTO_ENV, **env}, check=True)
+        return time.perf_counter() - started
+
+    return (timed("import main") - timed("pass")) * 1000
+
+
+def _median(samples) -> dict:
+    return {key: round(statistics.median(sample[key] for sample in samples), 1) for key in samples[0]}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="starts per scenario")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--workers", type=int, help="also time my_server with this many workers")
+    parser.add_argument("--app-dir", default=harness.REPO_ROOT,
+                        help="checkout whose main:app is benchmarked")
+    parser.add_argument("--output", help="write the JSON results to this file")
+    args = parser.parse_args()
+
+    results = {"config": vars(args), "environment": harness.environment(args.app_dir), "runs": []}
+    with harness.moto_server() as endpoint_url, tempfile.TemporaryDirectory() as scratch:
+        harness.s3_client(endpoint_url).create_bucket(Bucket=BUCKET)
+        # Keep jobs, spools and caches of the runs out of the checkout
+        state = {f"S3_SERVICE_{name.upper()}": os.path.join(scratch, name)
+                 for name in ("jobs_dir", "spool_dir", "download_dir", "sync_dir", "disk_cache_dir")}
+        state["S3_SERVICE_JOBS_DB"] = os.path.join(scratch, "jobs.db")
+        warm_cache = os.path.join(scratch, "warm-model-cache")
+
+        def cache_env(scenario: str) -> Dict[str, str]:
+            if scenario == "no-model-cache":
+                cache_dir = ""
+            elif scenario == "cold-model-cache":
+                cache_dir = tempfile.mkdtemp(dir=scratch)
+            else:
+                cache_dir = warm_cache
+            return {**state, "S3_SERVICE_MODEL_CACHE_DIR": cache_dir}
+
+        for scenario in args.scenarios:
+            if scenario == "warm-model-cache":
+                # One discarded start fills the cache
+                start_once(endpoint_url, args.app_dir, cache_env(scenario), None)
+            for workers in [None] + ([args.workers] if args.workers else []):
+                samples, imports = [], []
+                for _ in range(args.runs):
+                    if workers is None:
+                        imports.append(import_ms(args.app_dir, cache_env(scenario)))
+                    samples.append(start_once(endpoint_url, args.app_dir, cache_env(scenario), workers))
+                run = {"name": scenario + (f"/{workers}w" if workers else ""), "scenario": scenario,
+                       **_median(samples)}
+                if imports:
+                    run["import_ms"] = round(statistics.median(imports), 1)
+                results["runs"].append(run)
+                print(f"{run['name']}: ready {run['ready_ms']} ms, "
+                      f"first request {run['first_request_ms']} ms", flush=True)
+
+    harness.write_results(args.output, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Upload/download throughput across multipart chunk sizes and concurrency.
+
+Drives ``my_services.upload_file_to_s3`` and ``download_file_from_s3``
+directly against a moto server subprocess and reports MB/s for every
+combination of ``--part-sizes-mb`` and ``--concurrency``.
+
+    python -m benchmarks.bench_transfer --size-mb 64 --part-sizes-mb 5 8 16 32 --concurrency 1 4 10
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import my_services
+from benchmarks import harness
+
+
+BUCKET = "bench-bucket"
+
+
+def _timed(func, *args) -> float:
+    started = time.perf_counter()
+    if not func(*args):
+        raise RuntimeError(f"{func.__name__} failed")
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=64)
+    parser.add_argument("--part-sizes-mb", type=int, nargs="+", default=[5, 8, 16, 32])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 10])
+    parser.add_argument("--latency-ms", type=float, default=0.0,
+                        help="artificial S3 round-trip latency added by the moto server")
+    parser.add_argument("--output", help="write the JSON results to this file")
+    args = parser.parse_args()
+
+    results = {"config": vars(args), "runs": []}
+    with tempfile.TemporaryDirectory() as workdir, harness.moto_server(args.latency_ms) as endpoint_url:
+        source = os.path.join(workdir, "source.bin")
+        with open(source, "wb") as f:
+            for _ in range(args.size_mb):
+                f.write(os.urandom(1024 * 1024))
+        my_services.s3_client = harness.s3_client(endpoint_url)
+        my_services.s3_client.create_bucket(Bucket=BUCKET)
+
+        for part_size_mb in args.part_sizes_mb:
+            for concurrency in args.concurrency:
+                config = my_services.build_transfer_config(
+                    args.size_mb * my_services.MIB, part_size_mb * my_services.MIB, concurrency,
+                    use_threads=concurrency > 1)
+                key = f"transfer/{part_size_mb}-{concurrency}.bin"
+                upload_s = _timed(my_services.upload_file_to_s3, source, BUCKET, key, config)
+                download_s = _timed(my_services.download_file_from_s3, BUCKET, key,
+                                    os.path.join(workdir, "download.bin"), config)
+                my_services.delete_file_from_s3(BUCKET, key)
+                run = {
+                    "part_size_mb": part_size_mb,
+                    "concurrency": concurrency,
+                    "upload_mb_s": round(args.size_mb / upload_s, 1),
+                    "download_mb_s": round(args.size_mb / download_s, 1),
+                }
+                results["runs"].append(run)
+                print(run, flush=True)
+
+    harness.write_results(args.output, results)
+
+
+if __name__ == "__main__":
+    main()
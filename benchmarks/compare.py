@@ -0,0 +1,108 @@
+"""Compare two benchmark result files and flag regressions.
+
+Runs are matched by their ``name`` (or, for result files without runs, the
+whole file is one run). Every numeric metric with a known direction is
+compared: rates such as ``req_per_s`` and ``mb_per_s`` should not drop,
+latency percentiles, peak RSS and error counts should not grow.
+
+    python -m benchmarks.compare old.json new.json --threshold 10
+
+Exits with status 1 when a metric got worse by more than ``--threshold``
+percent, so it can gate a CI job.
+"""
+import argparse
+import json
+import re
+import sys
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+HIGHER_IS_BETTER = re.compile(r"(per_s|_mb_s)$")
+LOWER_IS_BETTER = re.compile(r"(^|\.)(p\d+|\w*_ms|\w*_s|\w*rss_mb|errors)$")
+# Bookkeeping fields that are numeric but not results
+IGNORED = re.compile(r"(^|\.)(requests|elapsed_s|object_kb)$")
+
+
+def _flatten(value, path: str = "") -> Iterator[Tuple[str, float]]:
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from _flatten(item, f"{path}.{key}" if path else key)
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        yield path, float(value)
+
+
+def _runs(results: dict) -> Dict[str, dict]:
+    if "runs" not in results:
+        return {"all": {key: value for key, value in results.items() if key not in ("config", "environment")}}
+    return {run.get("name") or json.dumps({k: v for k, v in run.items() if not isinstance(v, (int, float))},
+                                          sort_keys=True): run
+            for run in results["runs"]}
+
+
+def direction(metric: str) -> Optional[int]:
+    """Return 1 if bigger is better, -1 if smaller is better, None if unknown."""
+    if IGNORED.search(metric):
+        return None
+    if HIGHER_IS_BETTER.search(metric):
+        return 1
+    if LOWER_IS_BETTER.search(metric):
+        return -1
+    return None
+
+
+def compare(baseline: dict, candidate: dict, threshold: float) -> List[dict]:
+    """Return one row per comparable metric, marking regressions beyond ``threshold`` percent."""
+    rows = []
+    baseline_runs, candidate_runs = _runs(baseline), _runs(candidate)
+    for name, run in candidate_runs.items():
+        if name not in baseline_runs:
+            continue
+        before = dict(_flatten(baseline_runs[name]))
+        for metric, after in _flatten(run):
+            sign = direction(metric)
+            if sign is None or metric not in before:
+                continue
+            old = before[metric]
+            change = (after - old) / old * 100 if old else (0.0 if after == old else float("inf"))
+            rows.append({"run": name, "metric": metric, "baseline": old, "candidate": after,
+                         "change_pct": round(change, 1), "regression": -change * sign > threshold})
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="percent a metric may get worse before it counts as a regression")
+    parser.add_argument("--all", action="store_true", help="print unchanged metrics too")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+    for label, results in (("baseline", baseline), ("candidate", candidate)):
+        env = results.get("environment", {})
+        if env:
+            print(f"{label}: revision {env.get('revision')}, {env.get('cpu_count')} CPUs, "
+                  f"Python {env.get('python')}")
+
+    rows = compare(baseline, candidate, args.threshold)
+    for row in rows:
+        if args.all or row["regression"] or abs(row["change_pct"]) > args.threshold:
+            if row["regression"]:
+                marker = "REGRESSION"
+            elif direction(row["metric"]) * row["change_pct"] > args.threshold:
+                marker = "improved"
+            else:
+                marker = ""
+            print(f"{row['run']:<28} {row['metric']:<36} {row['baseline']:>12g} -> {row['candidate']:>12g} "
+                  f"({row['change_pct']:+.1f}%) {marker}")
+    regressions = sum(row["regression"] for row in rows)
+    print(f"{len(rows)} metrics compared, {regressions} regressions beyond {args.threshold:g}%")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
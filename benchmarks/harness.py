@@ -0,0 +1,225 @@
+"""Shared helpers for the benchmark scripts.
+
+The benchmarks run the real app under uvicorn, in its own process, against a
+moto server in another process. Numbers therefore include HTTP parsing and the
+event loop, but no real network and no AWS account. An optional per-request
+latency on the moto side stands in for the round trip to S3.
+"""
+import contextlib
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import boto3
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MOTO_ENV = {
+    "AWS_ACCESS_KEY_ID": "testing",
+    "AWS_SECRET_ACCESS_KEY": "testing",
+    "AWS_DEFAULT_REGION": "us-east-1",
+}
+
+
+class _LatencyMiddleware:
+    """WSGI middleware that delays every response to mimic S3 round trips."""
+
+    def __init__(self, app, latency_seconds: float):
+        self.app = app
+        self.latency_seconds = latency_seconds
+
+    def __call__(self, environ, start_response):
+        time.sleep(self.latency_seconds)
+        return self.app(environ, start_response)
+
+
+def free_port() -> int:
+    """Return a TCP port that is currently free on localhost."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port: int, timeout: float = 30.0) -> None:
+    """Block until something accepts connections on ``port``."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with contextlib.suppress(OSError):
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        time.sleep(0.05)
+    raise TimeoutError(f"nothing listening on port {port} after {timeout}s")
+
+
+def serve_moto(port: int, latency_ms: float = 0.0) -> None:
+    """Run a threaded moto S3 server in the current process (blocks)."""
+    from moto.moto_server.werkzeug_app import DomainDispatcherApplication, create_backend_app
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    WSGIRequestHandler.log_request = lambda *args, **kwargs: None
+    app = DomainDispatcherApplication(create_backend_app)
+    if latency_ms:
+        app = _LatencyMiddleware(app, latency_ms / 1000)
+    make_server("127.0.0.1", port, app, threaded=True).serve_forever()
+
+
+@contextlib.contextmanager
+def moto_server(latency_ms: float = 0.0) -> Iterator[str]:
+    """Start a moto S3 server subprocess and yield its endpoint URL."""
+    port = free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.harness", "moto", str(port), str(latency_ms)],
+        cwd=REPO_ROOT, env={**os.environ, **MOTO_ENV},
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_for_port(port)
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+@contextlib.contextmanager
+def in_process_moto_server(latency_ms: float = 0.0) -> Iterator[str]:
+    """Like :func:`moto_server`, but in this process so :func:`seed_objects` works.
+
+    Use it only when the seeding speed matters: the server then competes with
+    the benchmark driver for this process' GIL.
+    """
+    import threading
+    from moto.moto_server.werkzeug_app import DomainDispatcherApplication, create_backend_app
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    WSGIRequestHandler.log_request = lambda *args, **kwargs: None
+    app = DomainDispatcherApplication(create_backend_app)
+    if latency_ms:
+        app = _LatencyMiddleware(app, latency_ms / 1000)
+    server = make_server("127.0.0.1", free_port(), app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}"
+    finally:
+        server.shutdown()
+        thread.join()
+
+
+def seed_objects(bucket_name: str, keys: Iterable[str], body: bytes = b"") -> None:
+    """Write objects straight into the in-process moto backend, skipping HTTP."""
+    from moto.core import DEFAULT_ACCOUNT_ID
+    from moto.s3.models import s3_backends
+
+    backend = s3_backends[DEFAULT_ACCOUNT_ID]["aws"]
+    for key in keys:
+        backend.put_object(bucket_name, key, body)
+
+
+def app_command(port: int, app_dir: str = REPO_ROOT, workers: Optional[int] = None,
+                extra_args: Sequence[str] = ()) -> List[str]:
+    """Return the command line serving ``main:app`` on ``port``, under my_server if ``workers`` is set."""
+    if workers is None:
+        command = [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", app_dir]
+    else:
+        command = [sys.executable, "-m", "my_server", "--workers", str(workers)]
+    return [*command, "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning",
+            "--timeout-keep-alive", "60", *extra_args]
+
+
+def app_env(endpoint_url: str, extra_env: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """Return the environment pointing the app at the moto server at ``endpoint_url``."""
+    return {**os.environ, **MOTO_ENV, "AWS_ENDPOINT_URL_S3": endpoint_url, **(extra_env or {})}
+
+
+@contextlib.contextmanager
+def app_server(endpoint_url: str, app_dir: str = REPO_ROOT,
+               extra_env: Optional[Dict[str, str]] = None,
+               extra_args: Sequence[str] = (),
+               workers: Optional[int] = None) -> Iterator[Tuple[str, subprocess.Popen]]:
+    """Start ``main:app`` under uvicorn pointed at ``endpoint_url``.
+
+    With ``workers`` the app runs under the pre-fork server (:mod:`my_server`)
+    instead. Yields the base URL and the process, so callers can sample its RSS.
+    """
+    port = free_port()
+    proc = subprocess.Popen(app_command(port, app_dir, workers, extra_args), cwd=app_dir,
+                            env=app_env(endpoint_url, extra_env))
+    try:
+        wait_for_port(port)
+        yield f"http://127.0.0.1:{port}", proc
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def s3_client(endpoint_url: str):
+    """Return a boto3 client for the moto server at ``endpoint_url``."""
+    return boto3.client(
+        "s3", endpoint_url=endpoint_url, region_name=MOTO_ENV["AWS_DEFAULT_REGION"],
+        aws_access_key_id=MOTO_ENV["AWS_ACCESS_KEY_ID"],
+        aws_secret_access_key=MOTO_ENV["AWS_SECRET_ACCESS_KEY"],
+    )
+
+
+def percentiles(samples: List[float], points: Sequence[int] = (50, 95, 99)) -> Dict[str, float]:
+    """Return nearest-rank percentiles of ``samples`` in milliseconds."""
+    if not samples:
+        return {f"p{p}": 0.0 for p in points}
+    ordered = sorted(samples)
+    result = {}
+    for point in points:
+        rank = max(0, min(len(ordered) - 1, round(point / 100 * len(ordered)) - 1))
+        result[f"p{point}"] = round(ordered[rank] * 1000, 2)
+    return result
+
+
+def peak_rss_mb(pid: Optional[int] = None, children: bool = False) -> float:
+    """Return the peak resident set size of ``pid`` (default: this process) in MB.
+
+    With ``children`` the peaks of its child processes, e.g. server workers,
+    are added in.
+    """
+    pids = [pid or os.getpid()]
+    if children:
+        with contextlib.suppress(OSError):
+            with open(f"/proc/{pids[0]}/task/{pids[0]}/children") as listing:
+                pids += [int(child) for child in listing.read().split()]
+    total_kb = 0
+    for process in pids:
+        with contextlib.suppress(OSError):
+            with open(f"/proc/{process}/status") as status:
+                for line in status:
+                    if line.startswith("VmHWM:"):
+                        total_kb += int(line.split()[1])
+    return round(total_kb / 1024, 1)
+
+
+def environment(app_dir: str = REPO_ROOT) -> dict:
+    """Describe where a benchmark ran, so result files can be compared fairly."""
+    revision = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=app_dir,
+                              capture_output=True, text=True).stdout.strip()
+    return {
+        "revision": revision or None,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def write_results(path: Optional[str], results: dict) -> None:
+    """Print ``results`` as JSON and, if ``path`` is given, write them there too."""
+    text = json.dumps(results, indent=2, sort_keys=True)
+    print(text)
+    if path:
+        with open(path, "w") as output:
+            output.write(text + "\n")
+
+
+if __name__ == "__main__" and sys.argv[1:2] == ["moto"]:
+    serve_moto(int(sys.argv[2]), float(sys.argv[3]))
@@ -1,14 +1,160 @@
 """Module providing CRUD operations for S3."""
-from typing import List
+import asyncio
+import itertools
+import json
+import logging
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime
+from datetime import timezone
+from email.utils import format_datetime
+from typing import Iterator, List, Optional
 
-from fastapi import FastAPI, HTTPException, UploadFile, File
-from fastapi.responses import RedirectResponse
+from botocore.exceptions import (BotoCoreError, ClientError, ConnectionError as S3ConnectionError,
+                                 HTTPClientError)
+from fastapi import FastAPI, Header, HTTPException, Path, Query, Request, Response, UploadFile, File
+from fastapi.responses import FileResponse, JSONResponse, RedirectResponse, StreamingResponse
 
+import my_compression
+import my_dedup
+import my_jobs
+import my_json
+import my_metrics
+import my_query
+import my_resilience
 import my_schemas
+import my_server
 import my_services
+import my_spool
+import my_upload_sessions
 
 
-app = FastAPI()
+async def _warm_up() -> None:
+    """Warm the S3 clients and credentials, retrying until it works, then report ready."""
+    delay = 0.5
+    while True:
+        try:
+            await my_services.run_in_executor(my_services.warm_up)
+        except (BotoCoreError, my_resilience.S3ServiceError) as e:
+            logging.warning("S3 warm-up failed, retrying in %.1fs: %s", delay, e)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30.0)
+        else:
+            my_server.mark_ready()
+            return
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    sweepers = [
+        my_upload_sessions.Sweeper(my_services.sweep_abandoned_uploads,
+                                   my_services.settings.upload_sweep_interval_seconds),
+        my_upload_sessions.Sweeper(my_services.sweep_downloads,
+                                   my_services.settings.download_sweep_interval_seconds,
+                                   "download-sweeper", "Removed %d expired downloads"),
+        my_upload_sessions.Sweeper(my_services.sweep_jobs, my_services.settings.job_sweep_interval_seconds,
+                                   "job-sweeper", "Removed %d finished jobs"),
+    ]
+    # Spool files orphaned by an earlier process are removed when the manager is created
+    my_services.get_spool_manager()
+    job_queue = my_services.get_job_queue()
+    for sweeper in sweepers:
+        sweeper.start()
+    job_queue.start()
+    # Serve (and answer /health/) right away; /ready/ waits for the warm-up
+    warm_up = asyncio.create_task(_warm_up())
+    yield
+    my_server.mark_draining()
+    warm_up.cancel()
+    job_queue.stop(timeout=5)
+    for sweeper in sweepers:
+        sweeper.stop()
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(my_metrics.MetricsMiddleware)
+my_metrics.register_stats_collector(my_services.get_pool_stats, my_services.get_cache_stats,
+                                   my_services.get_dedup_stats, my_services.get_disk_cache_stats,
+                                   my_services.get_spool_stats)
+
+
+@app.exception_handler(my_resilience.S3ServiceError)
+async def s3_service_error(request: Request, error: my_resilience.S3ServiceError):
+    """Report a typed S3 error with its status code, and Retry-After for transient ones."""
+    if error.status_code >= 500:
+        logging.warning("%s %s: %s", request.method, request.url.path, error)
+    headers = {"Retry-After": str(error.retry_after)} if error.retry_after else None
+    return JSONResponse(status_code=error.status_code, content={"detail": str(error)}, headers=headers)
+
+
+@app.exception_handler(S3ConnectionError)
+@app.exception_handler(HTTPClientError)
+async def s3_unreachable(request: Request, error: Exception):
+    """S3 could not be reached even after retries."""
+    logging.error(error)
+    return JSONResponse(status_code=503, content={"detail": "S3 is unavailable, retry later"},
+                        headers={"Retry-After": str(my_services.settings.retry_after_seconds)})
+
+
+def _mib(size_mb: Optional[int]) -> Optional[int]:
+    return size_mb * 1024 * 1024 if size_mb else None
+
+
+async def _spool_body(request: Request, spool: my_spool.Spool, writer=None) -> None:
+    """Copy the request body into ``spool`` (through ``writer`` if given),
+    pausing while the spool quota is full."""
+    writer = writer or spool
+    async for chunk in request.stream():
+        await my_spool.wait_for_room(spool, len(chunk), my_services.settings.spool_wait_seconds)
+        writer.write(chunk)
+    spool.seek(0)
+
+
+def _spool_full(error: my_spool.SpoolQuotaExceeded) -> HTTPException:
+    logging.warning(error)
+    return HTTPException(status_code=503, detail="Server is busy spooling other uploads, retry later",
+                         headers={"Retry-After": "5"})
+
+
+def _dedup_enabled(dedup: Optional[bool]) -> bool:
+    return my_services.settings.dedup_enabled if dedup is None else dedup
+
+
+def _upload_encoding(compression: Optional[str], content_type: Optional[str]) -> Optional[str]:
+    """Pick the upload's content coding: the one requested, else the configured
+    one when the Content-Type is listed as compressible."""
+    settings = my_services.settings
+    if compression is None and not my_compression.is_compressible(content_type,
+                                                                 settings.compression_content_types):
+        return None
+    try:
+        return my_compression.resolve_encoding(
+            settings.upload_compression if compression is None else compression)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _check_dedup_compression(dedup: bool, compression: Optional[str], encoding: Optional[str]) -> None:
+    """Deduplicated uploads are stored as sent; only an explicit mix is an error."""
+    if dedup and compression is not None and encoding:
+        raise HTTPException(status_code=400, detail="Compression cannot be combined with dedup")
+
+
+async def _upload_deduplicated(fileobj, bucket: str, object_name: str, digest: str, size: int,
+                               transfer_config=None) -> dict:
+    """Run a deduplicated upload and build the upload response."""
+    result = await my_services.run_in_executor(
+        my_services.upload_fileobj_deduplicated, fileobj, bucket, object_name, digest, size,
+        transfer_config)
+    if result is None:
+        raise HTTPException(status_code=500, detail="File upload failed")
+    if result["deduplicated"]:
+        message = "File already stored, upload skipped"
+    else:
+        message = "File uploaded successfully"
+    return {"message": message, "object_name": object_name, "bucket_name": bucket, "sha256": digest,
+            "deduplicated": result["deduplicated"], "bytes_transferred": result["bytes_transferred"]}
+
 
 @app.get("/")
 async def root():
@@ -17,45 +163,849 @@ async def root():
 
 
 @app.post("/upload/", response_model=my_schemas.FileUploadResponse)
-async def upload_file(file_upload: UploadFile = File(...), bucket: str = "your-default-bucket"):
-    """Upload file to S3"""
-    file_location = f"temp/{file_upload.filename}"
-    with open(file_location, "wb+") as file_object:
-        file_object.write(file_upload.file.read())
+async def upload_file(file_upload: UploadFile = File(...), bucket: str = "your-default-bucket",
+                      part_size_mb: Optional[int] = Query(None, ge=5, le=5120),
+                      max_concurrency: Optional[int] = Query(None, ge=1, le=64),
+                      dedup: Optional[bool] = None, compression: Optional[str] = None):
+    """Upload file to S3
 
-    success = my_services.upload_file_to_s3(file_location, bucket, file_upload.filename)
+    With ``dedup`` (default: ``S3_SERVICE_DEDUP_ENABLED``) the content is
+    hashed and the transfer skipped when S3 already holds it. With
+    ``compression`` (``gzip``, ``zstd``, ``auto`` or ``none``; default:
+    ``S3_SERVICE_UPLOAD_COMPRESSION`` for compressible content types) the
+    file is compressed while it is uploaded.
+    """
+    transfer_config = my_services.build_transfer_config(
+        file_upload.size, _mib(part_size_mb), max_concurrency)
+    encoding = _upload_encoding(compression, file_upload.content_type)
+    _check_dedup_compression(_dedup_enabled(dedup), compression, encoding)
+    if encoding and not _dedup_enabled(dedup):
+        result = await my_services.run_in_executor(
+            my_services.upload_fileobj_compressed, file_upload.file, bucket, file_upload.filename,
+            encoding, file_upload.content_type, transfer_config)
+        if result is None:
+            raise HTTPException(status_code=500, detail="File upload failed")
+        return {"message": "File uploaded successfully", "object_name": file_upload.filename,
+                "bucket_name": bucket, "bytes_transferred": result["bytes_transferred"],
+                "content_encoding": encoding}
+    if _dedup_enabled(dedup):
+        # The form body was spooled by the multipart parser before we got
+        # here, so hashing it is a local read, not a second network pass
+        digest, size = await my_services.run_in_executor(my_dedup.hash_fileobj, file_upload.file)
+        return await _upload_deduplicated(file_upload.file, bucket, file_upload.filename, digest, size,
+                                          transfer_config)
+    success = await my_services.run_in_executor(
+        my_services.upload_fileobj_to_s3, file_upload.file, bucket, file_upload.filename,
+        transfer_config)
     if success:
-        return {"message": "File uploaded successfully",
-                "object_name": file_upload.filename, "bucket_name": bucket}
+        return {"message": "File uploaded successfully", "object_name": file_upload.filename,
+                "bucket_name": bucket, "bytes_transferred": file_upload.size}
+    raise HTTPException(status_code=500, detail="File upload failed")
+
+
+@app.post("/upload/batch/", response_model=my_schemas.BatchUploadResponse)
+async def upload_files_batch(files: Optional[List[UploadFile]] = File(None),
+                             archive: Optional[UploadFile] = File(None),
+                             bucket: str = "your-default-bucket", prefix: str = "",
+                             max_workers: Optional[int] = Query(None, ge=1, le=64)):
+    """Upload many files, or the members of a tar/zip archive, to S3 concurrently
+
+    Each multipart ``files`` part is stored under ``prefix`` plus its
+    filename; archive members under ``prefix`` plus their path.
+    """
+    if bool(files) == (archive is not None):
+        raise HTTPException(status_code=400, detail="Send either files or an archive")
+    if archive is not None:
+        try:
+            results = await my_services.run_in_executor(
+                my_services.upload_archive_to_s3, archive.file, bucket, prefix, max_workers)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except my_spool.SpoolQuotaExceeded as e:
+            raise _spool_full(e)
+    else:
+        items = [(prefix + upload.filename, upload.file) for upload in files]
+        results = await my_services.run_in_executor(
+            my_services.upload_files_to_s3, items, bucket, max_workers)
+    uploaded_count = sum(1 for result in results if result["uploaded"])
+    return my_json.RawJSONResponse({"bucket_name": bucket, "uploaded_count": uploaded_count,
+                                    "failed_count": len(results) - uploaded_count, "results": results})
+
+
+@app.put("/upload/stream/", response_model=my_schemas.FileUploadResponse)
+async def upload_file_stream(request: Request, object_name: str, bucket: str = "your-default-bucket",
+                             part_size_mb: Optional[int] = Query(None, ge=5, le=5120),
+                             content_length: Optional[int] = Header(None),
+                             content_type: Optional[str] = Header(None),
+                             dedup: Optional[bool] = None, compression: Optional[str] = None):
+    """Stream the raw request body to S3 as it arrives
+
+    With ``dedup`` the body is hashed while it is spooled and only sent to
+    S3 if S3 does not already hold the same content. With ``compression``
+    each chunk is compressed before it is buffered into a part.
+    """
+    encoding = _upload_encoding(compression, content_type)
+    _check_dedup_compression(_dedup_enabled(dedup), compression, encoding)
+    if _dedup_enabled(dedup):
+        with my_services.get_spool_manager().spool() as spool:
+            writer = my_dedup.HashingWriter(spool)
+            try:
+                await _spool_body(request, spool, writer)
+            except my_spool.SpoolQuotaExceeded as e:
+                raise _spool_full(e)
+            transfer_config = my_services.build_transfer_config(writer.size, _mib(part_size_mb))
+            return await _upload_deduplicated(spool, bucket, object_name, writer.hexdigest(), writer.size,
+                                              transfer_config)
+
+    uploader = my_services.MultipartStreamUploader(bucket, object_name, _mib(part_size_mb),
+                                                   content_length, encoding, content_type)
+    try:
+        async for chunk in request.stream():
+            if not await my_services.run_in_executor(uploader.write, chunk):
+                raise HTTPException(status_code=500, detail="File upload failed")
+        completed = await my_services.run_in_executor(uploader.complete)
+    except my_services.TooManyParts as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except BaseException:
+        # A dropped client or a cancelled request must not leave a multipart upload behind
+        await asyncio.shield(my_services.run_in_executor(uploader.abort))
+        raise
+
+    if completed:
+        return {"message": "File uploaded successfully", "object_name": object_name,
+                "bucket_name": bucket, "bytes_transferred": uploader.bytes_sent,
+                "content_encoding": encoding}
     raise HTTPException(status_code=500, detail="File upload failed")
 
 
 @app.get("/download/", response_model=my_schemas.FileDownloadResponse)
-async def download_file(bucket: str, object_name: str):
-    """Download file from S3"""
-    file_path = f"temp/{object_name}"
-    success = my_services.download_file_from_s3(bucket, object_name, file_path)
+async def download_file(bucket: str, object_name: str,
+                        part_size_mb: Optional[int] = Query(None, ge=5, le=5120),
+                        max_concurrency: Optional[int] = Query(None, ge=1, le=64),
+                        decompress: bool = True):
+    """Download file from S3
+
+    The file is written under ``S3_SERVICE_DOWNLOAD_DIR`` (``temp``) and
+    atomically replaced, so concurrent downloads of one object never mix.
+    gzip/zstd encoded objects are stored decompressed unless ``decompress`` is false.
+    """
+    try:
+        file_path = my_spool.safe_path(my_services.settings.download_dir, object_name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    transfer_config = my_services.build_transfer_config(
+        part_size=_mib(part_size_mb), max_concurrency=max_concurrency)
+    success = await my_services.run_in_executor(
+        my_services.download_file_from_s3, bucket, object_name, file_path, transfer_config, decompress)
     if success:
         return {"message": "File downloaded successfully", "file_path": file_path}
     raise HTTPException(status_code=500, detail="File download failed")
 
 
+def _object_headers(s3_response: dict) -> dict:
+    """Map get_object response fields onto HTTP response headers."""
+    headers = {"Accept-Ranges": "bytes"}
+    if "ETag" in s3_response:
+        headers["ETag"] = s3_response["ETag"]
+    if "ContentLength" in s3_response:
+        headers["Content-Length"] = str(s3_response["ContentLength"])
+    if "ContentRange" in s3_response:
+        headers["Content-Range"] = s3_response["ContentRange"]
+    if "LastModified" in s3_response:
+        headers["Last-Modified"] = format_datetime(s3_response["LastModified"].astimezone(timezone.utc),
+                                                   usegmt=True)
+    return headers
+
+
+def _read_error(e: ClientError, detail: str) -> Exception:
+    """Map a failed object read onto the error the client gets."""
+    code = e.response.get("Error", {}).get("Code")
+    if code == "InvalidRange":
+        return HTTPException(status_code=416, detail="Requested range not satisfiable")
+    typed = my_resilience.translate(e, my_services.settings.retry_after_seconds)
+    if typed is not None:
+        return typed
+    return HTTPException(status_code=500, detail=detail)
+
+
+@app.get("/download/stream/")
+async def download_file_stream(bucket: str, object_name: str,
+                               range_header: Optional[str] = Header(None, alias="Range"),
+                               if_none_match: Optional[str] = Header(None),
+                               accept_encoding: Optional[str] = Header(None)):
+    """Stream file bytes from S3, honouring Range and If-None-Match
+
+    Objects stored gzip/zstd encoded are passed through when the client's
+    Accept-Encoding admits the coding (and always for range requests, which
+    address the stored bytes); otherwise they are decompressed on the fly.
+    With the disk cache enabled, objects are served from local disk.
+    """
+    if my_services.get_disk_cache() is not None:
+        entry = await my_services.run_in_executor(my_services.open_cached_object, bucket, object_name)
+        if entry is not None:
+            return _cached_object_response(entry, range_header, if_none_match, accept_encoding)
+    try:
+        s3_response = await my_services.run_in_executor(
+            my_services.get_object_stream, bucket, object_name, range_header, _opaque_tags(if_none_match))
+    except ClientError as e:
+        code = e.response.get("Error", {}).get("Code")
+        if code in ("304", "NotModified"):
+            return await _not_modified(e, bucket, object_name, if_none_match)
+        raise _read_error(e, "File download failed") from e
+
+    body = my_services.iter_object_body(s3_response["Body"])
+    headers = _object_headers(s3_response)
+    encoding = s3_response.get("ContentEncoding")
+    if encoding and not _send_as_stored(encoding, range_header, accept_encoding):
+        body = _decompressed_body(body, encoding, bucket, object_name)
+        _set_decoded_headers(headers, s3_response.get("Metadata", {}))
+    elif encoding:
+        headers["Content-Encoding"] = encoding
+    if encoding:
+        headers["Vary"] = "Accept-Encoding"
+    return StreamingResponse(
+        body,
+        status_code=206 if "ContentRange" in s3_response else 200,
+        media_type=s3_response.get("ContentType", "application/octet-stream"),
+        headers=headers,
+    )
+
+
+def _opaque_tag(tag: str) -> str:
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def _opaque_tags(if_none_match: Optional[str]) -> Optional[str]:
+    """Drop the weak markers S3 would not match; If-None-Match compares weakly anyway."""
+    if not if_none_match or if_none_match.strip() == "*":
+        return if_none_match
+    return ", ".join(_opaque_tag(tag.strip()) for tag in if_none_match.split(","))
+
+
+def _matching_etag(etag: str, if_none_match: str) -> Optional[str]:
+    """Return the If-None-Match tag that weakly matches ``etag`` (``etag`` for ``*``), else None.
+
+    Decompressed responses carry the weak ``W/`` form of the stored ETag,
+    so the matching tag is the one the client's copy was sent with.
+    """
+    if if_none_match.strip() == "*":
+        return etag
+    tags = (tag.strip() for tag in if_none_match.split(","))
+    return next((tag for tag in tags if _opaque_tag(tag) == _opaque_tag(etag)), None)
+
+
+async def _not_modified(e: ClientError, bucket: str, object_name: str, if_none_match: str) -> Response:
+    """Answer 304 with the ETag of the client's copy; If-None-Match may list several tags or ``*``."""
+    etag = e.response.get("ResponseMetadata", {}).get("HTTPHeaders", {}).get("etag")
+    if etag is None:
+        metadata = await my_services.run_in_executor(my_services.head_file_in_s3, bucket, object_name)
+        etag = metadata["etag"] if metadata else None
+    if etag:
+        etag = _matching_etag(etag, if_none_match) or etag
+    return Response(status_code=304, headers={"ETag": etag} if etag else None)
+
+
+def _send_as_stored(encoding: str, range_header: Optional[str], accept_encoding: Optional[str]) -> bool:
+    """Whether an encoded object goes out as stored rather than decompressed."""
+    return (bool(range_header) or not my_compression.is_decodable(encoding)
+            or my_compression.negotiate(accept_encoding, encoding))
+
+
+def _set_decoded_headers(headers: dict, metadata: dict) -> None:
+    """Adjust the stored object's headers for a decompressed response."""
+    headers.pop("Accept-Ranges", None)
+    # The decoded bytes differ from the stored ones, so only a weak validator fits
+    if "ETag" in headers:
+        headers["ETag"] = "W/" + _opaque_tag(headers["ETag"])
+    original_size = metadata.get(my_compression.ORIGINAL_SIZE_METADATA_KEY)
+    if original_size:
+        headers["Content-Length"] = original_size
+    else:
+        headers.pop("Content-Length", None)
+
+
+def _decompressed_body(body: Iterator[bytes], encoding: str, bucket: str,
+                       object_name: str) -> Iterator[bytes]:
+    """Decompress a streamed object; a corrupt object ends the response early."""
+    try:
+        yield from my_compression.decompress_chunks(body, encoding)
+    except ValueError as e:
+        logging.error("Cannot decompress %s/%s: %s", bucket, object_name, e)
+
+
+def _ended_on_error(chunks: Iterator[bytes], bucket: str, object_name: str) -> Iterator[bytes]:
+    """Stream query output; an error once the response has started ends it early."""
+    try:
+        yield from chunks
+    except (ValueError, ClientError, BotoCoreError) as e:
+        logging.error("Query of %s/%s stopped: %s", bucket, object_name, e)
+
+
+@app.get("/query/")
+async def query_object(bucket: str, object_name: str, mode: str = "head",
+                       start: Optional[int] = Query(None, ge=0), end: Optional[int] = Query(None, ge=0),
+                       count: int = Query(10, ge=1, le=100_000),
+                       format_: str = Query("text", alias="format"), select: Optional[str] = None,
+                       where: Optional[str] = None, contains: Optional[str] = None,
+                       limit: Optional[int] = Query(None, ge=1)):
+    """Read part of an object: a byte range, lines or the rows matching a filter
+
+    ``mode=bytes`` returns bytes ``start`` to ``end`` of the stored object.
+    ``head`` and ``tail`` return the first or last ``count`` lines, ``lines``
+    lines ``start`` to ``end`` (numbered from 1). ``filter`` streams the
+    object and returns the lines of a ``text``, ``csv`` or ``jsonl`` object
+    that contain ``contains`` and match ``where`` (e.g. ``status>=500``),
+    keeping the comma-separated ``select`` columns, up to ``limit`` matches.
+    """
+    try:
+        info, chunks = await my_services.run_in_executor(
+            my_services.query_object, bucket, object_name, mode, start, end, count, format_,
+            select.split(",") if select else [], where, contains, limit)
+    except my_query.LineTooLong as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") == "PreconditionFailed":
+            raise HTTPException(status_code=409, detail="Object changed while it was read") from e
+        raise _read_error(e, "Object query failed") from e
+
+    headers = {}
+    if info["etag"]:
+        headers["ETag"] = info["etag"]
+    if info["content_range"]:
+        headers["Content-Range"] = info["content_range"]
+    if info["content_encoding"]:
+        headers["Content-Encoding"] = info["content_encoding"]
+    media_type = info["content_type"]
+    if mode == my_query.FILTER:
+        media_type = {my_query.CSV: "text/csv", my_query.JSONL: "application/x-ndjson"}.get(
+            format_, "text/plain")
+    return StreamingResponse(_ended_on_error(chunks, bucket, object_name),
+                             status_code=206 if info["content_range"] else 200,
+                             media_type=media_type, headers=headers)
+
+
+class _CachedFileResponse(FileResponse):
+    """FileResponse that unpins its disk cache entry however the response ends.
+
+    Starlette answers Range requests from the file itself, and hands the path
+    to servers offering the ``http.response.pathsend`` extension for a
+    zero-copy ``sendfile``.
+    """
+
+    def __init__(self, entry: dict, **kwargs):
+        super().__init__(entry["path"], **kwargs)
+        self.entry = entry
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            my_services.get_disk_cache().release(self.entry)
+
+
+def _released_after(body: Iterator[bytes], entry: dict) -> Iterator[bytes]:
+    try:
+        yield from body
+    finally:
+        my_services.get_disk_cache().release(entry)
+
+
+def _cached_object_response(entry: dict, range_header: Optional[str], if_none_match: Optional[str],
+                            accept_encoding: Optional[str]) -> Response:
+    """Answer a download from a pinned disk cache entry."""
+    etag = entry["etag"]
+    matching = _matching_etag(etag, if_none_match) if if_none_match else None
+    if matching:
+        my_services.get_disk_cache().release(entry)
+        return Response(status_code=304, headers={"ETag": matching})
+    headers = _object_headers({"ETag": etag, **({"LastModified": entry["last_modified"]}
+                                                 if entry["last_modified"] else {})})
+    media_type = entry["content_type"] or "application/octet-stream"
+    encoding = entry["content_encoding"]
+    if encoding:
+        headers["Vary"] = "Accept-Encoding"
+        if not _send_as_stored(encoding, range_header, accept_encoding):
+            _set_decoded_headers(headers, entry["metadata"] or {})
+            body = _decompressed_body(my_services.iter_cached_file(entry["path"]), encoding,
+                                      entry["bucket_name"], entry["object_name"])
+            return StreamingResponse(_released_after(body, entry), media_type=media_type, headers=headers)
+        headers["Content-Encoding"] = encoding
+    return _CachedFileResponse(entry, media_type=media_type, headers=headers)
+
+
+def _ndjson_listing(bucket: str, pages: Iterator[dict], detail: bool) -> Iterator[bytes]:
+    """Yield one NDJSON chunk per listing page."""
+    try:
+        for page in pages:
+            with my_metrics.stage_timer("list_objects", bucket, "serialize"):
+                entries = my_services.listing_entries(page, detail)
+                lines = [my_json.dumps(entry if detail else {"key": entry}) for entry in entries]
+                lines += [my_json.dumps({"prefix": p["Prefix"]}) for p in page.get("CommonPrefixes", [])]
+                chunk = b"\n".join(lines) + b"\n" if lines else b""
+            if chunk:
+                yield chunk
+    except (ClientError, my_resilience.S3ServiceError) as e:
+        # The 200 is already sent, so a failure after the first page ends the stream with an error line
+        logging.error(e)
+        yield (json.dumps({"error": "File listing failed"}) + "\n").encode()
+
+
+def _listing_response(bucket: str, prefix: str, page: dict) -> my_json.RawJSONResponse:
+    """Render listing pages with every field of FileListResponse, without validating them."""
+    return my_json.RawJSONResponse([{
+        "bucket_name": bucket, "files": [], "prefix": prefix or None, "common_prefixes": [],
+        "is_truncated": False, "next_continuation_token": None, "objects": None, **page}])
+
+
 @app.get("/list/", response_model=List[my_schemas.FileListResponse])
-async def list_files(bucket: str):
-    """List files from S3"""
-    file_names = my_services.list_files_in_s3(bucket)
-    return [{"bucket_name": bucket, "files": file_names}]
+async def list_files(bucket: str, prefix: str = "", delimiter: Optional[str] = None,
+                     max_keys: Optional[int] = Query(None, ge=1, le=1000),
+                     continuation_token: Optional[str] = None, stream: bool = False,
+                     detail: bool = False):
+    """List files from S3
+
+    Without paging parameters every page is fetched. With ``max_keys``,
+    ``continuation_token`` or ``delimiter`` a single page is returned.
+    ``stream=true`` walks all pages and streams them as NDJSON.
+    ``detail=true`` lists ``objects`` with size, ETag, last modification
+    and storage class instead of ``files``.
+    """
+    if stream:
+        pages = my_services.iter_list_pages(bucket, prefix, delimiter, max_keys, use_cache=False)
+        # Fetch the first page before the status goes out, so its errors get their own status
+        try:
+            first = await my_services.run_in_executor(next, pages)
+        except ClientError as e:
+            logging.error(e)
+            raise _read_error(e, "File listing failed") from e
+        return StreamingResponse(_ndjson_listing(bucket, itertools.chain([first], pages), detail),
+                                 media_type="application/x-ndjson")
+    if max_keys is not None or continuation_token is not None or delimiter is not None:
+        page = await my_services.run_in_executor(
+            my_services.list_files_page, bucket, prefix, delimiter, max_keys, continuation_token, detail)
+        return _listing_response(bucket, prefix, page)
+    entries = await my_services.run_in_executor(my_services.list_files_in_s3, bucket, prefix, detail)
+    return _listing_response(bucket, prefix, {"objects" if detail else "files": entries})
+
+
+@app.get("/metadata/", response_model=my_schemas.FileMetadataResponse)
+async def file_metadata(bucket: str, object_name: str):
+    """Get file metadata from S3, cached for a short TTL"""
+    metadata = await my_services.run_in_executor(my_services.head_file_in_s3, bucket, object_name)
+    if metadata is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    return {"bucket_name": bucket, "object_name": object_name, **metadata}
+
+
+@app.post("/presign/upload/", response_model=my_schemas.PresignedUrlResponse)
+async def presign_upload(request: my_schemas.PresignedUploadRequest):
+    """Issue a presigned PUT URL so the client uploads straight to S3"""
+    try:
+        presigned = await my_services.run_in_executor(
+            my_services.presign_upload_url, request.bucket_name, request.object_name,
+            request.expires_in, request.content_type)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if presigned is None:
+        raise HTTPException(status_code=500, detail="URL signing failed")
+    return presigned
+
+
+@app.post("/presign/download/", response_model=my_schemas.PresignedUrlResponse)
+async def presign_download(request: my_schemas.PresignedDownloadRequest):
+    """Issue a presigned GET URL so the client downloads straight from S3"""
+    presigned = await my_services.run_in_executor(
+        my_services.presign_download_url, request.bucket_name, request.object_name,
+        request.expires_in, request.response_content_type)
+    if presigned is None:
+        raise HTTPException(status_code=500, detail="URL signing failed")
+    return presigned
+
+
+@app.post("/presign/multipart/", response_model=my_schemas.PresignedMultipartResponse)
+async def presign_multipart(request: my_schemas.PresignedMultipartRequest):
+    """Start a multipart upload and issue one presigned URL per part"""
+    try:
+        upload = await my_services.run_in_executor(
+            my_services.presign_multipart_upload, request.bucket_name, request.object_name,
+            request.part_count, request.expires_in, request.content_type)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if upload is None:
+        raise HTTPException(status_code=500, detail="Multipart upload could not be started")
+    return {"bucket_name": request.bucket_name, "object_name": request.object_name, **upload}
+
+
+@app.post("/presign/multipart/complete/", response_model=my_schemas.FileUploadResponse)
+async def complete_presigned_multipart(request: my_schemas.MultipartCompleteRequest):
+    """Assemble a multipart upload from parts the client sent to S3"""
+    success = await my_services.run_in_executor(
+        my_services.complete_multipart_upload_in_s3, request.bucket_name, request.object_name,
+        request.upload_id, [part.model_dump() for part in request.parts])
+    if success:
+        return {"message": "File uploaded successfully",
+                "object_name": request.object_name, "bucket_name": request.bucket_name}
+    raise HTTPException(status_code=500, detail="Multipart upload could not be completed")
+
+
+@app.post("/presign/multipart/abort/", response_model=my_schemas.FileDeleteResponse)
+async def abort_presigned_multipart(request: my_schemas.MultipartAbortRequest):
+    """Abort a multipart upload started with /presign/multipart/"""
+    success = await my_services.run_in_executor(
+        my_services.abort_multipart_upload_in_s3, request.bucket_name, request.object_name,
+        request.upload_id)
+    if success:
+        return {"message": "Multipart upload aborted"}
+    raise HTTPException(status_code=500, detail="Multipart upload could not be aborted")
+
+
+def _session_response(session: dict) -> dict:
+    parts = [{"part_number": number, **part} for number, part in sorted(session["parts"].items())]
+    return {
+        **{key: session[key] for key in ("session_id", "bucket_name", "object_name", "content_type")},
+        "created_at": datetime.fromtimestamp(session["created_at"], timezone.utc),
+        "updated_at": datetime.fromtimestamp(session["updated_at"], timezone.utc),
+        "received_bytes": sum(part["size"] for part in parts),
+        "parts": parts,
+    }
+
+
+@app.post("/uploads/", response_model=my_schemas.UploadSessionResponse)
+async def start_resumable_upload(request: my_schemas.ResumableUploadRequest):
+    """Start a resumable upload session"""
+    session = await my_services.run_in_executor(
+        my_services.start_resumable_upload, request.bucket_name, request.object_name,
+        request.content_type)
+    if session is None:
+        raise HTTPException(status_code=500, detail="Upload session could not be started")
+    return _session_response(session)
+
+
+@app.get("/uploads/{session_id}/", response_model=my_schemas.UploadSessionResponse)
+async def get_resumable_upload(session_id: str):
+    """Report which parts of a resumable upload have been received"""
+    session = await my_services.run_in_executor(my_services.get_upload_session, session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    return _session_response(session)
+
+
+@app.put("/uploads/{session_id}/parts/{part_number}/", response_model=my_schemas.UploadedPart)
+async def upload_resumable_part(request: Request, session_id: str,
+                                part_number: int = Path(..., ge=1, le=10000)):
+    """Upload one numbered part; parts may be sent in parallel and retried"""
+    with my_services.get_spool_manager().spool() as body:
+        try:
+            await _spool_body(request, body)
+        except my_spool.SpoolQuotaExceeded as e:
+            raise _spool_full(e)
+        try:
+            part = await my_services.run_in_executor(
+                my_services.upload_session_part, session_id, part_number, body)
+        except KeyError:
+            raise HTTPException(status_code=404, detail="Upload session not found")
+    if part is None:
+        raise HTTPException(status_code=500, detail="Part upload failed")
+    return part
+
+
+@app.post("/uploads/{session_id}/complete/", response_model=my_schemas.FileUploadResponse)
+async def complete_resumable_upload(session_id: str):
+    """Assemble the received parts into the final object"""
+    session = await my_services.run_in_executor(my_services.get_upload_session, session_id)
+    try:
+        success = await my_services.run_in_executor(my_services.complete_resumable_upload, session_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if success:
+        return {"message": "File uploaded successfully",
+                "object_name": session["object_name"], "bucket_name": session["bucket_name"]}
+    raise HTTPException(status_code=500, detail="File upload failed")
+
+
+@app.delete("/uploads/{session_id}/", response_model=my_schemas.FileDeleteResponse)
+async def abort_resumable_upload(session_id: str):
+    """Abort a resumable upload and discard its parts"""
+    try:
+        success = await my_services.run_in_executor(my_services.abort_resumable_upload, session_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    if success:
+        return {"message": "Upload aborted"}
+    raise HTTPException(status_code=500, detail="Upload could not be aborted")
 
 
 @app.delete("/delete/", response_model=my_schemas.FileDeleteResponse)
 async def delete_file(bucket: str, object_name: str):
     """Delete file from S3"""
-    success = my_services.delete_file_from_s3(bucket, object_name)
+    success = await my_services.run_in_executor(my_services.delete_file_from_s3, bucket, object_name)
     if success:
         return {"message": "File deleted successfully"}
     raise HTTPException(status_code=500, detail="File deletion failed")
 
 
+@app.post("/delete/bulk/", response_model=my_schemas.BulkDeleteResponse)
+async def delete_files_bulk(request: my_schemas.BulkDeleteRequest):
+    """Delete many files, or everything under a prefix, from S3
+
+    Prefix deletes list only the failed keys, up to the first 1000.
+    """
+    if request.prefix is not None:
+        summary = await my_services.run_in_executor(
+            my_services.delete_prefix_in_s3, request.bucket_name, request.prefix)
+        return my_json.RawJSONResponse({"bucket_name": request.bucket_name,
+                                        "deleted_count": summary["deleted_count"],
+                                        "failed_count": summary["failed_count"],
+                                        "results": summary["failures"]})
+    results = await my_services.run_in_executor(
+        my_services.delete_files_in_s3, request.bucket_name, request.keys)
+    deleted_count = sum(1 for result in results if result["deleted"])
+    return my_json.RawJSONResponse({"bucket_name": request.bucket_name, "deleted_count": deleted_count,
+                                    "failed_count": len(results) - deleted_count, "results": results})
+
+
+async def _copy_or_move(request: my_schemas.CopyRequest, max_workers: Optional[int], move: bool) -> dict:
+    """Run a single or prefix copy/move and build the copy response."""
+    if request.source_key is not None:
+        service = my_services.move_file_in_s3 if move else my_services.copy_file_in_s3
+        try:
+            success = await my_services.run_in_executor(
+                service, request.source_bucket, request.source_key, request.bucket_name,
+                request.object_name, max_workers)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if not success:
+            raise HTTPException(status_code=500, detail="File move failed" if move else "File copy failed")
+        return {"source_bucket": request.source_bucket, "bucket_name": request.bucket_name,
+                "copied_count": 1, "failed_count": 0,
+                "results": [{"source_key": request.source_key, "object_name": request.object_name,
+                             "copied": True, "error": None}]}
+    try:
+        summary = await my_services.run_in_executor(
+            my_services.copy_prefix_in_s3, request.source_bucket, request.source_prefix,
+            request.bucket_name, request.prefix, max_workers, move)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"source_bucket": request.source_bucket, "bucket_name": request.bucket_name,
+            "copied_count": summary["copied_count"], "failed_count": summary["failed_count"],
+            "results": summary["failures"]}
+
+
+@app.post("/copy/", response_model=my_schemas.CopyResponse)
+async def copy_files(request: my_schemas.CopyRequest,
+                     max_workers: Optional[int] = Query(None, ge=1, le=64)):
+    """Copy an object, or every object under a prefix, inside S3
+
+    Bytes never pass through this server: small objects use copy_object,
+    objects over 5 GB parallel upload_part_copy ranges. Prefix copies list
+    only the failed keys, up to the first 1000.
+    """
+    return my_json.RawJSONResponse(await _copy_or_move(request, max_workers, move=False))
+
+
+@app.post("/move/", response_model=my_schemas.CopyResponse)
+async def move_files(request: my_schemas.CopyRequest,
+                     max_workers: Optional[int] = Query(None, ge=1, le=64)):
+    """Move an object, or every object under a prefix, inside S3 (copy, then delete)"""
+    return my_json.RawJSONResponse(await _copy_or_move(request, max_workers, move=True))
+
+
+def _sync_dir(local_dir: str) -> str:
+    try:
+        return my_spool.safe_path(my_services.settings.sync_dir, local_dir.rstrip("/"))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.post("/sync/", response_model=my_schemas.SyncResponse)
+async def sync_directory(request: my_schemas.SyncRequest,
+                         max_workers: Optional[int] = Query(None, ge=1, le=64)):
+    """Mirror a directory below the sync directory to a prefix, or the prefix to it
+
+    Only new and changed files are transferred; ``dry_run`` returns the plan
+    instead. Long syncs are better run as ``/jobs/sync/``.
+    """
+    local_dir = _sync_dir(request.local_dir)
+    try:
+        summary = await my_services.run_in_executor(
+            my_services.sync_directory, local_dir, request.bucket_name, request.prefix, request.direction,
+            request.delete, request.dry_run, request.compare, max_workers)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"bucket_name": request.bucket_name, "prefix": request.prefix, **summary}
+
+
+def _job_response(job: dict) -> dict:
+    def timestamp(value: Optional[float]) -> Optional[datetime]:
+        return datetime.fromtimestamp(value, timezone.utc) if value is not None else None
+
+    return {**{key: value for key, value in job.items() if key not in ("params", "worker")},
+            "created_at": timestamp(job["created_at"]), "started_at": timestamp(job["started_at"]),
+            "finished_at": timestamp(job["finished_at"])}
+
+
+@app.put("/jobs/upload/", response_model=my_schemas.JobResponse, status_code=202)
+async def submit_upload_job(request: Request, object_name: str, bucket: str = "your-default-bucket",
+                            priority: Optional[int] = None):
+    """Store the request body and upload it to S3 in the background
+
+    The response comes back once the body is on local disk; poll
+    ``/jobs/{job_id}/`` for the transfer.
+    """
+    job_id = uuid.uuid4().hex
+    with my_spool.atomic_path(my_services.upload_job_body_path(job_id)) as tmp_path:
+        with open(tmp_path, "wb") as body:
+            async for chunk in request.stream():
+                # Disk writes of a large body must not stall the event loop
+                await my_services.run_in_executor(body.write, chunk)
+    job = await my_services.run_in_executor(my_services.submit_upload_job, job_id, bucket, object_name,
+                                            priority)
+    return _job_response(job)
+
+
+@app.post("/jobs/download/", response_model=my_schemas.JobResponse, status_code=202)
+async def submit_download_job(request: my_schemas.DownloadJobRequest, priority: Optional[int] = None):
+    """Download an object into the download directory in the background"""
+    try:
+        my_spool.safe_path(my_services.settings.download_dir, request.object_name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    job = await my_services.run_in_executor(
+        my_services.submit_job, "download", request.bucket_name,
+        {"object_name": request.object_name, "decompress": request.decompress}, priority)
+    return _job_response(job)
+
+
+async def _submit_copy_job(request: my_schemas.CopyRequest, priority: Optional[int], move: bool) -> dict:
+    try:
+        if request.source_key is not None and move:
+            my_services.check_move_target(request.source_bucket, request.source_key, request.bucket_name,
+                                          request.object_name)
+        elif request.source_key is None:
+            my_services.check_prefix_target(request.source_bucket, request.source_prefix,
+                                            request.bucket_name, request.prefix)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    job = await my_services.run_in_executor(
+        my_services.submit_job, "move" if move else "copy", request.bucket_name,
+        request.model_dump(exclude={"bucket_name"}), priority)
+    return _job_response(job)
+
+
+@app.post("/jobs/copy/", response_model=my_schemas.JobResponse, status_code=202)
+async def submit_copy_job(request: my_schemas.CopyRequest, priority: Optional[int] = None):
+    """Copy an object, or every object under a prefix, in the background"""
+    return await _submit_copy_job(request, priority, move=False)
+
+
+@app.post("/jobs/move/", response_model=my_schemas.JobResponse, status_code=202)
+async def submit_move_job(request: my_schemas.CopyRequest, priority: Optional[int] = None):
+    """Move an object, or every object under a prefix, in the background"""
+    return await _submit_copy_job(request, priority, move=True)
+
+
+@app.post("/jobs/delete/", response_model=my_schemas.JobResponse, status_code=202)
+async def submit_delete_job(request: my_schemas.BulkDeleteRequest, priority: Optional[int] = None):
+    """Delete many files, or everything under a prefix, in the background"""
+    job = await my_services.run_in_executor(
+        my_services.submit_job, "delete", request.bucket_name,
+        {"keys": request.keys, "prefix": request.prefix}, priority)
+    return _job_response(job)
+
+
+@app.post("/jobs/sync/", response_model=my_schemas.JobResponse, status_code=202)
+async def submit_sync_job(request: my_schemas.SyncRequest, priority: Optional[int] = None):
+    """Mirror a directory to a prefix, or the prefix to the directory, in the background"""
+    if request.dry_run:
+        raise HTTPException(status_code=400, detail="Dry runs are not queued; use /sync/")
+    _sync_dir(request.local_dir)
+    job = await my_services.run_in_executor(
+        my_services.submit_job, "sync", request.bucket_name,
+        request.model_dump(exclude={"bucket_name", "dry_run"}), priority)
+    return _job_response(job)
+
+
+@app.get("/jobs/", response_model=List[my_schemas.JobResponse])
+async def list_jobs(state: Optional[str] = None, bucket: Optional[str] = None,
+                    limit: int = Query(100, ge=1, le=1000)):
+    """List the newest jobs, optionally by state and bucket"""
+    if state is not None and state not in my_jobs.STATES:
+        raise HTTPException(status_code=400, detail=f"state must be one of {', '.join(my_jobs.STATES)}")
+    jobs = await my_services.run_in_executor(my_services.list_jobs, state, bucket, limit)
+    return [_job_response(job) for job in jobs]
+
+
+@app.get("/jobs/{job_id}/", response_model=my_schemas.JobResponse)
+async def get_job(job_id: str):
+    """Report a job's state, progress and result"""
+    job = await my_services.run_in_executor(my_services.get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _job_response(job)
+
+
+@app.delete("/jobs/{job_id}/", response_model=my_schemas.JobResponse)
+async def cancel_job(job_id: str):
+    """Cancel a job that has not started yet"""
+    cancelled = await my_services.run_in_executor(my_services.cancel_job, job_id)
+    job = await my_services.run_in_executor(my_services.get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not cancelled:
+        raise HTTPException(status_code=409, detail=f"Job is already {job['state']}")
+    return _job_response(job)
+
+
+@app.get("/health/", response_model=my_schemas.WorkerStatusResponse)
+async def health():
+    """Report that this worker process is alive"""
+    return my_server.worker_status()
+
+
+@app.get("/ready/", response_model=my_schemas.WorkerStatusResponse,
+         responses={503: {"model": my_schemas.WorkerStatusResponse}})
+async def ready():
+    """Report whether this worker takes requests: 503 until S3 is warm, and while draining"""
+    status = my_server.worker_status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+
+@app.get("/stats/pool/", response_model=List[my_schemas.PoolStatsResponse])
+async def pool_stats():
+    """Report S3 connection pool usage per client"""
+    return my_services.get_pool_stats()
+
+
+@app.get("/stats/dedup/", response_model=my_schemas.DedupStatsResponse)
+async def dedup_stats():
+    """Report upload deduplication hits and bytes saved"""
+    return {"enabled": my_services.settings.dedup_enabled, **my_services.get_dedup_stats()}
+
+
+@app.get("/stats/cache/", response_model=my_schemas.CacheStatsResponse)
+async def cache_stats():
+    """Report listing, metadata and disk cache hit/miss counters"""
+    return {"enabled": my_services.settings.cache_enabled, **my_services.get_cache_stats(),
+            "disk": my_services.get_disk_cache_stats()}
+
+
+@app.get("/stats/spool/", response_model=my_schemas.SpoolStatsResponse)
+async def spool_stats():
+    """Disk usage and quota of spooled request bodies"""
+    return my_services.get_spool_stats()
+
+
+@app.get("/metrics")
+async def metrics():
+    """Expose Prometheus metrics"""
+    body, content_type = my_metrics.render()
+    return Response(content=body, media_type=content_type)
+
+
 if __name__ == "__main__":
     import uvicorn
 
@@ -0,0 +1,183 @@
+"""Streaming compression for object bodies: gzip, plus zstd when installed.
+
+Everything here works chunk by chunk, so compressing or decompressing an
+object never holds more than one chunk (plus the codec's window) in memory.
+"""
+import fnmatch
+import zlib
+from typing import BinaryIO, Iterable, Iterator, List, Optional
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+
+GZIP = "gzip"
+ZSTD = "zstd"
+# zlib wbits selecting the gzip container rather than raw deflate or zlib
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+DEFAULT_LEVELS = {GZIP: 6, ZSTD: 3}
+# User metadata key holding the uncompressed size of an encoded object
+# (sent to S3 as ``x-amz-meta-original-size``)
+ORIGINAL_SIZE_METADATA_KEY = "original-size"
+READ_CHUNK_SIZE = 256 * 1024
+
+
+def available_encodings() -> List[str]:
+    """Return the encodings this process can produce, preferred first."""
+    return [ZSTD, GZIP] if zstandard is not None else [GZIP]
+
+
+def resolve_encoding(name: Optional[str]) -> Optional[str]:
+    """
+    Map a configured or requested encoding onto one this process supports.
+
+    :param name: ``gzip``, ``zstd``, ``auto`` (zstd if installed, else gzip),
+        or ``none``/empty for no compression
+    :return: The encoding to use, or None for no compression
+    :raises ValueError: If the encoding is unknown or not installed
+    """
+    name = (name or "none").strip().lower()
+    if name == "none":
+        return None
+    if name == "auto":
+        return available_encodings()[0]
+    if name not in available_encodings():
+        raise ValueError(f"Unsupported compression {name!r}; available: {', '.join(available_encodings())}")
+    return name
+
+
+def is_compressible(content_type: Optional[str], patterns: Iterable[str]) -> bool:
+    """True if ``content_type`` matches one of the MIME patterns, e.g. ``text/*``."""
+    if not content_type:
+        return False
+    content_type = content_type.split(";", 1)[0].strip().lower()
+    return any(fnmatch.fnmatchcase(content_type, pattern) for pattern in patterns)
+
+
+def negotiate(accept_encoding: Optional[str], encoding: str) -> bool:
+    """
+    Check whether a client's ``Accept-Encoding`` header admits ``encoding``.
+
+    Follows RFC 9110: ``q=0`` rejects a coding and ``*`` covers codings not
+    listed. A missing header is treated as identity only, since clients such
+    as plain ``curl`` send none and cannot decode the body.
+    """
+    if accept_encoding is None:
+        return False
+    wildcard = None
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding == encoding or (encoding == GZIP and coding == "x-gzip"):
+            return quality > 0
+        if coding == "*":
+            wildcard = quality > 0
+    return bool(wildcard)
+
+
+def make_compressor(encoding: str, level: Optional[int] = None):
+    """Return an object with ``compress(data)`` and ``flush()`` for ``encoding``."""
+    level = DEFAULT_LEVELS[encoding] if level is None else level
+    if encoding == GZIP:
+        return zlib.compressobj(level, zlib.DEFLATED, GZIP_WBITS)
+    if encoding == ZSTD and zstandard is not None:
+        return zstandard.ZstdCompressor(level=level).compressobj()
+    raise ValueError(f"Unsupported compression {encoding!r}")
+
+
+def make_decompressor(encoding: str):
+    """Return an object with ``decompress(data)`` and ``flush()`` for ``encoding``."""
+    if encoding == GZIP:
+        return zlib.decompressobj(GZIP_WBITS)
+    if encoding == ZSTD and zstandard is not None:
+        return zstandard.ZstdDecompressor().decompressobj()
+    raise ValueError(f"Unsupported compression {encoding!r}")
+
+
+def is_decodable(encoding: Optional[str]) -> bool:
+    """True if objects stored with this ``Content-Encoding`` can be decoded here."""
+    return encoding in available_encodings()
+
+
+def compress_chunks(chunks: Iterable[bytes], encoding: str, level: Optional[int] = None) -> Iterator[bytes]:
+    """Yield the compressed form of a chunk stream, skipping empty outputs."""
+    compressor = make_compressor(encoding, level)
+    for chunk in chunks:
+        out = compressor.compress(chunk)
+        if out:
+            yield out
+    out = compressor.flush()
+    if out:
+        yield out
+
+
+def decompress_chunks(chunks: Iterable[bytes], encoding: str) -> Iterator[bytes]:
+    """
+    Yield the decompressed form of a chunk stream, skipping empty outputs.
+
+    :raises ValueError: If the stream is corrupt or ends before the end of the compressed data
+    """
+    decompressor = make_decompressor(encoding)
+    codec_errors = (zlib.error,) if zstandard is None else (zlib.error, zstandard.ZstdError)
+    try:
+        for chunk in chunks:
+            out = decompressor.decompress(chunk)
+            if out:
+                yield out
+        out = decompressor.flush()
+    except codec_errors as e:
+        raise ValueError(f"Corrupt {encoding} stream: {e}") from e
+    if out:
+        yield out
+    if not decompressor.eof:
+        raise ValueError(f"Truncated {encoding} stream")
+
+
+class CompressingReader:
+    """
+    Read-only file object yielding the compressed form of another one.
+
+    Meant to be handed to ``upload_fileobj``: the transfer manager pulls
+    compressed bytes as it needs them, so the source is compressed while it
+    is uploaded. The reader is deliberately not seekable, which makes boto3
+    read it strictly in order.
+    """
+
+    def __init__(self, fileobj: BinaryIO, encoding: str, level: Optional[int] = None,
+                 chunk_size: int = READ_CHUNK_SIZE):
+        self.fileobj = fileobj
+        self.encoding = encoding
+        self.chunk_size = chunk_size
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._compressor = make_compressor(encoding, level)
+        self._buffer = bytearray()
+        self._eof = False
+
+    def read(self, size: int = -1) -> bytes:
+        while not self._eof and (size < 0 or len(self._buffer) < size):
+            chunk = self.fileobj.read(self.chunk_size)
+            if chunk:
+                self.bytes_in += len(chunk)
+                self._buffer += self._compressor.compress(chunk)
+            else:
+                self._buffer += self._compressor.flush()
+                self._eof = True
+        if size < 0 or size >= len(self._buffer):
+            data = bytes(self._buffer)
+            self._buffer.clear()
+        else:
+            data = bytes(self._buffer[:size])
+            del self._buffer[:size]
+        self.bytes_out += len(data)
+        return data
@@ -0,0 +1,102 @@
+"""Content-addressed deduplication: digests, the digest index and its counters."""
+import hashlib
+import threading
+from typing import BinaryIO, Optional, Tuple
+
+from my_cache import TTLCache
+
+
+# User metadata key holding the hex SHA-256 of an object's content
+# (sent to S3 as ``x-amz-meta-sha256``)
+DIGEST_METADATA_KEY = "sha256"
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_fileobj(fileobj: BinaryIO, chunk_size: int = HASH_CHUNK_SIZE) -> Tuple[str, int]:
+    """Return the hex SHA-256 and size of ``fileobj`` from its current position.
+
+    The file is rewound to where it started, ready to be uploaded.
+    """
+    start = fileobj.tell()
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in iter(lambda: fileobj.read(chunk_size), b""):
+        digest.update(chunk)
+        size += len(chunk)
+    fileobj.seek(start)
+    return digest.hexdigest(), size
+
+
+class HashingWriter:
+    """Write-through wrapper that hashes bytes as they are written.
+
+    Lets a request body be spooled and hashed in the same pass.
+    """
+
+    def __init__(self, fileobj: BinaryIO):
+        self.fileobj = fileobj
+        self.size = 0
+        self._digest = hashlib.sha256()
+
+    def write(self, data: bytes) -> int:
+        self._digest.update(data)
+        self.size += len(data)
+        return self.fileobj.write(data)
+
+    def hexdigest(self) -> str:
+        return self._digest.hexdigest()
+
+
+class DigestIndex:
+    """
+    Map content digests to an S3 object known to hold that content.
+
+    Entries are hints: callers must confirm them against the object's
+    metadata before relying on them, since the object may have been
+    overwritten or deleted since. The least recently used digests are
+    forgotten once ``max_entries`` is reached.
+    """
+
+    def __init__(self, max_entries: int):
+        self._entries = TTLCache(max_entries, ttl=float("inf"))
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.bytes_uploaded = 0
+
+    def lookup(self, digest: str) -> Optional[Tuple[str, str]]:
+        """Return the ``(bucket_name, object_name)`` last seen with ``digest``."""
+        return self._entries.get(digest)
+
+    def remember(self, digest: str, bucket_name: str, object_name: str) -> None:
+        self._entries.set(digest, (bucket_name, object_name))
+
+    def forget(self, digest: str) -> None:
+        self._entries.pop(digest)
+
+    def record(self, deduplicated: bool, size: int) -> None:
+        """Count one upload and the bytes it sent or saved."""
+        with self._lock:
+            if deduplicated:
+                self.hits += 1
+                self.bytes_saved += size
+            else:
+                self.misses += 1
+                self.bytes_uploaded += size
+
+    def clear(self) -> None:
+        """Forget every digest and reset the counters."""
+        self._entries.clear()
+        with self._lock:
+            self.hits = self.misses = self.bytes_saved = self.bytes_uploaded = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "digests": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "bytes_saved": self.bytes_saved,
+                "bytes_uploaded": self.bytes_uploaded,
+            }
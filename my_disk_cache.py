@@ -0,0 +1,232 @@
+"""Read-through disk cache for whole S3 objects.
+
+Each cached object is one file named after its bucket, key and ETag, with a
+JSON sidecar holding the response metadata so the index can be rebuilt after
+a restart. The cache directory belongs to one process: several processes
+sharing it would evict each other's files without noticing.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import BinaryIO, Callable, Hashable, Optional, Tuple
+
+
+POLICIES = ("lru", "lfu")
+# Response fields worth keeping to answer a download from disk
+METADATA_FIELDS = ("etag", "size", "content_type", "content_encoding", "last_modified", "metadata")
+
+
+def entry_filename(bucket_name: str, object_name: str, etag: str) -> str:
+    """Return the file name caching one version of an object."""
+    return hashlib.sha256(f"{bucket_name}\0{object_name}\0{etag}".encode()).hexdigest()
+
+
+def _encode_json(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+class DiskCache:
+    """
+    Size-bounded cache of object bodies on local disk.
+
+    Entries are dicts with ``bucket_name``, ``object_name``, ``path``,
+    ``hits``, ``validated_at`` and the :data:`METADATA_FIELDS`. Once the
+    files exceed ``max_bytes`` the least recently used (``lru``) or least
+    frequently used (``lfu``) entries are evicted. Entries handed out by
+    :meth:`acquire` or :meth:`put` are pinned until :meth:`release`, so a
+    file is never deleted while a response is still reading it.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, policy: str = "lru",
+                 max_object_bytes: Optional[int] = None, clock: Callable[[], float] = time.monotonic):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown disk cache policy {policy!r}")
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.max_object_bytes = max_bytes if max_object_bytes is None else min(max_object_bytes, max_bytes)
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.revalidations = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def acquire(self, bucket_name: str, object_name: str) -> Optional[dict]:
+        """Return the pinned entry for an object, or None on a miss."""
+        key = (bucket_name, object_name)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            entry['hits'] += 1
+            entry['readers'] += 1
+            self.hits += 1
+            return entry
+
+    def release(self, entry: dict) -> None:
+        """Unpin an entry; its file is deleted now if it was dropped meanwhile."""
+        with self._lock:
+            entry['readers'] -= 1
+            if entry['readers'] == 0 and entry.get('dropped'):
+                self._unlink(entry)
+
+    def mark_validated(self, entry: dict) -> None:
+        """Record that S3 confirmed the entry is still current."""
+        with self._lock:
+            entry['validated_at'] = self._clock()
+            self.revalidations += 1
+
+    def is_fresh(self, entry: dict, max_age: float) -> bool:
+        return self._clock() - entry['validated_at'] < max_age
+
+    def put(self, bucket_name: str, object_name: str, info: dict,
+            fill: Callable[[BinaryIO], None]) -> Optional[dict]:
+        """
+        Store an object body and return its pinned entry.
+
+        :param bucket_name: Name of the S3 bucket
+        :param object_name: Object name in S3
+        :param info: Object metadata; must hold ``etag`` and ``size``
+        :param fill: Called with an open temporary file to write the body into
+        :return: The new entry, or None if the object is too big to cache
+        :raises Exception: Whatever ``fill`` raises; the partial file is removed
+        """
+        if info['size'] > self.max_object_bytes:
+            return None
+        path = os.path.join(self.directory, entry_filename(bucket_name, object_name, info['etag']))
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                fill(f)
+            size = os.path.getsize(tmp_path)
+            entry = {'bucket_name': bucket_name, 'object_name': object_name, 'path': path,
+                     **{field: info.get(field) for field in METADATA_FIELDS}, 'size': size}
+            with open(path + ".json", "w") as sidecar:
+                json.dump(entry, sidecar, default=_encode_json)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        entry.update(hits=1, readers=1, validated_at=self._clock())
+        with self._lock:
+            previous = self._entries.pop((bucket_name, object_name), None)
+            if previous is not None:
+                self._drop(previous, same_file=previous['path'] == path)
+            self._entries[(bucket_name, object_name)] = entry
+            self.bytes += size
+            self._evict()
+        return entry
+
+    def discard(self, bucket_name: str, object_name: str) -> None:
+        """Drop any cached version of an object."""
+        with self._lock:
+            entry = self._entries.pop((bucket_name, object_name), None)
+            if entry is not None:
+                self._drop(entry)
+
+    def clear(self) -> None:
+        """Drop every entry and reset the counters."""
+        with self._lock:
+            for entry in list(self._entries.values()):
+                self._drop(entry)
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = self.revalidations = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "policy": self.policy,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "revalidations": self.revalidations,
+            }
+
+    def _evict(self) -> None:
+        while self.bytes > self.max_bytes:
+            victim = self._victim()
+            if victim is None:
+                return
+            self.evictions += 1
+            self._drop(self._entries.pop(victim))
+
+    def _victim(self) -> Optional[Tuple[str, str]]:
+        # The OrderedDict runs from least to most recently used; LFU takes the
+        # fewest hits and breaks ties by recency. Pinned entries are skipped.
+        candidates = [(key, entry) for key, entry in self._entries.items() if not entry['readers']]
+        if not candidates:
+            return None
+        if self.policy == "lfu":
+            return min(candidates, key=lambda item: item[1]['hits'])[0]
+        return candidates[0][0]
+
+    def _drop(self, entry: dict, same_file: bool = False) -> None:
+        self.bytes -= entry['size']
+        if same_file:
+            return
+        entry['dropped'] = True
+        if not entry['readers']:
+            self._unlink(entry)
+
+    @staticmethod
+    def _unlink(entry: dict) -> None:
+        for path in (entry['path'], entry['path'] + ".json"):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    def _load(self) -> None:
+        """Rebuild the index from the sidecars left by a previous run."""
+        loaded = []
+        names = set(os.listdir(self.directory))
+        for name in names:
+            path = os.path.join(self.directory, name)
+            if name.endswith(".tmp") or (not name.endswith(".json") and name + ".json" not in names):
+                # Interrupted fills and bodies whose sidecar was never written
+                os.unlink(path)
+                continue
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(path) as sidecar:
+                    entry = json.load(sidecar)
+                data_path = path[:-len(".json")]
+                stat = os.stat(data_path)
+                if stat.st_size != entry['size']:
+                    raise ValueError("size mismatch")
+            except (OSError, ValueError, KeyError) as e:
+                logging.warning("Dropping unreadable disk cache entry %s: %s", name, e)
+                self._unlink({'path': path[:-len(".json")]})
+                continue
+            if entry.get('last_modified'):
+                entry['last_modified'] = datetime.fromisoformat(entry['last_modified'])
+            entry.update(path=data_path, hits=0, readers=0, validated_at=float("-inf"))
+            loaded.append((stat.st_mtime, entry))
+        for _, entry in sorted(loaded, key=lambda item: item[0]):
+            self._entries[(entry['bucket_name'], entry['object_name'])] = entry
+            self.bytes += entry['size']
+        self._evict()
@@ -0,0 +1,366 @@
+"""Background jobs for long-running transfers, stored in SQLite.
+
+A job is a plain dict with ``job_id``, ``kind``, ``bucket_name``, ``params``,
+``priority``, ``state``, ``attempts``, ``worker`` (pid of the process running
+it), ``created_at``, ``started_at``, ``finished_at``, the progress counters
+``bytes_done``, ``bytes_total``, ``parts_done`` and ``parts_total``, and on
+completion ``result`` or ``error``. ``JobQueue`` runs queued jobs on a pool
+of worker threads, highest priority first, with at most a configured number
+running per bucket at a time across every process sharing the database.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+from my_spool import process_exists
+
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+STATES = (QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED)
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class JobFailed(Exception):
+    """Raised by an executor to fail its job with a message instead of a traceback."""
+
+
+class JobStore:
+    """Jobs kept in a SQLite database, shared by every process using the file."""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            job_id TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            bucket_name TEXT NOT NULL,
+            params TEXT NOT NULL,
+            priority INTEGER NOT NULL,
+            state TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            worker INTEGER,
+            created_at REAL NOT NULL,
+            started_at REAL,
+            finished_at REAL,
+            bytes_done INTEGER NOT NULL DEFAULT 0,
+            bytes_total INTEGER,
+            parts_done INTEGER NOT NULL DEFAULT 0,
+            parts_total INTEGER,
+            result TEXT,
+            error TEXT
+        );
+        CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (state, priority DESC, created_at);
+    """
+    COLUMNS = ('job_id', 'kind', 'bucket_name', 'params', 'priority', 'state', 'attempts', 'worker',
+               'created_at', 'started_at', 'finished_at', 'bytes_done', 'bytes_total', 'parts_done',
+               'parts_total', 'result', 'error')
+
+    def __init__(self, path: str):
+        self.path = path
+        # Same connection handling as SQLiteSessionStore: one autocommit
+        # connection serialized by the lock, WAL for concurrent readers
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(self.SCHEMA)
+
+    def _job(self, row: tuple) -> dict:
+        job = dict(zip(self.COLUMNS, row))
+        job['params'] = json.loads(job['params'])
+        job['result'] = json.loads(job['result']) if job['result'] is not None else None
+        return job
+
+    def create(self, job_id: str, kind: str, bucket_name: str, params: dict, priority: int = 0,
+               created_at: Optional[float] = None) -> dict:
+        """Queue a new job and return it."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (job_id, kind, bucket_name, params, priority, state, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, bucket_name, json.dumps(params), priority, QUEUED,
+                 time.time() if created_at is None else created_at))
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(f"SELECT {', '.join(self.COLUMNS)} FROM jobs WHERE job_id = ?",
+                                     (job_id,)).fetchone()
+        return self._job(row) if row is not None else None
+
+    def list_jobs(self, state: Optional[str] = None, bucket_name: Optional[str] = None,
+                  limit: int = 100) -> List[dict]:
+        """Return the newest jobs first, optionally only those in ``state`` or on ``bucket_name``."""
+        query = f"SELECT {', '.join(self.COLUMNS)} FROM jobs"
+        conditions, params = [], []
+        if state is not None:
+            conditions.append("state = ?")
+            params.append(state)
+        if bucket_name is not None:
+            conditions.append("bucket_name = ?")
+            params.append(bucket_name)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        with self._lock:
+            rows = self._conn.execute(query, (*params, limit)).fetchall()
+        return [self._job(row) for row in rows]
+
+    def claim(self, bucket_limit: Callable[[str], int], worker: int) -> Optional[dict]:
+        """
+        Mark the next runnable job as running and return it.
+
+        Jobs are taken by descending priority, then age, skipping buckets that
+        already run ``bucket_limit(bucket)`` jobs (counted over every process).
+
+        :return: The claimed job, or None if nothing can run now
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                running = dict(self._conn.execute(
+                    "SELECT bucket_name, COUNT(*) FROM jobs WHERE state = ? GROUP BY bucket_name",
+                    (RUNNING,)))
+                full = [bucket for bucket, count in running.items() if count >= bucket_limit(bucket)]
+                row = self._conn.execute(
+                    f"SELECT job_id FROM jobs WHERE state = ? "
+                    f"AND bucket_name NOT IN ({', '.join('?' * len(full))}) "
+                    f"ORDER BY priority DESC, created_at, rowid LIMIT 1", (QUEUED, *full)).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET state = ?, worker = ?, started_at = ?, attempts = attempts + 1 "
+                        "WHERE job_id = ?", (RUNNING, worker, time.time(), row[0]))
+                self._conn.execute("COMMIT")
+            except sqlite3.Error:
+                self._conn.execute("ROLLBACK")
+                raise
+        return self.get(row[0]) if row is not None else None
+
+    def update_progress(self, job_id: str, bytes_done: int, bytes_total: Optional[int],
+                        parts_done: int, parts_total: Optional[int]) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET bytes_done = ?, bytes_total = ?, parts_done = ?, parts_total = ? "
+                "WHERE job_id = ?", (bytes_done, bytes_total, parts_done, parts_total, job_id))
+
+    def finish(self, job_id: str, state: str, result: Any = None, error: Optional[str] = None) -> None:
+        """Record the outcome of a running job."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET state = ?, finished_at = ?, result = ?, error = ? WHERE job_id = ?",
+                (state, time.time(), json.dumps(result) if result is not None else None, error, job_id))
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a job that has not started yet; False if it is running or finished."""
+        with self._lock:
+            return bool(self._conn.execute(
+                "UPDATE jobs SET state = ?, finished_at = ? WHERE job_id = ? AND state = ?",
+                (CANCELLED, time.time(), job_id, QUEUED)).rowcount)
+
+    def requeue_orphans(self, is_alive: Optional[Callable[[int], bool]] = None) -> int:
+        """
+        Put jobs whose worker process died back in the queue; return how many.
+
+        Called before this process starts its workers, so jobs recorded under
+        its own pid are orphans too (a container restart often reuses the pid).
+        """
+        if is_alive is None:
+            def is_alive(pid: int) -> bool:
+                return pid != os.getpid() and process_exists(pid)
+        with self._lock:
+            rows = self._conn.execute("SELECT job_id, worker FROM jobs WHERE state = ?",
+                                      (RUNNING,)).fetchall()
+            orphans = [job_id for job_id, worker in rows if worker is None or not is_alive(worker)]
+            for job_id in orphans:
+                self._conn.execute("UPDATE jobs SET state = ?, worker = NULL WHERE job_id = ? AND state = ?",
+                                   (QUEUED, job_id, RUNNING))
+        return len(orphans)
+
+    def delete_finished(self, finished_before: float) -> List[dict]:
+        """Forget jobs that finished before the given time; return them."""
+        with self._lock:
+            placeholders = ', '.join('?' * len(FINISHED_STATES))
+            rows = self._conn.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM jobs "
+                f"WHERE state IN ({placeholders}) AND finished_at < ?",
+                (*FINISHED_STATES, finished_before)).fetchall()
+            self._conn.executemany("DELETE FROM jobs WHERE job_id = ?", [(row[0],) for row in rows])
+        return [self._job(row) for row in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class Progress:
+    """
+    Progress counters of one running job, handed to its executor.
+
+    Safe to update from several threads (boto3 transfer callbacks are); the
+    counters are written to the store at most every ``min_interval`` seconds.
+    """
+
+    def __init__(self, store: JobStore, job_id: str, min_interval: float = 0.5,
+                 clock: Callable[[], float] = time.monotonic):
+        self.store = store
+        self.job_id = job_id
+        self.min_interval = min_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._flushed_at = float("-inf")
+        self.bytes_done = 0
+        self.bytes_total: Optional[int] = None
+        self.parts_done = 0
+        self.parts_total: Optional[int] = None
+        self.part_size: Optional[int] = None
+
+    def set_total(self, bytes_total: Optional[int] = None, parts_total: Optional[int] = None,
+                  part_size: Optional[int] = None) -> None:
+        """Record the expected totals; with ``part_size``, ``parts_done`` follows ``bytes_done``."""
+        with self._lock:
+            if bytes_total is not None:
+                self.bytes_total = bytes_total
+            if parts_total is not None:
+                self.parts_total = parts_total
+            self.part_size = part_size
+        self.flush()
+
+    def add_bytes(self, nbytes: int) -> None:
+        with self._lock:
+            self.bytes_done += nbytes
+            if self.part_size:
+                # Parts of a managed transfer run concurrently, so this counts
+                # the parts' worth of bytes moved rather than finished parts
+                self.parts_done = self.bytes_done // self.part_size
+                if self.parts_total is not None:
+                    complete = self.bytes_total is not None and self.bytes_done >= self.bytes_total
+                    self.parts_done = self.parts_total if complete else min(self.parts_done, self.parts_total)
+        self._maybe_flush()
+
+    def add_parts(self, count: int = 1) -> None:
+        with self._lock:
+            self.parts_done += count
+        self._maybe_flush()
+
+    def _maybe_flush(self) -> None:
+        if self._clock() - self._flushed_at >= self.min_interval:
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flushed_at = self._clock()
+            counters = (self.bytes_done, self.bytes_total, self.parts_done, self.parts_total)
+        self.store.update_progress(self.job_id, *counters)
+
+
+class JobQueue:
+    """
+    Run queued jobs on ``workers`` daemon threads.
+
+    ``executors`` maps a job kind to ``executor(job, progress)``; its return
+    value becomes the job result. Raising :class:`JobFailed` (or anything
+    else) fails the job.
+    """
+
+    def __init__(self, store: JobStore, executors: Dict[str, Callable[[dict, Progress], Any]],
+                 workers: int = 4, bucket_limits: Optional[Dict[str, int]] = None,
+                 default_bucket_limit: int = 2, bucket_priorities: Optional[Dict[str, int]] = None,
+                 poll_interval: float = 1.0):
+        self.store = store
+        self.executors = executors
+        self.workers = workers
+        self.bucket_limits = bucket_limits or {}
+        self.default_bucket_limit = default_bucket_limit
+        self.bucket_priorities = bucket_priorities or {}
+        self.poll_interval = poll_interval
+        self._wakeup = threading.Condition()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def bucket_limit(self, bucket_name: str) -> int:
+        return self.bucket_limits.get(bucket_name, self.default_bucket_limit)
+
+    def submit(self, kind: str, bucket_name: str, params: dict, priority: Optional[int] = None,
+               job_id: Optional[str] = None) -> dict:
+        """
+        Queue a job and return it.
+
+        :param priority: Higher runs first; defaults to the bucket's configured priority
+        :param job_id: Use this id, for executors that look up files named after it
+        :raises ValueError: If no executor handles ``kind``
+        """
+        if kind not in self.executors:
+            raise ValueError(f"Unknown job kind {kind!r}")
+        if priority is None:
+            priority = self.bucket_priorities.get(bucket_name, 0)
+        job = self.store.create(job_id or uuid.uuid4().hex, kind, bucket_name, params, priority)
+        self._notify()
+        return job
+
+    def start(self) -> None:
+        requeued = self.store.requeue_orphans()
+        if requeued:
+            logging.info("Requeued %d interrupted jobs", requeued)
+        self._stop.clear()
+        self._threads = [threading.Thread(target=self._run, name=f"job-worker-{n}", daemon=True)
+                         for n in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Stop taking new jobs and wait up to ``timeout`` seconds per worker for
+        the running ones. Jobs still running when the process exits are
+        requeued by the next :meth:`start`.
+        """
+        self._stop.set()
+        self._notify()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _notify(self) -> None:
+        with self._wakeup:
+            self._wakeup.notify_all()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                job = self.store.claim(self.bucket_limit, os.getpid())
+            except sqlite3.Error:
+                logging.exception("Claiming a job failed")
+                job = None
+            if job is None:
+                # Woken early by submit() and finished jobs; the timeout picks
+                # up jobs queued by other processes
+                with self._wakeup:
+                    self._wakeup.wait(self.poll_interval)
+                continue
+            self.execute(job)
+
+    def execute(self, job: dict) -> None:
+        """Run one claimed job to completion and record its outcome."""
+        progress = Progress(self.store, job['job_id'])
+        try:
+            result = self.executors[job['kind']](job, progress)
+        except JobFailed as e:
+            self._finish(job, progress, FAILED, error=str(e))
+        except Exception as e:
+            logging.exception("Job %s failed", job['job_id'])
+            self._finish(job, progress, FAILED, error=f"{type(e).__name__}: {e}")
+        else:
+            self._finish(job, progress, SUCCEEDED, result=result)
+
+    def _finish(self, job: dict, progress: Progress, state: str, result: Any = None,
+                error: Optional[str] = None) -> None:
+        progress.flush()
+        self.store.finish(job['job_id'], state, result, error)
+        # A bucket slot just freed up
+        self._notify()
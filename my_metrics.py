@@ -0,0 +1,214 @@
+"""Prometheus metrics for the HTTP routes and the S3 operations behind them."""
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests handled", ["method", "route", "status"])
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "Time from request start to the last response byte",
+    ["method", "route"], buckets=LATENCY_BUCKETS)
+HTTP_REQUEST_BYTES = Counter(
+    "http_request_bytes_total", "Request body bytes received", ["method", "route"])
+HTTP_RESPONSE_BYTES = Counter(
+    "http_response_bytes_total", "Response body bytes sent", ["method", "route"])
+STAGE_LATENCY = Histogram(
+    "s3_operation_stage_duration_seconds", "Time spent in one stage of an S3 operation",
+    ["operation", "bucket", "stage", "outcome"], buckets=LATENCY_BUCKETS)
+S3_BYTES = Counter(
+    "s3_operation_bytes_total", "Object bytes moved to or from S3", ["operation", "bucket"])
+EXECUTOR_QUEUE = Histogram(
+    "s3_executor_queue_seconds", "Time a blocking call waited for a worker thread",
+    ["operation"], buckets=LATENCY_BUCKETS)
+S3_RETRIES = Counter(
+    "s3_retry_decisions_total", "Failed S3 attempts and whether they were retried",
+    ["bucket", "reason", "outcome"])
+
+UNMATCHED_ROUTE = "unmatched"
+
+
+def _outcome(error: BaseException) -> str:
+    # ClientError carries the S3 error code, which is more useful than the class name
+    # (botocore's HTTPClientError has a ``response`` attribute too, set to None)
+    code = (getattr(error, "response", None) or {}).get("Error", {}).get("Code")
+    return code or type(error).__name__
+
+
+@contextmanager
+def stage_timer(operation: str, bucket: str, stage: str = "s3_call") -> Iterator[None]:
+    """Time the enclosed block as one stage of ``operation`` on ``bucket``.
+
+    The outcome label is ``ok``, or the S3 error code / exception name if the
+    block raises; the exception is re-raised.
+    """
+    started = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except BaseException as e:
+        outcome = _outcome(e)
+        raise
+    finally:
+        STAGE_LATENCY.labels(operation, bucket, stage, outcome).observe(time.perf_counter() - started)
+
+
+def count_bytes(operation: str, bucket: str, size) -> None:
+    """Add ``size`` bytes to the S3 byte counter; unknown sizes are ignored."""
+    if size:
+        S3_BYTES.labels(operation, bucket).inc(size)
+
+
+def observe_queue_wait(operation: str, seconds: float) -> None:
+    """Record how long a blocking call waited for a worker thread."""
+    EXECUTOR_QUEUE.labels(operation).observe(seconds)
+
+
+def count_retry(bucket: str, reason: str, outcome: str) -> None:
+    """Record what the retry layer did with a failed attempt (``retried``,
+    ``exhausted``, ``budget_spent``, ``circuit_open`` or ``rejected``)."""
+    S3_RETRIES.labels(bucket, reason, outcome).inc()
+
+
+def render() -> tuple:
+    """Return the exposition body and its content type."""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording rate, latency and body bytes per route.
+
+    Routes are labelled with their path template, e.g. ``/download/stream/``,
+    so label cardinality stays bounded; unknown paths share one label.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        received = sent = 0
+        status = 500
+
+        async def counting_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message):
+            nonlocal sent, status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            method = scope["method"]
+            route = getattr(scope.get("route"), "path", UNMATCHED_ROUTE)
+            HTTP_REQUESTS.labels(method, route, str(status)).inc()
+            HTTP_LATENCY.labels(method, route).observe(time.perf_counter() - started)
+            if received:
+                HTTP_REQUEST_BYTES.labels(method, route).inc(received)
+            if sent:
+                HTTP_RESPONSE_BYTES.labels(method, route).inc(sent)
+
+
+class StatsCollector:
+    """Expose connection pool, cache, dedup and spool statistics, read at scrape time."""
+
+    def __init__(self, pool_stats: Callable[[], List[dict]], cache_stats: Callable[[], dict],
+                 dedup_stats: Optional[Callable[[], dict]] = None,
+                 disk_cache_stats: Optional[Callable[[], Optional[dict]]] = None,
+                 spool_stats: Optional[Callable[[], dict]] = None):
+        self._pool_stats = pool_stats
+        self._cache_stats = cache_stats
+        self._dedup_stats = dedup_stats
+        self._disk_cache_stats = disk_cache_stats
+        self._spool_stats = spool_stats
+
+    def describe(self):
+        return []
+
+    def collect(self):
+        pool_labels = ["region", "endpoint"]
+        in_flight = GaugeMetricFamily("s3_pool_in_flight_requests", "S3 requests currently in flight",
+                                      labels=pool_labels)
+        peak = GaugeMetricFamily("s3_pool_peak_in_flight_requests", "Most S3 requests in flight at once",
+                                 labels=pool_labels)
+        size = GaugeMetricFamily("s3_pool_max_connections", "Configured connection pool size",
+                                 labels=pool_labels)
+        requests = CounterMetricFamily("s3_pool_requests", "S3 requests sent", labels=pool_labels)
+        saturated = CounterMetricFamily("s3_pool_saturated_requests",
+                                        "S3 requests started while every pooled connection was busy",
+                                        labels=pool_labels)
+        for stats in self._pool_stats():
+            labels = [stats["region_name"] or "", stats["endpoint_url"] or ""]
+            in_flight.add_metric(labels, stats["in_flight"])
+            peak.add_metric(labels, stats["peak_in_flight"])
+            size.add_metric(labels, stats["max_pool_connections"])
+            requests.add_metric(labels, stats["requests"])
+            saturated.add_metric(labels, stats["saturated_requests"])
+        yield from (in_flight, peak, size, requests, saturated)
+
+        entries = GaugeMetricFamily("s3_cache_entries", "Entries held by the cache", labels=["cache"])
+        counters = {name: CounterMetricFamily(f"s3_cache_{name}", f"Cache {name}", labels=["cache"])
+                    for name in ("hits", "misses", "evictions", "expirations", "invalidations")}
+        for cache, stats in self._cache_stats().items():
+            entries.add_metric([cache], stats["size"])
+            for name, family in counters.items():
+                family.add_metric([cache], stats[name])
+        yield entries
+        yield from counters.values()
+
+        if self._dedup_stats is not None:
+            stats = self._dedup_stats()
+            uploads = CounterMetricFamily("s3_dedup_uploads", "Deduplicated uploads by result",
+                                          labels=["result"])
+            uploads.add_metric(["hit"], stats["hits"])
+            uploads.add_metric(["miss"], stats["misses"])
+            yield uploads
+            yield CounterMetricFamily("s3_dedup_bytes_saved", "Upload bytes not sent thanks to dedup",
+                                      value=stats["bytes_saved"])
+            yield GaugeMetricFamily("s3_dedup_index_digests", "Digests held by the dedup index",
+                                    value=stats["digests"])
+
+        stats = self._disk_cache_stats() if self._disk_cache_stats is not None else None
+        if stats is not None:
+            yield GaugeMetricFamily("s3_disk_cache_bytes", "Bytes held by the disk cache",
+                                    value=stats["bytes"])
+            yield GaugeMetricFamily("s3_disk_cache_entries", "Objects held by the disk cache",
+                                    value=stats["entries"])
+            for name in ("hits", "misses", "evictions", "revalidations"):
+                yield CounterMetricFamily(f"s3_disk_cache_{name}", f"Disk cache {name}", value=stats[name])
+
+        if self._spool_stats is not None:
+            stats = self._spool_stats()
+            yield GaugeMetricFamily("s3_spool_disk_bytes", "Bytes of request bodies spooled to disk",
+                                    value=stats["disk_bytes"])
+            yield GaugeMetricFamily("s3_spool_files", "Spool files currently on disk", value=stats["files"])
+            yield CounterMetricFamily("s3_spool_rejections", "Spool writes refused by the disk quota",
+                                      value=stats["rejections"])
+
+
+def register_stats_collector(pool_stats: Callable[[], List[dict]], cache_stats: Callable[[], dict],
+                             dedup_stats: Optional[Callable[[], dict]] = None,
+                             disk_cache_stats: Optional[Callable[[], Optional[dict]]] = None,
+                             spool_stats: Optional[Callable[[], dict]] = None) -> StatsCollector:
+    """Publish pool, cache, dedup, disk cache and spool statistics on the default registry."""
+    collector = StatsCollector(pool_stats, cache_stats, dedup_stats, disk_cache_stats, spool_stats)
+    REGISTRY.register(collector)
+    return collector
@@ -0,0 +1,269 @@
+"""Line queries on large objects: head, tail, line ranges and row filters.
+
+Objects are read as chunk streams and split into lines here, so a query
+holds one chunk and the line being assembled, never the whole object. Lines
+keep their endings, so a slice reads exactly like the object. Head and line
+ranges stop reading once they have their lines; :func:`tail` reads
+backwards with ranged requests until it has enough newlines.
+
+Filters look at one line at a time:
+
+- ``text`` keeps the lines containing a substring,
+- ``csv`` takes the first line as the header and can select columns and
+  compare one column; quoted fields spanning lines are not supported,
+- ``jsonl`` parses one JSON object per line and can select and compare
+  top-level fields.
+"""
+import contextlib
+import csv
+import functools
+import io
+import itertools
+import json
+import operator
+import re
+from collections import deque
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence
+
+import my_json
+
+BYTES = "bytes"
+HEAD = "head"
+TAIL = "tail"
+LINES = "lines"
+FILTER = "filter"
+MODES = (BYTES, HEAD, TAIL, LINES, FILTER)
+
+TEXT = "text"
+CSV = "csv"
+JSONL = "jsonl"
+FORMATS = (TEXT, CSV, JSONL)
+
+# column, operator, value; the column ends at the first operator character
+_WHERE = re.compile(r"^([^!<>=~]+)(!=|<=|>=|=|<|>|~)(.*)$", re.DOTALL)
+_COMPARISONS = {"=": operator.eq, "!=": operator.ne, "<": operator.lt, ">": operator.gt,
+                "<=": operator.le, ">=": operator.ge}
+_MISSING = object()
+
+
+class LineTooLong(ValueError):
+    """A line, or the tail being collected, is longer than allowed."""
+
+
+def iter_lines(chunks: Iterable[bytes], max_line_bytes: int) -> Iterator[bytes]:
+    """
+    Split a chunk stream into lines, each ending with ``\\n`` except perhaps the last.
+
+    :param chunks: Object bytes in chunks of any size
+    :param max_line_bytes: Longest line allowed, ending included
+    :return: Iterator over lines
+    :raises LineTooLong: When a line exceeds ``max_line_bytes``
+    """
+    pending = bytearray()
+    for chunk in chunks:
+        start = 0
+        while True:
+            end = chunk.find(b"\n", start)
+            if end < 0:
+                break
+            if pending:
+                pending += chunk[start:end + 1]
+                line = bytes(pending)
+                pending.clear()
+            else:
+                line = chunk[start:end + 1]
+            if len(line) > max_line_bytes:
+                raise LineTooLong(f"A line is longer than {max_line_bytes} bytes")
+            yield line
+            start = end + 1
+        pending += chunk[start:]
+        if len(pending) > max_line_bytes:
+            raise LineTooLong(f"A line is longer than {max_line_bytes} bytes")
+    if pending:
+        yield bytes(pending)
+
+
+def line_range(chunks: Iterable[bytes], start: int, end: Optional[int],
+               max_line_bytes: int) -> Iterator[bytes]:
+    """
+    Yield lines ``start`` to ``end`` (numbered from 1, both included) and stop reading.
+
+    :param end: Last line, or None for every line from ``start`` on
+    """
+    with contextlib.closing(iter_lines(chunks, max_line_bytes)) as lines:
+        yield from itertools.islice(lines, start - 1, end)
+
+
+def tail(read_range: Callable[[int, int], bytes], size: int, count: int, max_bytes: int,
+         block_size: int = 256 * 1024) -> List[bytes]:
+    """
+    Return the last ``count`` lines of an object by reading it backwards.
+
+    :param read_range: Returns the object's bytes ``first`` to ``last``, both included
+    :param size: Size of the object
+    :param count: Lines wanted
+    :param max_bytes: Most bytes to read; tails longer than this are refused
+    :param block_size: Bytes per ranged read
+    :raises LineTooLong: If ``count`` lines span more than ``max_bytes``
+    """
+    blocks = deque()
+    newlines = 0
+    position = size
+    while position > 0:
+        first = max(0, position - block_size)
+        block = read_range(first, position - 1)
+        if not blocks and block.endswith(b"\n"):
+            # The final newline ends the last line rather than starting another
+            newlines -= 1
+        blocks.appendleft(block)
+        newlines += block.count(b"\n")
+        position = first
+        if newlines >= count:
+            break
+        if size - position > max_bytes:
+            raise LineTooLong(f"The last {count} lines are longer than {max_bytes} bytes")
+    return list(iter_lines(blocks, size + 1))[-count:]
+
+
+def stream_tail(chunks: Iterable[bytes], count: int, max_line_bytes: int) -> List[bytes]:
+    """Return the last ``count`` lines of a stream that cannot be read backwards, e.g. a compressed one."""
+    return list(deque(iter_lines(chunks, max_line_bytes), maxlen=count))
+
+
+def parse_where(expression: str) -> tuple:
+    """
+    Split a ``column<op>value`` predicate.
+
+    Operators are ``=``, ``!=``, ``<``, ``>``, ``<=``, ``>=`` and ``~``
+    (contains). Values that both sides parse as numbers compare as numbers.
+
+    :return: ``(column, operator, value)``
+    :raises ValueError: If the expression has no column or operator
+    """
+    match = _WHERE.match(expression)
+    if not match or not match.group(1).strip():
+        raise ValueError(f"Bad filter {expression!r}; use column=value, with =, !=, <, >, <=, >= or ~")
+    return match.group(1).strip(), match.group(2), match.group(3)
+
+
+def _number(text: str) -> Optional[float]:
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def _matches(actual, op: str, expected: str, expected_number: Optional[float]) -> bool:
+    if actual is _MISSING:
+        return False
+    if op == "~":
+        return expected in actual
+    actual_number = _number(actual) if expected_number is not None else None
+    if actual_number is not None:
+        return _COMPARISONS[op](actual_number, expected_number)
+    return _COMPARISONS[op](actual, expected)
+
+
+def _terminated(line: bytes) -> bytes:
+    return line if line.endswith(b"\n") else line + b"\n"
+
+
+def compile_filter(fmt: str = TEXT, select: Sequence[str] = (), where: Optional[str] = None,
+                   contains: Optional[str] = None,
+                   limit: Optional[int] = None) -> Callable[[Iterable[bytes]], Iterator[bytes]]:
+    """
+    Check a filter and return the function applying it to lines.
+
+    :param fmt: ``text``, ``csv`` or ``jsonl``
+    :param select: Columns or fields to keep (csv and jsonl); all when empty
+    :param where: Predicate, see :func:`parse_where` (csv and jsonl)
+    :param contains: Keep only lines containing this text, checked before parsing
+    :param limit: Stop after this many matching rows
+    :return: Function from lines to output lines; csv output starts with the header
+    :raises ValueError: If the filter is invalid for the format
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    if fmt == TEXT and (select or where):
+        raise ValueError("text filters only support contains")
+    condition = None
+    if where:
+        column, op, value = parse_where(where)
+        condition = (column, op, value, _number(value))
+    needle = contains.encode() if contains else None
+    rows = {TEXT: _text_rows, CSV: _csv_rows, JSONL: _json_rows}[fmt]
+    return functools.partial(rows, select=list(select), condition=condition, needle=needle, limit=limit)
+
+
+def _text_rows(lines: Iterable[bytes], select, condition, needle, limit) -> Iterator[bytes]:
+    matches = (_terminated(line) for line in lines if needle is None or needle in line)
+    return itertools.islice(matches, limit)
+
+
+def _csv_rows(lines: Iterable[bytes], select, condition, needle, limit) -> Iterator[bytes]:
+    lines = iter(lines)
+    header_line = next(lines, None)
+    if header_line is None:
+        return
+    header = next(csv.reader([header_line.decode("utf-8", "replace")]), [])
+    wanted = select + ([condition[0]] if condition else [])
+    unknown = [name for name in wanted if name not in header]
+    if unknown:
+        raise ValueError(f"Unknown column {unknown[0]!r}; the header has {', '.join(header)}")
+    indexes = [header.index(name) for name in select]
+    column = header.index(condition[0]) if condition else None
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator="\n")
+
+    def render(row: List[str]) -> bytes:
+        out.seek(0)
+        out.truncate()
+        writer.writerow(row)
+        return out.getvalue().encode()
+
+    yield render(select) if select else _terminated(header_line)
+    matched = 0
+    for line in lines:
+        if (needle is not None and needle not in line) or not line.strip():
+            continue
+        row = next(csv.reader([line.decode("utf-8", "replace")]), [])
+        if condition is not None:
+            actual = row[column] if column < len(row) else _MISSING
+            if not _matches(actual, *condition[1:]):
+                continue
+        yield render([row[i] if i < len(row) else "" for i in indexes]) if select else _terminated(line)
+        matched += 1
+        if limit is not None and matched >= limit:
+            return
+
+
+def _field_text(value) -> str:
+    if isinstance(value, str):
+        return value
+    return json.dumps(value)
+
+
+def _json_rows(lines: Iterable[bytes], select, condition, needle, limit) -> Iterator[bytes]:
+    matched = 0
+    for line in lines:
+        if (needle is not None and needle not in line) or not line.strip():
+            continue
+        if select or condition:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if not isinstance(record, dict):
+                continue
+            if condition is not None:
+                actual = record.get(condition[0], _MISSING)
+                if actual is not _MISSING:
+                    actual = _field_text(actual)
+                if not _matches(actual, *condition[1:]):
+                    continue
+            if select:
+                line = my_json.dumps({name: record.get(name) for name in select})
+        yield _terminated(line)
+        matched += 1
+        if limit is not None and matched >= limit:
+            return
@@ -0,0 +1,324 @@
+"""Retries, retry budget and per-bucket circuit breakers for S3 calls.
+
+:class:`Resilience` hooks into the botocore event system of a client, so it
+covers every request the client makes, including the part requests of the
+transfer manager:
+
+* failed attempts that are worth repeating (throttling, 5xx, dropped
+  connections) are retried after a full-jitter exponential backoff;
+* retries are paid for from a token bucket that requests refill, so a
+  degraded S3 sees a bounded amount of extra load instead of a retry storm;
+* consecutive failures open the breaker of the bucket, and calls against it
+  fail fast with :class:`CircuitOpen` until a single probe succeeds.
+
+Errors that reach the caller can be turned into typed errors with
+:func:`translate`, which carry the HTTP status they should be reported as.
+"""
+import logging
+import math
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from botocore.exceptions import ClientError, ConnectionError, HTTPClientError
+
+import my_metrics
+
+
+# Error codes S3 uses when it wants the client to slow down; SlowDown is sent
+# with a 503, the others with a 429 or 400
+THROTTLING_CODES = {"SlowDown", "Throttling", "ThrottlingException", "TooManyRequests",
+                    "RequestLimitExceeded", "RequestThrottled", "RequestThrottledException"}
+TRANSIENT_CODES = {"InternalError", "ServiceUnavailable", "RequestTimeout", "RequestTimeoutException"}
+TRANSIENT_STATUS = {500, 502, 503, 504}
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class S3ServiceError(Exception):
+    """An S3 failure with the HTTP status it should be reported as."""
+
+    status_code = 500
+
+    def __init__(self, message: str, code: Optional[str] = None, retry_after: Optional[int] = None,
+                 status_code: Optional[int] = None):
+        super().__init__(message)
+        self.code = code
+        self.retry_after = retry_after
+        if status_code is not None:
+            self.status_code = status_code
+
+
+class ObjectNotFound(S3ServiceError):
+    status_code = 404
+
+
+class BucketNotFound(S3ServiceError):
+    status_code = 404
+
+
+class Throttled(S3ServiceError):
+    """S3 asked for fewer requests; 503 for ``SlowDown``, 429 otherwise."""
+
+    status_code = 429
+
+
+class ServiceUnavailable(S3ServiceError):
+    status_code = 503
+
+
+class CircuitOpen(ServiceUnavailable):
+    """Raised instead of calling S3 while the breaker of a bucket is open."""
+
+
+def error_code(error: ClientError) -> Optional[str]:
+    return error.response.get("Error", {}).get("Code")
+
+
+def translate(error: ClientError, retry_after: int = 1) -> Optional[S3ServiceError]:
+    """
+    Map a ``ClientError`` onto a typed error.
+
+    :param error: Error raised by a botocore client
+    :param retry_after: Seconds to advertise in ``Retry-After`` for transient errors
+    :return: The typed error, or None for errors without one (e.g. AccessDenied)
+    """
+    code = error_code(error)
+    status = error.response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+    if code in ("NoSuchKey", "404"):
+        return ObjectNotFound("File not found", code)
+    if code == "NoSuchBucket":
+        return BucketNotFound("Bucket not found", code)
+    if code in THROTTLING_CODES:
+        return Throttled("S3 is throttling requests, retry later", code, retry_after,
+                         503 if code == "SlowDown" else 429)
+    if code in TRANSIENT_CODES or (status or 0) >= 500:
+        return ServiceUnavailable("S3 is unavailable, retry later", code, retry_after)
+    return None
+
+
+def backoff_delay(attempt: int, base: float, cap: float,
+                  rand: Callable[[], float] = random.random) -> float:
+    """
+    Full-jitter exponential backoff: uniform in ``[0, min(cap, base * 2**attempt))``.
+
+    :param attempt: Number of the retry, starting at 0
+    """
+    return rand() * min(cap, base * 2 ** attempt)
+
+
+class RetryBudget:
+    """
+    Token bucket that limits retries to a share of the requests.
+
+    Every request deposits ``ratio`` tokens and every retry withdraws one, so
+    in steady state at most ``ratio`` retries are made per request. A floor
+    of ``min_per_second`` tokens keeps retries possible at low traffic.
+    """
+
+    def __init__(self, ratio: float, min_per_second: float, capacity: float = 10.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.capacity = capacity
+        self._clock = clock
+        self._tokens = capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self, amount: float) -> None:
+        now = self._clock()
+        amount += (now - self._updated) * self.min_per_second
+        self._updated = now
+        self._tokens = min(self.capacity, self._tokens + amount)
+
+    def record_request(self) -> None:
+        with self._lock:
+            self._refill(self.ratio)
+
+    def try_withdraw(self) -> bool:
+        """Take the token for one retry; False when the budget is spent."""
+        with self._lock:
+            self._refill(0)
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    @property
+    def tokens(self) -> float:
+        with self._lock:
+            self._refill(0)
+            return self._tokens
+
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open breaker for one bucket.
+
+    ``failure_threshold`` consecutive failed attempts open the breaker. After
+    ``reset_seconds`` one probe is let through (half-open): its success closes
+    the breaker, its failure opens it again. A probe that never reports back
+    is replaced after another ``reset_seconds``.
+    """
+
+    def __init__(self, failure_threshold: int, reset_seconds: float,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probe_started: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Return whether a call may go to S3, claiming the probe when half-open."""
+        with self._lock:
+            now = self._clock()
+            if self.state == OPEN:
+                if now - self._opened_at < self.reset_seconds:
+                    return False
+                self.state = HALF_OPEN
+            elif self.state == CLOSED:
+                return True
+            if self._probe_started is not None and now - self._probe_started < self.reset_seconds:
+                return False
+            self._probe_started = now
+            return True
+
+    def is_open(self) -> bool:
+        with self._lock:
+            return self.state == OPEN
+
+    def retry_after(self) -> float:
+        """Seconds until the breaker lets a probe through."""
+        with self._lock:
+            if self.state != OPEN:
+                return 0.0
+            return max(0.0, self.reset_seconds - (self._clock() - self._opened_at))
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self._probe_started = None
+
+    def record_failure(self) -> bool:
+        """Count a failed attempt; return True if this opened the breaker."""
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+                self.state = OPEN
+                self._opened_at = self._clock()
+                self._probe_started = None
+                return True
+            return False
+
+
+def _retry_reason(response: Any, caught_exception: Optional[Exception]) -> Optional[str]:
+    """Classify a failed attempt; None when it is not worth repeating."""
+    if caught_exception is not None:
+        if isinstance(caught_exception, (ConnectionError, HTTPClientError)):
+            return type(caught_exception).__name__
+        return None
+    if response is None:
+        return None
+    http_response, parsed = response
+    code = parsed.get("Error", {}).get("Code") if isinstance(parsed, dict) else None
+    if code in THROTTLING_CODES or code in TRANSIENT_CODES:
+        return code
+    if http_response.status_code in TRANSIENT_STATUS:
+        return str(http_response.status_code)
+    return None
+
+
+class Resilience:
+    """
+    Retry policy and circuit breakers shared by every client it is registered on.
+
+    The clients should be configured with ``max_attempts=1`` so botocore's
+    own retry handler stays out of the way.
+    """
+
+    def __init__(self, max_attempts: int, base_delay: float, max_delay: float, budget: RetryBudget,
+                 failure_threshold: int, reset_seconds: float,
+                 clock: Callable[[], float] = time.monotonic,
+                 rand: Callable[[], float] = random.random):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._clock = clock
+        self._rand = rand
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def register(self, client) -> None:
+        events = client.meta.events
+        events.register('before-parameter-build.s3', self._before_call)
+        events.register('needs-retry.s3', self._needs_retry)
+        events.register('after-call.s3', self._after_call)
+
+    def breaker(self, bucket_name: Optional[str]) -> CircuitBreaker:
+        key = bucket_name or ""
+        with self._lock:
+            breaker = self._breakers.get(key)
+            if breaker is None:
+                breaker = CircuitBreaker(self.failure_threshold, self.reset_seconds, self._clock)
+                self._breakers[key] = breaker
+            return breaker
+
+    def stats(self) -> dict:
+        with self._lock:
+            breakers = dict(self._breakers)
+        return {
+            'retry_tokens': self.budget.tokens,
+            'circuits': {bucket: breaker.state for bucket, breaker in breakers.items()
+                         if breaker.state != CLOSED},
+        }
+
+    def _before_call(self, params: dict, context: dict, **kwargs: Any) -> None:
+        bucket_name = params.get('Bucket')
+        context['resilience_bucket'] = bucket_name
+        breaker = self.breaker(bucket_name)
+        if not breaker.allow():
+            my_metrics.count_retry(bucket_name or "", "circuit_open", "rejected")
+            raise CircuitOpen(f"S3 calls for bucket '{bucket_name}' are failing, retry later",
+                              "CircuitOpen", math.ceil(breaker.retry_after()) or 1)
+        self.budget.record_request()
+
+    def _needs_retry(self, response: Any = None, attempts: int = 1,
+                     caught_exception: Optional[Exception] = None,
+                     request_dict: Optional[dict] = None, **kwargs: Any) -> Optional[float]:
+        reason = _retry_reason(response, caught_exception)
+        if reason is None:
+            return None
+        bucket_name = (request_dict or {}).get('context', {}).get('resilience_bucket')
+        breaker = self.breaker(bucket_name)
+        if breaker.record_failure():
+            logging.warning("Circuit for bucket %s opened after %d failures (%s)",
+                            bucket_name, breaker.failures, reason)
+        if attempts >= self.max_attempts:
+            outcome = "exhausted"
+        elif breaker.is_open():
+            outcome = "circuit_open"
+        elif not self.budget.try_withdraw():
+            outcome = "budget_spent"
+        else:
+            my_metrics.count_retry(bucket_name or "", reason, "retried")
+            return backoff_delay(attempts - 1, self.base_delay, self.max_delay, self._rand)
+        my_metrics.count_retry(bucket_name or "", reason, outcome)
+        return None
+
+    def _after_call(self, http_response: Any, parsed: dict, context: dict, **kwargs: Any) -> None:
+        # Reached once per call with its final response; failures were
+        # counted per attempt in _needs_retry
+        if _retry_reason((http_response, parsed), None) is None:
+            self.breaker(context.get('resilience_bucket')).record_success()
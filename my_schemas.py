@@ -1,5 +1,6 @@
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, Field, model_validator
+from datetime import datetime
+from typing import Any, Dict, Optional, List
 
 
 class FileUploadRequest(BaseModel):
@@ -23,6 +24,12 @@ class FileUploadResponse(BaseModel):
     message: str
     object_name: str
     bucket_name: str
+    # Set on deduplicated uploads; bytes_transferred is 0 when S3 already had the content
+    sha256: Optional[str] = None
+    deduplicated: bool = False
+    bytes_transferred: Optional[int] = None
+    # Set when the object was compressed on upload; bytes_transferred is then the compressed size
+    content_encoding: Optional[str] = None
 
     class Config:
         json_schema_extra = {
@@ -52,9 +59,23 @@ class FileDownloadResponse(BaseModel):
     file_path: str
 
 
+class ObjectSummary(BaseModel):
+    key: str
+    size: int
+    etag: Optional[str] = None
+    last_modified: Optional[datetime] = None
+    storage_class: Optional[str] = None
+
+
 class FileListResponse(BaseModel):
     bucket_name: str
+    # Empty with detail=true, which lists objects instead
     files: List[str]
+    prefix: Optional[str] = None
+    common_prefixes: List[str] = []
+    is_truncated: bool = False
+    next_continuation_token: Optional[str] = None
+    objects: Optional[List[ObjectSummary]] = None
 
 
 class FileDeleteRequest(BaseModel):
@@ -72,3 +93,393 @@ class FileDeleteRequest(BaseModel):
 
 class FileDeleteResponse(BaseModel):
     message: str
+
+
+class BulkDeleteRequest(BaseModel):
+    bucket_name: str
+    keys: List[str] = []
+    prefix: Optional[str] = Field(None, min_length=1)
+
+    @model_validator(mode="after")
+    def check_keys_or_prefix(self):
+        if not self.keys and self.prefix is None:
+            raise ValueError("either keys or prefix must be given")
+        if self.keys and self.prefix is not None:
+            raise ValueError("keys and prefix are mutually exclusive")
+        return self
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "bucket_name": "my-s3-bucket",
+                "keys": ["folder/file1.jpg", "folder/file2.jpg"]
+            }
+        }
+
+
+class DeleteResult(BaseModel):
+    key: str
+    deleted: bool
+    error: Optional[str] = None
+
+
+class BulkDeleteResponse(BaseModel):
+    bucket_name: str
+    deleted_count: int
+    failed_count: int
+    # One entry per key; prefix deletes list only failures, at most the first 1000
+    results: List[DeleteResult]
+
+
+class BatchUploadResult(BaseModel):
+    object_name: str
+    uploaded: bool
+    size: Optional[int] = None
+    error: Optional[str] = None
+
+
+class BatchUploadResponse(BaseModel):
+    bucket_name: str
+    uploaded_count: int
+    failed_count: int
+    results: List[BatchUploadResult]
+
+
+class DedupStatsResponse(BaseModel):
+    enabled: bool
+    digests: int
+    hits: int
+    misses: int
+    bytes_saved: int
+    bytes_uploaded: int
+
+
+class CopyRequest(BaseModel):
+    source_bucket: str
+    source_key: Optional[str] = Field(None, min_length=1)
+    source_prefix: Optional[str] = None
+    # Destination bucket; defaults to the source bucket
+    bucket_name: Optional[str] = None
+    object_name: Optional[str] = Field(None, min_length=1)
+    prefix: Optional[str] = None
+
+    @model_validator(mode="after")
+    def check_object_or_prefix(self):
+        single = self.source_key is not None or self.object_name is not None
+        bulk = self.source_prefix is not None or self.prefix is not None
+        if single == bulk:
+            raise ValueError("give either source_key and object_name, or source_prefix and prefix")
+        if single and (self.source_key is None or self.object_name is None):
+            raise ValueError("source_key and object_name must be given together")
+        if bulk and (self.source_prefix is None or self.prefix is None):
+            raise ValueError("source_prefix and prefix must be given together")
+        if self.bucket_name is None:
+            self.bucket_name = self.source_bucket
+        return self
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "source_bucket": "my-s3-bucket",
+                "source_key": "incoming/file.jpg",
+                "bucket_name": "my-archive-bucket",
+                "object_name": "2024/file.jpg"
+            }
+        }
+
+
+class CopyResult(BaseModel):
+    source_key: str
+    object_name: str
+    copied: bool
+    error: Optional[str] = None
+
+
+class CopyResponse(BaseModel):
+    source_bucket: str
+    bucket_name: str
+    copied_count: int
+    failed_count: int
+    # Prefix copies list only failures, at most the first 1000
+    results: List[CopyResult]
+
+
+class SyncRequest(BaseModel):
+    bucket_name: str
+    prefix: str = ""
+    # Directory below the sync directory
+    local_dir: str = Field(..., min_length=1)
+    # "push" mirrors local_dir to the prefix, "pull" the prefix to local_dir
+    direction: str = "push"
+    # Also delete destination files the source does not have
+    delete: bool = False
+    dry_run: bool = False
+    # "size-mtime", or "checksum" to compare equal-sized files by MD5 and ETag
+    compare: str = "size-mtime"
+
+    @model_validator(mode="after")
+    def check_modes(self):
+        if self.direction not in ("push", "pull"):
+            raise ValueError("direction must be push or pull")
+        if self.compare not in ("size-mtime", "checksum"):
+            raise ValueError("compare must be size-mtime or checksum")
+        return self
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "bucket_name": "my-s3-bucket",
+                "prefix": "sites/www/",
+                "local_dir": "www",
+                "direction": "push",
+                "delete": True,
+                "dry_run": True
+            }
+        }
+
+
+class SyncAction(BaseModel):
+    action: str
+    key: str
+    size: int
+    reason: Optional[str] = None
+
+
+class SyncFailure(BaseModel):
+    action: str
+    key: str
+    error: Optional[str] = None
+
+
+class SyncResponse(BaseModel):
+    bucket_name: str
+    prefix: str
+    uploaded: int
+    downloaded: int
+    deleted: int
+    unchanged: int
+    failed: int
+    # Bytes transferred, or to transfer for dry runs
+    bytes: int
+    failures: List[SyncFailure]
+    # Dry runs only: the planned actions, at most the first 1000
+    plan: Optional[List[SyncAction]] = None
+
+
+class WorkerStatusResponse(BaseModel):
+    # Worker number under my_server; None when run by plain uvicorn
+    worker: Optional[int] = None
+    pid: int
+    uptime_seconds: float
+    ready: bool
+    draining: bool
+
+
+class PoolStatsResponse(BaseModel):
+    region_name: Optional[str] = None
+    endpoint_url: Optional[str] = None
+    max_pool_connections: int
+    in_flight: int
+    peak_in_flight: int
+    requests: int
+    saturated_requests: int
+
+
+class FileMetadataResponse(BaseModel):
+    bucket_name: str
+    object_name: str
+    size: int
+    etag: Optional[str] = None
+    last_modified: Optional[datetime] = None
+    content_type: Optional[str] = None
+    content_encoding: Optional[str] = None
+
+
+class CacheStats(BaseModel):
+    size: int
+    max_entries: int
+    ttl_seconds: float
+    hits: int
+    misses: int
+    evictions: int
+    expirations: int
+    invalidations: int
+
+
+class DiskCacheStats(BaseModel):
+    entries: int
+    bytes: int
+    max_bytes: int
+    policy: str
+    hits: int
+    misses: int
+    evictions: int
+    revalidations: int
+
+
+class CacheStatsResponse(BaseModel):
+    enabled: bool
+    listing: CacheStats
+    metadata: CacheStats
+    presign: CacheStats
+    # None while the disk cache is disabled
+    disk: Optional[DiskCacheStats] = None
+
+
+class SpoolStatsResponse(BaseModel):
+    directory: str
+    memory_limit: int
+    max_disk_bytes: int
+    disk_bytes: int
+    peak_disk_bytes: int
+    files: int
+    rejections: int
+
+
+# SigV4 presigned URLs are valid for at most seven days
+MAX_PRESIGN_EXPIRES = 7 * 24 * 3600
+
+
+class PresignedUploadRequest(BaseModel):
+    bucket_name: str
+    object_name: str
+    expires_in: Optional[int] = Field(None, ge=1, le=MAX_PRESIGN_EXPIRES)
+    content_type: Optional[str] = None
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "bucket_name": "my-s3-bucket",
+                "object_name": "media/video.mp4",
+                "expires_in": 900,
+                "content_type": "video/mp4"
+            }
+        }
+
+
+class PresignedDownloadRequest(BaseModel):
+    bucket_name: str
+    object_name: str
+    expires_in: Optional[int] = Field(None, ge=1, le=MAX_PRESIGN_EXPIRES)
+    response_content_type: Optional[str] = None
+
+
+class PresignedUrlResponse(BaseModel):
+    url: str
+    method: str
+    headers: Dict[str, str] = {}
+    expires_at: datetime
+
+
+class PresignedMultipartRequest(BaseModel):
+    bucket_name: str
+    object_name: str
+    part_count: int = Field(..., ge=1, le=10000)
+    expires_in: Optional[int] = Field(None, ge=1, le=MAX_PRESIGN_EXPIRES)
+    content_type: Optional[str] = None
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "bucket_name": "my-s3-bucket",
+                "object_name": "media/video.mp4",
+                "part_count": 3,
+                "content_type": "video/mp4"
+            }
+        }
+
+
+class PresignedPart(BaseModel):
+    part_number: int
+    url: str
+
+
+class PresignedMultipartResponse(BaseModel):
+    bucket_name: str
+    object_name: str
+    upload_id: str
+    expires_at: datetime
+    parts: List[PresignedPart]
+
+
+class CompletedPart(BaseModel):
+    part_number: int = Field(..., ge=1, le=10000)
+    etag: str
+
+
+class MultipartCompleteRequest(BaseModel):
+    bucket_name: str
+    object_name: str
+    upload_id: str
+    parts: List[CompletedPart] = Field(..., min_length=1)
+
+
+class MultipartAbortRequest(BaseModel):
+    bucket_name: str
+    object_name: str
+    upload_id: str
+
+
+class ResumableUploadRequest(BaseModel):
+    bucket_name: str
+    object_name: str
+    content_type: Optional[str] = None
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "bucket_name": "my-s3-bucket",
+                "object_name": "media/video.mp4",
+                "content_type": "video/mp4"
+            }
+        }
+
+
+class UploadedPart(BaseModel):
+    part_number: int
+    etag: str
+    size: int
+
+
+class UploadSessionResponse(BaseModel):
+    session_id: str
+    bucket_name: str
+    object_name: str
+    content_type: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+    received_bytes: int
+    parts: List[UploadedPart]
+
+
+class JobResponse(BaseModel):
+    job_id: str
+    kind: str
+    bucket_name: str
+    state: str
+    priority: int
+    attempts: int
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    bytes_done: int
+    bytes_total: Optional[int] = None
+    parts_done: int
+    parts_total: Optional[int] = None
+    # Set once the job succeeded; shape depends on the kind
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+
+class DownloadJobRequest(BaseModel):
+    bucket_name: str
+    object_name: str = Field(..., min_length=1)
+    decompress: bool = True
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "bucket_name": "my-s3-bucket",
+                "object_name": "exports/2024.tar"
+            }
+        }
@@ -0,0 +1,291 @@
+"""Pre-fork serving: one supervisor process and N uvicorn worker processes.
+
+    python -m my_server --port 8000 --workers 4
+
+The supervisor binds the listening socket and forks the workers, which all
+accept from it; the kernel spreads connections between them. The app is
+imported by each worker after the fork, so every module-level resource (the
+boto3 clients, SQLite connections, thread pools, caches) belongs to one
+worker and nothing is shared but the socket. Only botocore's parsed data is
+loaded before the fork (see :mod:`my_startup`), so workers inherit it.
+
+- SIGTERM or SIGINT drains: workers stop accepting, finish the requests in
+  flight for up to ``drain_timeout`` seconds, then run the app shutdown.
+- SIGTTIN adds a worker, SIGTTOU drains one.
+- Workers that die are replaced. A worker that fails to start the app stops
+  the whole server, since its replacements would fail the same way.
+
+Every worker answers ``/health/`` and ``/ready/`` about itself. With
+``--health-port`` worker ``n`` also listens on ``health_port + n``, so each
+worker's health and ``/metrics`` can be reached directly.
+"""
+import argparse
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Dict, List, Optional
+
+import my_startup
+from my_settings import settings
+
+# Exit status of a worker whose app failed to start (uvicorn's STARTUP_FAILURE)
+STARTUP_FAILURE = 3
+# Workers that die sooner than this after being forked are replaced only
+# after RESPAWN_DELAY, so a crash loop does not spin
+MIN_UPTIME = 1.0
+RESPAWN_DELAY = 1.0
+# How long workers get on top of the drain timeout before they are killed
+KILL_GRACE = 5.0
+
+_status = {'worker': None, 'pid': os.getpid(), 'started_at': time.time(), 'ready': False, 'draining': False}
+
+
+def worker_status() -> dict:
+    """
+    Describe this worker process.
+
+    :return: ``worker`` (number, None when not run by the supervisor), ``pid``,
+        ``uptime_seconds``, ``ready`` and ``draining``
+    """
+    return {'worker': _status['worker'], 'pid': _status['pid'],
+            'uptime_seconds': round(time.time() - _status['started_at'], 3),
+            'ready': _status['ready'] and not _status['draining'], 'draining': _status['draining']}
+
+
+def mark_ready() -> None:
+    """Report this worker ready; called once the app has started and warmed up."""
+    _status['ready'] = True
+
+
+def mark_draining() -> None:
+    """Report this worker as going away; it stays up until its requests finish."""
+    _status['draining'] = True
+
+
+def worker_count(workers: Optional[int] = None) -> int:
+    """Return ``workers``, or the CPUs this process may run on when it is 0 or None."""
+    if workers:
+        return workers
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def bind_socket(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    """Open a listening TCP socket that forked workers can share."""
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _uvicorn_server():
+    import uvicorn
+
+    class WorkerServer(uvicorn.Server):
+        """uvicorn server that reports draining and exits with its supervisor."""
+
+        def handle_exit(self, sig, frame):
+            mark_draining()
+            super().handle_exit(sig, frame)
+
+        async def on_tick(self, counter: int) -> bool:
+            # Re-parented: the supervisor was killed without draining us
+            if counter % 10 == 0 and os.getppid() != self.supervisor_pid:
+                mark_draining()
+                self.should_exit = True
+            return await super().on_tick(counter)
+
+    return uvicorn, WorkerServer
+
+
+class Supervisor:
+    """
+    Forks and watches the worker processes.
+
+    :param app: Import string of the ASGI app, e.g. ``main:app``
+    :param sock: Listening socket every worker accepts from
+    :param workers: Number of workers to keep running
+    :param drain_timeout: Seconds a draining worker may spend on requests in flight
+    :param health_port: Worker ``n`` also listens on ``health_port + n`` when set
+    :param uvicorn_options: Further ``uvicorn.Config`` arguments for the workers
+    """
+
+    def __init__(self, app: str, sock: socket.socket, workers: int, drain_timeout: float,
+                 health_port: Optional[int] = None, uvicorn_options: Optional[dict] = None):
+        self.app = app
+        self.sock = sock
+        self.target = workers
+        self.drain_timeout = drain_timeout
+        self.health_port = health_port
+        self.uvicorn_options = uvicorn_options or {}
+        self.workers: Dict[int, dict] = {}
+        self.retiring: Dict[int, dict] = {}
+        self._respawn_at: Dict[int, float] = {}
+        self._stopping = False
+        self._exit_code = 0
+
+    def run(self) -> int:
+        """Serve until a stop signal; return the exit status."""
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, self._on_stop)
+        signal.signal(signal.SIGTTIN, self._on_scale)
+        signal.signal(signal.SIGTTOU, self._on_scale)
+        logging.info("Supervisor %d serving %s with %d workers", os.getpid(), self.app, self.target)
+        while not self._stopping:
+            self._reap()
+            self._retire_extra()
+            self._spawn_missing()
+            time.sleep(0.1)
+        self._drain()
+        return self._exit_code
+
+    def _on_stop(self, sig, frame) -> None:
+        self._stopping = True
+
+    def _on_scale(self, sig, frame) -> None:
+        self.target = self.target + 1 if sig == signal.SIGTTIN else max(1, self.target - 1)
+        logging.info("Scaling to %d workers", self.target)
+
+    def _spawn_missing(self) -> None:
+        running = {worker['id'] for worker in self.workers.values()}
+        now = time.monotonic()
+        for worker_id in range(self.target):
+            if worker_id not in running and self._respawn_at.get(worker_id, 0) <= now:
+                self._spawn(worker_id)
+
+    def _spawn(self, worker_id: int) -> None:
+        pid = os.fork()
+        if pid:
+            self.workers[pid] = {'id': worker_id, 'started_at': time.monotonic()}
+            return
+        # Child: never return into the supervisor's loop
+        code = 1
+        try:
+            code = self._serve_worker(worker_id)
+        except SystemExit as e:
+            code = e.code if isinstance(e.code, int) else 1
+        except BaseException:
+            logging.exception("Worker %d crashed", worker_id)
+        finally:
+            logging.shutdown()
+            os._exit(code)
+
+    def _serve_worker(self, worker_id: int) -> int:
+        supervisor_pid = os.getppid()
+        # uvicorn installs its own SIGTERM/SIGINT handlers while serving and
+        # re-raises the signal afterwards; ignored, that lets us exit 0
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, signal.SIG_IGN)
+        # A terminal's Ctrl-C goes to the supervisor only, which drains us once;
+        # as a background process group we must not be stopped by terminal I/O
+        os.setpgid(0, 0)
+        for sig in (signal.SIGTTIN, signal.SIGTTOU):
+            signal.signal(sig, signal.SIG_IGN)
+        _status.update(worker=worker_id, pid=os.getpid(), started_at=time.time(), ready=False,
+                       draining=False)
+        sockets = [self.sock]
+        if self.health_port is not None:
+            sockets.append(bind_socket(self.sock.getsockname()[0], self.health_port + worker_id))
+        uvicorn, server_class = _uvicorn_server()
+        config = uvicorn.Config(self.app, timeout_graceful_shutdown=self.drain_timeout,
+                                **self.uvicorn_options)
+        server = server_class(config)
+        server.supervisor_pid = supervisor_pid
+        server.run(sockets=sockets)
+        return 0
+
+    def _reap(self) -> None:
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if not pid:
+                return
+            code = os.waitstatus_to_exitcode(status)
+            if self.retiring.pop(pid, None) is not None:
+                continue
+            worker = self.workers.pop(pid, None)
+            if worker is None:
+                continue
+            if code == STARTUP_FAILURE:
+                logging.error("Worker %d failed to start the app; stopping", worker['id'])
+                self._exit_code = STARTUP_FAILURE
+                self._stopping = True
+                continue
+            logging.warning("Worker %d (pid %d) exited with status %d", worker['id'], pid, code)
+            if time.monotonic() - worker['started_at'] < MIN_UPTIME:
+                self._respawn_at[worker['id']] = time.monotonic() + RESPAWN_DELAY
+
+    def _retire_extra(self) -> None:
+        for pid, worker in list(self.workers.items()):
+            if worker['id'] >= self.target:
+                self.retiring[pid] = self.workers.pop(pid)
+                _signal(pid, signal.SIGTERM)
+
+    def _drain(self) -> None:
+        self.retiring.update(self.workers)
+        self.workers.clear()
+        logging.info("Draining %d workers", len(self.retiring))
+        for pid in self.retiring:
+            _signal(pid, signal.SIGTERM)
+        self.sock.close()
+        deadline = time.monotonic() + self.drain_timeout + KILL_GRACE
+        while self.retiring and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.1)
+        for pid in self.retiring:
+            logging.warning("Killing worker pid %d after the drain timeout", pid)
+            _signal(pid, signal.SIGKILL)
+        while self.retiring:
+            pid, _ = os.waitpid(-1, 0)
+            self.retiring.pop(pid, None)
+
+
+def _signal(pid: int, sig: int) -> None:
+    try:
+        os.kill(pid, sig)
+    except ProcessLookupError:
+        pass
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--app", default="main:app", help="import string of the ASGI app")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=settings.workers,
+                        help="worker processes; 0 means one per CPU")
+    parser.add_argument("--drain-timeout", type=float, default=settings.drain_timeout_seconds,
+                        help="seconds workers may spend finishing requests after SIGTERM")
+    parser.add_argument("--health-port", type=int, default=settings.health_port,
+                        help="worker n also listens on this port plus n")
+    parser.add_argument("--timeout-keep-alive", type=int, default=5)
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(process)d %(message)s")
+    workers = worker_count(args.workers)
+    if workers > 1 and settings.upload_session_store == "memory":
+        logging.warning("Resumable uploads need S3_SERVICE_UPLOAD_SESSION_STORE=sqlite "
+                        "to work across %d workers", workers)
+    # Workers inherit the loaded botocore data and create their clients quickly
+    my_startup.preload()
+    sock = bind_socket(args.host, args.port)
+    supervisor = Supervisor(args.app, sock, workers, args.drain_timeout, args.health_port,
+                            {'log_level': args.log_level, 'timeout_keep_alive': args.timeout_keep_alive})
+    sys.exit(supervisor.run())
+
+
+if __name__ == "__main__":
+    # Run the importable module rather than __main__, so the workers update the
+    # status that main.py reads
+    import my_server
+    my_server.main()
@@ -1,62 +1,1755 @@
-import boto3
-from botocore.exceptions import NoCredentialsError, ClientError
+import asyncio
+import collections
+import fnmatch
+import functools
+import itertools
+import threading
+import uuid
+import time
+from datetime import datetime, timedelta, timezone
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, NoCredentialsError, ClientError
+from concurrent.futures import ThreadPoolExecutor
 import logging
-from typing import List
+import mimetypes
+import os
+import shutil
+import tarfile
+import zipfile
+from boto3.s3.transfer import TransferConfig
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
-# Initialize the S3 client
-s3_client = boto3.client('s3')
+import my_compression
+import my_jobs
+import my_metrics
+import my_query
+import my_resilience
+import my_server
+import my_spool
+import my_startup
+import my_sync
+from my_cache import TTLCache
+from my_dedup import DIGEST_METADATA_KEY, DigestIndex
+from my_disk_cache import DiskCache
+from my_upload_sessions import create_session_store
+from my_settings import settings
 
-def upload_file_to_s3(file_path: str, bucket_name: str, object_name: str) -> bool:
+class PoolStats:
+    """
+    Connection pool usage of one S3 client.
+
+    Counts requests between ``before-send`` and ``needs-retry``, i.e. while
+    an HTTP attempt holds a pooled connection. A request is counted as
+    saturated when it starts while every connection is already busy, which
+    means it had to wait for one or open a connection that is not kept.
+    """
+
+    def __init__(self, region_name: Optional[str], endpoint_url: Optional[str],
+                 max_pool_connections: int):
+        self.region_name = region_name
+        self.endpoint_url = endpoint_url
+        self.max_pool_connections = max_pool_connections
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.requests = 0
+        self.saturated_requests = 0
+        self._lock = threading.Lock()
+
+    def on_send(self, **kwargs: Any) -> None:
+        with self._lock:
+            if self.in_flight >= self.max_pool_connections:
+                self.saturated_requests += 1
+            self.in_flight += 1
+            self.requests += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def on_response(self, **kwargs: Any) -> None:
+        with self._lock:
+            self.in_flight = max(0, self.in_flight - 1)
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                'region_name': self.region_name,
+                'endpoint_url': self.endpoint_url,
+                'max_pool_connections': self.max_pool_connections,
+                'in_flight': self.in_flight,
+                'peak_in_flight': self.peak_in_flight,
+                'requests': self.requests,
+                'saturated_requests': self.saturated_requests,
+            }
+
+# Retry policy and per-bucket circuit breakers, shared by every client
+resilience = my_resilience.Resilience(
+    settings.max_attempts, settings.retry_base_delay, settings.retry_max_delay,
+    my_resilience.RetryBudget(settings.retry_budget_ratio, settings.retry_budget_min_per_second),
+    settings.circuit_failure_threshold, settings.circuit_reset_seconds)
+
+# botocore data comes from my_startup's loader: cached on disk between runs
+# and, under my_server, already loaded when the worker was forked
+_session = my_startup.create_session()
+_clients: Dict[Tuple[Optional[str], Optional[str]], Any] = {}
+_pool_stats: Dict[Tuple[Optional[str], Optional[str]], PoolStats] = {}
+_clients_lock = threading.Lock()
+
+def build_client_config() -> Config:
+    """
+    Build the botocore client configuration from settings.
+
+    With the resilience layer enabled botocore makes a single attempt and
+    ``resilience`` decides about retries.
+
+    :return: Config with pool size, timeouts, TCP keepalive, retry mode and SigV4 signing
+    """
+    if settings.resilience_enabled:
+        retries = {'mode': settings.retry_mode, 'total_max_attempts': 1}
+    else:
+        retries = {'mode': settings.retry_mode, 'max_attempts': settings.max_attempts}
+    return Config(
+        signature_version='s3v4',
+        max_pool_connections=settings.max_pool_connections,
+        connect_timeout=settings.connect_timeout,
+        read_timeout=settings.read_timeout,
+        tcp_keepalive=settings.tcp_keepalive,
+        retries=retries,
+    )
+
+def get_s3_client(region_name: Optional[str] = None, endpoint_url: Optional[str] = None):
+    """
+    Return the shared S3 client for a region and endpoint, creating it once.
+
+    Clients are cached per ``(region, endpoint)`` so requests against the same
+    target reuse warm pooled connections. All clients share one boto3 session,
+    so the service model is loaded only once.
+
+    :param region_name: AWS region; defaults to ``settings.region_name``
+    :param endpoint_url: Custom endpoint; defaults to ``settings.endpoint_url``
+    :return: boto3 S3 client
+    """
+    key = (region_name or settings.region_name, endpoint_url or settings.endpoint_url)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _session.client('s3', region_name=key[0], endpoint_url=key[1],
+                                     config=build_client_config())
+            stats = PoolStats(key[0], key[1], settings.max_pool_connections)
+            client.meta.events.register('before-send.s3', stats.on_send)
+            client.meta.events.register('needs-retry.s3', stats.on_response)
+            if settings.resilience_enabled:
+                resilience.register(client)
+            _clients[key] = client
+            _pool_stats[key] = stats
+    return client
+
+def client_for_bucket(bucket_name: str):
+    """
+    Return the client to use for a bucket.
+
+    Buckets listed in ``settings.bucket_regions`` get a client for their
+    region; every other bucket uses the default client.
+
+    :param bucket_name: Name of the S3 bucket
+    :return: boto3 S3 client
+    """
+    region_name = settings.bucket_regions.get(bucket_name)
+    if region_name is None:
+        return default_client()
+    return get_s3_client(region_name=region_name)
+
+def default_client():
+    """Return the default ``s3_client``, creating it on first use."""
+    global s3_client
+    client = s3_client
+    if client is None:
+        client = s3_client = get_s3_client()
+    return client
+
+def get_pool_stats() -> List[dict]:
+    """
+    Report connection pool usage for every cached client.
+
+    :return: One dict per client, see :class:`PoolStats`
+    """
+    with _clients_lock:
+        stats = list(_pool_stats.values())
+    return [s.as_dict() for s in stats]
+
+def reset_clients() -> None:
+    """Drop every cached client; the next call creates them again."""
+    global s3_client
+    with _clients_lock:
+        _clients.clear()
+        _pool_stats.clear()
+    s3_client = None
+
+def warm_up() -> None:
+    """
+    Do the slow parts of the first request ahead of it.
+
+    Creates the default client and the clients of ``settings.bucket_regions``,
+    resolves credentials (which may mean a call to the instance metadata
+    service or STS) and opens a pooled connection to each bucket in
+    ``settings.warm_up_buckets``. Any S3 answer counts, even an error: the
+    connection is open either way.
+
+    :raises NoCredentialsError: If no credentials can be found
+    :raises BotoCoreError: If S3 cannot be reached
+    """
+    default_client()
+    for region_name in set(settings.bucket_regions.values()):
+        get_s3_client(region_name=region_name)
+    credentials = _session.get_credentials()
+    if credentials is None:
+        raise NoCredentialsError()
+    # Refreshable credentials are only fetched when first used
+    credentials.get_frozen_credentials()
+    for bucket_name in settings.warm_up_buckets:
+        try:
+            client_for_bucket(bucket_name).head_bucket(Bucket=bucket_name)
+        except ClientError as e:
+            logging.info("Warm-up of bucket %s: %s", bucket_name, e)
+
+# The default client is created on first use (or by warm_up), so importing
+# this module does not load botocore's data or look for credentials
+s3_client = None
+
+def _raise_typed(error: ClientError) -> None:
+    """
+    Re-raise ``error`` as a typed error when it has one.
+
+    Missing objects and buckets, throttling and S3 outages are raised as
+    :class:`my_resilience.S3ServiceError`, which the API reports with a
+    matching status code; other errors are left to the caller.
+
+    :raises my_resilience.S3ServiceError: If ``error`` maps onto one
+    """
+    typed = my_resilience.translate(error, settings.retry_after_seconds)
+    if typed is not None:
+        raise typed from error
+
+def _raise_s3_error(error: ClientError, message: str) -> None:
+    """
+    Re-raise ``error`` as a typed error whatever its code.
+
+    Like :func:`_raise_typed`, but access denied is raised as a 403 and any
+    other error as a plain :class:`my_resilience.S3ServiceError` (500).
+
+    :param message: Message of the 500 error
+    :raises my_resilience.S3ServiceError: Always
+    """
+    code = my_resilience.error_code(error)
+    if code in ('403', 'AccessDenied'):
+        raise my_resilience.S3ServiceError("Access denied", code, status_code=403) from error
+    _raise_typed(error)
+    raise my_resilience.S3ServiceError(message, code) from error
+
+# Listing pages keyed by (bucket, prefix, delimiter, max_keys, token) and
+# object metadata keyed by (bucket, key); writes through this module invalidate them
+listing_cache = TTLCache(settings.cache_max_entries, settings.cache_ttl_seconds)
+metadata_cache = TTLCache(settings.cache_max_entries, settings.cache_ttl_seconds)
+# Signed URLs keyed by everything that goes into the signature; entries are
+# reused for at most settings.presign_reuse_seconds
+presign_cache = TTLCache(settings.cache_max_entries, settings.presign_reuse_seconds)
+# The stores below keep files on disk, so like s3_client they are created on
+# first use through their get_* function and importing this module writes nothing
+_state_lock = threading.Lock()
+# Object bodies on local disk, keyed by (bucket, key) and named after their ETag;
+# see open_cached_object
+disk_cache = None
+
+def get_disk_cache() -> Optional[DiskCache]:
+    """
+    Return the disk cache, creating its directory on first use.
+
+    A cache directory belongs to one process, so my_server workers each get
+    a subdirectory of ``settings.disk_cache_dir``.
+
+    :return: The cache; None unless ``settings.disk_cache_enabled``
+    """
+    global disk_cache
+    with _state_lock:
+        if disk_cache is None and settings.disk_cache_enabled:
+            worker = my_server.worker_status()['worker']
+            directory = settings.disk_cache_dir if worker is None else \
+                os.path.join(settings.disk_cache_dir, f"worker-{worker}")
+            disk_cache = DiskCache(directory, settings.disk_cache_max_bytes, settings.disk_cache_policy,
+                                   settings.disk_cache_max_object_bytes)
+        return disk_cache
+
+def invalidate_cached_objects(bucket_name: str, object_names: Iterable[str]) -> None:
+    """
+    Forget cached metadata and listing pages that may include these objects.
+
+    :param bucket_name: Name of the S3 bucket
+    :param object_names: Object names that were written or deleted
+    """
+    object_names = list(object_names)
+    cache = get_disk_cache()
+    for object_name in object_names:
+        metadata_cache.pop((bucket_name, object_name))
+        if cache is not None:
+            cache.discard(bucket_name, object_name)
+    listing_cache.invalidate(
+        lambda key: key[0] == bucket_name and any(name.startswith(key[1]) for name in object_names))
+
+def get_cache_stats() -> dict:
+    """
+    Report hit/miss counters of the metadata caches.
+
+    :return: Dict with ``listing``, ``metadata`` and ``presign`` counters
+    """
+    return {'listing': listing_cache.stats(), 'metadata': metadata_cache.stats(),
+            'presign': presign_cache.stats()}
+
+def get_disk_cache_stats() -> Optional[dict]:
+    """
+    Report disk cache usage and counters.
+
+    :return: Dict with ``entries``, ``bytes``, ``max_bytes``, ``policy``, ``hits``,
+        ``misses``, ``evictions`` and ``revalidations``; None if the cache is disabled
+    """
+    cache = get_disk_cache()
+    return cache.stats() if cache is not None else None
+
+# Digest -> object that holds that content, for deduplicated uploads
+dedup_index = DigestIndex(settings.dedup_index_max_entries)
+
+def get_dedup_stats() -> dict:
+    """
+    Report deduplication counters.
+
+    :return: Dict with ``digests``, ``hits``, ``misses``, ``bytes_saved`` and ``bytes_uploaded``
+    """
+    return dedup_index.stats()
+
+# Resumable upload sessions, see my_upload_sessions
+upload_sessions = None
+
+def get_upload_sessions():
+    """Return the upload session store, opening it on first use."""
+    global upload_sessions
+    with _state_lock:
+        if upload_sessions is None:
+            upload_sessions = create_session_store(settings.upload_session_store, settings.upload_session_db)
+        return upload_sessions
+
+# Spools for request bodies that must be read more than once, see my_spool
+spool_manager = None
+
+def get_spool_manager() -> my_spool.SpoolManager:
+    """Return the spool manager, creating ``settings.spool_dir`` and removing orphans on first use."""
+    global spool_manager
+    with _state_lock:
+        if spool_manager is None:
+            spool_manager = my_spool.SpoolManager(settings.spool_dir, settings.spool_memory_limit,
+                                                  settings.spool_max_disk_bytes)
+        return spool_manager
+
+def get_spool_stats() -> dict:
+    """
+    Report spool usage.
+
+    :return: Dict with ``disk_bytes``, ``peak_disk_bytes``, ``files``, ``rejections`` and the limits
+    """
+    return get_spool_manager().stats()
+
+def sweep_downloads() -> int:
+    """
+    Delete files under ``settings.download_dir`` older than the download retention.
+
+    :return: Number of files removed
+    """
+    if not settings.download_retention_seconds or not os.path.isdir(settings.download_dir):
+        return 0
+    return my_spool.sweep_directory(settings.download_dir, settings.download_retention_seconds)
+
+# Bounded pool that runs the blocking boto3 calls below off the event loop
+executor = ThreadPoolExecutor(max_workers=settings.max_workers, thread_name_prefix="s3-worker")
+
+MIB = 1024 * 1024
+# S3 rejects multipart parts smaller than 5 MiB (except the last one),
+# larger than 5 GiB, or more than 10000 parts per upload
+MIN_PART_SIZE = 5 * MIB
+MAX_PART_SIZE = 5 * 1024 * MIB
+MAX_PARTS = 10000
+# Streamed uploads of unknown size double their part size every this many
+# parts, which fits about 5 TiB into MAX_PARTS even from 5 MiB parts
+PART_GROWTH_INTERVAL = MAX_PARTS // 10
+# Large objects get bigger parts so they need at most this many requests
+TARGET_PART_COUNT = 1000
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+# DeleteObjects accepts at most 1000 keys per request
+DELETE_BATCH_SIZE = 1000
+# Prefix deletes and copies can cover millions of keys; they list at most this many failures
+FAILURE_LIMIT = 1000
+
+async def run_in_executor(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """
+    Run a blocking service call on the bounded worker pool.
+
+    At most ``settings.max_workers`` calls run at once; further calls queue
+    without blocking the event loop.
+
+    :param func: Blocking callable, usually one of the functions in this module
+    :return: Whatever ``func`` returns
+    """
+    loop = asyncio.get_running_loop()
+    operation = getattr(func, '__qualname__', 'call')
+    submitted = time.perf_counter()
+
+    def call() -> Any:
+        my_metrics.observe_queue_wait(operation, time.perf_counter() - submitted)
+        return func(*args, **kwargs)
+
+    return await loop.run_in_executor(executor, call)
+
+def bounded_map(func: Callable[[Any], Any], items: Iterable[Any],
+                max_workers: Optional[int] = None) -> Iterator[Any]:
+    """
+    Apply ``func`` to ``items`` concurrently, yielding results in input order.
+
+    Unlike ``Executor.map`` the input is consumed lazily: at most twice
+    ``max_workers`` items are in flight, so a generator over millions of keys
+    never gets materialized.
+
+    :param func: Blocking callable applied to each item
+    :param items: Iterable of work items, possibly lazy
+    :param max_workers: Pool size; defaults to ``settings.bulk_max_workers``
+    :return: Iterator over the results of ``func``
+    """
+    max_workers = max_workers or settings.bulk_max_workers
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="s3-bulk") as pool:
+        pending = collections.deque()
+        for item in items:
+            pending.append(pool.submit(func, item))
+            if len(pending) >= 2 * max_workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def _batched(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    iterator = iter(items)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+def adaptive_part_size(object_size: Optional[int], part_size: Optional[int] = None) -> int:
+    """
+    Choose a multipart part size for an object.
+
+    The configured size is a floor. Objects that would need more than
+    ``TARGET_PART_COUNT`` parts get proportionally bigger parts, rounded up to
+    a whole MiB, which also keeps every object under the 10000-part limit.
+
+    :param object_size: Object size in bytes, or None if unknown
+    :param part_size: Preferred part size; defaults to ``settings.multipart_chunksize``
+    :return: Part size in bytes
+    """
+    part_size = max(part_size or settings.multipart_chunksize, MIN_PART_SIZE)
+    if object_size and object_size > part_size * TARGET_PART_COUNT:
+        part_size = -(-object_size // TARGET_PART_COUNT)
+        part_size = -(-part_size // MIB) * MIB
+    return min(part_size, MAX_PART_SIZE)
+
+def build_transfer_config(object_size: Optional[int] = None, part_size: Optional[int] = None,
+                          max_concurrency: Optional[int] = None,
+                          use_threads: Optional[bool] = None) -> TransferConfig:
+    """
+    Build a boto3 TransferConfig from settings plus per-request overrides.
+
+    :param object_size: Object size in bytes, used for adaptive part sizing
+    :param part_size: Override for the multipart chunk size
+    :param max_concurrency: Override for the number of parallel part transfers
+    :param use_threads: Override for whether transfers use threads at all
+    :return: TransferConfig for ``upload_file``/``download_file``/``upload_fileobj``
+    """
+    chunk_size = adaptive_part_size(object_size, part_size)
+    return TransferConfig(
+        multipart_threshold=max(settings.multipart_threshold, MIN_PART_SIZE),
+        multipart_chunksize=chunk_size,
+        max_concurrency=max_concurrency or settings.max_concurrency,
+        use_threads=settings.use_threads if use_threads is None else use_threads,
+    )
+
+def _fileobj_size(fileobj: BinaryIO) -> Optional[int]:
+    try:
+        position = fileobj.tell()
+        size = fileobj.seek(0, os.SEEK_END)
+        fileobj.seek(position)
+        return size - position
+    except (AttributeError, OSError, ValueError):
+        return None
+
+def _path_size(file_path: str) -> Optional[int]:
+    try:
+        return os.path.getsize(file_path)
+    except OSError:
+        return None
+
+def upload_file_to_s3(file_path: str, bucket_name: str, object_name: str,
+                      transfer_config: Optional[TransferConfig] = None,
+                      encoding: Optional[str] = None,
+                      callback: Optional[Callable[[int], None]] = None) -> bool:
     """
     Upload a file to an S3 bucket.
     
     :param file_path: Path to the file to upload
     :param bucket_name: Name of the S3 bucket
     :param object_name: Object name in S3
+    :param transfer_config: Transfer tuning; built from settings and the file size if omitted
+    :param encoding: Compress the file on the fly with this content coding (``gzip`` or ``zstd``)
+    :param callback: Called with the number of bytes sent, from the transfer threads;
+        not used for compressed uploads
     :return: True if upload was successful, False otherwise
+    :raises my_resilience.S3ServiceError: If the object or bucket is missing, or S3 throttles or fails
     """
+    if encoding:
+        content_type = mimetypes.guess_type(file_path)[0]
+        with open(file_path, 'rb') as fileobj:
+            return upload_fileobj_compressed(fileobj, bucket_name, object_name, encoding, content_type,
+                                             transfer_config) is not None
+    size = _path_size(file_path)
+    if transfer_config is None:
+        transfer_config = build_transfer_config(size)
     try:
-        s3_client.upload_file(file_path, bucket_name, object_name)
+        with my_metrics.stage_timer('upload', bucket_name):
+            client_for_bucket(bucket_name).upload_file(file_path, bucket_name, object_name,
+                                                       Config=transfer_config, Callback=callback)
+        my_metrics.count_bytes('upload', bucket_name, size)
+        invalidate_cached_objects(bucket_name, [object_name])
         return True
     except NoCredentialsError:
         logging.error("Credentials not available")
         return False
     except ClientError as e:
         logging.error(e)
+        _raise_typed(e)
         return False
 
-def download_file_from_s3(bucket_name: str, object_name: str, file_path: str) -> bool:
+def upload_fileobj_to_s3(fileobj: BinaryIO, bucket_name: str, object_name: str,
+                         transfer_config: Optional[TransferConfig] = None) -> bool:
+    """
+    Upload a file-like object to an S3 bucket.
+
+    The object is read in chunks by the boto3 transfer manager, so nothing is
+    spooled to local disk and memory stays bounded regardless of its size.
+
+    :param fileobj: Readable binary file-like object
+    :param bucket_name: Name of the S3 bucket
+    :param object_name: Object name in S3
+    :param transfer_config: Transfer tuning; built from settings and the object size if omitted
+    :return: True if upload was successful, False otherwise
+    :raises my_resilience.S3ServiceError: If the object or bucket is missing, or S3 throttles or fails
+    """
+    size = _fileobj_size(fileobj)
+    if transfer_config is None:
+        transfer_config = build_transfer_config(size)
+    try:
+        with my_metrics.stage_timer('upload', bucket_name):
+            client_for_bucket(bucket_name).upload_fileobj(fileobj, bucket_name, object_name,
+                                                          Config=transfer_config)
+        my_metrics.count_bytes('upload', bucket_name, size)
+        invalidate_cached_objects(bucket_name, [object_name])
+        return True
+    except NoCredentialsError:
+        logging.error("Credentials not available")
+        return False
+    except ClientError as e:
+        logging.error(e)
+        _raise_typed(e)
+        return False
+
+def _encoded_object_args(encoding: str, content_type: Optional[str] = None,
+                         original_size: Optional[int] = None) -> dict:
+    """Build the put/create-multipart arguments describing an encoded object."""
+    args = {'ContentEncoding': encoding}
+    if content_type:
+        args['ContentType'] = content_type
+    if original_size is not None:
+        args['Metadata'] = {my_compression.ORIGINAL_SIZE_METADATA_KEY: str(original_size)}
+    return args
+
+def upload_fileobj_compressed(fileobj: BinaryIO, bucket_name: str, object_name: str, encoding: str,
+                              content_type: Optional[str] = None,
+                              transfer_config: Optional[TransferConfig] = None) -> Optional[dict]:
+    """
+    Compress a file-like object while uploading it to an S3 bucket.
+
+    The transfer manager reads compressed chunks from a
+    :class:`my_compression.CompressingReader`, so the compressed object is
+    never held in memory or on disk. The object is stored with
+    ``Content-Encoding`` set, and its uncompressed size in the
+    ``original-size`` metadata when the source is seekable.
+
+    :param fileobj: Readable binary file-like object
+    :param bucket_name: Name of the S3 bucket
+    :param object_name: Object name in S3
+    :param encoding: Content coding, ``gzip`` or ``zstd``
+    :param content_type: MIME type of the uncompressed content
+    :param transfer_config: Transfer tuning; built from settings and the source size if omitted
+    :return: Dict with ``original_size`` and ``bytes_transferred`` (compressed), None on failure
+    :raises my_resilience.S3ServiceError: If the bucket is missing, or S3 throttles or fails
+    """
+    size = _fileobj_size(fileobj)
+    reader = my_compression.CompressingReader(fileobj, encoding, settings.compression_level)
+    try:
+        # Compression and transfer interleave, so they are timed as one stage
+        with my_metrics.stage_timer('upload', bucket_name, 'compress_and_upload'):
+            client_for_bucket(bucket_name).upload_fileobj(
+                reader, bucket_name, object_name,
+                ExtraArgs=_encoded_object_args(encoding, content_type, size),
+                Config=transfer_config or build_transfer_config(size))
+    except NoCredentialsError:
+        logging.error("Credentials not available")
+        return None
+    except ClientError as e:
+        logging.error(e)
+        _raise_typed(e)
+        return None
+    my_metrics.count_bytes('upload', bucket_name, reader.bytes_out)
+    invalidate_cached_objects(bucket_name, [object_name])
+    return {'original_size': reader.bytes_in, 'bytes_transferred': reader.bytes_out}
+
+def _stored_digest(bucket_name: str, object_name: str) -> Optional[Tuple[str, int]]:
+    try:
+        with my_metrics.stage_timer('dedup', bucket_name, 'lookup'):
+            response = client_for_bucket(bucket_name).head_object(Bucket=bucket_name, Key=object_name)
+    except ClientError:
+        return None
+    return response.get('Metadata', {}).get(DIGEST_METADATA_KEY), response.get('ContentLength')
+
+def _copy_object(source_bucket: str, source_key: str, bucket_name: str, object_name: str) -> None:
+    with my_metrics.stage_timer('copy', bucket_name):
+        client_for_bucket(bucket_name).copy_object(
+            Bucket=bucket_name, Key=object_name,
+            CopySource={'Bucket': source_bucket, 'Key': source_key}, MetadataDirective='COPY')
+    invalidate_cached_objects(bucket_name, [object_name])
+
+def upload_fileobj_deduplicated(fileobj: BinaryIO, bucket_name: str, object_name: str, digest: str,
+                                size: int,
+                                transfer_config: Optional[TransferConfig] = None) -> Optional[dict]:
+    """
+    Upload a file-like object unless S3 already holds the same content.
+
+    The digest is checked against the target object's ``sha256`` metadata
+    first (nothing to do), then against the digest index (server-side
+    ``copy_object`` from the known object). Index hits are confirmed with a
+    HEAD request, so stale entries only cost a round trip. On a miss the
+    object is uploaded with its digest in the metadata and indexed.
+
+    :param fileobj: Readable binary file-like object, positioned at the start of the content
+    :param bucket_name: Name of the S3 bucket
+    :param object_name: Object name in S3
+    :param digest: Hex SHA-256 of the content, computed while it was received
+    :param size: Content size in bytes
+    :param transfer_config: Transfer tuning; built from settings and ``size`` if omitted
+    :return: Dict with ``deduplicated``, ``bytes_transferred`` and ``source``
+        (the object the content was copied from, if any); None on failure
+    :raises my_resilience.S3ServiceError: If the bucket is missing, or S3 throttles or fails
+    """
+    candidates = [(bucket_name, object_name)]
+    indexed = dedup_index.lookup(digest)
+    if indexed is not None and indexed != (bucket_name, object_name) and size <= MAX_PART_SIZE:
+        # copy_object is limited to 5 GiB; bigger objects are simply uploaded
+        candidates.append(indexed)
+    try:
+        for source_bucket, source_key in candidates:
+            stored = _stored_digest(source_bucket, source_key)
+            if stored is None or stored[0] != digest:
+                if (source_bucket, source_key) == indexed:
+                    dedup_index.forget(digest)
+                continue
+            source = None
+            if (source_bucket, source_key) != (bucket_name, object_name):
+                _copy_object(source_bucket, source_key, bucket_name, object_name)
+                source = f"{source_bucket}/{source_key}"
+            dedup_index.remember(digest, bucket_name, object_name)
+            dedup_index.record(True, size)
+            return {'deduplicated': True, 'bytes_transferred': 0, 'source': source}
+
+        with my_metrics.stage_timer('upload', bucket_name):
+            client_for_bucket(bucket_name).upload_fileobj(
+                fileobj, bucket_name, object_name,
+                ExtraArgs={'Metadata': {DIGEST_METADATA_KEY: digest}},
+                Config=transfer_config or build_transfer_config(size))
+    except NoCredentialsError:
+        logging.error("Credentials not available")
+        return None
+    except ClientError as e:
+        logging.error(e)
+        _raise_typed(e)
+        return None
+    my_metrics.count_bytes('upload', bucket_name, size)
+    invalidate_cached_objects(bucket_name, [object_name])
+    dedup_index.remember(digest, bucket_name, object_name)
+    dedup_index.record(False, size)
+    return {'deduplicated': False, 'bytes_transferred': size, 'source': None}
+
+class TooManyParts(ValueError):
+    """A streamed object would need more than ``MAX_PARTS`` parts."""
+
+class MultipartStreamUploader:
+    """
+    Feed a stream of chunks into an S3 object.
+
+    Chunks are buffered until a full part is available and then sent with
+    ``upload_part``, so memory is bounded by ``part_size`` whatever the total
+    payload. Payloads smaller than one part are sent with a single
+    ``put_object`` call instead of a multipart upload. The part size doubles
+    every ``PART_GROWTH_INTERVAL`` parts, so a body whose size was not
+    declared (or was understated) still fits into ``MAX_PARTS`` parts.
+
+    With ``encoding`` the chunks are compressed as they are written and the
+    object is stored with that ``Content-Encoding``; ``bytes_received``
+    counts the uncompressed bytes and ``bytes_sent`` what went to S3.
+    """
+
+    def __init__(self, bucket_name: str, object_name: str, part_size: Optional[int] = None,
+                 expected_size: Optional[int] = None, encoding: Optional[str] = None,
+                 content_type: Optional[str] = None):
+        self.bucket_name = bucket_name
+        self.object_name = object_name
+        self.part_size = adaptive_part_size(expected_size, part_size)
+        self.expected_size = expected_size
+        self.encoding = encoding
+        self.content_type = content_type
+        self.bytes_received = 0
+        self.bytes_sent = 0
+        self.failed = False
+        self._compressor = (my_compression.make_compressor(encoding, settings.compression_level)
+                            if encoding else None)
+        self._buffer = bytearray()
+        self._upload_id = None
+        self._parts = []
+
+    def write(self, data: bytes) -> bool:
+        """
+        Buffer a chunk and upload every complete part.
+
+        :param data: Next chunk of the object body
+        :return: False once the upload has failed, True otherwise
+        :raises TooManyParts: If the object outgrows ``MAX_PARTS`` parts; the upload is aborted
+        """
+        if self.failed:
+            return False
+        self.bytes_received += len(data)
+        self._buffer.extend(self._compressor.compress(data) if self._compressor else data)
+        try:
+            while len(self._buffer) >= self.part_size:
+                part = bytes(self._buffer[:self.part_size])
+                del self._buffer[:self.part_size]
+                self._upload_part(part)
+            return True
+        except TooManyParts:
+            self.abort()
+            raise
+        except (NoCredentialsError, ClientError) as e:
+            logging.error(e)
+            self.abort()
+            return False
+
+    def complete(self) -> bool:
+        """
+        Flush the remaining buffer and finalize the object.
+
+        :return: True if the object was written, False otherwise
+        :raises TooManyParts: If the last part would exceed ``MAX_PARTS``; the upload is aborted
+        """
+        if self.failed:
+            return False
+        if self._compressor:
+            self._buffer.extend(self._compressor.flush())
+        try:
+            client = client_for_bucket(self.bucket_name)
+            if self._upload_id is None:
+                with my_metrics.stage_timer('stream_upload', self.bucket_name):
+                    client.put_object(Bucket=self.bucket_name, Key=self.object_name,
+                                      Body=bytes(self._buffer), **self._object_args(self.bytes_received))
+                my_metrics.count_bytes('stream_upload', self.bucket_name, len(self._buffer))
+                self.bytes_sent += len(self._buffer)
+            else:
+                if self._buffer:
+                    self._upload_part(bytes(self._buffer))
+                with my_metrics.stage_timer('stream_upload', self.bucket_name, 'complete'):
+                    client.complete_multipart_upload(
+                        Bucket=self.bucket_name, Key=self.object_name, UploadId=self._upload_id,
+                        MultipartUpload={'Parts': self._parts})
+            self._buffer = bytearray()
+            invalidate_cached_objects(self.bucket_name, [self.object_name])
+            return True
+        except TooManyParts:
+            self.abort()
+            raise
+        except (NoCredentialsError, ClientError) as e:
+            logging.error(e)
+            self.abort()
+            return False
+
+    def abort(self) -> None:
+        """Discard buffered data and abort the multipart upload, if any."""
+        self.failed = True
+        self._buffer = bytearray()
+        if self._upload_id is None:
+            return
+        try:
+            client_for_bucket(self.bucket_name).abort_multipart_upload(
+                Bucket=self.bucket_name, Key=self.object_name, UploadId=self._upload_id)
+        except ClientError as e:
+            logging.error(e)
+        self._upload_id = None
+
+    def _object_args(self, original_size: Optional[int]) -> dict:
+        if not self.encoding:
+            return {}
+        return _encoded_object_args(self.encoding, self.content_type, original_size)
+
+    def _upload_part(self, body: bytes) -> None:
+        client = client_for_bucket(self.bucket_name)
+        if self._upload_id is None:
+            # The total is only known up front if the client declared it
+            with my_metrics.stage_timer('stream_upload', self.bucket_name, 'create'):
+                response = client.create_multipart_upload(Bucket=self.bucket_name, Key=self.object_name,
+                                                          **self._object_args(self.expected_size))
+            self._upload_id = response['UploadId']
+        part_number = len(self._parts) + 1
+        if part_number > MAX_PARTS:
+            raise TooManyParts(f"Object is too large for {MAX_PARTS} parts of up to {self.part_size} bytes")
+        with my_metrics.stage_timer('stream_upload', self.bucket_name, 'upload_part'):
+            response = client.upload_part(Bucket=self.bucket_name, Key=self.object_name,
+                                          UploadId=self._upload_id, PartNumber=part_number,
+                                          Body=body)
+        my_metrics.count_bytes('stream_upload', self.bucket_name, len(body))
+        self.bytes_sent += len(body)
+        self._parts.append({'PartNumber': part_number, 'ETag': response['ETag']})
+        if part_number % PART_GROWTH_INTERVAL == 0:
+            self.part_size = min(self.part_size * 2, MAX_PART_SIZE)
+
+def upload_stream_to_s3(chunks: Iterable[bytes], bucket_name: str, object_name: str,
+                        part_size: Optional[int] = None) -> bool:
+    """
+    Upload an iterable of byte chunks to an S3 bucket without spooling it.
+
+    :param chunks: Iterable yielding the object body in order
+    :param bucket_name: Name of the S3 bucket
+    :param object_name: Object name in S3
+    :param part_size: Multipart part size in bytes; defaults to ``settings.multipart_chunksize``
+    :return: True if upload was successful, False otherwise
+    :raises TooManyParts: If the object outgrows ``MAX_PARTS`` parts
+    """
+    uploader = MultipartStreamUploader(bucket_name, object_name, part_size)
+    for chunk in chunks:
+        if not uploader.write(chunk):
+            return False
+    return uploader.complete()
+
+def _batch_object_name(prefix: str, name: str) -> str:
+    while name.startswith(("/", "./")):
+        name = name[1:] if name.startswith("/") else name[2:]
+    return prefix + name
+
+def _upload_batch_item(bucket_name: str, item: Tuple[str, BinaryIO]) -> dict:
+    object_name, fileobj = item
+    size = _fileobj_size(fileobj)
+    try:
+        client = client_for_bucket(bucket_name)
+        with my_metrics.stage_timer('batch_upload', bucket_name):
+            if size is not None and size < settings.multipart_threshold:
+                # One PutObject round trip; the transfer manager would add a
+                # thread pool per file for no benefit
+                client.put_object(Bucket=bucket_name, Key=object_name, Body=fileobj)
+            else:
+                client.upload_fileobj(fileobj, bucket_name, object_name,
+                                      Config=build_transfer_config(size))
+    except NoCredentialsError:
+        logging.error("Credentials not available")
+        return {'object_name': object_name, 'uploaded': False, 'size': size,
+                'error': "Credentials not available"}
+    except (ClientError, my_resilience.CircuitOpen) as e:
+        logging.error(e)
+        return {'object_name': object_name, 'uploaded': False, 'size': size, 'error': str(e)}
+    my_metrics.count_bytes('batch_upload', bucket_name, size)
+    invalidate_cached_objects(bucket_name, [object_name])
+    return {'object_name': object_name, 'uploaded': True, 'size': size, 'error': None}
+
+def upload_files_to_s3(files: Iterable[Tuple[str, BinaryIO]], bucket_name: str,
+                       max_workers: Optional[int] = None) -> List[dict]:
+    """
+    Upload many file-like objects to an S3 bucket concurrently.
+
+    Small files go up with a single ``put_object`` each; files above the
+    multipart threshold use the transfer manager.
+
+    :param files: ``(object_name, fileobj)`` pairs, possibly lazy
+    :param bucket_name: Name of the S3 bucket
+    :param max_workers: Concurrent uploads; defaults to ``settings.bulk_max_workers``
+    :return: One ``{'object_name', 'uploaded', 'size', 'error'}`` dict per file, in input order
+    """
+    return list(bounded_map(functools.partial(_upload_batch_item, bucket_name), files, max_workers))
+
+def _spool_member(member: BinaryIO) -> BinaryIO:
+    spool = get_spool_manager().spool()
+    try:
+        shutil.copyfileobj(member, spool, DOWNLOAD_CHUNK_SIZE)
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool
+
+def iter_archive_members(archive: BinaryIO) -> Iterator[Tuple[str, BinaryIO]]:
+    """
+    Yield the regular files of a zip or (optionally compressed) tar archive.
+
+    Zip members are opened in place and decompressed as they are uploaded.
+    Tar archives are read as a stream, so each member is copied into a spool
+    (memory up to ``settings.spool_memory_limit``, then disk) before the next
+    one is reached; directories and links are skipped. Close each member
+    once it has been uploaded.
+
+    :param archive: Seekable binary file-like object holding the archive
+    :return: Iterator over ``(member_name, fileobj)`` pairs
+    :raises ValueError: If the archive is neither a readable zip nor tar file
+    :raises my_spool.SpoolQuotaExceeded: If a tar member does not fit in the spool quota
+    """
+    try:
+        if zipfile.is_zipfile(archive):
+            archive.seek(0)
+            with zipfile.ZipFile(archive) as zip_file:
+                for info in zip_file.infolist():
+                    if not info.is_dir():
+                        yield info.filename, zip_file.open(info)
+            return
+        archive.seek(0)
+        with tarfile.open(fileobj=archive, mode="r|*") as tar_file:
+            for member in tar_file:
+                if member.isfile():
+                    yield member.name, _spool_member(tar_file.extractfile(member))
+    except (tarfile.TarError, zipfile.BadZipFile, EOFError) as e:
+        raise ValueError(f"Unreadable archive: {e}") from e
+
+def _upload_archive_member(bucket_name: str, item: Tuple[str, BinaryIO]) -> dict:
+    with item[1]:
+        return _upload_batch_item(bucket_name, item)
+
+def upload_archive_to_s3(archive: BinaryIO, bucket_name: str, prefix: str = "",
+                         max_workers: Optional[int] = None) -> List[dict]:
+    """
+    Upload every file in a tar or zip archive to an S3 bucket concurrently.
+
+    :param archive: Seekable binary file-like object holding the archive
+    :param bucket_name: Name of the S3 bucket
+    :param prefix: Prepended to each member name to build its object name
+    :param max_workers: Concurrent uploads; defaults to ``settings.bulk_max_workers``
+    :return: One ``{'object_name', 'uploaded', 'size', 'error'}`` dict per member, in archive order
+    :raises ValueError: If the archive cannot be read
+    :raises my_spool.SpoolQuotaExceeded: If a tar member does not fit in the spool quota
+    """
+    members = ((_batch_object_name(prefix, name), fileobj)
+               for name, fileobj in iter_archive_members(archive))
+    return list(bounded_map(functools.partial(_upload_archive_member, bucket_name), members, max_workers))
+
+def download_file_from_s3(bucket_name: str, object_name: str, file_path: str,
+                          transfer_config: Optional[TransferConfig] = None,
+                          decompress: bool = False,
+                          callback: Optional[Callable[[int], None]] = None) -> bool:
     """
     Download a file from an S3 bucket.
+
+    With the disk cache enabled the file is copied out of the cache (with
+    ``sendfile``, so the bytes never pass through Python), fetching the
+    object into the cache first if needed.
     
     :param bucket_name: Name of the S3 bucket
     :param object_name: Object name in S3
     :param file_path: Path where the file will be saved
+    :param transfer_config: Transfer tuning; built from settings if omitted
+    :param decompress: Store gzip/zstd encoded objects decompressed; they are then
+        streamed sequentially instead of in parallel ranges
+    :param callback: Called with the number of bytes received, from the transfer threads;
+        not used when the file comes from the disk cache or is decompressed
     :return: True if download was successful, False otherwise
+    :raises my_resilience.S3ServiceError: If the object or bucket is missing, or S3 throttles or fails
     """
+    cache = get_disk_cache()
+    if cache is not None:
+        entry = open_cached_object(bucket_name, object_name)
+        if entry is not None:
+            try:
+                return _copy_cached_object(entry, file_path, decompress)
+            finally:
+                cache.release(entry)
+    if decompress:
+        metadata = head_file_in_s3(bucket_name, object_name)
+        if metadata is not None and my_compression.is_decodable(metadata['content_encoding']):
+            return _download_decompressed(bucket_name, object_name, file_path, metadata['content_encoding'])
     try:
-        s3_client.download_file(bucket_name, object_name, file_path)
+        # download_file streams straight into file_path, so this stage covers
+        # both the S3 transfer and the local file write
+        with my_metrics.stage_timer('download', bucket_name, 'download_to_file'):
+            client_for_bucket(bucket_name).download_file(
+                bucket_name, object_name, file_path, Config=transfer_config or build_transfer_config(),
+                Callback=callback)
+        my_metrics.count_bytes('download', bucket_name, _path_size(file_path))
         return True
     except NoCredentialsError:
         logging.error("Credentials not available")
         return False
     except ClientError as e:
+        logging.error(e)
+        _raise_typed(e)
+        return False
+
+def _write_decompressed(chunks: Iterable[bytes], file_path: str, encoding: str) -> None:
+    with my_spool.atomic_path(file_path) as tmp_path, open(tmp_path, 'wb') as f:
+        for chunk in my_compression.decompress_chunks(chunks, encoding):
+            f.write(chunk)
+
+def _download_decompressed(bucket_name: str, object_name: str, file_path: str, encoding: str) -> bool:
+    try:
+        response = get_object_stream(bucket_name, object_name)
+        with my_metrics.stage_timer('download', bucket_name, 'decompress_to_file'):
+            _write_decompressed(iter_object_body(response['Body']), file_path, encoding)
+        my_metrics.count_bytes('download', bucket_name, response.get('ContentLength'))
+        return True
+    except NoCredentialsError:
+        logging.error("Credentials not available")
+        return False
+    except (ClientError, ValueError) as e:
+        logging.error(e)
+        return False
+
+def _copy_cached_object(entry: dict, file_path: str, decompress: bool) -> bool:
+    try:
+        if decompress and my_compression.is_decodable(entry['content_encoding']):
+            with my_metrics.stage_timer('download', entry['bucket_name'], 'decompress_from_disk_cache'):
+                _write_decompressed(iter_cached_file(entry['path']), file_path, entry['content_encoding'])
+        else:
+            with my_metrics.stage_timer('download', entry['bucket_name'], 'copy_from_disk_cache'), \
+                    my_spool.atomic_path(file_path) as tmp_path:
+                shutil.copyfile(entry['path'], tmp_path)
+        return True
+    except (OSError, ValueError) as e:
         logging.error(e)
         return False
 
-def list_files_in_s3(bucket_name: str) -> List[str]:
+def get_object_stream(bucket_name: str, object_name: str, byte_range: Optional[str] = None,
+                      if_none_match: Optional[str] = None, if_match: Optional[str] = None) -> dict:
+    """
+    Open an S3 object for streaming without touching local disk.
+
+    Errors are not swallowed here because callers need the error code to
+    answer conditional and range requests (304, 404, 416).
+
+    :param bucket_name: Name of the S3 bucket
+    :param object_name: Object name in S3
+    :param byte_range: Optional HTTP Range header value, e.g. ``bytes=0-1023``
+    :param if_none_match: Optional ETag; S3 answers 304 if it still matches
+    :param if_match: Optional ETag; S3 answers 412 if the object no longer matches
+    :return: The ``get_object`` response; its ``Body`` must be consumed or closed
+    :raises ClientError: If S3 rejects the request
+    """
+    kwargs = {'Bucket': bucket_name, 'Key': object_name}
+    if byte_range:
+        kwargs['Range'] = byte_range
+    if if_none_match:
+        kwargs['IfNoneMatch'] = if_none_match
+    if if_match:
+        kwargs['IfMatch'] = if_match
+    with my_metrics.stage_timer('get_object', bucket_name):
+        return client_for_bucket(bucket_name).get_object(**kwargs)
+
+def head_file_in_s3(bucket_name: str, object_name: str) -> Optional[dict]:
+    """
+    Fetch an object's metadata, served from the metadata cache when fresh.
+
+    :param bucket_name: Name of the S3 bucket
+    :param object_name: Object name in S3
+    :return: Dict with ``size``, ``etag``, ``last_modified``, ``content_type`` and
+        ``content_encoding``; None if the object does not exist
+    :raises my_resilience.S3ServiceError: If access is denied, or S3 throttles or fails
+    """
+    key = (bucket_name, object_name)
+    if settings.cache_enabled:
+        cached = metadata_cache.get(key)
+        if cached is not None:
+            return cached
+    try:
+        with my_metrics.stage_timer('head_object', bucket_name):
+            response = client_for_bucket(bucket_name).head_object(Bucket=bucket_name, Key=object_name)
+    except ClientError as e:
+        code = my_resilience.error_code(e)
+        if code in ('404', 'NoSuchKey', 'NotFound'):
+            return None
+        logging.error(e)
+        _raise_s3_error(e, "Metadata lookup failed")
+    metadata = {
+        'size': response.get('ContentLength'),
+        'etag': response.get('ETag'),
+        'last_modified': response.get('LastModified'),
+        'content_type': response.get('ContentType'),
+        'content_encoding': response.get('ContentEncoding'),
+    }
+    if settings.cache_enabled:
+        metadata_cache.set(key, metadata)
+    return metadata
+
+def iter_object_body(body, chunk_size: int = DOWNLOAD_CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Yield an S3 streaming body in chunks and close it when done.
+
+    :param body: ``StreamingBody`` from a ``get_object`` response
+    :param chunk_size: Maximum size of each yielded chunk in bytes
+    :return: Iterator over the object bytes
+    """
+    try:
+        yield from body.iter_chunks(chunk_size)
+    finally:
+        body.close()
+
+def _read_range(bucket_name: str, object_name: str, etag: Optional[str], first: int, last: int) -> bytes:
+    # IfMatch keeps every range of one query on the same version of the object
+    response = get_object_stream(bucket_name, object_name, f"bytes={first}-{last}", if_match=etag)
+    return b"".join(iter_object_body(response['Body']))
+
+def _line_chunks(response: dict) -> Iterator[bytes]:
+    chunks = iter_object_body(response['Body'])
+    encoding = response.get('ContentEncoding')
+    if not encoding:
+        return chunks
+    if not my_compression.is_decodable(encoding):
+        chunks.close()
+        raise ValueError(f"Cannot read lines of a {encoding}-encoded object")
+    return my_compression.decompress_chunks(chunks, encoding)
+
+def query_object(bucket_name: str, object_name: str, mode: str = my_query.HEAD,
+                 start: Optional[int] = None, end: Optional[int] = None, count: int = 10,
+                 fmt: str = my_query.TEXT, select: Iterable[str] = (), where: Optional[str] = None,
+                 contains: Optional[str] = None, limit: Optional[int] = None) -> Tuple[dict, Iterator[bytes]]:
+    """
+    Read part of an object without downloading it.
+
+    ``bytes`` reads bytes ``start`` to ``end`` of the stored object with a
+    ranged request. The line modes (``head``, ``tail``, ``lines`` and
+    ``filter``) work on decompressed lines; see :mod:`my_query`. The first
+    output chunk is read here, so errors found at the start of the object
+    (an unknown CSV column, an over-long first line) raise rather than end
+    the stream.
+
+    :param bucket_name: Name of the S3 bucket
+    :param object_name: Object name in S3
+    :param mode: ``bytes``, ``head``, ``tail``, ``lines`` or ``filter``
+    :param start: First byte (``bytes``) or line, numbered from 1 (``lines``)
+    :param end: Last byte or line, both included; None reads to the end
+    :param count: Lines returned by ``head`` and ``tail``
+    :param fmt: ``text``, ``csv`` or ``jsonl`` for ``filter``
+    :param select: Columns or fields ``filter`` keeps
+    :param where: ``filter`` predicate such as ``status>=500``
+    :param contains: ``filter`` keeps only lines containing this text
+    :param limit: ``filter`` stops after this many matches
+    :return: ``({'content_type', 'etag', 'content_range', 'content_encoding'}, chunks)``
+    :raises ValueError: If the query is invalid, checked before S3 is called where possible
+    :raises my_query.LineTooLong: If a line or the tail is longer than the configured limits
+    :raises ClientError: If S3 rejects the request
+    """
+    if mode not in my_query.MODES:
+        raise ValueError(f"mode must be one of {', '.join(my_query.MODES)}")
+    if mode in (my_query.BYTES, my_query.LINES) and start is None:
+        raise ValueError(f"{mode} queries need a start")
+    if mode == my_query.LINES and start < 1:
+        raise ValueError("Lines are numbered from 1")
+    if start is not None and end is not None and end < start:
+        raise ValueError("end must not be before start")
+    rows = None
+    if mode == my_query.FILTER:
+        rows = my_query.compile_filter(fmt, list(select), where, contains, limit)
+    max_line = settings.query_max_line_bytes
+
+    if mode == my_query.BYTES:
+        response = get_object_stream(bucket_name, object_name, f"bytes={start}-{'' if end is None else end}")
+        chunks = iter_object_body(response['Body'])
+    elif mode == my_query.TAIL:
+        with my_metrics.stage_timer('head_object', bucket_name):
+            response = client_for_bucket(bucket_name).head_object(Bucket=bucket_name, Key=object_name)
+        if response.get('ContentEncoding'):
+            # Compressed objects cannot be read backwards
+            lines = my_query.stream_tail(_line_chunks(get_object_stream(bucket_name, object_name)), count,
+                                         max_line)
+        else:
+            read_range = functools.partial(_read_range, bucket_name, object_name, response.get('ETag'))
+            lines = my_query.tail(read_range, response['ContentLength'], count,
+                                  settings.query_max_tail_bytes, DOWNLOAD_CHUNK_SIZE)
+        chunks = iter(lines)
+    else:
+        response = get_object_stream(bucket_name, object_name)
+        chunks = _line_chunks(response)
+        if mode == my_query.FILTER:
+            chunks = rows(my_query.iter_lines(chunks, max_line))
+        else:
+            chunks = my_query.line_range(chunks, start if mode == my_query.LINES else 1,
+                                         end if mode == my_query.LINES else count, max_line)
+    try:
+        first = next(chunks, None)
+    except BaseException:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+        raise
+    info = {
+        'content_type': response.get('ContentType', 'application/octet-stream'),
+        'etag': response.get('ETag'),
+        'content_range': response.get('ContentRange'),
+        'content_encoding': response.get('ContentEncoding') if mode == my_query.BYTES else None,
+    }
+    return info, chunks if first is None else itertools.chain([first], chunks)
+
+def iter_cached_file(path: str, chunk_size: int = DOWNLOAD_CHUNK_SIZE) -> Iterator[bytes]:
+    """Yield a disk cache file in chunks."""
+    with open(path, 'rb') as f:
+        yield from iter(lambda: f.read(chunk_size), b'')
+
+def _revalidate(entry: dict) -> bool:
+    """Ask S3 whether a cached entry still matches the object; True if it does."""
+    bucket_name = entry['bucket_name']
+    try:
+        with my_metrics.stage_timer('disk_cache', bucket_name, 'revalidate'):
+            client_for_bucket(bucket_name).head_object(Bucket=bucket_name, Key=entry['object_name'],
+                                                       IfNoneMatch=entry['etag'])
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in ('304', 'NotModified'):
+            get_disk_cache().mark_validated(entry)
+            return True
+        raise
+    return False
+
+def _fill_disk_cache(bucket_name: str, object_name: str) -> Optional[dict]:
+    cache = get_disk_cache()
+    metadata = head_file_in_s3(bucket_name, object_name)
+    if metadata is None or metadata['size'] > cache.max_object_bytes:
+        return None
+    info = {**metadata, 'metadata': {}}
+
+    def fill(f: BinaryIO) -> None:
+        # Pinned to the ETag we index the file under, so a concurrent
+        # overwrite fails the fill instead of caching mismatched bytes
+        response = get_object_stream(bucket_name, object_name, if_match=metadata['etag'])
+        info['metadata'] = response.get('Metadata', {})
+        with my_metrics.stage_timer('disk_cache', bucket_name, 'fill'):
+            for chunk in iter_object_body(response['Body']):
+                f.write(chunk)
+        my_metrics.count_bytes('disk_cache_fill', bucket_name, response.get('ContentLength'))
+
+    return cache.put(bucket_name, object_name, info, fill)
+
+def open_cached_object(bucket_name: str, object_name: str) -> Optional[dict]:
+    """
+    Return a disk cache entry for an object, fetching it into the cache on a miss.
+
+    Entries older than ``settings.disk_cache_revalidate_seconds`` are
+    revalidated with a conditional ``head_object`` (``If-None-Match``), which
+    costs a round trip but no body transfer. The entry is pinned: pass it to
+    the cache's ``release`` once its file has been read.
+
+    :param bucket_name: Name of the S3 bucket
+    :param object_name: Object name in S3
+    :return: The entry (see :class:`my_disk_cache.DiskCache`); None if the cache is
+        disabled, the object is too big to cache or cannot be read
+    """
+    cache = get_disk_cache()
+    if cache is None:
+        return None
+    entry = cache.acquire(bucket_name, object_name)
+    try:
+        if entry is not None:
+            if cache.is_fresh(entry, settings.disk_cache_revalidate_seconds) or _revalidate(entry):
+                return entry
+            cache.release(entry)
+            entry = None
+            invalidate_cached_objects(bucket_name, [object_name])
+        return _fill_disk_cache(bucket_name, object_name)
+    except NoCredentialsError:
+        logging.error("Credentials not available")
+    except ClientError as e:
+        logging.error(e)
+        if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', '412', 'PreconditionFailed'):
+            # Deleted or overwritten since we looked
+            invalidate_cached_objects(bucket_name, [object_name])
+    except OSError as e:
+        logging.error(e)
+    if entry is not None:
+        cache.release(entry)
+    return None
+
+def _list_objects_page(bucket_name: str, prefix: str = "", delimiter: Optional[str] = None,
+                       max_keys: Optional[int] = None,
+                       continuation_token: Optional[str] = None, use_cache: bool = True) -> dict:
+    use_cache = use_cache and settings.cache_enabled
+    cache_key = (bucket_name, prefix or "", delimiter, max_keys, continuation_token)
+    if use_cache:
+        cached = listing_cache.get(cache_key)
+        if cached is not None:
+            return cached
+    kwargs = {'Bucket': bucket_name}
+    if prefix:
+        kwargs['Prefix'] = prefix
+    if delimiter:
+        kwargs['Delimiter'] = delimiter
+    if max_keys:
+        kwargs['MaxKeys'] = max_keys
+    if continuation_token:
+        kwargs['ContinuationToken'] = continuation_token
+    with my_metrics.stage_timer('list_objects', bucket_name):
+        response = client_for_bucket(bucket_name).list_objects_v2(**kwargs)
+    if use_cache:
+        listing_cache.set(cache_key, response)
+    return response
+
+def iter_list_pages(bucket_name: str, prefix: str = "", delimiter: Optional[str] = None,
+                    page_size: Optional[int] = None,
+                    continuation_token: Optional[str] = None,
+                    use_cache: bool = True) -> Iterator[dict]:
+    """
+    Walk every ``list_objects_v2`` page of a bucket lazily.
+
+    Only one page is held in memory at a time, so callers can stream
+    arbitrarily large listings; pass ``use_cache=False`` for such walks so
+    they do not flush the listing cache.
+
+    :param bucket_name: Name of the S3 bucket
+    :param prefix: Only list keys starting with this prefix
+    :param delimiter: Group keys sharing a prefix up to this delimiter
+    :param page_size: Keys per page (S3 caps this at 1000)
+    :param continuation_token: Token to resume a previous listing from
+    :param use_cache: Serve and store pages through the listing cache
+    :return: Iterator over raw ``list_objects_v2`` responses
+    :raises ClientError: If a page cannot be fetched
+    """
+    while True:
+        response = _list_objects_page(bucket_name, prefix, delimiter, page_size, continuation_token,
+                                      use_cache)
+        yield response
+        if not response.get('IsTruncated'):
+            return
+        continuation_token = response.get('NextContinuationToken')
+
+def listing_entries(response: dict, detail: bool = False) -> list:
+    """
+    Turn the ``Contents`` of one ``list_objects_v2`` page into listing entries.
+
+    Entries are plain values built in a single comprehension, ready for
+    ``my_json.dumps``; no model is instantiated per key.
+
+    :param response: Raw ``list_objects_v2`` page
+    :param detail: Describe each object rather than just naming it
+    :return: Keys, or ``{'key', 'size', 'etag', 'last_modified', 'storage_class'}``
+        dicts with ``detail``
+    """
+    contents = response.get('Contents', [])
+    if not detail:
+        return [obj['Key'] for obj in contents]
+    return [{'key': obj['Key'], 'size': obj.get('Size', 0), 'etag': obj.get('ETag'),
+             'last_modified': obj.get('LastModified'), 'storage_class': obj.get('StorageClass')}
+            for obj in contents]
+
+def iter_files_in_s3(bucket_name: str, prefix: str = "", use_cache: bool = True) -> Iterator[str]:
+    """
+    Yield every key in an S3 bucket, following pagination.
+
+    :param bucket_name: Name of the S3 bucket
+    :param prefix: Only list keys starting with this prefix
+    :param use_cache: Serve and store pages through the listing cache
+    :return: Iterator over file names
+    :raises ClientError: If a page cannot be fetched
+    """
+    for page in iter_list_pages(bucket_name, prefix, use_cache=use_cache):
+        for obj in page.get('Contents', []):
+            yield obj['Key']
+
+def list_files_page(bucket_name: str, prefix: str = "", delimiter: Optional[str] = None,
+                    max_keys: Optional[int] = None,
+                    continuation_token: Optional[str] = None, detail: bool = False) -> dict:
+    """
+    List a single page of files in an S3 bucket.
+
+    :param bucket_name: Name of the S3 bucket
+    :param prefix: Only list keys starting with this prefix
+    :param delimiter: Group keys sharing a prefix up to this delimiter
+    :param max_keys: Maximum number of keys to return (S3 caps this at 1000)
+    :param continuation_token: Token returned by the previous page
+    :param detail: Return ``objects`` (see :func:`listing_entries`) instead of ``files``
+    :return: Dict with ``files`` or ``objects``, ``common_prefixes``,
+        ``is_truncated`` and ``next_continuation_token``; an empty page on error
+    :raises my_resilience.S3ServiceError: If the object or bucket is missing, or S3 throttles or fails
+    """
+    try:
+        response = _list_objects_page(bucket_name, prefix, delimiter, max_keys, continuation_token)
+    except ClientError as e:
+        logging.error(e)
+        _raise_typed(e)
+        response = {}
+    return {
+        'objects' if detail else 'files': listing_entries(response, detail),
+        'common_prefixes': [p['Prefix'] for p in response.get('CommonPrefixes', [])],
+        'is_truncated': response.get('IsTruncated', False),
+        'next_continuation_token': response.get('NextContinuationToken'),
+    }
+
+def list_files_in_s3(bucket_name: str, prefix: str = "", detail: bool = False) -> list:
     """
     List all files in an S3 bucket.
     
     :param bucket_name: Name of the S3 bucket
-    :return: List of file names
+    :param prefix: Only list keys starting with this prefix
+    :param detail: Describe each object (see :func:`listing_entries`)
+    :return: List of file names, or of object descriptions with ``detail``
+    :raises my_resilience.S3ServiceError: If the object or bucket is missing, or S3 throttles or fails
     """
+    entries = []
     try:
-        response = s3_client.list_objects_v2(Bucket=bucket_name)
-        return [obj['Key'] for obj in response.get('Contents', [])]
+        for page in iter_list_pages(bucket_name, prefix):
+            entries.extend(listing_entries(page, detail))
     except ClientError as e:
         logging.error(e)
+        _raise_typed(e)
         return []
+    return entries
+
+def check_content_type(content_type: Optional[str]) -> None:
+    """
+    Enforce ``settings.presign_content_types`` on a requested content type.
+
+    :param content_type: MIME type the client intends to upload, or None
+    :raises ValueError: If an allowlist is configured and the type is not on it
+    """
+    allowed = settings.presign_content_types
+    if not allowed:
+        return
+    if not content_type or not any(fnmatch.fnmatchcase(content_type, pattern) for pattern in allowed):
+        raise ValueError(f"Content type {content_type!r} is not allowed")
+
+def _presign(bucket_name: str, client_method: str, params: dict, expires_in: int) -> Optional[dict]:
+    cache_key = (client_method, bucket_name, tuple(sorted(params.items())), expires_in)
+    reuse_for = min(settings.presign_reuse_seconds, expires_in / 2)
+    if reuse_for > 0:
+        cached = presign_cache.get(cache_key)
+        if cached is not None:
+            return cached
+    signed_at = datetime.now(timezone.utc)
+    try:
+        with my_metrics.stage_timer(client_method, bucket_name, 'presign'):
+            url = client_for_bucket(bucket_name).generate_presigned_url(
+                client_method, Params={'Bucket': bucket_name, **params}, ExpiresIn=expires_in)
+    except NoCredentialsError:
+        logging.error("Credentials not available")
+        return None
+    presigned = {'url': url, 'expires_at': signed_at + timedelta(seconds=expires_in)}
+    if reuse_for > 0:
+        presign_cache.set(cache_key, presigned, ttl=reuse_for)
+    return presigned
+
+def presign_upload_url(bucket_name: str, object_name: str, expires_in: Optional[int] = None,
+                       content_type: Optional[str] = None) -> Optional[dict]:
+    """
+    Sign a PUT URL so a client can upload an object straight to S3.
+
+    When ``content_type`` is given it is part of the signature, so the client
+    must send exactly that ``Content-Type`` header. Identical requests within
+    ``settings.presign_reuse_seconds`` get the same cached URL; ``expires_at``
+    always reports when the returned URL really expires.
+
+    :param bucket_name: Name of the S3 bucket
+    :param object_name: Object name in S3
+    :param expires_in: URL lifetime in seconds; defaults to ``settings.presign_expires_seconds``
+    :param content_type: MIME type the upload must declare
+    :return: Dict with ``url``, ``method``, ``headers`` and ``expires_at``; None without credentials
+    :raises ValueError: If ``content_type`` is not allowed
+    """
+    check_content_type(content_type)
+    params = {'Key': object_name}
+    headers = {}
+    if content_type:
+        params['ContentType'] = content_type
+        headers['Content-Type'] = content_type
+    presigned = _presign(bucket_name, 'put_object', params,
+                         expires_in or settings.presign_expires_seconds)
+    if presigned is None:
+        return None
+    return {**presigned, 'method': 'PUT', 'headers': headers}
+
+def presign_download_url(bucket_name: str, object_name: str, expires_in: Optional[int] = None,
+                         response_content_type: Optional[str] = None) -> Optional[dict]:
+    """
+    Sign a GET URL so a client can download an object straight from S3.
+
+    :param bucket_name: Name of the S3 bucket
+    :param object_name: Object name in S3
+    :param expires_in: URL lifetime in seconds; defaults to ``settings.presign_expires_seconds``
+    :param response_content_type: Content-Type S3 should answer with
+    :return: Dict with ``url``, ``method``, ``headers`` and ``expires_at``; None without credentials
+    """
+    params = {'Key': object_name}
+    if response_content_type:
+        params['ResponseContentType'] = response_content_type
+    presigned = _presign(bucket_name, 'get_object', params,
+                         expires_in or settings.presign_expires_seconds)
+    if presigned is None:
+        return None
+    return {**presigned, 'method': 'GET', 'headers': {}}
+
+def presign_multipart_upload(bucket_name: str, object_name: str, part_count: int,
+                             expires_in: Optional[int] = None,
+                             content_type: Optional[str] = None) -> Optional[dict]:
+    """
+    Start a multipart upload and sign one ``upload_part`` URL per part.
+
+    The client PUTs each part to its URL, collects the returned ETags and
+    finishes with ``complete_multipart_upload_in_s3``.
+
+    :param bucket_name: Name of the S3 bucket
+    :param object_name: Object name in S3
+    :param part_count: Number of parts to sign URLs for (1 to 10000)
+    :param expires_in: URL lifetime in seconds; defaults to ``settings.presign_expires_seconds``
+    :param content_type: MIME type stored on the finished object
+    :return: Dict with ``upload_id``, ``expires_at`` and ``parts``; None on error
+    :raises ValueError: If ``content_type`` is not allowed
+    """
+    check_content_type(content_type)
+    expires_in = expires_in or settings.presign_expires_seconds
+    kwargs = {'Bucket': bucket_name, 'Key': object_name}
+    if content_type:
+        kwargs['ContentType'] = content_type
+    client = client_for_bucket(bucket_name)
+    try:
+        with my_metrics.stage_timer('presign_multipart', bucket_name, 'create'):
+            upload_id = client.create_multipart_upload(**kwargs)['UploadId']
+    except NoCredentialsError:
+        logging.error("Credentials not available")
+        return None
+    except ClientError as e:
+        logging.error(e)
+        return None
+    signed_at = datetime.now(timezone.utc)
+    with my_metrics.stage_timer('presign_multipart', bucket_name, 'presign'):
+        parts = [
+            {'part_number': part_number,
+             'url': client.generate_presigned_url(
+                 'upload_part',
+                 Params={'Bucket': bucket_name, 'Key': object_name, 'UploadId': upload_id,
+                         'PartNumber': part_number},
+                 ExpiresIn=expires_in)}
+            for part_number in range(1, part_count + 1)
+        ]
+    return {'upload_id': upload_id, 'expires_at': signed_at + timedelta(seconds=expires_in),
+            'parts': parts}
+
+def complete_multipart_upload_in_s3(bucket_name: str, object_name: str, upload_id: str,
+                                    parts: List[dict]) -> bool:
+    """
+    Finish a multipart upload whose parts were sent by the client.
+
+    :param bucket_name: Name of the S3 bucket
+    :param object_name: Object name in S3
+    :param upload_id: Id returned by ``presign_multipart_upload``
+    :param parts: ``{'part_number', 'etag'}`` dicts, one per uploaded part
+    :return: True if the object was assembled, False otherwise
+    """
+    multipart = {'Parts': [{'PartNumber': part['part_number'], 'ETag': part['etag']}
+                           for part in sorted(parts, key=lambda part: part['part_number'])]}
+    try:
+        with my_metrics.stage_timer('multipart_upload', bucket_name, 'complete'):
+            client_for_bucket(bucket_name).complete_multipart_upload(
+                Bucket=bucket_name, Key=object_name, UploadId=upload_id, MultipartUpload=multipart)
+    except ClientError as e:
+        logging.error(e)
+        return False
+    invalidate_cached_objects(bucket_name, [object_name])
+    return True
+
+def abort_multipart_upload_in_s3(bucket_name: str, object_name: str, upload_id: str) -> bool:
+    """
+    Abort a multipart upload and free the parts stored so far.
+
+    :param bucket_name: Name of the S3 bucket
+    :param object_name: Object name in S3
+    :param upload_id: Id returned by ``presign_multipart_upload``
+    :return: True if the upload was aborted, False otherwise
+    """
+    try:
+        with my_metrics.stage_timer('multipart_upload', bucket_name, 'abort'):
+            client_for_bucket(bucket_name).abort_multipart_upload(
+                Bucket=bucket_name, Key=object_name, UploadId=upload_id)
+        return True
+    except ClientError as e:
+        logging.error(e)
+        return False
+
+def start_resumable_upload(bucket_name: str, object_name: str,
+                           content_type: Optional[str] = None) -> Optional[dict]:
+    """
+    Open a resumable upload session backed by an S3 multipart upload.
+
+    :param bucket_name: Name of the S3 bucket
+    :param object_name: Object name in S3
+    :param content_type: MIME type stored on the finished object
+    :return: The new session; None if S3 refused to start the upload
+    """
+    kwargs = {'Bucket': bucket_name, 'Key': object_name}
+    if content_type:
+        kwargs['ContentType'] = content_type
+    try:
+        with my_metrics.stage_timer('resumable_upload', bucket_name, 'create'):
+            upload_id = client_for_bucket(bucket_name).create_multipart_upload(**kwargs)['UploadId']
+    except NoCredentialsError:
+        logging.error("Credentials not available")
+        return None
+    except ClientError as e:
+        logging.error(e)
+        return None
+    now = time.time()
+    session = {'session_id': uuid.uuid4().hex, 'bucket_name': bucket_name, 'object_name': object_name,
+               'upload_id': upload_id, 'content_type': content_type, 'created_at': now,
+               'updated_at': now, 'parts': {}}
+    get_upload_sessions().create(session)
+    return session
+
+def get_upload_session(session_id: str) -> Optional[dict]:
+    """
+    Look up a resumable upload session and the parts received so far.
+
+    :param session_id: Id returned by ``start_resumable_upload``
+    :return: The session, or None if it is unknown, completed or aborted
+    """
+    return get_upload_sessions().get(session_id)
+
+def upload_session_part(session_id: str, part_number: int, body: BinaryIO) -> Optional[dict]:
+    """
+    Upload one numbered part of a resumable upload.
+
+    Parts may arrive in any order and in parallel; sending a part number
+    again replaces the earlier part.
+
+    :param session_id: Id returned by ``start_resumable_upload``
+    :param part_number: Part number, 1 to 10000
+    :param body: Readable, seekable part body
+    :return: ``{'part_number', 'etag', 'size'}``; None if S3 rejected the part
+    :raises KeyError: If the session does not exist
+    """
+    session = get_upload_sessions().get(session_id)
+    if session is None:
+        raise KeyError(session_id)
+    bucket_name = session['bucket_name']
+    size = _fileobj_size(body)
+    try:
+        with my_metrics.stage_timer('resumable_upload', bucket_name, 'upload_part'):
+            response = client_for_bucket(bucket_name).upload_part(
+                Bucket=bucket_name, Key=session['object_name'], UploadId=session['upload_id'],
+                PartNumber=part_number, Body=body)
+    except NoCredentialsError:
+        logging.error("Credentials not available")
+        return None
+    except ClientError as e:
+        logging.error(e)
+        return None
+    my_metrics.count_bytes('resumable_upload', bucket_name, size)
+    if not get_upload_sessions().add_part(session_id, part_number, response['ETag'], size or 0, time.time()):
+        raise KeyError(session_id)
+    return {'part_number': part_number, 'etag': response['ETag'], 'size': size or 0}
+
+def complete_resumable_upload(session_id: str) -> bool:
+    """
+    Assemble the received parts into the object and close the session.
+
+    :param session_id: Id returned by ``start_resumable_upload``
+    :return: True if the object was written, False if S3 refused
+    :raises KeyError: If the session does not exist
+    :raises ValueError: If no parts were received or part numbers have gaps
+    """
+    session = get_upload_sessions().get(session_id)
+    if session is None:
+        raise KeyError(session_id)
+    part_numbers = sorted(session['parts'])
+    if not part_numbers:
+        raise ValueError("No parts have been uploaded")
+    missing = sorted(set(range(1, part_numbers[-1] + 1)) - set(part_numbers))
+    if missing:
+        raise ValueError(f"Missing parts: {missing[:20]}")
+    if not complete_multipart_upload_in_s3(
+            session['bucket_name'], session['object_name'], session['upload_id'],
+            [{'part_number': number, 'etag': session['parts'][number]['etag']} for number in part_numbers]):
+        return False
+    get_upload_sessions().delete(session_id)
+    return True
+
+def abort_resumable_upload(session_id: str) -> bool:
+    """
+    Abort a resumable upload, free its stored parts and close the session.
+
+    :param session_id: Id returned by ``start_resumable_upload``
+    :return: True if the upload is gone, False if S3 refused to abort it
+    :raises KeyError: If the session does not exist
+    """
+    session = get_upload_sessions().get(session_id)
+    if session is None:
+        raise KeyError(session_id)
+    try:
+        with my_metrics.stage_timer('resumable_upload', session['bucket_name'], 'abort'):
+            client_for_bucket(session['bucket_name']).abort_multipart_upload(
+                Bucket=session['bucket_name'], Key=session['object_name'], UploadId=session['upload_id'])
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') != 'NoSuchUpload':
+            logging.error(e)
+            return False
+    get_upload_sessions().delete(session_id)
+    return True
+
+def _abort_untracked_uploads(bucket_name: str, initiated_before: datetime,
+                             tracked_upload_ids: set) -> int:
+    aborted = 0
+    client = client_for_bucket(bucket_name)
+    for page in client.get_paginator('list_multipart_uploads').paginate(Bucket=bucket_name):
+        for upload in page.get('Uploads', []):
+            if upload['UploadId'] in tracked_upload_ids or upload['Initiated'] >= initiated_before:
+                continue
+            try:
+                client.abort_multipart_upload(Bucket=bucket_name, Key=upload['Key'],
+                                              UploadId=upload['UploadId'])
+                aborted += 1
+            except ClientError as e:
+                logging.error(e)
+    return aborted
+
+def sweep_abandoned_uploads(max_idle_seconds: Optional[float] = None) -> int:
+    """
+    Abort multipart uploads nobody is going to finish.
+
+    Sessions idle for longer than ``max_idle_seconds`` are aborted and
+    closed. In ``settings.upload_sweep_buckets`` multipart uploads that no
+    session tracks and that were started before the cutoff are aborted too,
+    which catches uploads orphaned by a restart or by presigned clients.
+
+    :param max_idle_seconds: Idle time after which an upload is abandoned;
+        defaults to ``settings.upload_session_ttl_seconds``
+    :return: Number of multipart uploads aborted
+    """
+    if max_idle_seconds is None:
+        max_idle_seconds = settings.upload_session_ttl_seconds
+    cutoff = time.time() - max_idle_seconds
+    aborted = 0
+    for session in get_upload_sessions().list_sessions(updated_before=cutoff):
+        try:
+            if abort_resumable_upload(session['session_id']):
+                aborted += 1
+        except KeyError:
+            pass  # completed or aborted concurrently
+    if settings.upload_sweep_buckets:
+        tracked = {session['upload_id'] for session in get_upload_sessions().list_sessions()}
+        initiated_before = datetime.fromtimestamp(cutoff, timezone.utc)
+        for bucket_name in settings.upload_sweep_buckets:
+            try:
+                aborted += _abort_untracked_uploads(bucket_name, initiated_before, tracked)
+            except ClientError as e:
+                logging.error(e)
+    return aborted
 
 def delete_file_from_s3(bucket_name: str, object_name: str) -> bool:
     """
@@ -65,10 +1758,585 @@ def delete_file_from_s3(bucket_name: str, object_name: str) -> bool:
     :param bucket_name: Name of the S3 bucket
     :param object_name: Object name in S3
     :return: True if deletion was successful, False otherwise
+    :raises my_resilience.S3ServiceError: If the object or bucket is missing, or S3 throttles or fails
+    """
+    try:
+        with my_metrics.stage_timer('delete', bucket_name):
+            client_for_bucket(bucket_name).delete_object(Bucket=bucket_name, Key=object_name)
+        invalidate_cached_objects(bucket_name, [object_name])
+        return True
+    except ClientError as e:
+        logging.error(e)
+        _raise_typed(e)
+        return False
+
+def _delete_batch(bucket_name: str, object_names: List[str]) -> List[dict]:
+    try:
+        with my_metrics.stage_timer('bulk_delete', bucket_name):
+            response = client_for_bucket(bucket_name).delete_objects(
+                Bucket=bucket_name,
+                Delete={'Objects': [{'Key': name} for name in object_names], 'Quiet': True})
+    except (ClientError, my_resilience.CircuitOpen) as e:
+        logging.error(e)
+        return [{'key': name, 'deleted': False, 'error': str(e)} for name in object_names]
+    invalidate_cached_objects(bucket_name, object_names)
+    errors = {err['Key']: err.get('Message') or err.get('Code') for err in response.get('Errors', [])}
+    return [{'key': name, 'deleted': name not in errors, 'error': errors.get(name)}
+            for name in object_names]
+
+
+def _iter_delete_batches(bucket_name: str, object_names: Iterable[str],
+                         max_workers: Optional[int]) -> Iterator[List[dict]]:
+    try:
+        yield from bounded_map(functools.partial(_delete_batch, bucket_name),
+                               _batched(object_names, DELETE_BATCH_SIZE), max_workers)
+    except ClientError as e:
+        # Only listing the keys of a prefix can fail here; _delete_batch reports its own errors
+        logging.error(e)
+        _raise_s3_error(e, "Listing the keys to delete failed")
+
+
+def delete_files_in_s3(bucket_name: str, object_names: Iterable[str], max_workers: Optional[int] = None,
+                       callback: Optional[Callable[[List[dict]], None]] = None) -> List[dict]:
+    """
+    Delete many files from an S3 bucket with batched DeleteObjects calls.
+
+    Keys are grouped into batches of 1000 and the batches are sent
+    concurrently on a bounded pool.
+
+    :param bucket_name: Name of the S3 bucket
+    :param object_names: Object names to delete
+    :param max_workers: Concurrent DeleteObjects requests
+    :param callback: Called with the results of each batch as it completes
+    :return: One ``{'key', 'deleted', 'error'}`` dict per key, in input order
+    """
+    results = []
+    for batch_results in _iter_delete_batches(bucket_name, object_names, max_workers):
+        results.extend(batch_results)
+        if callback is not None:
+            callback(batch_results)
+    return results
+
+def delete_prefix_in_s3(bucket_name: str, prefix: str, max_workers: Optional[int] = None,
+                        callback: Optional[Callable[[List[dict]], None]] = None) -> dict:
+    """
+    Delete every object under a prefix, listing and deleting page by page.
+
+    Only failed keys are kept, at most ``FAILURE_LIMIT`` of them; the
+    rest are counted, so memory does not grow with the number of keys.
+
+    :param bucket_name: Name of the S3 bucket
+    :param prefix: Delete every object under this prefix
+    :param max_workers: Concurrent DeleteObjects requests
+    :param callback: Called with the results of each batch as it completes
+    :return: Dict with ``deleted_count``, ``failed_count`` and ``failures``, a list of
+        ``{'key', 'deleted', 'error'}`` dicts
+    :raises my_resilience.S3ServiceError: If the keys cannot be listed, e.g. the bucket is missing
+    """
+    summary = {'deleted_count': 0, 'failed_count': 0, 'failures': []}
+    object_names = iter_files_in_s3(bucket_name, prefix, use_cache=False)
+    for batch_results in _iter_delete_batches(bucket_name, object_names, max_workers):
+        for result in batch_results:
+            if result['deleted']:
+                summary['deleted_count'] += 1
+                continue
+            summary['failed_count'] += 1
+            if len(summary['failures']) < FAILURE_LIMIT:
+                summary['failures'].append(result)
+        if callback is not None:
+            callback(batch_results)
+    return summary
+
+def _copy_large_object(source_bucket: str, source_key: str, bucket_name: str, object_name: str,
+                       size: int, head: dict, max_workers: Optional[int] = None,
+                       callback: Optional[Callable[[int], None]] = None) -> None:
+    client = client_for_bucket(bucket_name)
+    # UploadPartCopy does not carry metadata over, so copy it explicitly
+    kwargs = {'Bucket': bucket_name, 'Key': object_name, 'Metadata': head.get('Metadata', {})}
+    for field in ('ContentType', 'ContentEncoding', 'ContentDisposition', 'CacheControl'):
+        if head.get(field):
+            kwargs[field] = head[field]
+    with my_metrics.stage_timer('copy', bucket_name, 'create'):
+        upload_id = client.create_multipart_upload(**kwargs)['UploadId']
+    part_size = adaptive_part_size(size, settings.copy_part_size)
+    copy_source = {'Bucket': source_bucket, 'Key': source_key}
+
+    def copy_part(part_number: int) -> dict:
+        start = (part_number - 1) * part_size
+        end = min(start + part_size, size) - 1
+        with my_metrics.stage_timer('copy', bucket_name, 'upload_part_copy'):
+            response = client.upload_part_copy(
+                Bucket=bucket_name, Key=object_name, UploadId=upload_id, PartNumber=part_number,
+                CopySource=copy_source, CopySourceRange=f'bytes={start}-{end}',
+                CopySourceIfMatch=head['ETag'])
+        if callback is not None:
+            callback(end - start + 1)
+        return {'PartNumber': part_number, 'ETag': response['CopyPartResult']['ETag']}
+
+    try:
+        part_count = -(-size // part_size)
+        parts = list(bounded_map(copy_part, range(1, part_count + 1),
+                                 max_workers or settings.max_concurrency))
+        with my_metrics.stage_timer('copy', bucket_name, 'complete'):
+            client.complete_multipart_upload(Bucket=bucket_name, Key=object_name, UploadId=upload_id,
+                                             MultipartUpload={'Parts': parts})
+    except BaseException:
+        try:
+            client.abort_multipart_upload(Bucket=bucket_name, Key=object_name, UploadId=upload_id)
+        except ClientError as e:
+            logging.error(e)
+        raise
+    invalidate_cached_objects(bucket_name, [object_name])
+
+def _copy_any_size(source_bucket: str, source_key: str, bucket_name: str, object_name: str,
+                   max_workers: Optional[int] = None,
+                   callback: Optional[Callable[[int], None]] = None) -> None:
+    with my_metrics.stage_timer('copy', source_bucket, 'head'):
+        head = client_for_bucket(source_bucket).head_object(Bucket=source_bucket, Key=source_key)
+    size = head['ContentLength']
+    if size > min(settings.copy_multipart_threshold, MAX_PART_SIZE):
+        _copy_large_object(source_bucket, source_key, bucket_name, object_name, size, head, max_workers,
+                           callback)
+    else:
+        _copy_object(source_bucket, source_key, bucket_name, object_name)
+        if callback is not None:
+            callback(size)
+
+def copy_file_in_s3(source_bucket: str, source_key: str, bucket_name: str, object_name: str,
+                    max_workers: Optional[int] = None,
+                    callback: Optional[Callable[[int], None]] = None) -> bool:
+    """
+    Copy an object inside S3 without moving its bytes through this host.
+
+    Objects up to ``settings.copy_multipart_threshold`` use one
+    ``copy_object`` call; bigger ones (anything over 5 GiB must) are copied
+    as parallel ``upload_part_copy`` ranges, pinned to the source ETag so a
+    concurrent overwrite cannot produce a mixed object.
+
+    :param source_bucket: Bucket holding the source object
+    :param source_key: Source object name
+    :param bucket_name: Destination bucket
+    :param object_name: Destination object name
+    :param max_workers: Parallel part copies for large objects; defaults to ``settings.max_concurrency``
+    :param callback: Called with the number of bytes copied as each part (or the whole object) completes
+    :return: True if the copy was successful, False otherwise
+    :raises my_resilience.S3ServiceError: If the object or bucket is missing, or S3 throttles or fails
     """
     try:
-        s3_client.delete_object(Bucket=bucket_name, Key=object_name)
+        _copy_any_size(source_bucket, source_key, bucket_name, object_name, max_workers, callback)
         return True
+    except NoCredentialsError:
+        logging.error("Credentials not available")
+        return False
     except ClientError as e:
         logging.error(e)
+        _raise_typed(e)
         return False
+
+def move_file_in_s3(source_bucket: str, source_key: str, bucket_name: str, object_name: str,
+                    max_workers: Optional[int] = None,
+                    callback: Optional[Callable[[int], None]] = None) -> bool:
+    """
+    Move an object inside S3: server-side copy, then delete the source.
+
+    :param source_bucket: Bucket holding the source object
+    :param source_key: Source object name
+    :param bucket_name: Destination bucket
+    :param object_name: Destination object name
+    :param max_workers: Parallel part copies for large objects
+    :param callback: Called with the number of bytes copied, see :func:`copy_file_in_s3`
+    :return: True if the object was copied and the source deleted, False otherwise
+    :raises ValueError: If source and destination are the same object
+    :raises my_resilience.S3ServiceError: If the source is missing, or S3 throttles or fails
+    """
+    check_move_target(source_bucket, source_key, bucket_name, object_name)
+    return (copy_file_in_s3(source_bucket, source_key, bucket_name, object_name, max_workers, callback)
+            and delete_file_from_s3(source_bucket, source_key))
+
+def check_move_target(source_bucket: str, source_key: str, bucket_name: str, object_name: str) -> None:
+    """:raises ValueError: If moving would delete the object it just wrote."""
+    if (source_bucket, source_key) == (bucket_name, object_name):
+        raise ValueError("Source and destination are the same object")
+
+def check_prefix_target(source_bucket: str, source_prefix: str, bucket_name: str, prefix: str) -> None:
+    """:raises ValueError: If the listing of a prefix copy would pick up its own copies."""
+    if source_bucket == bucket_name and prefix.startswith(source_prefix):
+        raise ValueError("Destination prefix must not be inside the source prefix")
+
+def _copy_result(source_bucket: str, bucket_name: str, item: Tuple[str, str]) -> dict:
+    source_key, object_name = item
+    try:
+        _copy_any_size(source_bucket, source_key, bucket_name, object_name)
+        return {'source_key': source_key, 'object_name': object_name, 'copied': True, 'error': None}
+    except (NoCredentialsError, ClientError, my_resilience.CircuitOpen) as e:
+        logging.error(e)
+        return {'source_key': source_key, 'object_name': object_name, 'copied': False, 'error': str(e)}
+
+def _delete_moved(source_bucket: str, results: List[dict]) -> None:
+    # Delete the sources of the copied results, marking those whose delete failed
+    copied = [result for result in results if result['copied']]
+    deleted = {entry['key']: entry for entry in
+               _delete_batch(source_bucket, [result['source_key'] for result in copied])}
+    for result in copied:
+        entry = deleted[result['source_key']]
+        if not entry['deleted']:
+            result['error'] = f"Copied but source not deleted: {entry['error']}"
+
+
+def _copy_counts(results: Iterable[dict], callback: Optional[Callable[[dict], None]] = None) -> dict:
+    # Prefix copies can cover millions of keys; keep at most FAILURE_LIMIT failures, count the rest
+    summary = {'copied_count': 0, 'failed_count': 0, 'failures': []}
+    for result in results:
+        if result['copied']:
+            summary['copied_count'] += 1
+        else:
+            summary['failed_count'] += 1
+        if (not result['copied'] or result['error']) and len(summary['failures']) < FAILURE_LIMIT:
+            summary['failures'].append(result)
+        if callback is not None:
+            callback(result)
+    return summary
+
+
+def _iter_prefix_copies(source_bucket: str, source_prefix: str, bucket_name: str, prefix: str,
+                        max_workers: Optional[int], move: bool) -> Iterator[dict]:
+    items = ((key, prefix + key[len(source_prefix):])
+             for key in iter_files_in_s3(source_bucket, source_prefix, use_cache=False))
+    pending = []
+    try:
+        for result in bounded_map(functools.partial(_copy_result, source_bucket, bucket_name),
+                                  items, max_workers):
+            if not move:
+                yield result
+                continue
+            # Results are held back until the DeleteObjects call for their batch has run
+            pending.append(result)
+            if len(pending) == DELETE_BATCH_SIZE:
+                _delete_moved(source_bucket, pending)
+                yield from pending
+                pending = []
+    except ClientError as e:
+        # Only listing the source prefix can fail here; _copy_result reports its own errors.
+        # Sources of a batch that was not deleted yet stay in place.
+        logging.error(e)
+        _raise_s3_error(e, "Listing the source prefix failed")
+    if pending:
+        _delete_moved(source_bucket, pending)
+        yield from pending
+
+
+def copy_prefix_in_s3(source_bucket: str, source_prefix: str, bucket_name: str, prefix: str,
+                      max_workers: Optional[int] = None, move: bool = False,
+                      callback: Optional[Callable[[dict], None]] = None) -> dict:
+    """
+    Copy (or move) every object under a prefix, concurrently on a bounded pool.
+
+    Each key keeps its path below ``source_prefix``, re-rooted at ``prefix``.
+    When moving, the sources of every ``DELETE_BATCH_SIZE`` copies are deleted
+    as soon as that batch is copied. Only failed keys are kept, at most
+    ``FAILURE_LIMIT`` of them; the rest are counted.
+
+    :param source_bucket: Bucket holding the source objects
+    :param source_prefix: Copy every object whose name starts with this
+    :param bucket_name: Destination bucket
+    :param prefix: Destination prefix replacing ``source_prefix``
+    :param max_workers: Concurrent copies; defaults to ``settings.bulk_max_workers``
+    :param move: Delete each source after it was copied
+    :param callback: Called with each copy result once it is final
+    :return: Dict with ``copied_count``, ``failed_count`` and ``failures``, a list of
+        ``{'source_key', 'object_name', 'copied', 'error'}`` dicts. Moved objects whose
+        source could not be deleted count as copied but are listed with their error.
+    :raises ValueError: If the destination lies inside the source prefix of the same bucket,
+        which would make the listing pick up its own copies
+    :raises my_resilience.S3ServiceError: If the source prefix cannot be listed, e.g. the bucket is missing
+    """
+    check_prefix_target(source_bucket, source_prefix, bucket_name, prefix)
+    results = _iter_prefix_copies(source_bucket, source_prefix, bucket_name, prefix, max_workers, move)
+    return _copy_counts(results, callback)
+
+SYNC_PLAN_LIMIT = 1000
+_SYNC_COUNTS = {my_sync.UPLOAD: 'uploaded', my_sync.DOWNLOAD: 'downloaded', my_sync.DELETE: 'deleted',
+                my_sync.SKIP: 'unchanged'}
+
+def _sync_work(actions: Iterable[dict], direction: str, summary: dict) -> Iterator[Any]:
+    # Unchanged files are only counted; remote deletes are grouped into
+    # DeleteObjects batches, every other action is a work item of its own
+    deletes = []
+    for action in actions:
+        if action['action'] == my_sync.SKIP:
+            summary['unchanged'] += 1
+        elif action['action'] == my_sync.DELETE and direction == my_sync.PUSH:
+            deletes.append(action['key'])
+            if len(deletes) == DELETE_BATCH_SIZE:
+                yield deletes
+                deletes = []
+        else:
+            yield action
+    if deletes:
+        yield deletes
+
+def _local_path(local_dir: str, key: str) -> str:
+    return os.path.join(local_dir, *key.split('/'))
+
+def _apply_sync_action(local_dir: str, bucket_name: str, prefix: str, item: Any) -> List[dict]:
+    if isinstance(item, list):
+        results = _delete_batch(bucket_name, [prefix + key for key in item])
+        return [{'action': my_sync.DELETE, 'key': key, 'size': 0, 'ok': result['deleted'],
+                 'error': result['error']} for key, result in zip(item, results)]
+    key = item['key']
+    try:
+        if item['action'] == my_sync.UPLOAD:
+            ok = upload_file_to_s3(_local_path(local_dir, key), bucket_name, prefix + key)
+        elif item['action'] == my_sync.DOWNLOAD:
+            file_path = my_spool.safe_path(local_dir, key)
+            ok = download_file_from_s3(bucket_name, prefix + key, file_path)
+            if ok:
+                # The next sync compares against the object's LastModified
+                os.utime(file_path, (item['mtime'], item['mtime']))
+        else:
+            os.unlink(_local_path(local_dir, key))
+            ok = True
+        error = None if ok else f"{item['action'].capitalize()} failed"
+    except (ValueError, OSError, BotoCoreError, my_resilience.S3ServiceError) as e:
+        logging.error(e)
+        ok, error = False, str(e)
+    return [{'action': item['action'], 'key': key, 'size': item['size'], 'ok': ok, 'error': error}]
+
+def sync_directory(local_dir: str, bucket_name: str, prefix: str = "", direction: str = my_sync.PUSH,
+                   delete: bool = False, dry_run: bool = False, compare: str = my_sync.COMPARE_MTIME,
+                   max_workers: Optional[int] = None,
+                   callback: Optional[Callable[[List[dict]], None]] = None) -> dict:
+    """
+    Mirror a local directory to a bucket prefix (push) or the prefix to the directory (pull).
+
+    Both sides are listed lazily and diffed as they stream (see
+    :mod:`my_sync`); only new and changed files are transferred, on a
+    bounded pool.
+
+    :param local_dir: Local directory; created when pulling
+    :param bucket_name: Name of the S3 bucket
+    :param prefix: Key prefix the directory maps to
+    :param direction: ``push`` or ``pull``
+    :param delete: Also delete destination files the source does not have
+    :param dry_run: Only plan; the first ``SYNC_PLAN_LIMIT`` planned actions are returned
+    :param compare: ``size-mtime``, or ``checksum`` to compare equal-sized files by MD5
+    :param max_workers: Concurrent transfers; defaults to ``settings.bulk_max_workers``
+    :param callback: Called with the results of each finished work item
+    :return: Counts (``uploaded``, ``downloaded``, ``deleted``, ``unchanged``, ``failed``),
+        ``bytes`` transferred and ``failures``; for dry runs also ``plan``
+    :raises ValueError: If a local directory to push does not exist, or an option is unknown
+    :raises my_resilience.S3ServiceError: If the bucket is missing, or S3 throttles or fails
+    """
+    prefix = my_sync.normalize_prefix(prefix)
+    if direction == my_sync.PULL:
+        os.makedirs(local_dir, exist_ok=True)
+    elif not os.path.isdir(local_dir):
+        raise ValueError("Local directory not found")
+    remote = my_sync.iter_remote_objects(iter_list_pages(bucket_name, prefix, use_cache=False), prefix)
+    actions = my_sync.plan(my_sync.iter_local_files(local_dir), remote, direction, delete, compare, local_dir)
+    summary = {name: 0 for name in _SYNC_COUNTS.values()}
+    summary.update(failed=0, bytes=0)
+    failures = []
+    try:
+        if dry_run:
+            planned = []
+            for action in actions:
+                summary[_SYNC_COUNTS[action['action']]] += 1
+                if action['action'] in (my_sync.UPLOAD, my_sync.DOWNLOAD):
+                    summary['bytes'] += action['size']
+                if action['action'] != my_sync.SKIP and len(planned) < SYNC_PLAN_LIMIT:
+                    planned.append({key: action[key] for key in ('action', 'key', 'size', 'reason')})
+            return {**summary, 'failures': [], 'plan': planned}
+        for results in bounded_map(functools.partial(_apply_sync_action, local_dir, bucket_name, prefix),
+                                   _sync_work(actions, direction, summary), max_workers):
+            for result in results:
+                if not result['ok']:
+                    summary['failed'] += 1
+                    failures.append(result)
+                    continue
+                summary[_SYNC_COUNTS[result['action']]] += 1
+                if result['action'] != my_sync.DELETE:
+                    summary['bytes'] += result['size']
+            if callback is not None:
+                callback(results)
+    except ClientError as e:
+        logging.error(e)
+        _raise_typed(e)
+        raise
+    return {**summary, 'failures': failures}
+
+def _transfer_part_count(size: int, transfer_config: TransferConfig) -> int:
+    if size < transfer_config.multipart_threshold:
+        return 1
+    return max(1, -(-size // transfer_config.multipart_chunksize))
+
+def _track_transfer(progress: my_jobs.Progress, size: Optional[int],
+                    transfer_config: TransferConfig) -> Callable[[int], None]:
+    if size is not None:
+        parts = _transfer_part_count(size, transfer_config)
+        progress.set_total(size, parts, transfer_config.multipart_chunksize if parts > 1 else max(size, 1))
+    return progress.add_bytes
+
+def upload_job_body_path(job_id: str) -> str:
+    """Return where the request body of an upload job is kept until the job ends."""
+    os.makedirs(settings.jobs_dir, exist_ok=True)
+    return os.path.join(settings.jobs_dir, f"{job_id}.body")
+
+def _run_upload_job(job: dict, progress: my_jobs.Progress) -> dict:
+    params = job['params']
+    file_path = upload_job_body_path(job['job_id'])
+    size = _path_size(file_path)
+    if size is None:
+        raise my_jobs.JobFailed("Upload body is missing")
+    transfer_config = build_transfer_config(size)
+    callback = _track_transfer(progress, size, transfer_config)
+    try:
+        if not upload_file_to_s3(file_path, job['bucket_name'], params['object_name'], transfer_config,
+                                 callback=callback):
+            raise my_jobs.JobFailed("File upload failed")
+    finally:
+        # A crash skips this, so a job requeued after a restart finds its body
+        _discard_job_body(job['job_id'])
+    return {'object_name': params['object_name'], 'size': size}
+
+def _run_download_job(job: dict, progress: my_jobs.Progress) -> dict:
+    object_name = job['params']['object_name']
+    try:
+        file_path = my_spool.safe_path(settings.download_dir, object_name)
+    except ValueError as e:
+        raise my_jobs.JobFailed(str(e))
+    metadata = head_file_in_s3(job['bucket_name'], object_name)
+    if metadata is None:
+        raise my_jobs.JobFailed("Object not found")
+    transfer_config = build_transfer_config()
+    callback = _track_transfer(progress, metadata['size'], transfer_config)
+    if not download_file_from_s3(job['bucket_name'], object_name, file_path, transfer_config,
+                                 decompress=job['params'].get('decompress', True), callback=callback):
+        raise my_jobs.JobFailed("File download failed")
+    return {'file_path': file_path, 'size': _path_size(file_path)}
+
+def _run_copy_job(job: dict, progress: my_jobs.Progress) -> dict:
+    params = job['params']
+    move = job['kind'] == 'move'
+    if params.get('source_key') is not None:
+        metadata = head_file_in_s3(params['source_bucket'], params['source_key'])
+        if metadata is None:
+            raise my_jobs.JobFailed("Source object not found")
+        progress.set_total(metadata['size'], 1)
+        service = move_file_in_s3 if move else copy_file_in_s3
+        if not service(params['source_bucket'], params['source_key'], job['bucket_name'],
+                       params['object_name'], callback=progress.add_bytes):
+            raise my_jobs.JobFailed("File move failed" if move else "File copy failed")
+        progress.add_parts()
+        return {'copied_count': 1, 'failed_count': 0, 'failures': []}
+    return copy_prefix_in_s3(params['source_bucket'], params['source_prefix'], job['bucket_name'],
+                             params['prefix'], move=move, callback=lambda result: progress.add_parts())
+
+def _run_delete_job(job: dict, progress: my_jobs.Progress) -> dict:
+    params = job['params']
+
+    def track(results: List[dict]) -> None:
+        progress.add_parts(len(results))
+
+    if params.get('prefix') is not None:
+        return delete_prefix_in_s3(job['bucket_name'], params['prefix'], callback=track)
+    keys = params.get('keys') or ()
+    progress.set_total(parts_total=len(keys))
+    results = delete_files_in_s3(job['bucket_name'], keys, callback=track)
+    deleted_count = sum(1 for result in results if result['deleted'])
+    return {'deleted_count': deleted_count, 'failed_count': len(results) - deleted_count,
+            'failures': [result for result in results if not result['deleted']]}
+
+def _run_sync_job(job: dict, progress: my_jobs.Progress) -> dict:
+    params = job['params']
+
+    def track(results: List[dict]) -> None:
+        progress.add_parts(len(results))
+        progress.add_bytes(sum(result['size'] for result in results
+                               if result['ok'] and result['action'] != my_sync.DELETE))
+
+    try:
+        local_dir = my_spool.safe_path(settings.sync_dir, params['local_dir'].rstrip('/'))
+        return sync_directory(local_dir, job['bucket_name'], params.get('prefix', ''),
+                              params.get('direction', my_sync.PUSH), params.get('delete', False),
+                              compare=params.get('compare', my_sync.COMPARE_MTIME), callback=track)
+    except ValueError as e:
+        raise my_jobs.JobFailed(str(e))
+
+# Background jobs, see my_jobs; "parts" count multipart parts for uploads
+# and downloads, objects for copies, deletes and syncs
+JOB_EXECUTORS = {'upload': _run_upload_job, 'download': _run_download_job, 'copy': _run_copy_job,
+                 'move': _run_copy_job, 'delete': _run_delete_job, 'sync': _run_sync_job}
+job_queue = None
+
+def get_job_queue() -> my_jobs.JobQueue:
+    """Return the job queue, opening ``settings.jobs_db`` on first use; the app lifespan starts it."""
+    global job_queue
+    with _state_lock:
+        if job_queue is None:
+            job_queue = my_jobs.JobQueue(
+                my_jobs.JobStore(settings.jobs_db), JOB_EXECUTORS, settings.job_workers,
+                settings.job_bucket_concurrency, settings.job_default_bucket_concurrency,
+                settings.job_bucket_priorities)
+        return job_queue
+
+def submit_job(kind: str, bucket_name: str, params: dict, priority: Optional[int] = None) -> dict:
+    """
+    Queue a background job.
+
+    :param kind: ``upload``, ``download``, ``copy``, ``move``, ``delete`` or ``sync``
+    :param bucket_name: Bucket the job writes to; per bucket limits and priorities apply to it
+    :param params: Job arguments, stored as JSON
+    :param priority: Higher runs first; defaults to the bucket's configured priority
+    :return: The queued job
+    """
+    return get_job_queue().submit(kind, bucket_name, params, priority)
+
+def submit_upload_job(job_id: str, bucket_name: str, object_name: str,
+                      priority: Optional[int] = None) -> dict:
+    """
+    Queue the job that sends a body already stored at :func:`upload_job_body_path`.
+
+    The body lives on disk, not in a spool, so a job interrupted by a
+    restart can run again. It is deleted when the job ends.
+
+    :param job_id: Id the body was stored under
+    :param bucket_name: Name of the S3 bucket
+    :param object_name: Object name in S3
+    :param priority: Higher runs first
+    :return: The queued job
+    """
+    return get_job_queue().submit('upload', bucket_name, {'object_name': object_name}, priority, job_id)
+
+def get_job(job_id: str) -> Optional[dict]:
+    """Return a job with its state, progress and result, or None if it does not exist."""
+    return get_job_queue().store.get(job_id)
+
+def list_jobs(state: Optional[str] = None, bucket_name: Optional[str] = None, limit: int = 100) -> List[dict]:
+    """Return the newest jobs, optionally filtered by state and bucket."""
+    return get_job_queue().store.list_jobs(state, bucket_name, limit)
+
+def cancel_job(job_id: str) -> bool:
+    """
+    Cancel a job that has not started yet, dropping the body of an upload job.
+
+    :return: True if the job was cancelled, False if it is running or finished
+    """
+    if not get_job_queue().store.cancel(job_id):
+        return False
+    _discard_job_body(job_id)
+    return True
+
+def _discard_job_body(job_id: str) -> None:
+    try:
+        os.unlink(upload_job_body_path(job_id))
+    except FileNotFoundError:
+        pass
+
+def sweep_jobs() -> int:
+    """
+    Forget jobs that finished more than ``settings.job_retention_seconds`` ago.
+
+    :return: Number of jobs removed
+    """
+    return len(get_job_queue().store.delete_finished(time.time() - settings.job_retention_seconds))
@@ -0,0 +1,157 @@
+"""Runtime settings for the S3 services, read from the environment."""
+import os
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, field_validator
+
+
+ENV_PREFIX = "S3_SERVICE_"
+
+
+class Settings(BaseModel):
+    # Size of the thread pool that runs blocking boto3 calls off the event loop
+    max_workers: int = 10
+    # Concurrent S3 requests a single bulk operation may issue
+    bulk_max_workers: int = 4
+    # boto3 TransferConfig defaults for managed uploads and downloads
+    multipart_threshold: int = 8 * 1024 * 1024
+    multipart_chunksize: int = 8 * 1024 * 1024
+    max_concurrency: int = 10
+    use_threads: bool = True
+    # botocore client configuration; the pool must cover max_workers plus the
+    # extra threads bulk operations and multipart transfers open
+    region_name: Optional[str] = None
+    endpoint_url: Optional[str] = None
+    max_pool_connections: int = 50
+    connect_timeout: float = 5.0
+    read_timeout: float = 60.0
+    tcp_keepalive: bool = True
+    retry_mode: str = "adaptive"
+    max_attempts: int = 5
+    # Retries are made by my_resilience instead of botocore: up to max_attempts
+    # attempts per call with full-jitter backoff (base and cap in seconds), paid
+    # from a budget of retry_budget_ratio retries per request plus
+    # retry_budget_min_per_second. After circuit_failure_threshold consecutive
+    # failures calls to a bucket fail fast for circuit_reset_seconds. Throttled
+    # and unavailable responses ask clients to come back after retry_after_seconds.
+    resilience_enabled: bool = True
+    retry_base_delay: float = 0.05
+    retry_max_delay: float = 5.0
+    retry_budget_ratio: float = 0.1
+    retry_budget_min_per_second: float = 1.0
+    circuit_failure_threshold: int = 10
+    circuit_reset_seconds: float = 10.0
+    retry_after_seconds: int = 1
+    # Buckets living outside the default region, as "bucket=region,bucket=region"
+    bucket_regions: Dict[str, str] = {}
+    # In-process cache for listing pages and object metadata
+    cache_enabled: bool = True
+    cache_ttl_seconds: float = 30.0
+    cache_max_entries: int = 1024
+    # Presigned URLs: default lifetime, how long an identical request may get
+    # the same signed URL back, and an optional MIME allowlist ("image/*,video/mp4")
+    presign_expires_seconds: int = 3600
+    presign_reuse_seconds: float = 60.0
+    presign_content_types: List[str] = []
+    # Resumable uploads: session store ("memory" or "sqlite"), how long an idle
+    # session lives, how often the sweeper runs, and buckets whose untracked
+    # multipart uploads the sweeper may abort as well
+    upload_session_store: str = "memory"
+    upload_session_db: str = "upload_sessions.db"
+    upload_session_ttl_seconds: float = 24 * 3600
+    upload_sweep_interval_seconds: float = 300.0
+    upload_sweep_buckets: List[str] = []
+    # Server-side copies: objects above the threshold (at most 5 GiB, the
+    # copy_object limit) are copied as parallel UploadPartCopy ranges
+    copy_multipart_threshold: int = 5 * 1024 * 1024 * 1024
+    copy_part_size: int = 256 * 1024 * 1024
+    # Content-addressed deduplication of uploads (per request override: ?dedup=)
+    dedup_enabled: bool = False
+    dedup_index_max_entries: int = 100_000
+    # Read-through disk cache for downloaded objects: directory, byte budget,
+    # largest object worth caching, eviction policy ("lru" or "lfu") and how
+    # long an entry is served before a conditional HEAD revalidates it
+    disk_cache_enabled: bool = False
+    disk_cache_dir: str = "cache"
+    disk_cache_max_bytes: int = 1024 * 1024 * 1024
+    disk_cache_max_object_bytes: int = 256 * 1024 * 1024
+    disk_cache_policy: str = "lru"
+    disk_cache_revalidate_seconds: float = 60.0
+    # Request bodies that must be read twice are spooled: in memory up to
+    # spool_memory_limit, then in unique files under spool_dir, with all
+    # spool files together capped at spool_max_disk_bytes. Writers wait up to
+    # spool_wait_seconds for space before the request is refused with 503.
+    spool_dir: str = "spool"
+    spool_memory_limit: int = 8 * 1024 * 1024
+    spool_max_disk_bytes: int = 10 * 1024 * 1024 * 1024
+    spool_wait_seconds: float = 30.0
+    # /download/ writes objects under download_dir; files older than the
+    # retention are deleted by a sweeper (0 keeps them forever)
+    download_dir: str = "temp"
+    download_retention_seconds: float = 3600.0
+    download_sweep_interval_seconds: float = 300.0
+    # /sync/ mirrors directories below sync_dir to and from bucket prefixes
+    sync_dir: str = "sync"
+    # Line queries (/query/): longest line they return, and the most bytes a
+    # tail may read backwards before it is refused
+    query_max_line_bytes: int = 1024 * 1024
+    query_max_tail_bytes: int = 64 * 1024 * 1024
+    # Background jobs (/jobs/): SQLite database, directory holding the bodies
+    # of queued upload jobs, worker threads, jobs running at once per bucket
+    # ("bucket=n,bucket=n", others get the default), default priority per
+    # bucket (higher runs first) and how long finished jobs stay queryable
+    jobs_db: str = "jobs.db"
+    jobs_dir: str = "jobs"
+    job_workers: int = 4
+    job_bucket_concurrency: Dict[str, int] = {}
+    job_default_bucket_concurrency: int = 2
+    job_bucket_priorities: Dict[str, int] = {}
+    job_retention_seconds: float = 7 * 24 * 3600
+    job_sweep_interval_seconds: float = 3600.0
+    # Upload compression: "none", "gzip", "zstd" or "auto" (zstd when the
+    # zstandard package is installed, else gzip), applied to uploads whose
+    # Content-Type matches one of the patterns (per request override: ?compression=)
+    upload_compression: str = "none"
+    compression_level: Optional[int] = None
+    compression_content_types: List[str] = [
+        "text/*", "application/json", "application/x-ndjson", "application/xml",
+        "application/javascript", "application/x-yaml"]
+    # Startup: directory keeping parsed botocore data between runs (empty: off),
+    # and buckets whose connections are opened before the service reports ready
+    model_cache_dir: str = "model_cache"
+    warm_up_buckets: List[str] = []
+    # Pre-fork serving (python -m my_server): worker processes (0 means one
+    # per CPU), seconds a worker may spend finishing requests after SIGTERM,
+    # and the first of the per-worker health ports (unset: none)
+    workers: int = 0
+    drain_timeout_seconds: float = 30.0
+    health_port: Optional[int] = None
+
+    @field_validator("bucket_regions", "job_bucket_concurrency", "job_bucket_priorities", mode="before")
+    @classmethod
+    def parse_bucket_map(cls, value):
+        if isinstance(value, str):
+            pairs = (item.split("=", 1) for item in value.split(",") if item.strip())
+            return {bucket.strip(): setting.strip() for bucket, setting in pairs}
+        return value
+
+    @field_validator("presign_content_types", "upload_sweep_buckets", "compression_content_types",
+                     "warm_up_buckets", mode="before")
+    @classmethod
+    def parse_comma_separated(cls, value):
+        if isinstance(value, str):
+            return [item.strip() for item in value.split(",") if item.strip()]
+        return value
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        """Build settings from ``S3_SERVICE_<FIELD>`` environment variables."""
+        values = {}
+        for name in cls.model_fields:
+            value = os.environ.get(ENV_PREFIX + name.upper())
+            if value is not None:
+                values[name] = value
+        return cls(**values)
+
+
+settings = Settings.from_env()
@@ -0,0 +1,290 @@
+"""Spooling of request bodies and safe local paths for downloads.
+
+Request bodies that must be read more than once (hashed, then uploaded; or
+retried part uploads) are spooled: kept in memory up to a threshold, then
+moved to a uniquely named file under the spool directory. Disk usage of all
+spools together is bounded by a quota, and every spool file is deleted when
+its spool is closed or garbage collected.
+"""
+import asyncio
+import contextlib
+import io
+import logging
+import os
+import tempfile
+import threading
+import time
+import weakref
+from typing import BinaryIO, Iterator, Optional
+
+
+SPOOL_PREFIX = "spool-"
+# Poll interval while a writer waits for spool quota to free up
+QUOTA_POLL_SECONDS = 0.05
+
+
+class SpoolQuotaExceeded(Exception):
+    """Raised when spooling more bytes would exceed the disk quota."""
+
+
+class SpoolManager:
+    """
+    Hand out spools and account for the disk space they use.
+
+    Spool files are named ``spool-<pid>-<random>``; files left behind by
+    processes that no longer exist are removed when a manager starts.
+    """
+
+    def __init__(self, directory: str, memory_limit: int, max_disk_bytes: int):
+        self.directory = directory
+        self.memory_limit = memory_limit
+        self.max_disk_bytes = max_disk_bytes
+        self._lock = threading.Lock()
+        self.disk_bytes = 0
+        self.peak_disk_bytes = 0
+        self.files = 0
+        self.rejections = 0
+        os.makedirs(directory, exist_ok=True)
+        self._remove_orphans()
+
+    def spool(self) -> "Spool":
+        """Return a new, empty spool; close it (or use it as a context manager) when done."""
+        return Spool(self)
+
+    def has_room(self, nbytes: int) -> bool:
+        with self._lock:
+            return self.disk_bytes + nbytes <= self.max_disk_bytes
+
+    def reserve(self, nbytes: int) -> None:
+        """Account ``nbytes`` more spool bytes on disk.
+
+        :raises SpoolQuotaExceeded: If that would exceed ``max_disk_bytes``
+        """
+        with self._lock:
+            if self.disk_bytes + nbytes > self.max_disk_bytes:
+                self.rejections += 1
+                raise SpoolQuotaExceeded(
+                    f"Spool quota of {self.max_disk_bytes} bytes exhausted ({self.disk_bytes} in use)")
+            self.disk_bytes += nbytes
+            self.peak_disk_bytes = max(self.peak_disk_bytes, self.disk_bytes)
+
+    def release(self, nbytes: int) -> None:
+        with self._lock:
+            self.disk_bytes -= nbytes
+
+    def reject(self, message: str) -> SpoolQuotaExceeded:
+        """Count a refused write and return the exception to raise for it."""
+        with self._lock:
+            self.rejections += 1
+        return SpoolQuotaExceeded(message)
+
+    def _file_opened(self) -> None:
+        with self._lock:
+            self.files += 1
+
+    def _file_closed(self) -> None:
+        with self._lock:
+            self.files -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "directory": self.directory,
+                "memory_limit": self.memory_limit,
+                "max_disk_bytes": self.max_disk_bytes,
+                "disk_bytes": self.disk_bytes,
+                "peak_disk_bytes": self.peak_disk_bytes,
+                "files": self.files,
+                "rejections": self.rejections,
+            }
+
+    def _remove_orphans(self) -> None:
+        for name in os.listdir(self.directory):
+            if not name.startswith(SPOOL_PREFIX):
+                continue
+            pid = name[len(SPOOL_PREFIX):].split("-", 1)[0]
+            if pid.isdigit() and (int(pid) == os.getpid() or process_exists(int(pid))):
+                continue
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(os.path.join(self.directory, name))
+                logging.info("Removed orphaned spool file %s", name)
+
+
+def process_exists(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _cleanup(state: dict) -> None:
+    # Runs on close() or, failing that, when the spool is garbage collected
+    if state['file'] is not None:
+        state['file'].close()
+        state['file'] = None
+    if state['path'] is not None:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(state['path'])
+        state['manager']._file_closed()
+        state['path'] = None
+    if state['reserved']:
+        state['manager'].release(state['reserved'])
+        state['reserved'] = 0
+
+
+class Spool(io.RawIOBase):
+    """
+    Seekable binary buffer that moves from memory to disk past a threshold.
+
+    Like ``tempfile.SpooledTemporaryFile``, but the rollover file lives in the
+    manager's directory under a unique name, disk growth is charged against
+    the manager's quota, and the file is removed on close.
+    """
+
+    def __init__(self, manager: SpoolManager):
+        super().__init__()
+        self.manager = manager
+        self._buffer: BinaryIO = io.BytesIO()
+        self._size = 0
+        self._state = {'manager': manager, 'file': None, 'path': None, 'reserved': 0}
+        self._finalizer = weakref.finalize(self, _cleanup, self._state)
+
+    @property
+    def rolled_over(self) -> bool:
+        return self._state['path'] is not None
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def readable(self) -> bool:
+        return True
+
+    def writable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def needs_room(self, nbytes: int) -> int:
+        """Return the quota a write of ``nbytes`` at the current position would take."""
+        growth = max(0, self._buffer.tell() + nbytes - self._size)
+        if self.rolled_over:
+            return growth
+        if self._size + growth <= self.manager.memory_limit:
+            return 0
+        return self._size + growth
+
+    def write(self, data) -> int:
+        needed = self.needs_room(len(data))
+        if needed:
+            self.manager.reserve(needed)
+            self._state['reserved'] += needed
+            if not self.rolled_over:
+                self._rollover()
+        written = self._buffer.write(data)
+        self._size = max(self._size, self._buffer.tell())
+        return written
+
+    def read(self, size: int = -1) -> bytes:
+        return self._buffer.read(size)
+
+    def readinto(self, b) -> int:
+        return self._buffer.readinto(b)
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        return self._buffer.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self._buffer.tell()
+
+    def close(self) -> None:
+        if not self.closed:
+            self._finalizer()
+        super().close()
+
+    def _rollover(self) -> None:
+        fd, path = tempfile.mkstemp(dir=self.manager.directory, prefix=f"{SPOOL_PREFIX}{os.getpid()}-")
+        self._state['path'] = path
+        self.manager._file_opened()
+        file = os.fdopen(fd, "w+b")
+        self._state['file'] = file
+        position = self._buffer.tell()
+        file.write(self._buffer.getbuffer())
+        file.seek(position)
+        self._buffer = file
+
+
+async def wait_for_room(spool: Spool, nbytes: int, timeout: float) -> None:
+    """
+    Wait until the spool quota can take a write of ``nbytes``.
+
+    Awaiting this before each write stops reading the request body while the
+    quota is full, so the client is slowed down by TCP flow control instead
+    of the disk filling up.
+
+    :raises SpoolQuotaExceeded: If there is still no room after ``timeout`` seconds
+    """
+    needed = spool.needs_room(nbytes)
+    if not needed or spool.manager.has_room(needed):
+        return
+    deadline = time.monotonic() + timeout
+    while not spool.manager.has_room(needed):
+        if time.monotonic() >= deadline:
+            raise spool.manager.reject(f"No spool space for {needed} bytes after {timeout}s")
+        await asyncio.sleep(QUOTA_POLL_SECONDS)
+
+
+def safe_path(directory: str, object_name: str) -> str:
+    """
+    Map an object name onto a path inside ``directory``, creating parent directories.
+
+    :raises ValueError: If the name is empty, absolute or would escape ``directory``
+    """
+    parts = object_name.split("/")
+    if not object_name or object_name.startswith("/") or any(part in ("", ".", "..") for part in parts):
+        raise ValueError(f"Object name {object_name!r} cannot be used as a local path")
+    path = os.path.join(directory, *parts)
+    root = os.path.realpath(directory)
+    if not os.path.realpath(path).startswith(root + os.sep):
+        raise ValueError(f"Object name {object_name!r} escapes {directory!r}")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+
+@contextlib.contextmanager
+def atomic_path(file_path: str) -> Iterator[str]:
+    """
+    Yield a unique temporary path next to ``file_path`` and rename it over
+    ``file_path`` if the block succeeds; it is deleted otherwise.
+
+    Concurrent writers of the same path each produce a complete file and
+    readers never see a partial one; the last rename wins.
+    """
+    directory, name = os.path.split(file_path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory or ".", prefix=f".{name}.", suffix=".part")
+    os.close(fd)
+    try:
+        yield tmp_path
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(tmp_path)
+        raise
+
+
+def sweep_directory(directory: str, max_age_seconds: float, now: Optional[float] = None) -> int:
+    """Delete files under ``directory`` last modified more than ``max_age_seconds`` ago; return how many."""
+    cutoff = (time.time() if now is None else now) - max_age_seconds
+    removed = 0
+    for root, _, names in os.walk(directory):
+        for name in names:
+            path = os.path.join(root, name)
+            with contextlib.suppress(FileNotFoundError):
+                if os.stat(path).st_mtime < cutoff:
+                    os.unlink(path)
+                    removed += 1
+    return removed
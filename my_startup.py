@@ -0,0 +1,141 @@
+"""Startup helpers: a botocore data cache shared by every boto3 session.
+
+Creating the first S3 client costs around 100 ms, nearly all of it in
+botocore's data loader: it scans its data directories, then decompresses and
+parses the S3 model, the endpoint rule set and the partition data. The
+loader keeps what it loaded for the life of the process, so the cost is paid
+once per process.
+
+:class:`ModelCacheLoader` also keeps the parsed data on disk, in a directory
+per botocore version, so a restarted process reads one small file per
+document instead. The pre-fork server calls :func:`preload` before forking,
+so its workers inherit the loaded data and create their clients in a few
+milliseconds.
+"""
+import contextlib
+import gc
+import hashlib
+import json
+import logging
+import os
+from typing import Iterator, Optional
+
+import boto3
+import botocore
+import botocore.loaders
+import botocore.session
+
+import my_spool
+from my_settings import settings
+
+# What creating an S3 client and its paginators loads
+S3_DOCUMENTS = ("service-2", "endpoint-rule-set-1")
+S3_DATA = ("endpoints", "partitions", "sdk-default-configuration", "_retry")
+
+
+@contextlib.contextmanager
+def _gc_paused() -> Iterator[None]:
+    # Parsing allocates hundreds of thousands of containers, each batch of
+    # which would otherwise trigger a collection that finds nothing to free
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+class ModelCacheLoader(botocore.loaders.Loader):
+    """
+    botocore loader that keeps loaded documents in ``cache_dir`` between runs.
+
+    Entries live under ``botocore-<version>`` and are named after the
+    request and the loader's search paths, so upgrading botocore or adding
+    models under ``AWS_DATA_PATH`` never serves stale data. Service models
+    are cached as a whole, after version resolution and extras, which is what
+    skips the directory scans. An empty ``cache_dir`` turns the disk cache off.
+    """
+
+    def __init__(self, cache_dir: str, **kwargs):
+        super().__init__(**kwargs)
+        self.cache_dir = os.path.join(cache_dir, f"botocore-{botocore.__version__}") if cache_dir else ""
+        # Set while a service model is assembled from files that need no entries of their own
+        self._assembling = False
+
+    @botocore.loaders.instance_cache
+    def load_service_model(self, service_name, type_name, api_version=None):
+        return self._cached(("service", service_name, type_name, api_version),
+                            lambda: self._assemble(service_name, type_name, api_version))
+
+    def _assemble(self, service_name, type_name, api_version):
+        self._assembling = True
+        try:
+            return super().load_service_model(service_name, type_name, api_version)
+        finally:
+            self._assembling = False
+
+    @botocore.loaders.instance_cache
+    def load_data_with_path(self, name):
+        if self._assembling:
+            return super().load_data_with_path(name)
+        data, path = self._cached(("data", name),
+                                  lambda: list(super(ModelCacheLoader, self).load_data_with_path(name)))
+        return data, path
+
+    def _cached(self, key: tuple, load):
+        if not self.cache_dir:
+            return load()
+        key = [*key, *self.search_paths]
+        digest = hashlib.sha256(json.dumps(key).encode()).hexdigest()[:32]
+        path = os.path.join(self.cache_dir, f"{digest}.json")
+        with contextlib.suppress(OSError, ValueError):
+            with open(path) as f, _gc_paused():
+                # Plain dicts keep the order too and parse twice as fast
+                entry = json.load(f)
+            if entry['key'] == key:
+                return entry['value']
+        # Missing data raises here and is not cached
+        value = load()
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with my_spool.atomic_path(path) as tmp_path:
+                with open(tmp_path, "w") as f:
+                    json.dump({'key': key, 'value': value}, f, separators=(",", ":"))
+        except OSError as e:
+            logging.warning("Cannot cache botocore data in %s: %s", self.cache_dir, e)
+        return value
+
+
+_loader: Optional[ModelCacheLoader] = None
+
+
+def loader() -> ModelCacheLoader:
+    """Return the process-wide loader, creating it on first use."""
+    global _loader
+    if _loader is None:
+        # Same extra search paths as botocore's own loader
+        data_path = os.environ.get('AWS_DATA_PATH')
+        extra_paths = [os.path.expanduser(os.path.expandvars(path))
+                       for path in data_path.split(os.pathsep)] if data_path else []
+        _loader = ModelCacheLoader(settings.model_cache_dir, extra_search_paths=extra_paths)
+    return _loader
+
+
+def create_session() -> boto3.session.Session:
+    """Return a boto3 session whose botocore data comes from :func:`loader`."""
+    core_session = botocore.session.get_session()
+    core_session.register_component('data_loader', loader())
+    return boto3.session.Session(botocore_session=core_session)
+
+
+def preload() -> None:
+    """Load what creating an S3 client needs into :func:`loader`, without creating one."""
+    data_loader = loader()
+    for type_name in S3_DOCUMENTS:
+        data_loader.load_service_model("s3", type_name)
+    for name in S3_DATA:
+        data_loader.load_data(name)
+    # Paginators are asked for by API version
+    api_version = data_loader.load_service_model("s3", "service-2")['metadata']['apiVersion']
+    data_loader.load_service_model("s3", "paginators-1", api_version)
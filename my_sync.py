@@ -0,0 +1,159 @@
+"""Diffing a local directory tree against an S3 prefix, for directory sync.
+
+Both sides are walked in the order S3 lists keys (by UTF-8 bytes, which
+matches Python's string order) and merged like two sorted files. Only one
+local directory's entries and one listing page are in memory at a time, so
+trees with millions of files diff in bounded memory.
+
+A file is transferred when it is missing on the other side, when the sizes
+differ, or when the source is newer than the copy. With ``checksum``
+comparison, files of equal size are compared by MD5 against the object's
+ETag instead; multipart ETags are not MD5s, so those fall back to the
+modification times.
+"""
+import hashlib
+import os
+import re
+from typing import Iterable, Iterator, Optional
+
+PUSH = "push"
+PULL = "pull"
+DIRECTIONS = (PUSH, PULL)
+
+COMPARE_MTIME = "size-mtime"
+COMPARE_CHECKSUM = "checksum"
+COMPARE_MODES = (COMPARE_MTIME, COMPARE_CHECKSUM)
+
+UPLOAD = "upload"
+DOWNLOAD = "download"
+DELETE = "delete"
+SKIP = "skip"
+
+HASH_CHUNK_SIZE = 1024 * 1024
+_PLAIN_MD5 = re.compile(r"^[0-9a-f]{32}$")
+# Temporary files of my_spool.atomic_path, i.e. downloads in progress
+_PARTIAL_FILE = re.compile(r"^\..+\.part$")
+
+
+def normalize_prefix(prefix: str) -> str:
+    """Treat a non-empty prefix as a directory: ``builds`` means ``builds/``."""
+    return prefix if not prefix or prefix.endswith("/") else prefix + "/"
+
+
+def iter_local_files(root: str) -> Iterator[dict]:
+    """
+    Walk the files under ``root`` in S3 key order.
+
+    Directories sort as their name plus ``/``, so ``a-b`` comes before the
+    files in ``a/`` just as the keys would. Symlinked directories are not
+    followed and unfinished downloads are skipped.
+
+    :param root: Directory to walk
+    :return: Iterator over ``{'key', 'size', 'mtime'}`` dicts, keys relative to ``root``
+    """
+    return _walk(root, "")
+
+
+def _walk(directory: str, key_prefix: str) -> Iterator[dict]:
+    with os.scandir(directory) as scan:
+        entries = sorted((entry.name + "/" if entry.is_dir(follow_symlinks=False) else entry.name, entry)
+                         for entry in scan)
+    for name, entry in entries:
+        if name.endswith("/"):
+            yield from _walk(entry.path, key_prefix + name)
+        elif entry.is_file() and not _PARTIAL_FILE.match(name):
+            stat = entry.stat()
+            yield {'key': key_prefix + name, 'size': stat.st_size, 'mtime': stat.st_mtime}
+
+
+def iter_remote_objects(pages: Iterable[dict], prefix: str = "") -> Iterator[dict]:
+    """
+    Turn ``list_objects_v2`` pages into entries keyed relative to ``prefix``.
+
+    Folder markers (keys ending in ``/``) are skipped.
+
+    :param pages: Listing pages, e.g. from ``my_services.iter_list_pages``
+    :param prefix: Prefix the pages were listed with
+    :return: Iterator over ``{'key', 'size', 'mtime', 'etag'}`` dicts
+    """
+    prefix = normalize_prefix(prefix)
+    for page in pages:
+        for obj in page.get('Contents', []):
+            key = obj['Key'][len(prefix):]
+            if not key or key.endswith("/"):
+                continue
+            yield {'key': key, 'size': obj['Size'], 'mtime': obj['LastModified'].timestamp(),
+                   'etag': obj.get('ETag', '').strip('"')}
+
+
+def file_md5(path: str) -> str:
+    digest = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def transfer_reason(local: dict, remote: dict, direction: str, compare: str = COMPARE_MTIME,
+                    local_root: Optional[str] = None) -> Optional[str]:
+    """
+    Decide whether a file present on both sides must be transferred.
+
+    :return: Why (``size``, ``checksum`` or ``newer``), or None if it is unchanged
+    """
+    if local['size'] != remote['size']:
+        return "size"
+    if compare == COMPARE_CHECKSUM and _PLAIN_MD5.match(remote['etag'] or ""):
+        path = os.path.join(local_root or "", *local['key'].split("/"))
+        return "checksum" if file_md5(path) != remote['etag'] else None
+    # S3 keeps whole seconds
+    local_mtime, remote_mtime = int(local['mtime']), int(remote['mtime'])
+    newer = local_mtime > remote_mtime if direction == PUSH else remote_mtime > local_mtime
+    return "newer" if newer else None
+
+
+def plan(local_entries: Iterable[dict], remote_entries: Iterable[dict], direction: str,
+         delete: bool = False, compare: str = COMPARE_MTIME,
+         local_root: Optional[str] = None) -> Iterator[dict]:
+    """
+    Merge two key-ordered walks into sync actions.
+
+    :param local_entries: Output of :func:`iter_local_files`
+    :param remote_entries: Output of :func:`iter_remote_objects`
+    :param direction: ``push`` (local to S3) or ``pull`` (S3 to local)
+    :param delete: Also delete files on the destination that the source lacks
+    :param compare: ``size-mtime`` or ``checksum``
+    :param local_root: Local directory, needed to hash files for ``checksum``
+    :return: Iterator over ``{'action', 'key', 'size', 'mtime', 'reason'}`` dicts,
+        ``action`` being ``upload``, ``download``, ``delete`` or ``skip``
+    """
+    if direction not in DIRECTIONS:
+        raise ValueError(f"direction must be one of {', '.join(DIRECTIONS)}")
+    if compare not in COMPARE_MODES:
+        raise ValueError(f"compare must be one of {', '.join(COMPARE_MODES)}")
+    transfer = UPLOAD if direction == PUSH else DOWNLOAD
+    local_iter, remote_iter = iter(local_entries), iter(remote_entries)
+    local, remote = next(local_iter, None), next(remote_iter, None)
+    while local is not None or remote is not None:
+        if remote is None or (local is not None and local['key'] < remote['key']):
+            if direction == PUSH:
+                yield _action(transfer, local, "missing")
+            elif delete:
+                yield _action(DELETE, local, "extraneous")
+            local = next(local_iter, None)
+        elif local is None or remote['key'] < local['key']:
+            if direction == PULL:
+                yield _action(transfer, remote, "missing")
+            elif delete:
+                yield _action(DELETE, remote, "extraneous")
+            remote = next(remote_iter, None)
+        else:
+            reason = transfer_reason(local, remote, direction, compare, local_root)
+            source = local if direction == PUSH else remote
+            yield _action(transfer if reason else SKIP, source, reason)
+            local, remote = next(local_iter, None), next(remote_iter, None)
+
+
+def _action(action: str, entry: dict, reason: Optional[str]) -> dict:
+    return {'action': action, 'key': entry['key'], 'size': entry['size'], 'mtime': entry['mtime'],
+            'reason': reason}
@@ -0,0 +1,227 @@
+"""Session state for resumable uploads, and the sweeper that expires it.
+
+A session maps one client upload onto one S3 multipart upload. Stores are
+pluggable: ``MemorySessionStore`` for a single process, ``SQLiteSessionStore``
+when sessions must survive restarts or be shared between worker processes.
+Sessions are plain dicts with ``session_id``, ``bucket_name``,
+``object_name``, ``upload_id``, ``content_type``, ``created_at``,
+``updated_at`` and ``parts`` (``{part_number: {'etag', 'size'}}``).
+"""
+import abc
+import copy
+import logging
+import sqlite3
+import threading
+from typing import Callable, Dict, List, Optional
+
+
+class SessionStore(abc.ABC):
+    """Interface every upload session store implements."""
+
+    @abc.abstractmethod
+    def create(self, session: dict) -> None:
+        """Store a new session."""
+
+    @abc.abstractmethod
+    def get(self, session_id: str) -> Optional[dict]:
+        """Return a copy of the session, or None if it does not exist."""
+
+    @abc.abstractmethod
+    def add_part(self, session_id: str, part_number: int, etag: str, size: int,
+                 updated_at: float) -> bool:
+        """Record (or replace) a received part; False if the session is gone."""
+
+    @abc.abstractmethod
+    def delete(self, session_id: str) -> None:
+        """Forget a session and its parts."""
+
+    @abc.abstractmethod
+    def list_sessions(self, updated_before: Optional[float] = None) -> List[dict]:
+        """Return every session, or only those idle since ``updated_before``."""
+
+
+class MemorySessionStore(SessionStore):
+    """Sessions kept in a dict; lost when the process exits."""
+
+    def __init__(self):
+        self._sessions: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def create(self, session: dict) -> None:
+        with self._lock:
+            self._sessions[session['session_id']] = {**copy.deepcopy(session), 'parts': {}}
+
+    def get(self, session_id: str) -> Optional[dict]:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            return copy.deepcopy(session) if session is not None else None
+
+    def add_part(self, session_id: str, part_number: int, etag: str, size: int,
+                 updated_at: float) -> bool:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return False
+            session['parts'][part_number] = {'etag': etag, 'size': size}
+            session['updated_at'] = updated_at
+            return True
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def list_sessions(self, updated_before: Optional[float] = None) -> List[dict]:
+        with self._lock:
+            return [copy.deepcopy(session) for session in self._sessions.values()
+                    if updated_before is None or session['updated_at'] < updated_before]
+
+
+class SQLiteSessionStore(SessionStore):
+    """Sessions kept in a SQLite database, shared by every process using the file."""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS upload_sessions (
+            session_id TEXT PRIMARY KEY,
+            bucket_name TEXT NOT NULL,
+            object_name TEXT NOT NULL,
+            upload_id TEXT NOT NULL,
+            content_type TEXT,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS upload_sessions_updated_at ON upload_sessions (updated_at);
+        CREATE TABLE IF NOT EXISTS upload_parts (
+            session_id TEXT NOT NULL,
+            part_number INTEGER NOT NULL,
+            etag TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            PRIMARY KEY (session_id, part_number)
+        );
+    """
+    COLUMNS = ('session_id', 'bucket_name', 'object_name', 'upload_id', 'content_type',
+               'created_at', 'updated_at')
+
+    def __init__(self, path: str):
+        self.path = path
+        # One connection shared by all threads, serialized by the lock;
+        # autocommit mode with WAL so other processes can read while we write
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(self.SCHEMA)
+
+    def _parts(self, session_id: str) -> Dict[int, dict]:
+        rows = self._conn.execute(
+            "SELECT part_number, etag, size FROM upload_parts WHERE session_id = ? ORDER BY part_number",
+            (session_id,))
+        return {part_number: {'etag': etag, 'size': size} for part_number, etag, size in rows}
+
+    def _session(self, row: tuple) -> dict:
+        session = dict(zip(self.COLUMNS, row))
+        session['parts'] = self._parts(session['session_id'])
+        return session
+
+    def create(self, session: dict) -> None:
+        with self._lock:
+            self._conn.execute(
+                f"INSERT INTO upload_sessions ({', '.join(self.COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                tuple(session[column] for column in self.COLUMNS))
+
+    def get(self, session_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM upload_sessions WHERE session_id = ?",
+                (session_id,)).fetchone()
+            return self._session(row) if row is not None else None
+
+    def add_part(self, session_id: str, part_number: int, etag: str, size: int,
+                 updated_at: float) -> bool:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                updated = self._conn.execute(
+                    "UPDATE upload_sessions SET updated_at = ? WHERE session_id = ?",
+                    (updated_at, session_id)).rowcount
+                if updated:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO upload_parts (session_id, part_number, etag, size) "
+                        "VALUES (?, ?, ?, ?)", (session_id, part_number, etag, size))
+                self._conn.execute("COMMIT")
+            except sqlite3.Error:
+                self._conn.execute("ROLLBACK")
+                raise
+            return bool(updated)
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.execute("DELETE FROM upload_parts WHERE session_id = ?", (session_id,))
+            self._conn.execute("DELETE FROM upload_sessions WHERE session_id = ?", (session_id,))
+            self._conn.execute("COMMIT")
+
+    def list_sessions(self, updated_before: Optional[float] = None) -> List[dict]:
+        query = f"SELECT {', '.join(self.COLUMNS)} FROM upload_sessions"
+        params = ()
+        if updated_before is not None:
+            query += " WHERE updated_at < ?"
+            params = (updated_before,)
+        with self._lock:
+            return [self._session(row) for row in self._conn.execute(query, params).fetchall()]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def create_session_store(kind: str, path: str) -> SessionStore:
+    """
+    Build the session store named by ``kind``.
+
+    :param kind: ``memory`` or ``sqlite``
+    :param path: Database file for the SQLite store
+    :return: A ready to use store
+    :raises ValueError: If ``kind`` is unknown
+    """
+    if kind == "memory":
+        return MemorySessionStore()
+    if kind == "sqlite":
+        return SQLiteSessionStore(path)
+    raise ValueError(f"Unknown upload session store {kind!r}")
+
+
+class Sweeper:
+    """Run ``sweep`` every ``interval`` seconds on a daemon thread.
+
+    ``sweep`` returns how many items it removed; non-zero counts are logged
+    with ``message``.
+    """
+
+    def __init__(self, sweep: Callable[[], int], interval: float, name: str = "upload-sweeper",
+                 message: str = "Aborted %d abandoned multipart uploads"):
+        self._sweep = sweep
+        self.interval = interval
+        self.name = name
+        self.message = message
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                removed = self._sweep()
+                if removed:
+                    logging.info(self.message, removed)
+            except Exception:
+                logging.exception("%s failed", self.name)
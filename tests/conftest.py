@@ -72,4 +72,29 @@ def cleanup_temp_files():
         for filename in os.listdir(temp_dir):
             file_path = os.path.join(temp_dir, filename)
             if os.path.isfile(file_path):
-                os.unlink(file_path)
\ No newline at end of file
+                os.unlink(file_path)
+
+@pytest.fixture(autouse=True)
+def clear_metadata_caches():
+    """Start every test with empty listing and metadata caches."""
+    import my_services
+    my_services.listing_cache.clear()
+    my_services.metadata_cache.clear()
+    my_services.presign_cache.clear()
+    my_services.dedup_index.clear()
+    yield
+
+
+@pytest.fixture(autouse=True)
+def isolated_stores(tmp_path_factory):
+    """Create the job, session and spool stores under a temporary directory, one set per test."""
+    import my_services
+    directory = tmp_path_factory.mktemp("stores")
+    with patch.multiple(my_services.settings, jobs_db=str(directory / "jobs.db"),
+                        upload_session_db=str(directory / "upload_sessions.db"),
+                        spool_dir=str(directory / "spool"), disk_cache_dir=str(directory / "cache")), \
+            patch.multiple(my_services, job_queue=None, upload_sessions=None, spool_manager=None,
+                           disk_cache=None):
+        yield
+        if my_services.job_queue is not None:
+            my_services.job_queue.store.close()
@@ -2,10 +2,16 @@ import pytest
 from fastapi.testclient import TestClient
 from unittest.mock import patch, MagicMock
 import tempfile
+import json
 import os
 from io import BytesIO
 
+from botocore.exceptions import ClientError
+
+import my_services
 from main import app
+from my_disk_cache import DiskCache
+from my_resilience import ServiceUnavailable
 
 
 @pytest.fixture
@@ -29,7 +35,7 @@ class TestRootEndpoint:
 
 class TestFileUploadEndpoint:
     
-    @patch('my_services.upload_file_to_s3')
+    @patch('my_services.upload_fileobj_to_s3')
     def test_upload_file_success(self, mock_upload, client):
         mock_upload.return_value = True
         
@@ -51,7 +57,7 @@ class TestFileUploadEndpoint:
         assert data["object_name"] == "test.txt"
         assert data["bucket_name"] == "test-bucket"
     
-    @patch('my_services.upload_file_to_s3')
+    @patch('my_services.upload_fileobj_to_s3')
     def test_upload_file_failure(self, mock_upload, client):
         mock_upload.return_value = False
         
@@ -71,11 +77,112 @@ class TestFileUploadEndpoint:
         data = response.json()
         assert data["detail"] == "File upload failed"
     
+    @patch('my_services.upload_fileobj_to_s3')
+    def test_upload_file_transfer_overrides(self, mock_upload, client):
+        mock_upload.return_value = True
+        
+        response = client.post(
+            "/upload/?bucket=test-bucket&part_size_mb=64&max_concurrency=4",
+            files={"file_upload": ("test.txt", b"test content", "text/plain")}
+        )
+        
+        assert response.status_code == 200
+        transfer_config = mock_upload.call_args.args[3]
+        assert transfer_config.multipart_chunksize == 64 * 1024 * 1024
+        assert transfer_config.max_request_concurrency == 4
+    
     def test_upload_file_missing_file(self, client):
         response = client.post("/upload/?bucket=test-bucket")
         assert response.status_code == 422
 
 
+class TestFileStreamUploadEndpoint:
+    
+    @patch('my_services.MultipartStreamUploader')
+    def test_upload_stream_success(self, mock_uploader_class, client):
+        mock_uploader = mock_uploader_class.return_value
+        mock_uploader.write.return_value = True
+        mock_uploader.complete.return_value = True
+        
+        response = client.put(
+            "/upload/stream/?bucket=test-bucket&object_name=big.bin",
+            content=b"streamed content"
+        )
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["object_name"] == "big.bin"
+        assert data["bucket_name"] == "test-bucket"
+        mock_uploader_class.assert_called_once_with("test-bucket", "big.bin", None, len(b"streamed content"),
+                                                    None, None)
+        mock_uploader.complete.assert_called_once()
+    
+    @patch('my_services.MultipartStreamUploader')
+    def test_upload_stream_write_failure(self, mock_uploader_class, client):
+        mock_uploader = mock_uploader_class.return_value
+        mock_uploader.write.return_value = False
+        
+        response = client.put(
+            "/upload/stream/?bucket=test-bucket&object_name=big.bin",
+            content=b"streamed content"
+        )
+        
+        assert response.status_code == 500
+        assert response.json()["detail"] == "File upload failed"
+        mock_uploader.complete.assert_not_called()
+    
+    @patch('my_services.MultipartStreamUploader')
+    def test_upload_stream_complete_failure(self, mock_uploader_class, client):
+        mock_uploader = mock_uploader_class.return_value
+        mock_uploader.write.return_value = True
+        mock_uploader.complete.return_value = False
+        
+        response = client.put(
+            "/upload/stream/?bucket=test-bucket&object_name=big.bin",
+            content=b"streamed content"
+        )
+        
+        assert response.status_code == 500
+    
+    @patch('my_services.MultipartStreamUploader')
+    def test_upload_stream_too_many_parts(self, mock_uploader_class, client):
+        mock_uploader = mock_uploader_class.return_value
+        mock_uploader.write.side_effect = my_services.TooManyParts("Object is too large")
+        
+        response = client.put(
+            "/upload/stream/?bucket=test-bucket&object_name=big.bin",
+            content=b"streamed content"
+        )
+        
+        assert response.status_code == 413
+        mock_uploader.complete.assert_not_called()
+    
+    @patch('my_services.MultipartStreamUploader')
+    def test_upload_stream_part_size_override(self, mock_uploader_class, client):
+        mock_uploader = mock_uploader_class.return_value
+        mock_uploader.write.return_value = True
+        mock_uploader.complete.return_value = True
+        
+        response = client.put(
+            "/upload/stream/?bucket=test-bucket&object_name=big.bin&part_size_mb=16",
+            content=b"data"
+        )
+        
+        assert response.status_code == 200
+        assert mock_uploader_class.call_args.args[2] == 16 * 1024 * 1024
+    
+    def test_upload_stream_rejects_part_size_below_s3_minimum(self, client):
+        response = client.put(
+            "/upload/stream/?bucket=test-bucket&object_name=big.bin&part_size_mb=1",
+            content=b"data"
+        )
+        assert response.status_code == 422
+    
+    def test_upload_stream_missing_object_name(self, client):
+        response = client.put("/upload/stream/?bucket=test-bucket", content=b"data")
+        assert response.status_code == 422
+
+
 class TestFileDownloadEndpoint:
     
     @patch('my_services.download_file_from_s3')
@@ -105,6 +212,45 @@ class TestFileDownloadEndpoint:
         
         response = client.get("/download/?object_name=test.txt")
         assert response.status_code == 422
+    
+    @patch('my_services.get_object_stream')
+    def test_not_modified_sends_the_object_etag(self, mock_get, client):
+        mock_get.side_effect = ClientError(
+            {'Error': {'Code': '304', 'Message': 'Not Modified'},
+             'ResponseMetadata': {'HTTPStatusCode': 304, 'HTTPHeaders': {'etag': '"abc"'}}}, 'GetObject')
+        
+        response = client.get("/download/stream/?bucket=test-bucket&object_name=a.txt",
+                              headers={"If-None-Match": '"old", "abc"'})
+        
+        assert response.status_code == 304
+        assert response.headers["etag"] == '"abc"'
+    
+    @patch('my_services.get_object_stream')
+    def test_not_modified_compares_weakly(self, mock_get, client):
+        mock_get.side_effect = ClientError(
+            {'Error': {'Code': '304', 'Message': 'Not Modified'},
+             'ResponseMetadata': {'HTTPStatusCode': 304, 'HTTPHeaders': {'etag': '"abc"'}}}, 'GetObject')
+        
+        response = client.get("/download/stream/?bucket=test-bucket&object_name=a.txt",
+                              headers={"If-None-Match": 'W/"old", W/"abc"'})
+        
+        assert response.status_code == 304
+        assert response.headers["etag"] == 'W/"abc"'
+        assert mock_get.call_args[0][3] == '"old", "abc"'
+    
+    @patch('my_services.head_file_in_s3')
+    @patch('my_services.get_object_stream')
+    def test_not_modified_looks_up_a_missing_etag(self, mock_get, mock_head, client):
+        mock_get.side_effect = ClientError({'Error': {'Code': '304', 'Message': 'Not Modified'}}, 'GetObject')
+        mock_head.return_value = {"size": 3, "etag": '"abc"', "last_modified": None, "content_type": None,
+                                  "content_encoding": None}
+        
+        response = client.get("/download/stream/?bucket=test-bucket&object_name=a.txt",
+                              headers={"If-None-Match": "*"})
+        
+        assert response.status_code == 304
+        assert response.headers["etag"] == '"abc"'
+        mock_head.assert_called_once_with("test-bucket", "a.txt")
 
 
 class TestFileListEndpoint:
@@ -133,6 +279,57 @@ class TestFileListEndpoint:
         assert data[0]["bucket_name"] == "test-bucket"
         assert data[0]["files"] == []
     
+    @patch('my_services.list_files_page')
+    def test_list_files_single_page(self, mock_page, client):
+        mock_page.return_value = {
+            "files": ["logs/a.txt"],
+            "common_prefixes": ["logs/2024/"],
+            "is_truncated": True,
+            "next_continuation_token": "next-token",
+        }
+        
+        response = client.get("/list/?bucket=test-bucket&prefix=logs/&delimiter=/&max_keys=1")
+        
+        assert response.status_code == 200
+        data = response.json()[0]
+        assert data["files"] == ["logs/a.txt"]
+        assert data["prefix"] == "logs/"
+        assert data["common_prefixes"] == ["logs/2024/"]
+        assert data["is_truncated"] is True
+        assert data["next_continuation_token"] == "next-token"
+        mock_page.assert_called_once_with("test-bucket", "logs/", "/", 1, None, False)
+    
+    def test_list_files_rejects_oversized_page(self, client):
+        response = client.get("/list/?bucket=test-bucket&max_keys=5000")
+        assert response.status_code == 422
+    
+    @patch('my_services.iter_list_pages')
+    def test_list_files_stream_ndjson(self, mock_pages, client):
+        mock_pages.return_value = iter([
+            {'Contents': [{'Key': 'a.txt'}, {'Key': 'b.txt'}]},
+            {'Contents': [{'Key': 'c.txt'}]},
+        ])
+        
+        response = client.get("/list/?bucket=test-bucket&stream=true")
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert lines == [{"key": "a.txt"}, {"key": "b.txt"}, {"key": "c.txt"}]
+    
+    @patch('my_services.iter_list_pages')
+    def test_list_files_stream_reports_later_errors_inline(self, mock_pages, client):
+        def pages():
+            yield {'Contents': [{'Key': 'a.txt'}]}
+            raise ServiceUnavailable("S3 is unavailable")
+        mock_pages.return_value = pages()
+        
+        response = client.get("/list/?bucket=test-bucket&stream=true")
+        
+        assert response.status_code == 200
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert lines == [{"key": "a.txt"}, {"error": "File listing failed"}]
+    
     def test_list_files_missing_bucket(self, client):
         response = client.get("/list/")
         assert response.status_code == 422
@@ -168,9 +365,158 @@ class TestFileDeleteEndpoint:
         assert response.status_code == 422
 
 
+class TestBulkDeleteEndpoint:
+    
+    @patch('my_services.delete_files_in_s3')
+    def test_bulk_delete_by_keys(self, mock_bulk_delete, client):
+        mock_bulk_delete.return_value = [
+            {"key": "a.txt", "deleted": True, "error": None},
+            {"key": "b.txt", "deleted": False, "error": "Access Denied"},
+        ]
+        
+        response = client.post("/delete/bulk/", json={"bucket_name": "test-bucket", "keys": ["a.txt", "b.txt"]})
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["deleted_count"] == 1
+        assert data["failed_count"] == 1
+        assert data["results"][1]["error"] == "Access Denied"
+        mock_bulk_delete.assert_called_once_with("test-bucket", ["a.txt", "b.txt"])
+    
+    @patch('my_services.delete_prefix_in_s3')
+    def test_bulk_delete_by_prefix(self, mock_prefix_delete, client):
+        mock_prefix_delete.return_value = {
+            "deleted_count": 5000, "failed_count": 1,
+            "failures": [{"key": "logs/b.txt", "deleted": False, "error": "Access Denied"}],
+        }
+        
+        response = client.post("/delete/bulk/", json={"bucket_name": "test-bucket", "prefix": "logs/"})
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["deleted_count"] == 5000
+        assert data["failed_count"] == 1
+        assert [r["key"] for r in data["results"]] == ["logs/b.txt"]
+        mock_prefix_delete.assert_called_once_with("test-bucket", "logs/")
+    
+    def test_bulk_delete_requires_keys_or_prefix(self, client):
+        response = client.post("/delete/bulk/", json={"bucket_name": "test-bucket"})
+        assert response.status_code == 422
+
+
+class TestBatchUploadEndpoint:
+    
+    @patch('my_services.upload_files_to_s3')
+    def test_batch_upload_reports_counts(self, mock_upload, client):
+        mock_upload.return_value = [
+            {"object_name": "a.txt", "uploaded": True, "size": 1, "error": None},
+            {"object_name": "b.txt", "uploaded": False, "size": 1, "error": "Denied"},
+        ]
+        
+        response = client.post("/upload/batch/?bucket=test-bucket",
+                               files=[("files", ("a.txt", b"a")), ("files", ("b.txt", b"b"))])
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["uploaded_count"] == 1
+        assert data["failed_count"] == 1
+        items, bucket, max_workers = mock_upload.call_args.args
+        assert [name for name, _ in items] == ["a.txt", "b.txt"]
+        assert bucket == "test-bucket"
+
+
+class TestPoolStatsEndpoint:
+    
+    @patch('my_services.get_pool_stats')
+    def test_pool_stats(self, mock_stats, client):
+        mock_stats.return_value = [{
+            "region_name": "us-east-1", "endpoint_url": None, "max_pool_connections": 50,
+            "in_flight": 3, "peak_in_flight": 12, "requests": 100, "saturated_requests": 0,
+        }]
+        
+        response = client.get("/stats/pool/")
+        
+        assert response.status_code == 200
+        assert response.json()[0]["peak_in_flight"] == 12
+
+
+class TestMetadataEndpoint:
+    
+    @patch('my_services.head_file_in_s3')
+    def test_metadata_success(self, mock_head, client):
+        mock_head.return_value = {"size": 12, "etag": '"abc"', "last_modified": None,
+                                  "content_type": "text/plain"}
+        
+        response = client.get("/metadata/", params={"bucket": "test-bucket", "object_name": "a.txt"})
+        
+        assert response.status_code == 200
+        assert response.json()["size"] == 12
+        mock_head.assert_called_once_with("test-bucket", "a.txt")
+    
+    @patch('my_services.head_file_in_s3')
+    def test_metadata_not_found(self, mock_head, client):
+        mock_head.return_value = None
+        
+        response = client.get("/metadata/", params={"bucket": "test-bucket", "object_name": "a.txt"})
+        
+        assert response.status_code == 404
+    
+    @patch('my_services.head_file_in_s3')
+    def test_metadata_service_unavailable(self, mock_head, client):
+        mock_head.side_effect = ServiceUnavailable("S3 is unavailable, retry later", "InternalError", 1)
+        
+        response = client.get("/metadata/", params={"bucket": "test-bucket", "object_name": "a.txt"})
+        
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+
+
+class TestCacheStatsEndpoint:
+    
+    def test_cache_stats(self, client):
+        response = client.get("/stats/cache/")
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["enabled"] is True
+        assert set(data["listing"]) >= {"hits", "misses", "evictions", "size"}
+        assert data["disk"] is None
+    
+    def test_disk_cache_stats_when_enabled(self, client, tmp_path):
+        with patch('my_services.disk_cache', DiskCache(str(tmp_path), max_bytes=1024, policy="lfu")):
+            response = client.get("/stats/cache/")
+        
+        assert response.json()["disk"]["max_bytes"] == 1024
+        assert response.json()["disk"]["policy"] == "lfu"
+
+
+class TestMetricsEndpoint:
+    
+    @patch('my_services.list_files_in_s3')
+    def test_requests_are_counted_per_route_template(self, mock_list, client):
+        mock_list.return_value = ["a.txt"]
+        client.get("/list/?bucket=test-bucket")
+        
+        response = client.get("/metrics")
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert 'http_requests_total{method="GET",route="/list/",status="200"}' in response.text
+        assert 'http_response_bytes_total{method="GET",route="/list/"}' in response.text
+        assert "s3_pool_max_connections" in response.text
+    
+    def test_unknown_paths_share_one_label(self, client):
+        client.get("/no/such/path/")
+        
+        response = client.get("/metrics")
+        
+        assert 'route="unmatched",status="404"' in response.text
+        assert "/no/such/path/" not in response.text
+
+
 class TestEndToEndWorkflow:
     
-    @patch('my_services.upload_file_to_s3')
+    @patch('my_services.upload_fileobj_to_s3')
     @patch('my_services.list_files_in_s3')
     @patch('my_services.download_file_from_s3')
     @patch('my_services.delete_file_from_s3')
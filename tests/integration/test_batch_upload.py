@@ -0,0 +1,83 @@
+import io
+import tarfile
+import zipfile
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+
+
+@pytest.fixture
+def client_with_bucket(mock_s3_service):
+    s3_client, bucket_name = mock_s3_service
+    with patch('my_services.s3_client', s3_client):
+        yield TestClient(app), s3_client, bucket_name
+
+
+def _tar_archive(members):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as tar_file:
+        directory = tarfile.TarInfo("docs")
+        directory.type = tarfile.DIRTYPE
+        tar_file.addfile(directory)
+        for name, body in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(body)
+            tar_file.addfile(info, io.BytesIO(body))
+    return buffer.getvalue()
+
+
+def _zip_archive(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zip_file:
+        zip_file.writestr("docs/", b"")
+        for name, body in members.items():
+            zip_file.writestr(name, body)
+    return buffer.getvalue()
+
+
+class TestBatchUploadWithMoto:
+
+    def test_multipart_files_are_uploaded(self, client_with_bucket):
+        client, s3_client, bucket_name = client_with_bucket
+        files = [("files", (f"file-{i}.txt", f"body {i}".encode())) for i in range(25)]
+
+        response = client.post(f"/upload/batch/?bucket={bucket_name}&prefix=batch/", files=files)
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["uploaded_count"] == 25
+        assert [r["object_name"] for r in data["results"]] == [f"batch/file-{i}.txt" for i in range(25)]
+        body = s3_client.get_object(Bucket=bucket_name, Key="batch/file-7.txt")["Body"].read()
+        assert body == b"body 7"
+
+    @pytest.mark.parametrize("build_archive, filename", [(_tar_archive, "docs.tar.gz"),
+                                                         (_zip_archive, "docs.zip")])
+    def test_archive_members_are_uploaded(self, client_with_bucket, build_archive, filename):
+        client, s3_client, bucket_name = client_with_bucket
+        members = {"docs/a.txt": b"alpha", "docs/sub/b.txt": b"beta"}
+
+        response = client.post(f"/upload/batch/?bucket={bucket_name}&prefix=unpacked/",
+                               files={"archive": (filename, build_archive(members))})
+
+        assert response.status_code == 200
+        assert response.json()["uploaded_count"] == 2
+        body = s3_client.get_object(Bucket=bucket_name, Key="unpacked/docs/sub/b.txt")["Body"].read()
+        assert body == b"beta"
+
+    def test_unreadable_archive_is_rejected(self, client_with_bucket):
+        client, _, bucket_name = client_with_bucket
+
+        response = client.post(f"/upload/batch/?bucket={bucket_name}",
+                               files={"archive": ("junk.tar", b"not an archive")})
+
+        assert response.status_code == 400
+
+    def test_files_and_archive_are_mutually_exclusive(self, client_with_bucket):
+        client, _, bucket_name = client_with_bucket
+
+        response = client.post(f"/upload/batch/?bucket={bucket_name}")
+
+        assert response.status_code == 400
@@ -0,0 +1,51 @@
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+
+
+@pytest.fixture
+def client_with_keys(mock_s3_service):
+    s3_client, bucket_name = mock_s3_service
+    for i in range(1200):
+        s3_client.put_object(Bucket=bucket_name, Key=f"tmp/{i:04d}", Body=b"")
+    s3_client.put_object(Bucket=bucket_name, Key="keep.txt", Body=b"")
+    with patch('my_services.s3_client', s3_client):
+        yield TestClient(app), s3_client, bucket_name
+
+
+def _remaining_keys(s3_client, bucket_name):
+    paginator = s3_client.get_paginator('list_objects_v2')
+    return [obj['Key'] for page in paginator.paginate(Bucket=bucket_name) for obj in page.get('Contents', [])]
+
+
+class TestBulkDeleteWithMoto:
+
+    def test_delete_by_prefix_spans_batches(self, client_with_keys):
+        client, s3_client, bucket_name = client_with_keys
+
+        response = client.post("/delete/bulk/", json={"bucket_name": bucket_name, "prefix": "tmp/"})
+
+        assert response.status_code == 200
+        assert response.json()["deleted_count"] == 1200
+        assert _remaining_keys(s3_client, bucket_name) == ["keep.txt"]
+
+    def test_delete_by_keys(self, client_with_keys):
+        client, s3_client, bucket_name = client_with_keys
+        keys = [f"tmp/{i:04d}" for i in range(0, 1200, 2)]
+
+        response = client.post("/delete/bulk/", json={"bucket_name": bucket_name, "keys": keys})
+
+        data = response.json()
+        assert data["deleted_count"] == 600
+        assert data["failed_count"] == 0
+        assert len(_remaining_keys(s3_client, bucket_name)) == 601
+
+    def test_delete_by_prefix_in_missing_bucket(self, client_with_keys):
+        client, _, _ = client_with_keys
+
+        response = client.post("/delete/bulk/", json={"bucket_name": "no-such-bucket", "prefix": "tmp/"})
+
+        assert response.status_code == 404
@@ -0,0 +1,174 @@
+import gzip
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+import my_services
+from main import app
+
+
+LOG = b"2024-01-01T00:00:00Z INFO GET /health 200 1ms\n" * 5000
+
+
+@pytest.fixture
+def client_with_bucket(mock_s3_service):
+    s3_client, bucket_name = mock_s3_service
+    with patch('my_services.s3_client', s3_client):
+        yield TestClient(app), s3_client, bucket_name
+
+
+def _stored(s3_client, bucket_name, key):
+    return s3_client.get_object(Bucket=bucket_name, Key=key)
+
+
+class TestCompressedUploadWithMoto:
+
+    def test_upload_with_gzip_stores_encoded_object(self, client_with_bucket):
+        client, s3_client, bucket_name = client_with_bucket
+
+        response = client.post(f"/upload/?bucket={bucket_name}&compression=gzip",
+                               files={"file_upload": ("app.log", LOG, "text/plain")})
+
+        assert response.status_code == 200
+        assert response.json()["content_encoding"] == "gzip"
+        stored = _stored(s3_client, bucket_name, "app.log")
+        body = stored["Body"].read()
+        assert response.json()["bytes_transferred"] == len(body) < len(LOG) // 10
+        assert gzip.decompress(body) == LOG
+        assert stored["ContentEncoding"] == "gzip"
+        assert stored["ContentType"] == "text/plain"
+        assert stored["Metadata"]["original-size"] == str(len(LOG))
+
+    def test_configured_compression_only_applies_to_listed_types(self, client_with_bucket):
+        client, s3_client, bucket_name = client_with_bucket
+
+        with patch.object(my_services.settings, 'upload_compression', "gzip"):
+            client.post(f"/upload/?bucket={bucket_name}", files={"file_upload": ("a.json", b"{}" * 100,
+                                                                                 "application/json")})
+            client.post(f"/upload/?bucket={bucket_name}", files={"file_upload": ("a.png", b"\x89PNG",
+                                                                                 "image/png")})
+
+        assert _stored(s3_client, bucket_name, "a.json").get("ContentEncoding") == "gzip"
+        assert "ContentEncoding" not in _stored(s3_client, bucket_name, "a.png")
+
+    def test_unknown_compression_is_rejected(self, client_with_bucket):
+        client, _, bucket_name = client_with_bucket
+
+        response = client.post(f"/upload/?bucket={bucket_name}&compression=lz4",
+                               files={"file_upload": ("app.log", LOG)})
+
+        assert response.status_code == 400
+
+    def test_explicit_compression_with_dedup_is_rejected(self, client_with_bucket):
+        client, _, bucket_name = client_with_bucket
+
+        response = client.post(f"/upload/?bucket={bucket_name}&compression=gzip&dedup=true",
+                               files={"file_upload": ("app.log", LOG)})
+
+        assert response.status_code == 400
+
+    def test_upload_to_missing_bucket_is_404(self, client_with_bucket):
+        client, _, _ = client_with_bucket
+
+        response = client.post("/upload/?bucket=no-such-bucket&compression=gzip",
+                               files={"file_upload": ("app.log", LOG)})
+
+        assert response.status_code == 404
+        assert response.json()["detail"] == "Bucket not found"
+
+    def test_upload_file_to_s3_guesses_content_type(self, client_with_bucket, tmp_path):
+        _, s3_client, bucket_name = client_with_bucket
+        source = tmp_path / "app.log.txt"
+        source.write_bytes(LOG)
+
+        assert my_services.upload_file_to_s3(str(source), bucket_name, "app.log.txt", encoding="gzip")
+
+        stored = _stored(s3_client, bucket_name, "app.log.txt")
+        assert stored["ContentType"] == "text/plain"
+        assert gzip.decompress(stored["Body"].read()) == LOG
+
+    def test_stream_upload_compresses_chunks(self, client_with_bucket):
+        client, s3_client, bucket_name = client_with_bucket
+
+        response = client.put(f"/upload/stream/?bucket={bucket_name}&object_name=app.log&compression=gzip",
+                              content=iter([LOG[:100_000], LOG[100_000:]]),
+                              headers={"Content-Type": "text/plain"})
+
+        assert response.status_code == 200
+        stored = _stored(s3_client, bucket_name, "app.log")
+        assert gzip.decompress(stored["Body"].read()) == LOG
+        assert stored["ContentEncoding"] == "gzip"
+
+
+class TestCompressedDownloadWithMoto:
+
+    @pytest.fixture
+    def encoded_object(self, client_with_bucket):
+        client, s3_client, bucket_name = client_with_bucket
+        client.post(f"/upload/?bucket={bucket_name}&compression=gzip",
+                    files={"file_upload": ("app.log", LOG, "text/plain")})
+        return client, bucket_name
+
+    def test_client_accepting_gzip_gets_stored_bytes(self, encoded_object):
+        client, bucket_name = encoded_object
+
+        with client.stream("GET", f"/download/stream/?bucket={bucket_name}&object_name=app.log",
+                           headers={"Accept-Encoding": "gzip"}) as response:
+            raw = b"".join(response.iter_raw())
+
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["vary"] == "Accept-Encoding"
+        assert gzip.decompress(raw) == LOG
+
+    def test_client_without_gzip_gets_decompressed_body(self, encoded_object):
+        client, bucket_name = encoded_object
+
+        with client.stream("GET", f"/download/stream/?bucket={bucket_name}&object_name=app.log",
+                           headers={"Accept-Encoding": "identity"}) as response:
+            raw = b"".join(response.iter_raw())
+
+        assert "content-encoding" not in response.headers
+        assert response.headers["content-length"] == str(len(LOG))
+        assert raw == LOG
+
+    def test_decompressed_body_carries_a_weak_etag(self, encoded_object):
+        client, bucket_name = encoded_object
+        url = f"/download/stream/?bucket={bucket_name}&object_name=app.log"
+        stored = client.get(url, headers={"Accept-Encoding": "gzip"}).headers["etag"]
+
+        decoded = client.get(url, headers={"Accept-Encoding": "identity"})
+        not_modified = client.get(url, headers={"Accept-Encoding": "identity",
+                                                "If-None-Match": decoded.headers["etag"]})
+
+        assert not stored.startswith("W/")
+        assert decoded.headers["etag"] == "W/" + stored
+        assert not_modified.status_code == 304
+        assert not_modified.headers["etag"] == "W/" + stored
+
+    def test_range_request_addresses_stored_bytes(self, encoded_object):
+        client, bucket_name = encoded_object
+
+        with client.stream("GET", f"/download/stream/?bucket={bucket_name}&object_name=app.log",
+                           headers={"Accept-Encoding": "identity", "Range": "bytes=0-1"}) as response:
+            raw = b"".join(response.iter_raw())
+
+        assert response.status_code == 206
+        assert response.headers["content-encoding"] == "gzip"
+        assert raw == b"\x1f\x8b"
+
+    def test_download_to_file_decompresses(self, encoded_object, tmp_path):
+        _, bucket_name = encoded_object
+        target = tmp_path / "app.log"
+
+        assert my_services.download_file_from_s3(bucket_name, "app.log", str(target), decompress=True)
+
+        assert target.read_bytes() == LOG
+
+    def test_download_to_file_keeps_encoding_by_default(self, encoded_object, tmp_path):
+        _, bucket_name = encoded_object
+        target = tmp_path / "app.log.gz"
+
+        assert my_services.download_file_from_s3(bucket_name, "app.log", str(target))
+
+        assert gzip.decompress(target.read_bytes()) == LOG
@@ -0,0 +1,159 @@
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+import my_services
+from main import app
+
+
+MIB = 1024 * 1024
+
+
+@pytest.fixture
+def client_with_buckets(mock_s3_service):
+    s3_client, bucket_name = mock_s3_service
+    s3_client.create_bucket(Bucket="archive-bucket")
+    for i in range(12):
+        s3_client.put_object(Bucket=bucket_name, Key=f"incoming/{i:02d}.txt", Body=f"file {i}".encode())
+    with patch('my_services.s3_client', s3_client):
+        yield TestClient(app), s3_client, bucket_name
+
+
+def _keys(s3_client, bucket_name, prefix=""):
+    response = s3_client.list_objects_v2(Bucket=bucket_name, Prefix=prefix)
+    return [obj["Key"] for obj in response.get("Contents", [])]
+
+
+class TestCopyWithMoto:
+
+    def test_copy_single_object_to_other_bucket(self, client_with_buckets):
+        client, s3_client, bucket_name = client_with_buckets
+
+        response = client.post("/copy/", json={
+            "source_bucket": bucket_name, "source_key": "incoming/01.txt",
+            "bucket_name": "archive-bucket", "object_name": "2024/01.txt"})
+
+        assert response.status_code == 200
+        assert response.json()["copied_count"] == 1
+        assert s3_client.get_object(Bucket="archive-bucket", Key="2024/01.txt")["Body"].read() == b"file 1"
+        assert "incoming/01.txt" in _keys(s3_client, bucket_name)
+
+    def test_move_single_object_deletes_source(self, client_with_buckets):
+        client, s3_client, bucket_name = client_with_buckets
+
+        response = client.post("/move/", json={
+            "source_bucket": bucket_name, "source_key": "incoming/01.txt", "object_name": "done/01.txt"})
+
+        assert response.status_code == 200
+        assert "incoming/01.txt" not in _keys(s3_client, bucket_name)
+        assert s3_client.get_object(Bucket=bucket_name, Key="done/01.txt")["Body"].read() == b"file 1"
+
+    def test_copy_missing_object_is_not_found(self, client_with_buckets):
+        client, _, bucket_name = client_with_buckets
+
+        response = client.post("/copy/", json={
+            "source_bucket": bucket_name, "source_key": "missing.txt", "object_name": "copy.txt"})
+
+        assert response.status_code == 404
+        assert response.json() == {"detail": "File not found"}
+
+    def test_move_onto_itself_is_rejected(self, client_with_buckets):
+        client, s3_client, bucket_name = client_with_buckets
+
+        response = client.post("/move/", json={
+            "source_bucket": bucket_name, "source_key": "incoming/01.txt", "object_name": "incoming/01.txt"})
+
+        assert response.status_code == 400
+        assert "incoming/01.txt" in _keys(s3_client, bucket_name)
+
+    def test_prefix_copy(self, client_with_buckets):
+        client, s3_client, bucket_name = client_with_buckets
+
+        response = client.post("/copy/?max_workers=4", json={
+            "source_bucket": bucket_name, "source_prefix": "incoming/",
+            "bucket_name": "archive-bucket", "prefix": "backup/incoming/"})
+
+        assert response.json()["copied_count"] == 12
+        assert _keys(s3_client, "archive-bucket") == [f"backup/incoming/{i:02d}.txt" for i in range(12)]
+
+    def test_prefix_move(self, client_with_buckets):
+        client, s3_client, bucket_name = client_with_buckets
+
+        response = client.post("/move/", json={
+            "source_bucket": bucket_name, "source_prefix": "incoming/", "prefix": "processed/"})
+
+        assert response.json()["copied_count"] == 12
+        assert _keys(s3_client, bucket_name, "incoming/") == []
+        assert len(_keys(s3_client, bucket_name, "processed/")) == 12
+
+    def test_prefix_move_deletes_sources_batch_by_batch(self, client_with_buckets):
+        client, s3_client, bucket_name = client_with_buckets
+        batches = []
+
+        def delete_batch(bucket, names):
+            batches.append(len(names))
+            return delete_batch.wrapped(bucket, names)
+
+        delete_batch.wrapped = my_services._delete_batch
+        with patch('my_services.DELETE_BATCH_SIZE', 5), patch('my_services._delete_batch', delete_batch):
+            response = client.post("/move/", json={
+                "source_bucket": bucket_name, "source_prefix": "incoming/", "prefix": "processed/"})
+
+        assert response.json()["copied_count"] == 12
+        assert response.json()["results"] == []
+        assert batches == [5, 5, 2]
+        assert _keys(s3_client, bucket_name, "incoming/") == []
+
+    def test_prefix_copy_lists_capped_failures(self, client_with_buckets):
+        client, _, bucket_name = client_with_buckets
+
+        with patch('my_services.FAILURE_LIMIT', 2):
+            response = client.post("/copy/", json={
+                "source_bucket": bucket_name, "source_prefix": "incoming/",
+                "bucket_name": "no-such-bucket", "prefix": "incoming/"})
+
+        data = response.json()
+        assert response.status_code == 200
+        assert (data["copied_count"], data["failed_count"]) == (0, 12)
+        assert [result["source_key"] for result in data["results"]] == ["incoming/00.txt", "incoming/01.txt"]
+
+    @pytest.mark.parametrize("route", ["/copy/", "/move/"])
+    def test_prefix_copy_from_missing_bucket_is_not_found(self, client_with_buckets, route):
+        client, _, _ = client_with_buckets
+
+        response = client.post(route, json={
+            "source_bucket": "no-such-bucket", "source_prefix": "incoming/", "prefix": "processed/"})
+
+        assert response.status_code == 404
+
+    def test_prefix_copy_into_itself_is_rejected(self, client_with_buckets):
+        client, _, bucket_name = client_with_buckets
+
+        response = client.post("/copy/", json={
+            "source_bucket": bucket_name, "source_prefix": "incoming/", "prefix": "incoming/again/"})
+
+        assert response.status_code == 400
+
+
+class TestLargeObjectCopyWithMoto:
+
+    def test_large_object_is_copied_in_parallel_parts(self, client_with_buckets):
+        client, s3_client, bucket_name = client_with_buckets
+        body = bytes(range(256)) * (12 * MIB // 256)
+        s3_client.put_object(Bucket=bucket_name, Key="big.bin", Body=body, ContentType="video/mp4",
+                             Metadata={"owner": "media"})
+
+        with patch.object(my_services.settings, 'copy_multipart_threshold', 5 * MIB), \
+                patch.object(my_services.settings, 'copy_part_size', 5 * MIB), \
+                patch.object(my_services.s3_client, 'copy_object') as mock_copy_object:
+            response = client.post("/copy/", json={
+                "source_bucket": bucket_name, "source_key": "big.bin",
+                "bucket_name": "archive-bucket", "object_name": "big.bin"})
+
+        mock_copy_object.assert_not_called()
+        assert response.status_code == 200
+        copied = s3_client.get_object(Bucket="archive-bucket", Key="big.bin")
+        assert copied["Body"].read() == body
+        assert copied["ContentType"] == "video/mp4"
+        assert copied["Metadata"] == {"owner": "media"}
@@ -0,0 +1,105 @@
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+import my_services
+from main import app
+
+
+@pytest.fixture
+def client_with_bucket(mock_s3_service):
+    s3_client, bucket_name = mock_s3_service
+    with patch('my_services.s3_client', s3_client):
+        yield TestClient(app), s3_client, bucket_name
+
+
+def _upload(client, bucket_name, name, body):
+    response = client.post(f"/upload/?bucket={bucket_name}&dedup=true",
+                           files={"file_upload": (name, body)})
+    assert response.status_code == 200
+    return response.json()
+
+
+class TestDedupWithMoto:
+
+    def test_first_upload_transfers_and_stores_digest(self, client_with_bucket):
+        client, s3_client, bucket_name = client_with_bucket
+
+        result = _upload(client, bucket_name, "a.txt", b"same content")
+
+        assert result["deduplicated"] is False
+        assert result["bytes_transferred"] == 12
+        metadata = s3_client.head_object(Bucket=bucket_name, Key="a.txt")["Metadata"]
+        assert metadata["sha256"] == result["sha256"]
+
+    def test_reupload_to_same_key_is_skipped(self, client_with_bucket):
+        client, _, bucket_name = client_with_bucket
+        _upload(client, bucket_name, "a.txt", b"same content")
+        my_services.dedup_index.clear()
+
+        result = _upload(client, bucket_name, "a.txt", b"same content")
+
+        assert result["deduplicated"] is True
+        assert result["bytes_transferred"] == 0
+        assert my_services.get_dedup_stats()["bytes_saved"] == 12
+
+    def test_same_content_under_new_key_is_copied_server_side(self, client_with_bucket):
+        client, s3_client, bucket_name = client_with_bucket
+        _upload(client, bucket_name, "a.txt", b"same content")
+
+        with patch.object(my_services.s3_client, 'upload_fileobj') as mock_upload:
+            result = _upload(client, bucket_name, "b.txt", b"same content")
+
+        mock_upload.assert_not_called()
+        assert result["deduplicated"] is True
+        assert s3_client.get_object(Bucket=bucket_name, Key="b.txt")["Body"].read() == b"same content"
+
+    def test_stale_index_entry_falls_back_to_upload(self, client_with_bucket):
+        client, s3_client, bucket_name = client_with_bucket
+        _upload(client, bucket_name, "a.txt", b"same content")
+        s3_client.put_object(Bucket=bucket_name, Key="a.txt", Body=b"overwritten elsewhere")
+
+        result = _upload(client, bucket_name, "b.txt", b"same content")
+
+        assert result["deduplicated"] is False
+        assert s3_client.get_object(Bucket=bucket_name, Key="b.txt")["Body"].read() == b"same content"
+
+    def test_changed_content_is_uploaded(self, client_with_bucket):
+        client, s3_client, bucket_name = client_with_bucket
+        _upload(client, bucket_name, "a.txt", b"version 1")
+
+        result = _upload(client, bucket_name, "a.txt", b"version 2")
+
+        assert result["deduplicated"] is False
+        assert s3_client.get_object(Bucket=bucket_name, Key="a.txt")["Body"].read() == b"version 2"
+
+    def test_upload_to_missing_bucket_is_404(self, client_with_bucket):
+        client, _, _ = client_with_bucket
+
+        response = client.post("/upload/?bucket=no-such-bucket&dedup=true",
+                               files={"file_upload": ("a.txt", b"same content")})
+
+        assert response.status_code == 404
+        assert response.json()["detail"] == "Bucket not found"
+
+    def test_streaming_upload_is_hashed_while_received(self, client_with_bucket):
+        client, _, bucket_name = client_with_bucket
+        _upload(client, bucket_name, "a.txt", b"same content")
+
+        response = client.put(f"/upload/stream/?bucket={bucket_name}&object_name=c.txt&dedup=true",
+                              content=iter([b"same ", b"content"]))
+
+        assert response.status_code == 200
+        assert response.json()["deduplicated"] is True
+
+    def test_dedup_stats_endpoint(self, client_with_bucket):
+        client, _, bucket_name = client_with_bucket
+        _upload(client, bucket_name, "a.txt", b"same content")
+        _upload(client, bucket_name, "b.txt", b"same content")
+
+        stats = client.get("/stats/dedup/").json()
+
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["bytes_saved"] == 12
@@ -0,0 +1,114 @@
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+import my_services
+from main import app
+from my_disk_cache import DiskCache
+
+
+@pytest.fixture
+def cached_client(mock_s3_service, tmp_path):
+    s3_client, bucket_name = mock_s3_service
+    s3_client.put_object(Bucket=bucket_name, Key="logo.png", Body=b"png bytes" * 100, ContentType="image/png")
+    cache = DiskCache(str(tmp_path / "cache"), max_bytes=1024 * 1024)
+    with patch('my_services.s3_client', s3_client), patch('my_services.disk_cache', cache), \
+            patch.object(s3_client, 'get_object', wraps=s3_client.get_object) as get_object:
+        yield TestClient(app), s3_client, bucket_name, cache, get_object
+
+
+def _download(client, bucket_name, name="logo.png", **headers):
+    return client.get(f"/download/stream/?bucket={bucket_name}&object_name={name}", headers=headers)
+
+
+class TestDiskCacheWithMoto:
+
+    def test_repeated_downloads_hit_s3_once(self, cached_client):
+        client, _, bucket_name, cache, get_object = cached_client
+
+        responses = [_download(client, bucket_name) for _ in range(3)]
+
+        assert all(r.content == b"png bytes" * 100 for r in responses)
+        assert responses[-1].headers["content-type"] == "image/png"
+        assert responses[-1].headers["etag"] == responses[0].headers["etag"]
+        assert get_object.call_count == 1
+        assert cache.stats()["hits"] == 2
+
+    def test_range_and_conditional_requests_are_served_from_disk(self, cached_client):
+        client, _, bucket_name, _, get_object = cached_client
+        etag = _download(client, bucket_name).headers["etag"]
+
+        ranged = _download(client, bucket_name, Range="bytes=0-2")
+        not_modified = _download(client, bucket_name, **{"If-None-Match": etag})
+
+        weak_not_modified = _download(client, bucket_name, **{"If-None-Match": "W/" + etag})
+
+        assert ranged.status_code == 206
+        assert ranged.content == b"png"
+        assert not_modified.status_code == 304
+        assert not_modified.headers["etag"] == etag
+        assert weak_not_modified.status_code == 304
+        assert weak_not_modified.headers["etag"] == "W/" + etag
+        assert get_object.call_count == 1
+
+    def test_stale_entry_is_revalidated_without_a_transfer(self, cached_client):
+        client, _, bucket_name, cache, get_object = cached_client
+        _download(client, bucket_name)
+
+        with patch.object(my_services.settings, 'disk_cache_revalidate_seconds', 0):
+            response = _download(client, bucket_name)
+
+        assert response.content == b"png bytes" * 100
+        assert get_object.call_count == 1
+        assert cache.stats()["revalidations"] == 1
+
+    def test_object_changed_behind_our_back_is_refetched(self, cached_client):
+        client, s3_client, bucket_name, _, get_object = cached_client
+        _download(client, bucket_name)
+        s3_client.put_object(Bucket=bucket_name, Key="logo.png", Body=b"new logo")
+        my_services.metadata_cache.clear()
+
+        with patch.object(my_services.settings, 'disk_cache_revalidate_seconds', 0):
+            response = _download(client, bucket_name)
+
+        assert response.content == b"new logo"
+        assert get_object.call_count == 2
+
+    def test_upload_through_the_service_invalidates_the_entry(self, cached_client):
+        client, _, bucket_name, cache, _ = cached_client
+        _download(client, bucket_name)
+
+        client.post(f"/upload/?bucket={bucket_name}", files={"file_upload": ("logo.png", b"replaced")})
+
+        assert len(cache) == 0
+        assert _download(client, bucket_name).content == b"replaced"
+
+    def test_missing_object_is_not_cached(self, cached_client):
+        client, _, bucket_name, cache, _ = cached_client
+
+        assert _download(client, bucket_name, "missing.png").status_code == 404
+        assert len(cache) == 0
+
+    def test_download_to_file_copies_from_cache(self, cached_client, tmp_path):
+        _, _, bucket_name, _, get_object = cached_client
+
+        for name in ("first.png", "second.png"):
+            assert my_services.download_file_from_s3(bucket_name, "logo.png", str(tmp_path / name))
+
+        assert (tmp_path / "second.png").read_bytes() == b"png bytes" * 100
+        assert get_object.call_count == 1
+
+    def test_encoded_object_is_decoded_from_cache(self, cached_client):
+        client, _, bucket_name, _, get_object = cached_client
+        log = b"GET /health 200\n" * 1000
+        client.post(f"/upload/?bucket={bucket_name}&compression=gzip",
+                    files={"file_upload": ("app.log", log, "text/plain")})
+
+        for _ in range(2):
+            with client.stream("GET", f"/download/stream/?bucket={bucket_name}&object_name=app.log",
+                               headers={"Accept-Encoding": "identity"}) as response:
+                raw = b"".join(response.iter_raw())
+            assert raw == log
+            assert response.headers["content-length"] == str(len(log))
+        assert get_object.call_count == 1
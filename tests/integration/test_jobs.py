@@ -0,0 +1,177 @@
+import os
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+import my_services
+from main import app
+from my_jobs import JobQueue, JobStore
+
+
+MIB = 1024 * 1024
+
+
+@pytest.fixture
+def jobs_client(mock_s3_service, tmp_path):
+    s3_client, bucket_name = mock_s3_service
+    store = JobStore(str(tmp_path / "jobs.db"))
+    queue = JobQueue(store, my_services.JOB_EXECUTORS)
+    with patch('my_services.s3_client', s3_client), patch('my_services.job_queue', queue), \
+            patch.object(my_services.settings, 'jobs_dir', str(tmp_path / "jobs")), \
+            patch.object(my_services.settings, 'download_dir', str(tmp_path / "downloads")):
+        yield TestClient(app), s3_client, bucket_name, queue, tmp_path
+    store.close()
+
+
+def _run_queued(queue):
+    """Run every queued job on the calling thread, like a worker would."""
+    while True:
+        job = queue.store.claim(queue.bucket_limit, os.getpid())
+        if job is None:
+            return
+        queue.execute(job)
+
+
+def _job(client, job_id):
+    response = client.get(f"/jobs/{job_id}/")
+    assert response.status_code == 200
+    return response.json()
+
+
+class TestJobsWithMoto:
+
+    def test_upload_job_reports_progress_and_removes_its_body(self, jobs_client):
+        client, s3_client, bucket_name, queue, tmp_path = jobs_client
+        body = os.urandom(6 * MIB)
+
+        with patch.object(my_services.settings, 'multipart_threshold', 5 * MIB), \
+                patch.object(my_services.settings, 'multipart_chunksize', 5 * MIB):
+            response = client.put(f"/jobs/upload/?bucket={bucket_name}&object_name=big.bin", content=body)
+            assert response.status_code == 202
+            assert response.json()["state"] == "queued"
+            job_id = response.json()["job_id"]
+            _run_queued(queue)
+
+        job = _job(client, job_id)
+        assert job["state"] == "succeeded"
+        assert (job["bytes_done"], job["bytes_total"]) == (len(body), len(body))
+        assert (job["parts_done"], job["parts_total"]) == (2, 2)
+        assert job["result"] == {"object_name": "big.bin", "size": len(body)}
+        assert s3_client.get_object(Bucket=bucket_name, Key="big.bin")["Body"].read() == body
+        assert os.listdir(tmp_path / "jobs") == []
+
+    def test_prefix_copy_and_move_jobs(self, jobs_client):
+        client, s3_client, bucket_name, queue, _ = jobs_client
+        for name in ("a.txt", "b.txt", "c.txt"):
+            s3_client.put_object(Bucket=bucket_name, Key=f"src/{name}", Body=name.encode())
+
+        copy_id = client.post("/jobs/copy/", json={"source_bucket": bucket_name, "source_prefix": "src/",
+                                                   "prefix": "copy/"}).json()["job_id"]
+        _run_queued(queue)
+        move_id = client.post("/jobs/move/", json={"source_bucket": bucket_name, "source_key": "copy/a.txt",
+                                                   "object_name": "moved/a.txt"}).json()["job_id"]
+        _run_queued(queue)
+
+        copied = _job(client, copy_id)
+        assert copied["state"] == "succeeded"
+        assert copied["parts_done"] == 3
+        assert copied["result"] == {"copied_count": 3, "failed_count": 0, "failures": []}
+        moved = _job(client, move_id)
+        assert moved["state"] == "succeeded"
+        assert (moved["bytes_done"], moved["parts_done"]) == (5, 1)
+        keys = {obj["Key"] for obj in s3_client.list_objects_v2(Bucket=bucket_name)["Contents"]}
+        assert keys == {"src/a.txt", "src/b.txt", "src/c.txt", "copy/b.txt", "copy/c.txt", "moved/a.txt"}
+
+    def test_prefix_copy_job_lists_capped_failures(self, jobs_client):
+        client, s3_client, bucket_name, queue, _ = jobs_client
+        for i in range(5):
+            s3_client.put_object(Bucket=bucket_name, Key=f"src/{i}.txt", Body=b"x")
+
+        job_id = client.post("/jobs/copy/", json={"source_bucket": bucket_name, "source_prefix": "src/",
+                                                  "bucket_name": "no-such-bucket",
+                                                  "prefix": "copy/"}).json()["job_id"]
+        with patch('my_services.FAILURE_LIMIT', 2):
+            _run_queued(queue)
+
+        job = _job(client, job_id)
+        assert job["state"] == "succeeded"
+        assert (job["result"]["copied_count"], job["result"]["failed_count"]) == (0, 5)
+        assert [failure["source_key"] for failure in job["result"]["failures"]] == ["src/0.txt", "src/1.txt"]
+        assert job["parts_done"] == 5
+
+    def test_delete_job_by_prefix(self, jobs_client):
+        client, s3_client, bucket_name, queue, _ = jobs_client
+        for i in range(5):
+            s3_client.put_object(Bucket=bucket_name, Key=f"logs/{i}.log", Body=b"x")
+        s3_client.put_object(Bucket=bucket_name, Key="keep.txt", Body=b"x")
+
+        response = client.post("/jobs/delete/", json={"bucket_name": bucket_name, "prefix": "logs/"})
+        _run_queued(queue)
+
+        job = _job(client, response.json()["job_id"])
+        assert job["result"] == {"deleted_count": 5, "failed_count": 0, "failures": []}
+        assert job["parts_done"] == 5
+        remaining = s3_client.list_objects_v2(Bucket=bucket_name)["Contents"]
+        assert [obj["Key"] for obj in remaining] == ["keep.txt"]
+
+    def test_delete_job_by_prefix_in_missing_bucket_fails(self, jobs_client):
+        client, _, _, queue, _ = jobs_client
+
+        response = client.post("/jobs/delete/", json={"bucket_name": "no-such-bucket", "prefix": "logs/"})
+        _run_queued(queue)
+
+        job = _job(client, response.json()["job_id"])
+        assert job["state"] == "failed"
+        assert job["result"] is None
+
+    def test_download_job_writes_into_download_dir(self, jobs_client):
+        client, s3_client, bucket_name, queue, tmp_path = jobs_client
+        s3_client.put_object(Bucket=bucket_name, Key="exports/q1.csv", Body=b"a,b\n")
+
+        job_id = client.post("/jobs/download/", json={"bucket_name": bucket_name,
+                                                      "object_name": "exports/q1.csv"}).json()["job_id"]
+        _run_queued(queue)
+
+        job = _job(client, job_id)
+        assert job["state"] == "succeeded"
+        assert job["result"]["file_path"] == str(tmp_path / "downloads" / "exports" / "q1.csv")
+        assert (tmp_path / "downloads" / "exports" / "q1.csv").read_bytes() == b"a,b\n"
+
+    def test_failed_job_reports_its_error(self, jobs_client):
+        client, _, bucket_name, queue, _ = jobs_client
+
+        job_id = client.post("/jobs/copy/", json={"source_bucket": bucket_name, "source_key": "missing.txt",
+                                                  "object_name": "copy.txt"}).json()["job_id"]
+        _run_queued(queue)
+
+        job = _job(client, job_id)
+        assert job["state"] == "failed"
+        assert job["error"] == "Source object not found"
+        assert job["attempts"] == 1
+
+    def test_cancel_list_and_errors(self, jobs_client):
+        client, _, bucket_name, queue, tmp_path = jobs_client
+        queued = client.put(f"/jobs/upload/?bucket={bucket_name}&object_name=a.bin&priority=5",
+                            content=b"data").json()
+
+        assert queued["priority"] == 5
+        assert [job["job_id"] for job in client.get("/jobs/?state=queued").json()] == [queued["job_id"]]
+        assert client.delete(f"/jobs/{queued['job_id']}/").json()["state"] == "cancelled"
+        assert os.listdir(tmp_path / "jobs") == []
+        assert client.delete(f"/jobs/{queued['job_id']}/").status_code == 409
+        assert client.get("/jobs/unknown/").status_code == 404
+        assert client.delete("/jobs/unknown/").status_code == 404
+        assert client.get("/jobs/?state=paused").status_code == 400
+
+    def test_invalid_targets_are_rejected_before_queueing(self, jobs_client):
+        client, _, bucket_name, queue, _ = jobs_client
+
+        traversal = client.post("/jobs/download/", json={"bucket_name": bucket_name, "object_name": "../x"})
+        same_object = client.post("/jobs/move/", json={"source_bucket": bucket_name, "source_key": "a",
+                                                       "object_name": "a"})
+        nested_prefix = client.post("/jobs/copy/", json={"source_bucket": bucket_name, "source_prefix": "a/",
+                                                         "prefix": "a/b/"})
+
+        assert [r.status_code for r in (traversal, same_object, nested_prefix)] == [400, 400, 400]
+        assert queue.store.list_jobs() == []
@@ -0,0 +1,129 @@
+import json
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from my_schemas import FileListResponse
+
+
+KEYS = sorted([f"logs/2024/{i:03d}.log" for i in range(20)] +
+              [f"logs/2025/{i:03d}.log" for i in range(5)] +
+              ["readme.txt"])
+
+
+@pytest.fixture
+def client_with_keys(mock_s3_service):
+    s3_client, bucket_name = mock_s3_service
+    for key in KEYS:
+        s3_client.put_object(Bucket=bucket_name, Key=key, Body=b"")
+    with patch('my_services.s3_client', s3_client):
+        yield TestClient(app), bucket_name
+
+
+class TestListingWithMoto:
+
+    def test_full_listing_follows_all_pages(self, client_with_keys):
+        client, bucket_name = client_with_keys
+
+        with patch.dict('os.environ', {'MOTO_S3_DEFAULT_MAX_KEYS': '7'}):
+            response = client.get(f"/list/?bucket={bucket_name}")
+
+        assert response.json()[0]["files"] == KEYS
+
+    def test_continuation_tokens_walk_every_key(self, client_with_keys):
+        client, bucket_name = client_with_keys
+        seen, token = [], None
+
+        while True:
+            url = f"/list/?bucket={bucket_name}&prefix=logs/&max_keys=10"
+            if token:
+                url += f"&continuation_token={token}"
+            page = client.get(url).json()[0]
+            seen += page["files"]
+            if not page["is_truncated"]:
+                break
+            token = page["next_continuation_token"]
+
+        assert seen == [key for key in KEYS if key.startswith("logs/")]
+
+    def test_delimiter_groups_common_prefixes(self, client_with_keys):
+        client, bucket_name = client_with_keys
+
+        page = client.get(f"/list/?bucket={bucket_name}&prefix=logs/&delimiter=/").json()[0]
+
+        assert page["files"] == []
+        assert page["common_prefixes"] == ["logs/2024/", "logs/2025/"]
+
+    def test_stream_mode_emits_every_key(self, client_with_keys):
+        client, bucket_name = client_with_keys
+
+        response = client.get(f"/list/?bucket={bucket_name}&stream=true&max_keys=4")
+
+        keys = [json.loads(line)["key"] for line in response.text.splitlines()]
+        assert keys == KEYS
+
+    def test_detail_lists_sizes_etags_and_modification_times(self, client_with_keys):
+        client, bucket_name = client_with_keys
+        client.put(f"/upload/stream/?bucket={bucket_name}&object_name=logs/big.bin", content=b"x" * 10)
+
+        page = client.get(f"/list/?bucket={bucket_name}&prefix=logs/&detail=true").json()[0]
+
+        assert page["files"] == []
+        objects = {entry["key"]: entry for entry in page["objects"]}
+        assert sorted(objects) == sorted([key for key in KEYS if key.startswith("logs/")] + ["logs/big.bin"])
+        assert objects["logs/big.bin"]["size"] == 10
+        assert objects["logs/big.bin"]["etag"].startswith('"')
+        assert objects["logs/big.bin"]["last_modified"].endswith("Z")
+        assert FileListResponse(**page).objects[0].key == "logs/2024/000.log"
+
+    def test_detail_single_page_and_stream(self, client_with_keys):
+        client, bucket_name = client_with_keys
+
+        page = client.get(f"/list/?bucket={bucket_name}&max_keys=2&detail=true").json()[0]
+        response = client.get(f"/list/?bucket={bucket_name}&stream=true&max_keys=4&detail=true")
+
+        assert [entry["key"] for entry in page["objects"]] == KEYS[:2]
+        assert page["is_truncated"] is True
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert [line["key"] for line in lines] == KEYS
+        assert set(lines[0]) == {"key", "size", "etag", "last_modified", "storage_class"}
+
+    def test_listing_keeps_every_response_field(self, client_with_keys):
+        client, bucket_name = client_with_keys
+
+        page = client.get(f"/list/?bucket={bucket_name}").json()[0]
+
+        assert page == FileListResponse(**page).model_dump(mode="json")
+        assert page["objects"] is None
+
+    def test_stream_mode_of_missing_bucket_is_not_found(self, client_with_keys):
+        client, _ = client_with_keys
+
+        response = client.get("/list/?bucket=missing-bucket&stream=true")
+
+        assert response.status_code == 404
+
+
+class TestListingCacheWithMoto:
+
+    def test_upload_through_api_shows_up_in_cached_listing(self, client_with_keys):
+        client, bucket_name = client_with_keys
+        before = client.get(f"/list/?bucket={bucket_name}&prefix=logs/2025/").json()[0]["files"]
+
+        client.post(f"/upload/?bucket={bucket_name}",
+                    files={"file_upload": ("logs/2025/new.log", b"data")})
+        after = client.get(f"/list/?bucket={bucket_name}&prefix=logs/2025/").json()[0]["files"]
+
+        assert "logs/2025/new.log" not in before
+        assert "logs/2025/new.log" in after
+
+    def test_delete_through_api_drops_key_from_cached_listing(self, client_with_keys):
+        client, bucket_name = client_with_keys
+        client.get(f"/list/?bucket={bucket_name}")
+
+        client.delete(f"/delete/?bucket={bucket_name}&object_name=readme.txt")
+        files = client.get(f"/list/?bucket={bucket_name}").json()[0]["files"]
+
+        assert "readme.txt" not in files
@@ -0,0 +1,74 @@
+from unittest.mock import patch
+
+import pytest
+import requests
+from fastapi.testclient import TestClient
+
+from main import app
+
+
+@pytest.fixture
+def client_with_bucket(mock_s3_service):
+    s3_client, bucket_name = mock_s3_service
+    with patch('my_services.s3_client', s3_client):
+        yield TestClient(app), s3_client, bucket_name
+
+
+class TestPresignWithMoto:
+
+    def test_presigned_put_then_get_round_trip(self, client_with_bucket):
+        client, s3_client, bucket_name = client_with_bucket
+
+        upload = client.post("/presign/upload/", json={
+            "bucket_name": bucket_name, "object_name": "media/a.txt", "content_type": "text/plain"}).json()
+        put = requests.put(upload["url"], data=b"direct to s3", headers=upload["headers"])
+        download = client.post("/presign/download/", json={
+            "bucket_name": bucket_name, "object_name": "media/a.txt"}).json()
+        get = requests.get(download["url"])
+
+        assert upload["method"] == "PUT"
+        assert put.status_code == 200
+        assert get.content == b"direct to s3"
+        assert s3_client.head_object(Bucket=bucket_name, Key="media/a.txt")["ContentType"] == "text/plain"
+
+    def test_presigned_multipart_upload(self, client_with_bucket):
+        client, s3_client, bucket_name = client_with_bucket
+        part_body = b"x" * (5 * 1024 * 1024)
+
+        upload = client.post("/presign/multipart/", json={
+            "bucket_name": bucket_name, "object_name": "media/big.bin", "part_count": 2}).json()
+        parts = []
+        for part, body in zip(upload["parts"], [part_body, b"tail"]):
+            response = requests.put(part["url"], data=body)
+            parts.append({"part_number": part["part_number"], "etag": response.headers["ETag"]})
+        response = client.post("/presign/multipart/complete/", json={
+            "bucket_name": bucket_name, "object_name": "media/big.bin",
+            "upload_id": upload["upload_id"], "parts": parts})
+
+        assert response.status_code == 200
+        obj = s3_client.head_object(Bucket=bucket_name, Key="media/big.bin")
+        assert obj["ContentLength"] == len(part_body) + 4
+
+    def test_abort_multipart_upload(self, client_with_bucket):
+        client, s3_client, bucket_name = client_with_bucket
+        upload = client.post("/presign/multipart/", json={
+            "bucket_name": bucket_name, "object_name": "media/big.bin", "part_count": 1}).json()
+
+        response = client.post("/presign/multipart/abort/", json={
+            "bucket_name": bucket_name, "object_name": "media/big.bin", "upload_id": upload["upload_id"]})
+
+        assert response.status_code == 200
+        assert "Uploads" not in s3_client.list_multipart_uploads(Bucket=bucket_name)
+
+    def test_disallowed_content_type_is_rejected(self, client_with_bucket):
+        client, _, bucket_name = client_with_bucket
+
+        with patch('my_services.settings.presign_content_types', ["image/*"]):
+            allowed = client.post("/presign/upload/", json={
+                "bucket_name": bucket_name, "object_name": "a.png", "content_type": "image/png"})
+            rejected = client.post("/presign/upload/", json={
+                "bucket_name": bucket_name, "object_name": "a.exe",
+                "content_type": "application/x-msdownload"})
+
+        assert allowed.status_code == 200
+        assert rejected.status_code == 400
@@ -0,0 +1,95 @@
+import gzip
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+import my_services
+from main import app
+
+
+TEXT = b"".join(f"{n},{200 if n % 10 else 500},/path/{n}\n".encode() for n in range(1, 5001))
+CSV = b"id,status,path\n" + TEXT
+
+
+@pytest.fixture
+def client_with_objects(mock_s3_service):
+    s3_client, bucket_name = mock_s3_service
+    s3_client.put_object(Bucket=bucket_name, Key="logs/access.csv", Body=CSV, ContentType="text/csv")
+    s3_client.put_object(Bucket=bucket_name, Key="logs/access.csv.gz", Body=gzip.compress(CSV),
+                         ContentType="text/csv", ContentEncoding="gzip")
+    with patch('my_services.s3_client', s3_client):
+        yield TestClient(app), bucket_name
+
+
+def _query(client, bucket_name, key="logs/access.csv", **params):
+    return client.get("/query/", params={"bucket": bucket_name, "object_name": key, **params})
+
+
+class TestQueryWithMoto:
+
+    def test_byte_range(self, client_with_objects):
+        client, bucket_name = client_with_objects
+
+        response = _query(client, bucket_name, mode="bytes", start=15, end=24)
+
+        assert response.status_code == 206
+        assert response.content == CSV[15:25]
+        assert response.headers["content-range"] == f"bytes 15-24/{len(CSV)}"
+
+    def test_head_tail_and_line_ranges(self, client_with_objects):
+        client, bucket_name = client_with_objects
+        lines = CSV.splitlines(keepends=True)
+
+        assert _query(client, bucket_name, mode="head", count=3).content == b"".join(lines[:3])
+        assert _query(client, bucket_name, mode="tail", count=3).content == b"".join(lines[-3:])
+        assert _query(client, bucket_name, mode="lines", start=100, end=102).content == \
+            b"".join(lines[99:102])
+
+    def test_tail_reads_ranges_rather_than_the_object(self, client_with_objects):
+        client, bucket_name = client_with_objects
+
+        with patch('my_services.DOWNLOAD_CHUNK_SIZE', 1024), \
+                patch('my_services.get_object_stream', wraps=my_services.get_object_stream) as get:
+            response = _query(client, bucket_name, mode="tail", count=200)
+
+        assert response.content == b"".join(CSV.splitlines(keepends=True)[-200:])
+        assert all(call.args[2].startswith("bytes=") for call in get.call_args_list)
+        assert 1 < get.call_count < 10
+
+    def test_line_modes_decompress_encoded_objects(self, client_with_objects):
+        client, bucket_name = client_with_objects
+        lines = CSV.splitlines(keepends=True)
+
+        head = _query(client, bucket_name, "logs/access.csv.gz", mode="head", count=2)
+        last = _query(client, bucket_name, "logs/access.csv.gz", mode="tail", count=2)
+
+        assert head.content == b"".join(lines[:2])
+        assert last.content == b"".join(lines[-2:])
+
+    def test_filter_streams_matching_rows(self, client_with_objects):
+        client, bucket_name = client_with_objects
+
+        response = _query(client, bucket_name, mode="filter", format="csv", where="status>=500",
+                          select="id,path", limit=3)
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+        assert response.text == "id,path\n10,/path/10\n20,/path/20\n30,/path/30\n"
+
+    def test_invalid_queries_are_rejected(self, client_with_objects):
+        client, bucket_name = client_with_objects
+
+        assert _query(client, bucket_name, mode="lines").status_code == 400
+        assert _query(client, bucket_name, mode="sideways").status_code == 400
+        assert _query(client, bucket_name, mode="filter", format="csv", where="nope=1").status_code == 400
+        assert _query(client, bucket_name, mode="bytes", start=len(CSV) + 10).status_code == 416
+        assert _query(client, bucket_name, "logs/missing.csv", mode="head").status_code == 404
+
+    def test_over_long_lines_are_refused(self, client_with_objects):
+        client, bucket_name = client_with_objects
+
+        with patch('my_services.settings.query_max_line_bytes', 8):
+            response = _query(client, bucket_name, mode="head")
+
+        assert response.status_code == 413
@@ -0,0 +1,158 @@
+from io import BytesIO
+from unittest.mock import patch
+
+import boto3
+import pytest
+from botocore.awsrequest import AWSResponse
+from botocore.exceptions import ClientError, ConnectionClosedError
+from fastapi.testclient import TestClient
+from moto import mock_aws
+
+import my_services
+from main import app
+from my_resilience import CircuitOpen, Resilience, RetryBudget, Throttled
+
+
+class _Body:
+    def __init__(self, content):
+        self.content = content
+
+    def stream(self, **kwargs):
+        yield self.content
+
+
+class FaultInjector:
+    """Answer the next requests with faults instead of letting moto serve them."""
+
+    ERRORS = {"slowdown": (503, "SlowDown"), "throttle": (429, "TooManyRequests"),
+              "internal": (500, "InternalError")}
+
+    def __init__(self):
+        self.faults = []
+        self.sent = 0
+
+    def __call__(self, request, **kwargs):
+        self.sent += 1
+        if not self.faults:
+            return None
+        fault = self.faults.pop(0)
+        if fault == "reset":
+            raise ConnectionClosedError(endpoint_url=request.url)
+        status, code = self.ERRORS[fault]
+        body = f"<Error><Code>{code}</Code><Message>{fault}</Message></Error>".encode()
+        return AWSResponse(request.url, status, {}, _Body(body))
+
+
+@pytest.fixture
+def faulty_s3(tmp_path):
+    now = [0.0]
+    resilience = Resilience(max_attempts=3, base_delay=0, max_delay=0,
+                            budget=RetryBudget(1.0, 0, capacity=2, clock=lambda: now[0]),
+                            failure_threshold=4, reset_seconds=10, clock=lambda: now[0])
+    injector = FaultInjector()
+    with mock_aws(), patch.object(my_services.settings, 'retry_mode', 'standard'):
+        s3_client = boto3.client('s3', region_name='us-east-1', config=my_services.build_client_config())
+        s3_client.create_bucket(Bucket='test-bucket')
+        s3_client.create_bucket(Bucket='other-bucket')
+        resilience.register(s3_client)
+        s3_client.meta.events.register_first('before-send.s3', injector)
+        with patch('my_services.s3_client', s3_client), patch('my_services.resilience', resilience), \
+                patch.object(my_services.settings, 'download_dir', str(tmp_path / "downloads")):
+            yield TestClient(app), s3_client, injector, resilience, now
+
+
+class TestRetriesWithMoto:
+
+    def test_transient_faults_are_retried(self, faulty_s3):
+        client, s3_client, injector, _, _ = faulty_s3
+        injector.faults = ["slowdown", "reset"]
+
+        response = client.put("/upload/stream/?bucket=test-bucket&object_name=a.txt", content=b"hello")
+
+        assert response.status_code == 200
+        assert injector.sent == 3
+        assert s3_client.get_object(Bucket='test-bucket', Key='a.txt')["Body"].read() == b"hello"
+
+    def test_client_errors_are_not_retried(self, faulty_s3):
+        client, _, injector, _, _ = faulty_s3
+
+        response = client.get("/download/stream/", params={"bucket": "test-bucket", "object_name": "missing"})
+
+        assert response.status_code == 404
+        assert response.json() == {"detail": "File not found"}
+        assert injector.sent == 1
+
+    @pytest.mark.parametrize("fault, status", [("slowdown", 503), ("throttle", 429), ("internal", 503)])
+    def test_exhausted_retries_report_status_with_retry_after(self, faulty_s3, fault, status):
+        client, _, injector, _, _ = faulty_s3
+        injector.faults = [fault] * 3
+
+        response = client.delete("/delete/", params={"bucket": "test-bucket", "object_name": "a.txt"})
+
+        assert response.status_code == status
+        assert response.headers["retry-after"] == str(my_services.settings.retry_after_seconds)
+        assert injector.sent == 3
+
+    def test_lost_connection_is_503(self, faulty_s3):
+        client, _, injector, _, _ = faulty_s3
+        injector.faults = ["reset"] * 3
+
+        response = client.get("/download/stream/", params={"bucket": "test-bucket", "object_name": "a.txt"})
+
+        assert response.status_code == 503
+        assert "retry-after" in response.headers
+
+    def test_spent_budget_stops_retrying(self, faulty_s3):
+        _, _, injector, resilience, _ = faulty_s3
+        resilience.budget = RetryBudget(0, 0, capacity=1)
+
+        injector.faults = ["slowdown"]
+        assert my_services.upload_fileobj_to_s3(BytesIO(b"a"), "test-bucket", "a.txt") is True
+        injector.faults = ["slowdown"]
+        with pytest.raises(Throttled):
+            my_services.upload_fileobj_to_s3(BytesIO(b"b"), "test-bucket", "b.txt")
+
+        assert injector.sent == 3
+
+
+class TestCircuitBreakerWithMoto:
+
+    def test_open_circuit_fails_fast_then_recovers(self, faulty_s3):
+        client, s3_client, injector, resilience, now = faulty_s3
+        s3_client.put_object(Bucket='test-bucket', Key='a.txt', Body=b"a")
+        params = {"bucket": "test-bucket", "object_name": "a.txt"}
+        injector.faults = ["slowdown"] * 4
+
+        assert client.get("/download/stream/", params=params).status_code == 503
+        assert client.get("/download/stream/", params=params).status_code == 503
+        sent = injector.sent
+        rejected = client.get("/download/stream/", params=params)
+
+        assert rejected.status_code == 503
+        assert rejected.headers["retry-after"] == "10"
+        assert injector.sent == sent
+        assert resilience.stats()['circuits'] == {"test-bucket": "open"}
+        assert s3_client.put_object(Bucket='other-bucket', Key='b.txt', Body=b"b")["ETag"]
+
+        now[0] = 11
+        recovered = client.get("/download/stream/", params=params)
+
+        assert recovered.status_code == 200
+        assert recovered.content == b"a"
+        assert resilience.stats()['circuits'] == {}
+
+    def test_failed_probe_opens_the_circuit_again(self, faulty_s3):
+        _, s3_client, injector, resilience, now = faulty_s3
+        breaker = resilience.breaker('test-bucket')
+        for _ in range(4):
+            breaker.record_failure()
+        now[0] = 11
+        injector.faults = ["slowdown"]
+
+        with pytest.raises(ClientError):
+            s3_client.head_object(Bucket='test-bucket', Key='a.txt')
+        with pytest.raises(CircuitOpen):
+            s3_client.head_object(Bucket='test-bucket', Key='a.txt')
+
+        assert injector.sent == 1
+
@@ -0,0 +1,99 @@
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+import my_services
+from main import app
+from my_upload_sessions import MemorySessionStore
+
+
+PART_SIZE = 5 * 1024 * 1024
+
+
+@pytest.fixture
+def client_with_bucket(mock_s3_service):
+    s3_client, bucket_name = mock_s3_service
+    with patch('my_services.s3_client', s3_client), \
+            patch('my_services.upload_sessions', MemorySessionStore()):
+        yield TestClient(app), s3_client, bucket_name
+
+
+def _start(client, bucket_name, object_name="media/big.bin"):
+    response = client.post("/uploads/", json={"bucket_name": bucket_name, "object_name": object_name})
+    assert response.status_code == 200
+    return response.json()["session_id"]
+
+
+class TestResumableUploadWithMoto:
+
+    def test_parts_sent_in_parallel_and_out_of_order(self, client_with_bucket):
+        client, s3_client, bucket_name = client_with_bucket
+        session_id = _start(client, bucket_name)
+        bodies = {1: b"a" * PART_SIZE, 2: b"b" * PART_SIZE, 3: b"tail"}
+
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            responses = list(pool.map(
+                lambda n: client.put(f"/uploads/{session_id}/parts/{n}/", content=bodies[n]), [3, 1, 2]))
+        status = client.get(f"/uploads/{session_id}/").json()
+        completed = client.post(f"/uploads/{session_id}/complete/")
+
+        assert all(response.status_code == 200 for response in responses)
+        assert [part["part_number"] for part in status["parts"]] == [1, 2, 3]
+        assert status["received_bytes"] == 2 * PART_SIZE + 4
+        assert completed.status_code == 200
+        body = s3_client.get_object(Bucket=bucket_name, Key="media/big.bin")["Body"].read()
+        assert body == bodies[1] + bodies[2] + bodies[3]
+        assert client.get(f"/uploads/{session_id}/").status_code == 404
+
+    def test_resending_a_part_replaces_it(self, client_with_bucket):
+        client, s3_client, bucket_name = client_with_bucket
+        session_id = _start(client, bucket_name, "small.txt")
+
+        client.put(f"/uploads/{session_id}/parts/1/", content=b"broken")
+        client.put(f"/uploads/{session_id}/parts/1/", content=b"fixed")
+        client.post(f"/uploads/{session_id}/complete/")
+
+        assert s3_client.get_object(Bucket=bucket_name, Key="small.txt")["Body"].read() == b"fixed"
+
+    def test_complete_with_missing_parts_is_rejected(self, client_with_bucket):
+        client, _, bucket_name = client_with_bucket
+        session_id = _start(client, bucket_name)
+        client.put(f"/uploads/{session_id}/parts/2/", content=b"x")
+
+        response = client.post(f"/uploads/{session_id}/complete/")
+
+        assert response.status_code == 400
+        assert "[1]" in response.json()["detail"]
+
+    def test_abort_discards_the_multipart_upload(self, client_with_bucket):
+        client, s3_client, bucket_name = client_with_bucket
+        session_id = _start(client, bucket_name)
+        client.put(f"/uploads/{session_id}/parts/1/", content=b"x")
+
+        response = client.delete(f"/uploads/{session_id}/")
+
+        assert response.status_code == 200
+        assert "Uploads" not in s3_client.list_multipart_uploads(Bucket=bucket_name)
+        assert client.put(f"/uploads/{session_id}/parts/2/", content=b"x").status_code == 404
+
+    def test_sweeper_aborts_idle_sessions(self, client_with_bucket):
+        client, s3_client, bucket_name = client_with_bucket
+        idle = _start(client, bucket_name, "idle.bin")
+
+        aborted = my_services.sweep_abandoned_uploads(max_idle_seconds=0)
+
+        assert aborted == 1
+        assert client.get(f"/uploads/{idle}/").status_code == 404
+        assert "Uploads" not in s3_client.list_multipart_uploads(Bucket=bucket_name)
+
+    def test_sweeper_aborts_untracked_uploads_in_configured_buckets(self, client_with_bucket):
+        client, s3_client, bucket_name = client_with_bucket
+        s3_client.create_multipart_upload(Bucket=bucket_name, Key="orphan.bin")
+
+        with patch.object(my_services.settings, 'upload_sweep_buckets', [bucket_name]):
+            aborted = my_services.sweep_abandoned_uploads(max_idle_seconds=-60)
+
+        assert aborted == 1
+        assert "Uploads" not in s3_client.list_multipart_uploads(Bucket=bucket_name)
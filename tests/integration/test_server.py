@@ -0,0 +1,104 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+import pytest
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _get(port, path, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return httpx.get(f"http://127.0.0.1:{port}{path}", timeout=5)
+        except httpx.TransportError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.1)
+
+
+def _ready(port, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    response = _get(port, "/ready/", timeout)
+    while response.status_code == 503 and time.monotonic() < deadline:
+        time.sleep(0.1)
+        response = _get(port, "/ready/", timeout)
+    return response
+
+
+@pytest.fixture
+def server(tmp_path):
+    port, health_port = _free_port(), _free_port()
+    env = {**os.environ, "AWS_ACCESS_KEY_ID": "testing", "AWS_SECRET_ACCESS_KEY": "testing",
+           "AWS_DEFAULT_REGION": "us-east-1", "S3_SERVICE_ENDPOINT_URL": "http://127.0.0.1:9",
+           "S3_SERVICE_MAX_ATTEMPTS": "1"}
+    for name in ("jobs_dir", "spool_dir", "download_dir", "sync_dir", "disk_cache_dir"):
+        env[f"S3_SERVICE_{name.upper()}"] = str(tmp_path / name)
+    env["S3_SERVICE_JOBS_DB"] = str(tmp_path / "jobs.db")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "my_server", "--host", "127.0.0.1", "--port", str(port), "--workers", "2",
+         "--health-port", str(health_port), "--drain-timeout", "10", "--log-level", "warning"],
+        cwd=REPO_ROOT, env=env)
+    yield proc, port, health_port
+    if proc.poll() is None:
+        proc.kill()
+        proc.wait()
+
+
+class TestPreForkServer:
+
+    def test_workers_report_their_own_health(self, server):
+        _, port, health_port = server
+
+        first, second = _ready(health_port), _ready(health_port + 1)
+
+        assert first.status_code == second.status_code == 200
+        assert (first.json()["worker"], second.json()["worker"]) == (0, 1)
+        assert first.json()["pid"] != second.json()["pid"]
+        pids = {_get(port, "/health/").json()["pid"] for _ in range(20)}
+        assert pids <= {first.json()["pid"], second.json()["pid"]}
+
+    def test_dead_worker_is_replaced(self, server):
+        _, _, health_port = server
+        pid = _get(health_port + 1, "/health/").json()["pid"]
+
+        os.kill(pid, signal.SIGKILL)
+        deadline = time.monotonic() + 30
+        while _get(health_port + 1, "/health/").json()["pid"] == pid and time.monotonic() < deadline:
+            time.sleep(0.2)
+
+        replaced = _ready(health_port + 1)
+        assert replaced.status_code == 200
+        assert replaced.json()["worker"] == 1
+        assert replaced.json()["pid"] != pid
+
+    def test_sigterm_drains_requests_in_flight(self, server):
+        proc, port, health_port = server
+        _ready(health_port)
+        _ready(health_port + 1)
+
+        with socket.create_connection(("127.0.0.1", health_port)) as sock:
+            sock.sendall(b"PUT /jobs/upload/?object_name=a.txt&bucket=test-bucket HTTP/1.1\r\n"
+                         b"Host: localhost\r\nContent-Length: 10\r\n\r\nhello")
+            time.sleep(0.5)
+            proc.send_signal(signal.SIGTERM)
+            time.sleep(0.5)
+            sock.sendall(b"world")
+            response = sock.recv(65536)
+
+        assert response.startswith(b"HTTP/1.1 202")
+        assert proc.wait(timeout=30) == 0
+        with pytest.raises(OSError):
+            socket.create_connection(("127.0.0.1", port), timeout=1)
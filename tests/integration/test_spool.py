@@ -0,0 +1,88 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+import my_services
+from main import app
+from my_spool import SpoolManager
+
+
+@pytest.fixture
+def client_with_bucket(mock_s3_service, tmp_path):
+    s3_client, bucket_name = mock_s3_service
+    with patch('my_services.s3_client', s3_client), \
+            patch.object(my_services.settings, 'download_dir', str(tmp_path / "downloads")), \
+            patch('my_services.spool_manager', SpoolManager(str(tmp_path / "spool"), 1024, 64 * 1024)):
+        yield TestClient(app), s3_client, bucket_name, tmp_path
+
+
+def _download(client, bucket_name, object_name):
+    return client.get("/download/", params={"bucket": bucket_name, "object_name": object_name})
+
+
+class TestDownloadPathsWithMoto:
+
+    def test_nested_key_is_downloaded_into_its_directory(self, client_with_bucket):
+        client, s3_client, bucket_name, tmp_path = client_with_bucket
+        s3_client.put_object(Bucket=bucket_name, Key="reports/2024/q1.csv", Body=b"a,b\n1,2\n")
+
+        response = _download(client, bucket_name, "reports/2024/q1.csv")
+
+        assert response.status_code == 200
+        path = response.json()["file_path"]
+        assert path == str(tmp_path / "downloads" / "reports" / "2024" / "q1.csv")
+        assert open(path, "rb").read() == b"a,b\n1,2\n"
+
+    @pytest.mark.parametrize("object_name", ["../escape.txt", "a/../../escape.txt", "/etc/passwd"])
+    def test_traversal_is_rejected(self, client_with_bucket, object_name):
+        client, _, bucket_name, tmp_path = client_with_bucket
+
+        response = _download(client, bucket_name, object_name)
+
+        assert response.status_code == 400
+        assert not (tmp_path / "escape.txt").exists()
+
+    def test_concurrent_downloads_of_one_key_leave_a_complete_file(self, client_with_bucket):
+        client, s3_client, bucket_name, tmp_path = client_with_bucket
+        body = os.urandom(256 * 1024)
+        s3_client.put_object(Bucket=bucket_name, Key="report.bin", Body=body)
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            responses = list(pool.map(lambda _: _download(client, bucket_name, "report.bin"), range(8)))
+
+        assert all(r.status_code == 200 for r in responses)
+        assert (tmp_path / "downloads" / "report.bin").read_bytes() == body
+        assert os.listdir(tmp_path / "downloads") == ["report.bin"]
+
+
+class TestSpoolWithMoto:
+
+    def test_spooled_upload_leaves_no_files_behind(self, client_with_bucket):
+        client, s3_client, bucket_name, tmp_path = client_with_bucket
+        body = os.urandom(16 * 1024)
+
+        response = client.put(f"/upload/stream/?bucket={bucket_name}&object_name=a.bin&dedup=true",
+                              content=body)
+
+        assert response.status_code == 200
+        assert s3_client.get_object(Bucket=bucket_name, Key="a.bin")["Body"].read() == body
+        assert os.listdir(tmp_path / "spool") == []
+        stats = client.get("/stats/spool/").json()
+        assert stats["disk_bytes"] == 0
+        assert stats["peak_disk_bytes"] == len(body)
+
+    def test_body_over_quota_is_refused_with_503(self, client_with_bucket):
+        client, s3_client, bucket_name, tmp_path = client_with_bucket
+
+        with patch.object(my_services.settings, 'spool_wait_seconds', 0.1):
+            response = client.put(f"/upload/stream/?bucket={bucket_name}&object_name=big.bin&dedup=true",
+                                  content=os.urandom(128 * 1024))
+
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == "5"
+        assert "Contents" not in s3_client.list_objects_v2(Bucket=bucket_name)
+        assert os.listdir(tmp_path / "spool") == []
+        assert client.get("/stats/spool/").json()["rejections"] == 1
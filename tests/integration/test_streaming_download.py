@@ -0,0 +1,95 @@
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+
+
+CONTENT = bytes(range(256)) * 4096
+
+
+@pytest.fixture
+def client_with_object(mock_s3_service):
+    s3_client, bucket_name = mock_s3_service
+    s3_client.put_object(Bucket=bucket_name, Key="folder/data.bin", Body=CONTENT)
+    with patch('my_services.s3_client', s3_client):
+        yield TestClient(app), bucket_name
+
+
+class TestStreamingDownloadWithMoto:
+
+    def test_streams_whole_object(self, client_with_object):
+        client, bucket_name = client_with_object
+
+        response = client.get(f"/download/stream/?bucket={bucket_name}&object_name=folder/data.bin")
+
+        assert response.status_code == 200
+        assert response.content == CONTENT
+        assert response.headers["content-length"] == str(len(CONTENT))
+        assert response.headers["accept-ranges"] == "bytes"
+        assert response.headers["etag"].startswith('"')
+        assert "last-modified" in response.headers
+
+    def test_range_request_returns_partial_content(self, client_with_object):
+        client, bucket_name = client_with_object
+
+        response = client.get(
+            f"/download/stream/?bucket={bucket_name}&object_name=folder/data.bin",
+            headers={"Range": "bytes=100-199"}
+        )
+
+        assert response.status_code == 206
+        assert response.content == CONTENT[100:200]
+        assert response.headers["content-range"] == f"bytes 100-199/{len(CONTENT)}"
+
+    def test_open_ended_range_resumes_download(self, client_with_object):
+        client, bucket_name = client_with_object
+        offset = len(CONTENT) - 1000
+
+        response = client.get(
+            f"/download/stream/?bucket={bucket_name}&object_name=folder/data.bin",
+            headers={"Range": f"bytes={offset}-"}
+        )
+
+        assert response.status_code == 206
+        assert response.content == CONTENT[offset:]
+
+    def test_matching_etag_returns_not_modified(self, client_with_object):
+        client, bucket_name = client_with_object
+        url = f"/download/stream/?bucket={bucket_name}&object_name=folder/data.bin"
+        etag = client.get(url).headers["etag"]
+
+        response = client.get(url, headers={"If-None-Match": etag})
+
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["etag"] == etag
+
+    def test_stale_etag_returns_object(self, client_with_object):
+        client, bucket_name = client_with_object
+
+        response = client.get(
+            f"/download/stream/?bucket={bucket_name}&object_name=folder/data.bin",
+            headers={"If-None-Match": '"stale"'}
+        )
+
+        assert response.status_code == 200
+        assert response.content == CONTENT
+
+    def test_missing_object_returns_404(self, client_with_object):
+        client, bucket_name = client_with_object
+
+        response = client.get(f"/download/stream/?bucket={bucket_name}&object_name=missing.bin")
+
+        assert response.status_code == 404
+
+    def test_unsatisfiable_range_returns_416(self, client_with_object):
+        client, bucket_name = client_with_object
+
+        response = client.get(
+            f"/download/stream/?bucket={bucket_name}&object_name=folder/data.bin",
+            headers={"Range": f"bytes={len(CONTENT) + 10}-"}
+        )
+
+        assert response.status_code == 416
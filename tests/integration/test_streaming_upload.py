@@ -0,0 +1,102 @@
+import asyncio
+import gc
+import tracemalloc
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.requests import ClientDisconnect
+
+import my_services
+from main import app
+
+
+CHUNK = b"x" * (64 * 1024)
+PART_SIZE = my_services.MIN_PART_SIZE
+
+
+def _chunks(total_size, collect=False):
+    sent = 0
+    while sent < total_size:
+        yield CHUNK
+        sent += len(CHUNK)
+        if collect and sent % PART_SIZE == 0:
+            # moto's request objects form reference cycles; collect them so
+            # only memory held by the upload path itself is measured
+            gc.collect()
+
+
+def _peak_while_streaming(bucket_name, object_name, total_size):
+    """Return the peak traced memory while the body is streamed to S3."""
+    uploader = my_services.MultipartStreamUploader(bucket_name, object_name, PART_SIZE)
+    tracemalloc.start()
+    try:
+        for chunk in _chunks(total_size, collect=True):
+            assert uploader.write(chunk)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    # moto assembles completed objects in memory, so completion is not measured
+    assert uploader.complete()
+    return peak
+
+
+class TestStreamingUploadWithMoto:
+
+    def test_streamed_object_round_trips(self, mock_s3_service):
+        s3_client, bucket_name = mock_s3_service
+        total_size = 2 * PART_SIZE + 12345
+
+        with patch('my_services.s3_client', s3_client):
+            result = my_services.upload_stream_to_s3(_chunks(total_size), bucket_name, "big.bin", PART_SIZE)
+
+        assert result is True
+        head = s3_client.head_object(Bucket=bucket_name, Key="big.bin")
+        expected_size = -(-total_size // len(CHUNK)) * len(CHUNK)
+        assert head['ContentLength'] == expected_size
+        assert head['ETag'].endswith('-3"')
+
+    def test_peak_memory_stays_flat_as_payload_grows(self, mock_s3_service):
+        s3_client, bucket_name = mock_s3_service
+
+        with patch('my_services.s3_client', s3_client):
+            small_peak = _peak_while_streaming(bucket_name, "small.bin", 3 * PART_SIZE)
+            large_peak = _peak_while_streaming(bucket_name, "large.bin", 12 * PART_SIZE)
+
+        # 4x the payload must not cost meaningfully more memory, and the large
+        # upload must never hold anything close to the whole payload
+        assert large_peak < small_peak * 1.25
+        assert large_peak < 12 * PART_SIZE
+
+    def test_stream_endpoint_uploads_request_body(self, mock_s3_service):
+        s3_client, bucket_name = mock_s3_service
+        client = TestClient(app)
+
+        with patch('my_services.s3_client', s3_client):
+            response = client.put(
+                f"/upload/stream/?bucket={bucket_name}&object_name=folder/stream.bin",
+                content=_chunks(PART_SIZE + len(CHUNK))
+            )
+
+        assert response.status_code == 200
+        body = s3_client.get_object(Bucket=bucket_name, Key="folder/stream.bin")['Body'].read()
+        assert len(body) == PART_SIZE + len(CHUNK)
+
+    def test_client_disconnect_aborts_multipart_upload(self, mock_s3_service):
+        s3_client, bucket_name = mock_s3_service
+        messages = [{"type": "http.request", "body": b"x" * (PART_SIZE + 1), "more_body": True},
+                    {"type": "http.disconnect"}]
+        scope = {"type": "http", "method": "PUT", "path": "/upload/stream/", "headers": [],
+                 "query_string": f"bucket={bucket_name}&object_name=dropped.bin&part_size_mb=5".encode()}
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            pass
+
+        with patch('my_services.s3_client', s3_client), pytest.raises(ClientDisconnect):
+            asyncio.run(app(scope, receive, send))
+
+        assert s3_client.list_multipart_uploads(Bucket=bucket_name).get('Uploads', []) == []
+        assert 'Contents' not in s3_client.list_objects_v2(Bucket=bucket_name)
@@ -0,0 +1,106 @@
+import os
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+import my_services
+from main import app
+from tests.integration.test_jobs import _run_queued
+
+
+@pytest.fixture
+def sync_client(mock_s3_service, tmp_path):
+    s3_client, bucket_name = mock_s3_service
+    with patch('my_services.s3_client', s3_client), \
+            patch.object(my_services.settings, 'sync_dir', str(tmp_path)):
+        yield TestClient(app), s3_client, bucket_name, tmp_path
+
+
+def _write(path, content, mtime=None):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(content)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+def _keys(s3_client, bucket_name, prefix=""):
+    response = s3_client.list_objects_v2(Bucket=bucket_name, Prefix=prefix)
+    return [obj['Key'] for obj in response.get('Contents', [])]
+
+
+class TestSyncWithMoto:
+
+    def test_push_transfers_only_changed_files(self, sync_client):
+        client, s3_client, bucket_name, tmp_path = sync_client
+        _write(tmp_path / "site" / "index.html", b"<html>")
+        _write(tmp_path / "site" / "css" / "main.css", b"body {}")
+        request = {"bucket_name": bucket_name, "prefix": "www", "local_dir": "site"}
+
+        first = client.post("/sync/", json=request)
+        assert first.status_code == 200
+        assert (first.json()["uploaded"], first.json()["bytes"]) == (2, 13)
+        assert _keys(s3_client, bucket_name) == ["www/css/main.css", "www/index.html"]
+
+        _write(tmp_path / "site" / "index.html", b"<html></html>")
+        second = client.post("/sync/", json=request).json()
+
+        assert (second["uploaded"], second["unchanged"], second["failed"]) == (1, 1, 0)
+        body = s3_client.get_object(Bucket=bucket_name, Key="www/index.html")["Body"].read()
+        assert body == b"<html></html>"
+
+    def test_pull_and_delete_extraneous(self, sync_client):
+        client, s3_client, bucket_name, tmp_path = sync_client
+        s3_client.put_object(Bucket=bucket_name, Key="data/a.txt", Body=b"a")
+        s3_client.put_object(Bucket=bucket_name, Key="data/sub/b.txt", Body=b"bb")
+        _write(tmp_path / "copy" / "stale.txt", b"old")
+
+        response = client.post("/sync/", json={"bucket_name": bucket_name, "prefix": "data/",
+                                               "local_dir": "copy", "direction": "pull", "delete": True})
+
+        assert response.status_code == 200
+        assert (response.json()["downloaded"], response.json()["deleted"]) == (2, 1)
+        assert (tmp_path / "copy" / "sub" / "b.txt").read_bytes() == b"bb"
+        assert not (tmp_path / "copy" / "stale.txt").exists()
+        again = client.post("/sync/", json={"bucket_name": bucket_name, "prefix": "data/",
+                                            "local_dir": "copy", "direction": "pull"}).json()
+        assert (again["downloaded"], again["unchanged"]) == (0, 2)
+
+    def test_dry_run_plans_without_changing_anything(self, sync_client):
+        client, s3_client, bucket_name, tmp_path = sync_client
+        s3_client.put_object(Bucket=bucket_name, Key="www/old.txt", Body=b"old")
+        _write(tmp_path / "site" / "new.txt", b"new")
+
+        response = client.post("/sync/", json={"bucket_name": bucket_name, "prefix": "www/",
+                                               "local_dir": "site", "delete": True, "dry_run": True})
+
+        assert response.status_code == 200
+        assert response.json()["plan"] == [
+            {"action": "upload", "key": "new.txt", "size": 3, "reason": "missing"},
+            {"action": "delete", "key": "old.txt", "size": 3, "reason": "extraneous"}]
+        assert _keys(s3_client, bucket_name) == ["www/old.txt"]
+
+    def test_rejects_paths_outside_the_sync_dir(self, sync_client):
+        client, _, bucket_name, _ = sync_client
+
+        for local_dir in ("../etc", "/", "missing"):
+            response = client.post("/sync/", json={"bucket_name": bucket_name, "local_dir": local_dir})
+            assert response.status_code == 400
+
+    def test_sync_job(self, sync_client, tmp_path):
+        client, s3_client, bucket_name, _ = sync_client
+        _write(tmp_path / "site" / "a.txt", b"abc")
+        store = my_services.my_jobs.JobStore(str(tmp_path / "jobs.db"))
+        queue = my_services.my_jobs.JobQueue(store, my_services.JOB_EXECUTORS)
+
+        with patch('my_services.job_queue', queue):
+            response = client.post("/jobs/sync/", json={"bucket_name": bucket_name, "local_dir": "site"})
+            assert response.status_code == 202
+            _run_queued(queue)
+            job = client.get(f"/jobs/{response.json()['job_id']}/").json()
+        store.close()
+
+        assert job["state"] == "succeeded"
+        assert (job["parts_done"], job["bytes_done"]) == (1, 3)
+        assert job["result"]["uploaded"] == 1
+        assert _keys(s3_client, bucket_name) == ["a.txt"]
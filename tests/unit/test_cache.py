@@ -0,0 +1,65 @@
+from my_cache import TTLCache
+
+
+class FakeClock:
+    
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+
+class TestTTLCache:
+    
+    def test_get_counts_hits_and_misses(self):
+        cache = TTLCache(max_entries=10, ttl=30)
+        cache.set("a", 1)
+        
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+    
+    def test_entries_expire_after_ttl(self):
+        clock = FakeClock()
+        cache = TTLCache(max_entries=10, ttl=30, clock=clock)
+        cache.set("a", 1)
+        
+        clock.now = 29.9
+        assert cache.get("a") == 1
+        clock.now = 30
+        assert cache.get("a") is None
+        assert cache.stats()["expirations"] == 1
+        assert len(cache) == 0
+    
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = TTLCache(max_entries=2, ttl=30)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        
+        cache.set("c", 3)
+        
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+        assert cache.stats()["evictions"] == 1
+    
+    def test_invalidate_drops_matching_keys(self):
+        cache = TTLCache(max_entries=10, ttl=30)
+        cache.set(("bucket", "logs/"), 1)
+        cache.set(("bucket", "docs/"), 2)
+        cache.set(("other", "logs/"), 3)
+        
+        dropped = cache.invalidate(lambda key: key[0] == "bucket")
+        
+        assert dropped == 2
+        assert cache.get(("other", "logs/")) == 3
+        assert cache.stats()["invalidations"] == 2
+    
+    def test_zero_capacity_disables_caching(self):
+        cache = TTLCache(max_entries=0, ttl=30)
+        cache.set("a", 1)
+        
+        assert cache.get("a") is None
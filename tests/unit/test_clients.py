@@ -0,0 +1,160 @@
+import os
+
+import pytest
+from unittest.mock import patch
+from botocore.exceptions import NoCredentialsError
+from moto import mock_aws
+
+import my_services
+
+
+@pytest.fixture
+def fresh_clients():
+    """Run a test with an empty client cache and restore the default client after."""
+    original_client = my_services.s3_client
+    with patch.dict(my_services._clients, clear=True), patch.dict(my_services._pool_stats, clear=True):
+        yield
+    my_services.s3_client = original_client
+
+
+class TestClientConfig:
+    
+    def test_config_comes_from_settings(self):
+        with patch.multiple(my_services.settings, max_pool_connections=64, connect_timeout=2.0,
+                            read_timeout=30.0, tcp_keepalive=True, retry_mode="adaptive",
+                            max_attempts=7, resilience_enabled=False):
+            config = my_services.build_client_config()
+        
+        assert config.max_pool_connections == 64
+        assert config.connect_timeout == 2.0
+        assert config.read_timeout == 30.0
+        assert config.tcp_keepalive is True
+        assert config.retries == {'mode': 'adaptive', 'max_attempts': 7}
+    
+    def test_resilience_layer_takes_over_retries(self):
+        with patch.multiple(my_services.settings, retry_mode="adaptive", max_attempts=7,
+                            resilience_enabled=True):
+            config = my_services.build_client_config()
+        
+        assert config.retries == {'mode': 'adaptive', 'total_max_attempts': 1}
+
+
+class TestClientCache:
+    
+    def test_clients_are_cached_per_region_and_endpoint(self, fresh_clients):
+        first = my_services.get_s3_client("eu-west-1")
+        
+        assert my_services.get_s3_client("eu-west-1") is first
+        assert my_services.get_s3_client("us-west-2") is not first
+        assert my_services.get_s3_client("eu-west-1", "http://localhost:9000") is not first
+        assert first.meta.config.max_pool_connections == my_services.settings.max_pool_connections
+    
+    def test_unmapped_bucket_uses_default_client(self):
+        assert my_services.client_for_bucket("any-bucket") is my_services.s3_client
+    
+    def test_mapped_bucket_uses_regional_client(self, fresh_clients):
+        with patch.dict(my_services.settings.bucket_regions, {"eu-bucket": "eu-central-1"}):
+            client = my_services.client_for_bucket("eu-bucket")
+        
+        assert client.meta.region_name == "eu-central-1"
+        assert client is my_services.get_s3_client("eu-central-1")
+    
+    def test_reset_clients_recreates_default_client_on_next_use(self, fresh_clients):
+        old_client = my_services.default_client()
+        
+        my_services.reset_clients()
+        
+        assert my_services.s3_client is None
+        assert my_services._clients == {}
+        client = my_services.default_client()
+        assert client is not old_client
+        assert my_services._clients == {(my_services.settings.region_name,
+                                          my_services.settings.endpoint_url): client}
+
+
+class TestLazyClient:
+    
+    def test_default_client_is_created_on_first_use(self, fresh_clients):
+        my_services.s3_client = None
+        
+        client = my_services.client_for_bucket("any-bucket")
+        
+        assert my_services.s3_client is client
+        assert my_services.default_client() is client
+    
+    def test_warm_up_creates_clients_and_resolves_credentials(self, fresh_clients):
+        my_services.s3_client = None
+        with mock_aws(), patch.dict(my_services.settings.bucket_regions, {"eu-bucket": "eu-central-1"}):
+            my_services.warm_up()
+        
+        assert my_services.s3_client is not None
+        assert {region for region, _ in my_services._clients} >= {"eu-central-1"}
+    
+    def test_warm_up_fails_without_credentials(self, fresh_clients):
+        with patch.object(my_services._session, 'get_credentials', return_value=None):
+            with pytest.raises(NoCredentialsError):
+                my_services.warm_up()
+    
+    def test_warm_up_opens_connections_to_buckets(self, fresh_clients):
+        with mock_aws(), patch.object(my_services.settings, 'warm_up_buckets', ["test-bucket", "missing"]):
+            my_services.s3_client = None
+            my_services.default_client().create_bucket(Bucket="test-bucket")
+            my_services.warm_up()
+            
+            stats = my_services.get_pool_stats()[0]
+        
+        assert stats['requests'] == 3
+
+    
+    def test_stores_are_created_on_first_use(self):
+        settings = my_services.settings
+        assert not os.path.exists(settings.jobs_db)
+        assert not os.path.exists(settings.spool_dir)
+        
+        queue = my_services.get_job_queue()
+        spool_manager = my_services.get_spool_manager()
+        
+        assert my_services.get_job_queue() is queue
+        assert my_services.get_spool_manager() is spool_manager
+        assert os.path.exists(settings.jobs_db)
+        assert os.path.isdir(settings.spool_dir)
+    
+    def test_disk_cache_is_created_only_when_enabled(self):
+        settings = my_services.settings
+        assert my_services.get_disk_cache() is None
+        assert not os.path.exists(settings.disk_cache_dir)
+        
+        with patch.object(settings, 'disk_cache_enabled', True):
+            cache = my_services.get_disk_cache()
+        
+        assert cache is my_services.disk_cache
+        assert os.path.isdir(settings.disk_cache_dir)
+
+
+class TestPoolStats:
+    
+    def test_saturation_is_counted_when_all_connections_are_busy(self):
+        stats = my_services.PoolStats("us-east-1", None, max_pool_connections=2)
+        
+        for _ in range(3):
+            stats.on_send()
+        
+        assert stats.as_dict()['saturated_requests'] == 1
+        assert stats.peak_in_flight == 3
+        
+        for _ in range(3):
+            stats.on_response()
+        
+        assert stats.in_flight == 0
+        assert stats.requests == 3
+    
+    def test_requests_are_counted_through_botocore_events(self, fresh_clients):
+        with mock_aws():
+            client = my_services.get_s3_client("us-east-1")
+            client.create_bucket(Bucket="test-bucket")
+            client.list_objects_v2(Bucket="test-bucket")
+        
+        stats = [s for s in my_services.get_pool_stats() if s['region_name'] == "us-east-1"][0]
+        assert stats['requests'] == 2
+        assert stats['in_flight'] == 0
+        assert stats['peak_in_flight'] == 1
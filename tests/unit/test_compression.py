@@ -0,0 +1,105 @@
+import gzip
+from io import BytesIO
+from unittest.mock import patch
+
+import pytest
+
+import my_compression
+
+
+TEXT = b"2024-01-01T00:00:00Z INFO request handled in 12ms\n" * 2000
+
+
+def _chunks(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class TestResolveEncoding:
+    
+    def test_none_and_empty_disable_compression(self):
+        assert my_compression.resolve_encoding("none") is None
+        assert my_compression.resolve_encoding("") is None
+        assert my_compression.resolve_encoding(None) is None
+    
+    def test_auto_picks_the_preferred_encoding(self):
+        assert my_compression.resolve_encoding("auto") == my_compression.available_encodings()[0]
+    
+    def test_auto_falls_back_to_gzip_without_zstandard(self):
+        with patch.object(my_compression, 'zstandard', None):
+            assert my_compression.resolve_encoding("auto") == "gzip"
+            with pytest.raises(ValueError):
+                my_compression.resolve_encoding("zstd")
+    
+    def test_unknown_encoding_raises(self):
+        with pytest.raises(ValueError):
+            my_compression.resolve_encoding("brotli")
+
+
+class TestNegotiate:
+    
+    def test_listed_encoding_is_accepted(self):
+        assert my_compression.negotiate("gzip, deflate, br", "gzip") is True
+    
+    def test_zero_quality_rejects(self):
+        assert my_compression.negotiate("gzip;q=0, *", "gzip") is False
+    
+    def test_wildcard_covers_unlisted_encodings(self):
+        assert my_compression.negotiate("br, *;q=0.1", "zstd") is True
+        assert my_compression.negotiate("br", "zstd") is False
+    
+    def test_missing_header_means_identity(self):
+        assert my_compression.negotiate(None, "gzip") is False
+
+
+class TestIsCompressible:
+    
+    def test_patterns_match_without_parameters(self):
+        patterns = ["text/*", "application/json"]
+        
+        assert my_compression.is_compressible("text/plain; charset=utf-8", patterns) is True
+        assert my_compression.is_compressible("application/json", patterns) is True
+        assert my_compression.is_compressible("image/png", patterns) is False
+        assert my_compression.is_compressible(None, patterns) is False
+
+
+@pytest.mark.parametrize("encoding", my_compression.available_encodings())
+class TestChunkedCodecs:
+    
+    def test_round_trip_in_small_chunks(self, encoding):
+        compressed = b"".join(my_compression.compress_chunks(_chunks(TEXT, 999), encoding))
+        
+        assert len(compressed) < len(TEXT) // 10
+        assert b"".join(my_compression.decompress_chunks(_chunks(compressed, 7), encoding)) == TEXT
+    
+    def test_truncated_stream_raises(self, encoding):
+        compressed = b"".join(my_compression.compress_chunks([TEXT], encoding))
+        
+        with pytest.raises(ValueError):
+            list(my_compression.decompress_chunks([compressed[:-4]], encoding))
+    
+    def test_corrupt_stream_raises(self, encoding):
+        with pytest.raises(ValueError):
+            list(my_compression.decompress_chunks([b"definitely not compressed"], encoding))
+    
+    def test_compressing_reader_counts_bytes(self, encoding):
+        reader = my_compression.CompressingReader(BytesIO(TEXT), encoding, chunk_size=4096)
+        
+        compressed = b"".join(iter(lambda: reader.read(1000), b""))
+        
+        assert reader.bytes_in == len(TEXT)
+        assert reader.bytes_out == len(compressed)
+        assert b"".join(my_compression.decompress_chunks([compressed], encoding)) == TEXT
+
+
+class TestGzipCompatibility:
+    
+    def test_output_is_a_standard_gzip_file(self):
+        compressed = b"".join(my_compression.compress_chunks(_chunks(TEXT, 4096), "gzip"))
+        
+        assert gzip.decompress(compressed) == TEXT
+    
+    def test_reader_without_size_returns_everything(self):
+        reader = my_compression.CompressingReader(BytesIO(TEXT), "gzip")
+        
+        assert gzip.decompress(reader.read()) == TEXT
+        assert reader.read() == b""
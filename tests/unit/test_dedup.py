@@ -0,0 +1,59 @@
+import hashlib
+from io import BytesIO
+
+from my_dedup import DigestIndex, HashingWriter, hash_fileobj
+
+
+class TestHashing:
+    
+    def test_hash_fileobj_rewinds_to_start_position(self):
+        fileobj = BytesIO(b"skip" + b"content")
+        fileobj.seek(4)
+        
+        digest, size = hash_fileobj(fileobj, chunk_size=3)
+        
+        assert digest == hashlib.sha256(b"content").hexdigest()
+        assert size == 7
+        assert fileobj.tell() == 4
+    
+    def test_hashing_writer_hashes_what_it_writes(self):
+        target = BytesIO()
+        writer = HashingWriter(target)
+        
+        writer.write(b"hello ")
+        writer.write(b"world")
+        
+        assert target.getvalue() == b"hello world"
+        assert writer.hexdigest() == hashlib.sha256(b"hello world").hexdigest()
+        assert writer.size == 11
+
+
+class TestDigestIndex:
+    
+    def test_remember_lookup_and_forget(self):
+        index = DigestIndex(max_entries=10)
+        
+        index.remember("abc", "bucket", "a.txt")
+        assert index.lookup("abc") == ("bucket", "a.txt")
+        index.forget("abc")
+        assert index.lookup("abc") is None
+    
+    def test_least_recently_used_digest_is_dropped(self):
+        index = DigestIndex(max_entries=1)
+        
+        index.remember("abc", "bucket", "a.txt")
+        index.remember("def", "bucket", "b.txt")
+        
+        assert index.lookup("abc") is None
+        assert index.stats()["digests"] == 1
+    
+    def test_record_counts_saved_and_uploaded_bytes(self):
+        index = DigestIndex(max_entries=10)
+        
+        index.record(True, 100)
+        index.record(True, 50)
+        index.record(False, 30)
+        
+        stats = index.stats()
+        assert (stats["hits"], stats["misses"]) == (2, 1)
+        assert (stats["bytes_saved"], stats["bytes_uploaded"]) == (150, 30)
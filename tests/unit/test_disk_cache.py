@@ -0,0 +1,130 @@
+import os
+from datetime import datetime, timezone
+
+import pytest
+
+from my_disk_cache import DiskCache
+
+
+def _info(etag, size, **extra):
+    return {'etag': etag, 'size': size, 'content_type': 'text/plain', **extra}
+
+
+def _put(cache, name, body, etag='"v1"', **extra):
+    entry = cache.put("bucket", name, _info(etag, len(body), **extra), lambda f: f.write(body))
+    if entry is not None:
+        cache.release(entry)
+    return entry
+
+
+class TestDiskCache:
+    
+    def test_put_then_acquire_serves_the_file(self, tmp_path):
+        cache = DiskCache(str(tmp_path), max_bytes=1000)
+        _put(cache, "a.txt", b"hello")
+        
+        entry = cache.acquire("bucket", "a.txt")
+        
+        assert open(entry['path'], 'rb').read() == b"hello"
+        assert entry['etag'] == '"v1"'
+        assert cache.stats()['hits'] == 1
+        assert cache.acquire("bucket", "missing.txt") is None
+        assert cache.stats()['misses'] == 1
+    
+    def test_lru_evicts_least_recently_used(self, tmp_path):
+        cache = DiskCache(str(tmp_path), max_bytes=10)
+        _put(cache, "a", b"aaaa")
+        _put(cache, "b", b"bbbb")
+        cache.release(cache.acquire("bucket", "a"))
+        
+        _put(cache, "c", b"cccc")
+        
+        assert cache.acquire("bucket", "b") is None
+        assert cache.acquire("bucket", "a") is not None
+        assert cache.stats()['evictions'] == 1
+        assert cache.stats()['bytes'] == 8
+    
+    def test_lfu_evicts_least_frequently_used(self, tmp_path):
+        cache = DiskCache(str(tmp_path), max_bytes=10, policy="lfu")
+        _put(cache, "a", b"aaaa")
+        _put(cache, "b", b"bbbb")
+        for _ in range(3):
+            cache.release(cache.acquire("bucket", "a"))
+        cache.release(cache.acquire("bucket", "b"))
+        
+        _put(cache, "c", b"cccc")
+        
+        assert cache.acquire("bucket", "b") is None
+        assert cache.acquire("bucket", "a") is not None
+        assert cache.acquire("bucket", "c") is not None
+    
+    def test_pinned_entries_survive_eviction_and_discard(self, tmp_path):
+        cache = DiskCache(str(tmp_path), max_bytes=4)
+        _put(cache, "a", b"aaaa")
+        pinned = cache.acquire("bucket", "a")
+        
+        cache.discard("bucket", "a")
+        
+        assert os.path.exists(pinned['path'])
+        cache.release(pinned)
+        assert not os.path.exists(pinned['path'])
+        assert cache.stats()['bytes'] == 0
+    
+    def test_objects_over_the_object_limit_are_not_cached(self, tmp_path):
+        cache = DiskCache(str(tmp_path), max_bytes=100, max_object_bytes=3)
+        
+        assert _put(cache, "a", b"aaaa") is None
+        assert len(cache) == 0
+    
+    def test_failed_fill_leaves_nothing_behind(self, tmp_path):
+        cache = DiskCache(str(tmp_path), max_bytes=100)
+        
+        def fill(f):
+            f.write(b"partial")
+            raise OSError("connection reset")
+        
+        with pytest.raises(OSError):
+            cache.put("bucket", "a", _info('"v1"', 10), fill)
+        
+        assert os.listdir(tmp_path) == []
+    
+    def test_new_version_replaces_old_file(self, tmp_path):
+        cache = DiskCache(str(tmp_path), max_bytes=100)
+        old = _put(cache, "a", b"old", etag='"v1"')
+        
+        new = _put(cache, "a", b"newer", etag='"v2"')
+        
+        assert not os.path.exists(old['path'])
+        assert open(new['path'], 'rb').read() == b"newer"
+        assert cache.stats()['bytes'] == 5
+    
+    def test_index_is_rebuilt_after_restart(self, tmp_path):
+        modified = datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+        cache = DiskCache(str(tmp_path), max_bytes=100)
+        _put(cache, "a.txt", b"hello", last_modified=modified)
+        (tmp_path / "leftover.tmp").write_bytes(b"x")
+        (tmp_path / ("0" * 64)).write_bytes(b"no sidecar")
+        
+        reloaded = DiskCache(str(tmp_path), max_bytes=100)
+        
+        entry = reloaded.acquire("bucket", "a.txt")
+        assert open(entry['path'], 'rb').read() == b"hello"
+        assert entry['last_modified'] == modified
+        assert reloaded.stats()['bytes'] == 5
+        assert sorted(os.listdir(tmp_path)) == sorted([os.path.basename(entry['path']),
+                                                      os.path.basename(entry['path']) + ".json"])
+    
+    def test_stale_entries_need_revalidation(self, tmp_path):
+        now = [0.0]
+        cache = DiskCache(str(tmp_path), max_bytes=100, clock=lambda: now[0])
+        entry = _put(cache, "a", b"aaaa")
+        
+        now[0] = 61.0
+        assert cache.is_fresh(entry, 60) is False
+        cache.mark_validated(entry)
+        assert cache.is_fresh(entry, 60) is True
+        assert cache.stats()['revalidations'] == 1
+    
+    def test_unknown_policy_raises(self, tmp_path):
+        with pytest.raises(ValueError):
+            DiskCache(str(tmp_path), max_bytes=100, policy="fifo")
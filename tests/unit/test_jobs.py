@@ -0,0 +1,220 @@
+import os
+import threading
+import time
+
+import pytest
+
+from my_jobs import (CANCELLED, FAILED, QUEUED, RUNNING, SUCCEEDED, JobFailed, JobQueue, JobStore,
+                     Progress)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    yield store
+    store.close()
+
+
+def _limit(n):
+    return lambda bucket: n
+
+
+class TestJobStore:
+    
+    def test_create_and_get_round_trip_params(self, store):
+        store.create("j1", "copy", "bucket", {"source_key": "a", "keys": [1, 2]}, priority=3)
+        
+        job = store.get("j1")
+        
+        assert job['state'] == QUEUED
+        assert job['params'] == {"source_key": "a", "keys": [1, 2]}
+        assert job['priority'] == 3
+        assert job['attempts'] == 0
+        assert store.get("missing") is None
+    
+    def test_claim_takes_highest_priority_then_oldest(self, store):
+        store.create("low", "copy", "bucket", {}, priority=0, created_at=1)
+        store.create("high-new", "copy", "bucket", {}, priority=5, created_at=3)
+        store.create("high-old", "copy", "bucket", {}, priority=5, created_at=2)
+        
+        order = [store.claim(_limit(10), worker=1)['job_id'] for _ in range(3)]
+        
+        assert order == ["high-old", "high-new", "low"]
+        assert store.claim(_limit(10), worker=1) is None
+        claimed = store.get("low")
+        assert claimed['state'] == RUNNING
+        assert claimed['worker'] == 1
+        assert claimed['attempts'] == 1
+    
+    def test_claim_respects_per_bucket_limits(self, store):
+        store.create("a1", "copy", "busy", {}, priority=9, created_at=1)
+        store.create("a2", "copy", "busy", {}, priority=9, created_at=2)
+        store.create("b1", "copy", "quiet", {}, priority=0, created_at=3)
+        limits = {"busy": 1}.get
+        
+        first = store.claim(lambda bucket: limits(bucket, 5), worker=1)
+        second = store.claim(lambda bucket: limits(bucket, 5), worker=1)
+        
+        assert (first['job_id'], second['job_id']) == ("a1", "b1")
+        assert store.claim(lambda bucket: limits(bucket, 5), worker=1) is None
+        store.finish("a1", SUCCEEDED, {"ok": True})
+        assert store.claim(lambda bucket: limits(bucket, 5), worker=1)['job_id'] == "a2"
+    
+    def test_finish_records_result_and_error(self, store):
+        store.create("ok", "copy", "bucket", {})
+        store.create("bad", "copy", "bucket", {})
+        
+        store.finish("ok", SUCCEEDED, {"copied_count": 2})
+        store.finish("bad", FAILED, error="boom")
+        
+        assert store.get("ok")['result'] == {"copied_count": 2}
+        assert store.get("ok")['finished_at'] is not None
+        assert store.get("bad")['error'] == "boom"
+    
+    def test_only_queued_jobs_can_be_cancelled(self, store):
+        store.create("queued", "copy", "bucket", {}, created_at=1)
+        store.create("running", "copy", "bucket", {}, priority=1, created_at=2)
+        store.claim(_limit(10), worker=1)
+        
+        assert store.cancel("queued") is True
+        assert store.cancel("running") is False
+        assert store.get("queued")['state'] == CANCELLED
+    
+    def test_jobs_of_dead_workers_are_requeued(self, store):
+        for job_id in ("alive", "dead"):
+            store.create(job_id, "copy", "bucket", {})
+        store.claim(_limit(10), worker=100)
+        store.claim(_limit(10), worker=200)
+        
+        requeued = store.requeue_orphans(is_alive=lambda pid: pid == 100)
+        
+        assert requeued == 1
+        states = {job['job_id']: (job['state'], job['worker']) for job in store.list_jobs()}
+        assert states == {"alive": (RUNNING, 100), "dead": (QUEUED, None)}
+    
+    def test_jobs_survive_reopening_the_database(self, tmp_path):
+        path = str(tmp_path / "jobs.db")
+        first = JobStore(path)
+        first.create("j1", "delete", "bucket", {"prefix": "logs/"})
+        first.close()
+        
+        reopened = JobStore(path)
+        
+        assert reopened.get("j1")['params'] == {"prefix": "logs/"}
+        reopened.close()
+    
+    def test_list_filters_and_delete_finished(self, store):
+        store.create("old", "copy", "a", {}, created_at=1)
+        store.create("new", "copy", "b", {}, created_at=2)
+        store.finish("old", SUCCEEDED)
+        
+        assert [job['job_id'] for job in store.list_jobs()] == ["new", "old"]
+        assert [job['job_id'] for job in store.list_jobs(bucket_name="b")] == ["new"]
+        assert [job['job_id'] for job in store.list_jobs(state=SUCCEEDED)] == ["old"]
+        assert [job['job_id'] for job in store.delete_finished(time.time() + 1)] == ["old"]
+        assert store.get("old") is None
+        assert store.get("new") is not None
+
+
+class TestProgress:
+    
+    def test_writes_are_throttled_but_flush_is_immediate(self, store):
+        store.create("j1", "upload", "bucket", {})
+        now = [0.0]
+        progress = Progress(store, "j1", min_interval=1.0, clock=lambda: now[0])
+        progress.set_total(100, 4)
+        
+        progress.add_bytes(10)
+        assert store.get("j1")['bytes_done'] == 0
+        now[0] = 2.0
+        progress.add_bytes(10)
+        
+        job = store.get("j1")
+        assert (job['bytes_done'], job['bytes_total'], job['parts_total']) == (20, 100, 4)
+    
+    def test_parts_follow_bytes_with_part_size(self, store):
+        store.create("j1", "upload", "bucket", {})
+        progress = Progress(store, "j1", min_interval=0)
+        progress.set_total(250, 3, part_size=100)
+        
+        for _ in range(20):
+            progress.add_bytes(10)
+        
+        assert progress.parts_done == 2
+        progress.add_bytes(50)
+        assert store.get("j1")['parts_done'] == 3
+
+
+class TestJobQueue:
+    
+    def test_execute_records_success_and_failures(self, store):
+        def succeed(job, progress):
+            progress.add_parts(2)
+            return {"value": job['params']['value']}
+        
+        def fail(job, progress):
+            raise JobFailed("File copy failed")
+        
+        def crash(job, progress):
+            raise RuntimeError("unexpected")
+        
+        queue = JobQueue(store, {"ok": succeed, "fail": fail, "crash": crash})
+        jobs = [queue.submit(kind, "bucket", {"value": 7}) for kind in ("ok", "fail", "crash")]
+        for _ in jobs:
+            queue.execute(store.claim(queue.bucket_limit, worker=1))
+        
+        ok, failed, crashed = (store.get(job['job_id']) for job in jobs)
+        assert (ok['state'], ok['result'], ok['parts_done']) == (SUCCEEDED, {"value": 7}, 2)
+        assert (failed['state'], failed['error']) == (FAILED, "File copy failed")
+        assert (crashed['state'], crashed['error']) == (FAILED, "RuntimeError: unexpected")
+    
+    def test_submit_uses_bucket_priority_and_rejects_unknown_kinds(self, store):
+        queue = JobQueue(store, {"copy": lambda job, progress: None}, bucket_priorities={"urgent": 10})
+        
+        assert queue.submit("copy", "urgent", {})['priority'] == 10
+        assert queue.submit("copy", "other", {})['priority'] == 0
+        assert queue.submit("copy", "urgent", {}, priority=-1)['priority'] == -1
+        with pytest.raises(ValueError):
+            queue.submit("teleport", "bucket", {})
+    
+    def test_workers_run_jobs_within_bucket_limit(self, store):
+        lock = threading.Lock()
+        running, peak = [0], [0]
+        
+        def work(job, progress):
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.05)
+            with lock:
+                running[0] -= 1
+        
+        queue = JobQueue(store, {"work": work}, workers=4, default_bucket_limit=2, poll_interval=0.05)
+        jobs = [queue.submit("work", "bucket", {}) for _ in range(6)]
+        queue.start()
+        try:
+            deadline = time.monotonic() + 10
+            while time.monotonic() < deadline and any(
+                    store.get(job['job_id'])['state'] != SUCCEEDED for job in jobs):
+                time.sleep(0.02)
+        finally:
+            queue.stop()
+        
+        assert all(store.get(job['job_id'])['state'] == SUCCEEDED for job in jobs)
+        assert peak[0] == 2
+    
+    def test_start_requeues_jobs_interrupted_in_this_pid(self, store):
+        store.create("j1", "work", "bucket", {})
+        store.claim(_limit(10), worker=os.getpid())
+        queue = JobQueue(store, {"work": lambda job, progress: {"attempt": job['attempts']}},
+                         poll_interval=0.05)
+        
+        queue.start()
+        try:
+            deadline = time.monotonic() + 10
+            while time.monotonic() < deadline and store.get("j1")['state'] != SUCCEEDED:
+                time.sleep(0.02)
+        finally:
+            queue.stop()
+        
+        assert store.get("j1")['result'] == {"attempt": 2}
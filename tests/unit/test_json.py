@@ -0,0 +1,56 @@
+import json
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import pytest
+from dateutil.tz import tzutc
+
+import my_json
+from my_schemas import FileListResponse
+
+
+LISTING = [{
+    "bucket_name": "test-bucket", "files": [], "prefix": "logs/", "common_prefixes": [],
+    "is_truncated": False, "next_continuation_token": None,
+    "objects": [{"key": "logs/é.log", "size": 3, "etag": '"abc"',
+                 "last_modified": datetime(2024, 5, 1, 12, 30, 15, 250000, tzinfo=tzutc()),
+                 "storage_class": "STANDARD"}],
+}]
+
+
+class TestDumps:
+    
+    def test_matches_pydantic_rendering(self):
+        expected = FileListResponse(**LISTING[0]).model_dump_json().encode()
+        
+        assert json.loads(my_json.dumps(LISTING)) == [json.loads(expected)]
+        assert b'"2024-05-01T12:30:15.250000Z"' in my_json.dumps(LISTING)
+    
+    def test_fallback_renders_the_same_bytes(self):
+        with patch('my_json.orjson', None):
+            fallback = my_json.dumps(LISTING)
+        
+        assert fallback == my_json.pydantic_dumps(LISTING)
+        assert fallback == my_json.dumps(LISTING)
+    
+    def test_keeps_other_offsets(self):
+        moment = datetime(2024, 5, 1, 12, 0, tzinfo=timezone(timedelta(hours=2)))
+        
+        assert my_json.pydantic_dumps([moment]) == b'["2024-05-01T12:00:00+02:00"]'
+        assert my_json.dumps([moment]) == b'["2024-05-01T12:00:00+02:00"]'
+    
+    def test_unsupported_types_raise(self):
+        with pytest.raises(TypeError):
+            my_json.pydantic_dumps({"value": object()})
+        
+        with pytest.raises(TypeError):
+            my_json.dumps({"value": object()})
+
+
+class TestRawJSONResponse:
+    
+    def test_renders_content_without_validation(self):
+        response = my_json.RawJSONResponse({"results": [{"key": "a", "extra": 1}]})
+        
+        assert response.body == b'{"results":[{"key":"a","extra":1}]}'
+        assert response.media_type == "application/json"
@@ -0,0 +1,55 @@
+import pytest
+from botocore.exceptions import ClientError
+from prometheus_client import REGISTRY, CollectorRegistry
+
+import my_metrics
+
+
+def _stage_count(operation, bucket, stage, outcome):
+    return REGISTRY.get_sample_value(
+        "s3_operation_stage_duration_seconds_count",
+        {"operation": operation, "bucket": bucket, "stage": stage, "outcome": outcome}) or 0
+
+
+class TestStageTimer:
+    
+    def test_successful_block_is_labelled_ok(self):
+        before = _stage_count("unit_op", "unit-bucket", "s3_call", "ok")
+        
+        with my_metrics.stage_timer("unit_op", "unit-bucket"):
+            pass
+        
+        assert _stage_count("unit_op", "unit-bucket", "s3_call", "ok") == before + 1
+    
+    def test_client_error_is_labelled_with_its_code(self):
+        before = _stage_count("unit_op", "unit-bucket", "s3_call", "NoSuchKey")
+        
+        with pytest.raises(ClientError):
+            with my_metrics.stage_timer("unit_op", "unit-bucket"):
+                raise ClientError({'Error': {'Code': 'NoSuchKey', 'Message': 'Missing'}}, 'GetObject')
+        
+        assert _stage_count("unit_op", "unit-bucket", "s3_call", "NoSuchKey") == before + 1
+    
+    def test_other_errors_are_labelled_with_their_type(self):
+        with pytest.raises(ValueError):
+            with my_metrics.stage_timer("unit_op", "unit-bucket", "serialize"):
+                raise ValueError("boom")
+        
+        assert _stage_count("unit_op", "unit-bucket", "serialize", "ValueError") == 1
+
+
+class TestStatsCollector:
+    
+    def test_pool_and_cache_stats_are_exported(self):
+        registry = CollectorRegistry()
+        registry.register(my_metrics.StatsCollector(
+            lambda: [{"region_name": "us-east-1", "endpoint_url": None, "max_pool_connections": 50,
+                      "in_flight": 2, "peak_in_flight": 7, "requests": 40, "saturated_requests": 1}],
+            lambda: {"listing": {"size": 3, "hits": 10, "misses": 4, "evictions": 0,
+                                 "expirations": 1, "invalidations": 2}}))
+        
+        pool_labels = {"region": "us-east-1", "endpoint": ""}
+        assert registry.get_sample_value("s3_pool_in_flight_requests", pool_labels) == 2
+        assert registry.get_sample_value("s3_pool_saturated_requests_total", pool_labels) == 1
+        assert registry.get_sample_value("s3_cache_entries", {"cache": "listing"}) == 3
+        assert registry.get_sample_value("s3_cache_hits_total", {"cache": "listing"}) == 10
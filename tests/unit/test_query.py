@@ -0,0 +1,120 @@
+import pytest
+
+from my_query import (LineTooLong, compile_filter, iter_lines, line_range, parse_where, stream_tail,
+                      tail)
+
+
+TEXT = b"".join(f"line {n}\n".encode() for n in range(1, 101))
+
+
+def _chunks(data, size=7):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def _reader(data, reads):
+    def read_range(first, last):
+        reads.append((first, last))
+        return data[first:last + 1]
+    return read_range
+
+
+class TestLines:
+    
+    def test_lines_survive_any_chunking(self):
+        for size in (1, 3, 7, 1000):
+            assert b"".join(iter_lines(_chunks(TEXT, size), 100)) == TEXT
+        
+        assert list(iter_lines([b"a\nb", b"c"], 100)) == [b"a\n", b"bc"]
+    
+    def test_over_long_lines_raise(self):
+        with pytest.raises(LineTooLong):
+            list(iter_lines(_chunks(b"x" * 50 + b"\n"), 20))
+        
+        with pytest.raises(LineTooLong):
+            list(iter_lines(_chunks(b"x" * 50), 20))
+    
+    def test_line_range_stops_reading_after_the_last_line(self):
+        consumed = []
+        
+        def chunks():
+            for chunk in _chunks(TEXT):
+                consumed.append(chunk)
+                yield chunk
+        
+        lines = list(line_range(chunks(), 3, 5, 100))
+        
+        assert lines == [b"line 3\n", b"line 4\n", b"line 5\n"]
+        assert sum(map(len, consumed)) < 50
+        assert list(line_range(_chunks(TEXT), 99, None, 100)) == [b"line 99\n", b"line 100\n"]
+
+
+class TestTail:
+    
+    def test_reads_backwards_only_as_far_as_needed(self):
+        reads = []
+        
+        lines = tail(_reader(TEXT, reads), len(TEXT), 3, 1000, block_size=16)
+        
+        assert lines == [b"line 98\n", b"line 99\n", b"line 100\n"]
+        assert reads[0] == (len(TEXT) - 16, len(TEXT) - 1)
+        assert len(reads) <= 3
+    
+    def test_whole_object_and_missing_final_newline(self):
+        assert tail(_reader(b"a\nb", []), 3, 5, 100, block_size=2) == [b"a\n", b"b"]
+        assert tail(_reader(b"a\nb\n", []), 4, 1, 100, block_size=2) == [b"b\n"]
+        assert tail(_reader(b"", []), 0, 1, 100) == []
+    
+    def test_refuses_tails_longer_than_the_limit(self):
+        with pytest.raises(LineTooLong):
+            tail(_reader(TEXT, []), len(TEXT), 90, 100, block_size=16)
+    
+    def test_stream_tail_keeps_the_last_lines(self):
+        assert stream_tail(_chunks(TEXT), 2, 100) == [b"line 99\n", b"line 100\n"]
+
+
+CSV = b"id,status,path\n1,200,/a\n2,500,/b\n3,503,\"/c,d\"\n4,404,/e\n"
+JSONL = (b'{"id": 1, "status": 200}\n{"id": 2, "status": 500, "ok": false}\n'
+         b'not json\n{"id": 3, "status": 503}\n')
+
+
+def _run(data, **kwargs):
+    return b"".join(compile_filter(**kwargs)(iter_lines(_chunks(data), 1000)))
+
+
+class TestFilter:
+    
+    def test_parse_where(self):
+        assert parse_where("status>=500") == ("status", ">=", "500")
+        assert parse_where("path~/b") == ("path", "~", "/b")
+        assert parse_where("name!=") == ("name", "!=", "")
+        
+        with pytest.raises(ValueError):
+            parse_where("=500")
+        with pytest.raises(ValueError):
+            parse_where("status")
+    
+    def test_text_contains_and_limit(self):
+        assert _run(TEXT, contains="line 5", limit=2) == b"line 5\nline 50\n"
+    
+    def test_csv_selects_and_compares_numbers(self):
+        assert _run(CSV, fmt="csv", where="status>=500") == b"id,status,path\n2,500,/b\n3,503,\"/c,d\"\n"
+        assert _run(CSV, fmt="csv", select=["path", "id"], where="status!=200", limit=2) == \
+            b"path,id\n/b,2\n\"/c,d\",3\n"
+    
+    def test_csv_unknown_column_raises_on_the_header(self):
+        rows = compile_filter(fmt="csv", where="missing=1")(iter_lines(_chunks(CSV), 1000))
+        
+        with pytest.raises(ValueError, match="missing"):
+            next(rows)
+    
+    def test_jsonl_skips_bad_lines_and_projects_fields(self):
+        assert _run(JSONL, fmt="jsonl", where="status>200") == \
+            b'{"id": 2, "status": 500, "ok": false}\n{"id": 3, "status": 503}\n'
+        assert _run(JSONL, fmt="jsonl", select=["id", "ok"], where="ok=false") == b'{"id":2,"ok":false}\n'
+        assert _run(JSONL, fmt="jsonl", contains="json") == b"not json\n"
+    
+    def test_invalid_filters_raise_before_reading(self):
+        with pytest.raises(ValueError):
+            compile_filter(fmt="xml")
+        with pytest.raises(ValueError):
+            compile_filter(fmt="text", where="a=1")
@@ -0,0 +1,123 @@
+import pytest
+from botocore.exceptions import ClientError
+
+from my_resilience import (CLOSED, HALF_OPEN, OPEN, BucketNotFound, CircuitBreaker, ObjectNotFound,
+                           RetryBudget, ServiceUnavailable, Throttled, backoff_delay, translate)
+
+
+def _client_error(code, status=400):
+    return ClientError({'Error': {'Code': code, 'Message': code},
+                        'ResponseMetadata': {'HTTPStatusCode': status}}, 'GetObject')
+
+
+class TestTranslate:
+    
+    @pytest.mark.parametrize("code, status, error_class, status_code", [
+        ("NoSuchKey", 404, ObjectNotFound, 404),
+        ("404", 404, ObjectNotFound, 404),
+        ("NoSuchBucket", 404, BucketNotFound, 404),
+        ("SlowDown", 503, Throttled, 503),
+        ("TooManyRequests", 429, Throttled, 429),
+        ("ThrottlingException", 400, Throttled, 429),
+        ("InternalError", 500, ServiceUnavailable, 503),
+        ("BadGateway", 502, ServiceUnavailable, 503),
+    ])
+    def test_maps_codes_to_typed_errors(self, code, status, error_class, status_code):
+        error = translate(_client_error(code, status), retry_after=3)
+        
+        assert type(error) is error_class
+        assert error.status_code == status_code
+        assert error.code == code
+    
+    def test_only_transient_errors_carry_retry_after(self):
+        assert translate(_client_error("SlowDown", 503), retry_after=3).retry_after == 3
+        assert translate(_client_error("NoSuchKey", 404), retry_after=3).retry_after is None
+    
+    def test_other_errors_have_no_typed_error(self):
+        assert translate(_client_error("AccessDenied", 403)) is None
+
+
+class TestBackoff:
+    
+    def test_full_jitter_grows_exponentially_up_to_the_cap(self):
+        assert [backoff_delay(n, 0.1, 1.0, rand=lambda: 1.0) for n in range(6)] == \
+            [0.1, 0.2, 0.4, 0.8, 1.0, 1.0]
+        assert backoff_delay(3, 0.1, 1.0, rand=lambda: 0.5) == 0.4
+        assert backoff_delay(3, 0.1, 1.0, rand=lambda: 0.0) == 0.0
+
+
+class TestRetryBudget:
+    
+    def test_requests_pay_for_retries(self):
+        budget = RetryBudget(ratio=0.5, min_per_second=0, capacity=1, clock=lambda: 0)
+        
+        assert budget.try_withdraw() is True
+        assert budget.try_withdraw() is False
+        budget.record_request()
+        assert budget.try_withdraw() is False
+        budget.record_request()
+        assert budget.try_withdraw() is True
+    
+    def test_floor_refills_over_time_up_to_capacity(self):
+        now = [0.0]
+        budget = RetryBudget(ratio=0, min_per_second=2, capacity=3, clock=lambda: now[0])
+        for _ in range(3):
+            budget.try_withdraw()
+        
+        now[0] = 0.5
+        assert budget.try_withdraw() is True
+        assert budget.try_withdraw() is False
+        now[0] = 100
+        assert budget.tokens == 3
+
+
+class TestCircuitBreaker:
+    
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker(failure_threshold=3, reset_seconds=10, clock=lambda: 0)
+        
+        breaker.record_failure()
+        breaker.record_failure()
+        breaker.record_success()
+        assert [breaker.record_failure() for _ in range(3)] == [False, False, True]
+        
+        assert breaker.state == OPEN
+        assert breaker.allow() is False
+        assert breaker.retry_after() == 10
+    
+    def test_half_open_lets_one_probe_through(self):
+        now = [0.0]
+        breaker = CircuitBreaker(failure_threshold=1, reset_seconds=10, clock=lambda: now[0])
+        breaker.record_failure()
+        
+        now[0] = 10
+        assert breaker.allow() is True
+        assert breaker.state == HALF_OPEN
+        assert breaker.allow() is False
+        breaker.record_success()
+        
+        assert breaker.state == CLOSED
+        assert breaker.allow() is True
+    
+    def test_failed_probe_reopens(self):
+        now = [0.0]
+        breaker = CircuitBreaker(failure_threshold=5, reset_seconds=10, clock=lambda: now[0])
+        for _ in range(5):
+            breaker.record_failure()
+        now[0] = 12
+        breaker.allow()
+        
+        assert breaker.record_failure() is True
+        assert breaker.allow() is False
+        assert breaker.retry_after() == 10
+    
+    def test_lost_probe_is_replaced(self):
+        now = [0.0]
+        breaker = CircuitBreaker(failure_threshold=1, reset_seconds=10, clock=lambda: now[0])
+        breaker.record_failure()
+        now[0] = 10
+        breaker.allow()
+        
+        now[0] = 20
+        
+        assert breaker.allow() is True
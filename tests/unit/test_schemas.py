@@ -7,7 +7,9 @@ from my_schemas import (
     FileDownloadResponse,
     FileListResponse,
     FileDeleteRequest,
-    FileDeleteResponse
+    FileDeleteResponse,
+    BulkDeleteRequest,
+    BulkDeleteResponse
 )
 
 
@@ -177,4 +179,48 @@ class TestFileDeleteResponse:
     
     def test_delete_response_missing_required_fields(self):
         with pytest.raises(ValidationError):
-            FileDeleteResponse()
\ No newline at end of file
+            FileDeleteResponse()
+
+
+class TestBulkDeleteRequest:
+    
+    def test_valid_keys_request(self):
+        request = BulkDeleteRequest(bucket_name="test-bucket", keys=["a.txt", "b.txt"])
+        
+        assert request.keys == ["a.txt", "b.txt"]
+        assert request.prefix is None
+    
+    def test_valid_prefix_request(self):
+        request = BulkDeleteRequest(bucket_name="test-bucket", prefix="logs/")
+        
+        assert request.keys == []
+        assert request.prefix == "logs/"
+    
+    def test_keys_or_prefix_required(self):
+        with pytest.raises(ValidationError):
+            BulkDeleteRequest(bucket_name="test-bucket")
+    
+    def test_keys_and_prefix_are_exclusive(self):
+        with pytest.raises(ValidationError):
+            BulkDeleteRequest(bucket_name="test-bucket", keys=["a.txt"], prefix="logs/")
+    
+    def test_empty_prefix_is_rejected(self):
+        with pytest.raises(ValidationError):
+            BulkDeleteRequest(bucket_name="test-bucket", prefix="")
+
+
+class TestBulkDeleteResponse:
+    
+    def test_valid_bulk_delete_response(self):
+        response = BulkDeleteResponse(
+            bucket_name="test-bucket",
+            deleted_count=1,
+            failed_count=1,
+            results=[
+                {"key": "a.txt", "deleted": True},
+                {"key": "b.txt", "deleted": False, "error": "Access Denied"},
+            ]
+        )
+        
+        assert response.results[0].error is None
+        assert response.results[1].error == "Access Denied"
@@ -0,0 +1,59 @@
+import asyncio
+import os
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from botocore.exceptions import NoCredentialsError
+
+import main
+import my_server
+
+
+@pytest.fixture
+def status():
+    saved = dict(my_server._status)
+    yield
+    my_server._status.update(saved)
+
+
+class TestWorkerStatus:
+    
+    def test_ready_until_draining(self, status):
+        my_server._status.update(ready=False, draining=False)
+        assert my_server.worker_status()['ready'] is False
+        
+        my_server.mark_ready()
+        assert my_server.worker_status()['ready'] is True
+        
+        my_server.mark_draining()
+        current = my_server.worker_status()
+        assert (current['ready'], current['draining']) == (False, True)
+        assert current['pid'] == os.getpid()
+
+
+class TestWorkerCount:
+    
+    def test_defaults_to_usable_cpus(self):
+        with patch('os.sched_getaffinity', return_value={0, 1, 2}, create=True):
+            assert my_server.worker_count(0) == 3
+            assert my_server.worker_count(None) == 3
+        assert my_server.worker_count(5) == 5
+
+
+class TestWarmUp:
+    
+    def test_ready_only_after_a_successful_warm_up(self, status):
+        my_server._status.update(ready=False, draining=False)
+        attempts = []
+        
+        def warm_up():
+            attempts.append(my_server.worker_status()['ready'])
+            if len(attempts) < 3:
+                raise NoCredentialsError()
+        
+        with patch('my_services.warm_up', warm_up), patch('asyncio.sleep', AsyncMock()) as sleep:
+            asyncio.run(main._warm_up())
+        
+        assert attempts == [False, False, False]
+        assert [call.args[0] for call in sleep.call_args_list] == [0.5, 1.0]
+        assert my_server.worker_status()['ready'] is True
@@ -1,7 +1,21 @@
+import asyncio
+import gzip
+import random
+import tarfile
+import threading
+import time
+import zipfile
 import pytest
-from unittest.mock import Mock, patch, MagicMock
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from io import BytesIO
+from unittest.mock import ANY, Mock, patch, MagicMock
+import boto3
+from boto3.s3.transfer import TransferConfig
 from botocore.exceptions import NoCredentialsError, ClientError
 import my_services
+import my_spool
+from my_resilience import BucketNotFound, ObjectNotFound, S3ServiceError, Throttled
 
 
 class TestUploadFileToS3:
@@ -18,8 +32,9 @@ class TestUploadFileToS3:
         
         assert result is True
         mock_s3_client.upload_file.assert_called_once_with(
-            "/test/path/file.txt", "test-bucket", "test-object"
+            "/test/path/file.txt", "test-bucket", "test-object", Config=ANY, Callback=None
         )
+        assert isinstance(mock_s3_client.upload_file.call_args.kwargs['Config'], TransferConfig)
     
     @patch('my_services.s3_client')
     def test_upload_file_no_credentials(self, mock_s3_client):
@@ -40,13 +55,226 @@ class TestUploadFileToS3:
             operation_name='upload_file'
         )
         
-        result = my_services.upload_file_to_s3(
-            file_path="/test/path/file.txt",
-            bucket_name="test-bucket",
-            object_name="test-object"
+        with pytest.raises(BucketNotFound):
+            my_services.upload_file_to_s3(
+                file_path="/test/path/file.txt",
+                bucket_name="test-bucket",
+                object_name="test-object"
+            )
+    
+    @patch('my_services.s3_client')
+    def test_upload_file_untyped_error_returns_false(self, mock_s3_client):
+        mock_s3_client.upload_file.side_effect = ClientError(
+            error_response={'Error': {'Code': 'AccessDenied', 'Message': 'Access Denied'}},
+            operation_name='upload_file'
         )
         
-        assert result is False
+        assert my_services.upload_file_to_s3("/test/path/file.txt", "test-bucket", "test-object") is False
+
+
+class TestUploadFileobjToS3:
+    
+    @patch('my_services.s3_client')
+    def test_upload_fileobj_success(self, mock_s3_client):
+        fileobj = BytesIO(b"content")
+        
+        result = my_services.upload_fileobj_to_s3(fileobj, "test-bucket", "test-object")
+        
+        assert result is True
+        mock_s3_client.upload_fileobj.assert_called_once_with(
+            fileobj, "test-bucket", "test-object", Config=ANY
+        )
+    
+    @patch('my_services.s3_client')
+    def test_upload_fileobj_client_error(self, mock_s3_client):
+        mock_s3_client.upload_fileobj.side_effect = ClientError(
+            error_response={'Error': {'Code': 'NoSuchBucket', 'Message': 'Bucket does not exist'}},
+            operation_name='upload_fileobj'
+        )
+        
+        with pytest.raises(BucketNotFound):
+            my_services.upload_fileobj_to_s3(BytesIO(b"content"), "test-bucket", "test-object")
+
+
+class TestMultipartStreamUploader:
+    
+    @patch('my_services.s3_client')
+    def test_small_payload_uses_single_put(self, mock_s3_client):
+        uploader = my_services.MultipartStreamUploader("test-bucket", "test-object")
+        
+        assert uploader.write(b"hello ") is True
+        assert uploader.write(b"world") is True
+        assert uploader.complete() is True
+        
+        mock_s3_client.put_object.assert_called_once_with(
+            Bucket="test-bucket", Key="test-object", Body=b"hello world"
+        )
+        mock_s3_client.create_multipart_upload.assert_not_called()
+    
+    @patch('my_services.s3_client')
+    def test_large_payload_is_split_into_parts(self, mock_s3_client):
+        part_size = my_services.MIN_PART_SIZE
+        mock_s3_client.create_multipart_upload.return_value = {'UploadId': 'upload-1'}
+        mock_s3_client.upload_part.side_effect = [{'ETag': '"a"'}, {'ETag': '"b"'}, {'ETag': '"c"'}]
+        uploader = my_services.MultipartStreamUploader("test-bucket", "test-object", part_size)
+        
+        chunk = b"x" * (part_size // 2)
+        for _ in range(5):
+            assert uploader.write(chunk) is True
+        assert uploader.complete() is True
+        
+        bodies = [c.kwargs['Body'] for c in mock_s3_client.upload_part.call_args_list]
+        assert [len(b) for b in bodies] == [part_size, part_size, part_size // 2]
+        assert uploader.bytes_received == 5 * len(chunk)
+        mock_s3_client.complete_multipart_upload.assert_called_once_with(
+            Bucket="test-bucket", Key="test-object", UploadId="upload-1",
+            MultipartUpload={'Parts': [
+                {'PartNumber': 1, 'ETag': '"a"'},
+                {'PartNumber': 2, 'ETag': '"b"'},
+                {'PartNumber': 3, 'ETag': '"c"'},
+            ]}
+        )
+    
+    @patch('my_services.s3_client')
+    def test_part_size_is_clamped_to_s3_minimum(self, mock_s3_client):
+        uploader = my_services.MultipartStreamUploader("test-bucket", "test-object", part_size=1024)
+        
+        assert uploader.part_size == my_services.MIN_PART_SIZE
+    
+    @patch('my_services.s3_client')
+    def test_part_size_grows_until_part_limit(self, mock_s3_client):
+        mock_s3_client.create_multipart_upload.return_value = {'UploadId': 'upload-1'}
+        mock_s3_client.upload_part.return_value = {'ETag': '"a"'}
+        uploader = my_services.MultipartStreamUploader("test-bucket", "test-object")
+        uploader.part_size = 1024
+        
+        with patch('my_services.MAX_PARTS', 5), patch('my_services.PART_GROWTH_INTERVAL', 2):
+            assert uploader.write(b"x" * (1024 * 2 + 2048 * 2 + 4096)) is True
+            with pytest.raises(my_services.TooManyParts):
+                uploader.write(b"x" * 8192)
+        
+        bodies = [c.kwargs['Body'] for c in mock_s3_client.upload_part.call_args_list]
+        assert [len(b) for b in bodies] == [1024, 1024, 2048, 2048, 4096]
+        mock_s3_client.abort_multipart_upload.assert_called_once_with(
+            Bucket="test-bucket", Key="test-object", UploadId="upload-1"
+        )
+    
+    @patch('my_services.s3_client')
+    def test_part_failure_aborts_upload(self, mock_s3_client):
+        part_size = my_services.MIN_PART_SIZE
+        mock_s3_client.create_multipart_upload.return_value = {'UploadId': 'upload-1'}
+        mock_s3_client.upload_part.side_effect = ClientError(
+            error_response={'Error': {'Code': 'InternalError', 'Message': 'Boom'}},
+            operation_name='upload_part'
+        )
+        uploader = my_services.MultipartStreamUploader("test-bucket", "test-object", part_size)
+        
+        assert uploader.write(b"x" * part_size) is False
+        assert uploader.write(b"more") is False
+        assert uploader.complete() is False
+        
+        mock_s3_client.abort_multipart_upload.assert_called_once_with(
+            Bucket="test-bucket", Key="test-object", UploadId="upload-1"
+        )
+        mock_s3_client.complete_multipart_upload.assert_not_called()
+    
+    @patch('my_services.s3_client')
+    def test_compressed_small_payload_sets_encoding_and_original_size(self, mock_s3_client):
+        uploader = my_services.MultipartStreamUploader("test-bucket", "log.txt", encoding="gzip",
+                                                       content_type="text/plain")
+        
+        assert uploader.write(b"line\n" * 1000) is True
+        assert uploader.complete() is True
+        
+        kwargs = mock_s3_client.put_object.call_args.kwargs
+        assert gzip.decompress(kwargs['Body']) == b"line\n" * 1000
+        assert kwargs['ContentEncoding'] == "gzip"
+        assert kwargs['ContentType'] == "text/plain"
+        assert kwargs['Metadata'] == {'original-size': '5000'}
+        assert uploader.bytes_received == 5000
+        assert uploader.bytes_sent == len(kwargs['Body'])
+    
+    @patch('my_services.s3_client')
+    def test_compressed_parts_form_one_stream(self, mock_s3_client):
+        mock_s3_client.create_multipart_upload.return_value = {'UploadId': 'upload-1'}
+        mock_s3_client.upload_part.return_value = {'ETag': '"a"'}
+        uploader = my_services.MultipartStreamUploader("test-bucket", "log.txt", expected_size=None,
+                                                       encoding="gzip")
+        uploader.part_size = 16 * 1024
+        payload = random.Random(0).randbytes(200_000)
+        
+        for i in range(0, len(payload), 10_000):
+            assert uploader.write(payload[i:i + 10_000]) is True
+        assert uploader.complete() is True
+        
+        create_kwargs = mock_s3_client.create_multipart_upload.call_args.kwargs
+        assert create_kwargs['ContentEncoding'] == "gzip"
+        assert 'Metadata' not in create_kwargs
+        bodies = [c.kwargs['Body'] for c in mock_s3_client.upload_part.call_args_list]
+        assert len(bodies) > 1
+        assert gzip.decompress(b"".join(bodies)) == payload
+    
+    @patch('my_services.s3_client')
+    def test_upload_stream_to_s3(self, mock_s3_client):
+        result = my_services.upload_stream_to_s3(iter([b"a", b"b"]), "test-bucket", "test-object")
+        
+        assert result is True
+        mock_s3_client.put_object.assert_called_once_with(
+            Bucket="test-bucket", Key="test-object", Body=b"ab"
+        )
+
+
+class TestTransferConfig:
+    
+    def test_configured_part_size_is_kept_for_small_objects(self):
+        assert my_services.adaptive_part_size(100 * my_services.MIB, 8 * my_services.MIB) == 8 * my_services.MIB
+    
+    def test_unknown_size_uses_configured_part_size(self):
+        assert my_services.adaptive_part_size(None, 16 * my_services.MIB) == 16 * my_services.MIB
+    
+    def test_part_size_never_below_s3_minimum(self):
+        assert my_services.adaptive_part_size(1024, 1024) == my_services.MIN_PART_SIZE
+    
+    def test_large_objects_get_larger_parts(self):
+        object_size = 100 * 1024 * my_services.MIB
+        
+        part_size = my_services.adaptive_part_size(object_size, 8 * my_services.MIB)
+        
+        assert part_size % my_services.MIB == 0
+        assert -(-object_size // part_size) <= my_services.TARGET_PART_COUNT
+    
+    def test_part_size_capped_at_s3_maximum(self):
+        assert my_services.adaptive_part_size(10 ** 15) == my_services.MAX_PART_SIZE
+    
+    def test_build_transfer_config_uses_settings(self):
+        with patch.multiple(my_services.settings, multipart_threshold=16 * my_services.MIB,
+                            multipart_chunksize=32 * my_services.MIB, max_concurrency=3,
+                            use_threads=False):
+            config = my_services.build_transfer_config()
+        
+        assert config.multipart_threshold == 16 * my_services.MIB
+        assert config.multipart_chunksize == 32 * my_services.MIB
+        assert config.max_request_concurrency == 3
+        assert config.use_threads is False
+    
+    def test_build_transfer_config_overrides(self):
+        config = my_services.build_transfer_config(part_size=64 * my_services.MIB, max_concurrency=2,
+                                                   use_threads=True)
+        
+        assert config.multipart_chunksize == 64 * my_services.MIB
+        assert config.max_request_concurrency == 2
+        assert config.use_threads is True
+    
+    @patch('my_services.s3_client')
+    def test_upload_fileobj_sizes_parts_from_object(self, mock_s3_client):
+        class HugeFile(BytesIO):
+            def seek(self, offset, whence=0):
+                return 200 * 1024 * my_services.MIB if whence == 2 else super().seek(offset, whence)
+        
+        my_services.upload_fileobj_to_s3(HugeFile(b""), "test-bucket", "test-object")
+        
+        config = mock_s3_client.upload_fileobj.call_args.kwargs['Config']
+        assert config.multipart_chunksize > my_services.settings.multipart_chunksize
 
 
 class TestDownloadFileFromS3:
@@ -63,8 +291,9 @@ class TestDownloadFileFromS3:
         
         assert result is True
         mock_s3_client.download_file.assert_called_once_with(
-            "test-bucket", "test-object", "/test/path/file.txt"
+            "test-bucket", "test-object", "/test/path/file.txt", Config=ANY, Callback=None
         )
+        assert isinstance(mock_s3_client.download_file.call_args.kwargs['Config'], TransferConfig)
     
     @patch('my_services.s3_client')
     def test_download_file_no_credentials(self, mock_s3_client):
@@ -85,13 +314,65 @@ class TestDownloadFileFromS3:
             operation_name='download_file'
         )
         
-        result = my_services.download_file_from_s3(
-            bucket_name="test-bucket",
-            object_name="test-object",
-            file_path="/test/path/file.txt"
+        with pytest.raises(ObjectNotFound):
+            my_services.download_file_from_s3(
+                bucket_name="test-bucket",
+                object_name="test-object",
+                file_path="/test/path/file.txt"
+            )
+
+
+class TestGetObjectStream:
+    
+    @patch('my_services.s3_client')
+    def test_plain_get(self, mock_s3_client):
+        mock_s3_client.get_object.return_value = {'Body': MagicMock()}
+        
+        result = my_services.get_object_stream("test-bucket", "test-object")
+        
+        assert result is mock_s3_client.get_object.return_value
+        mock_s3_client.get_object.assert_called_once_with(Bucket="test-bucket", Key="test-object")
+    
+    @patch('my_services.s3_client')
+    def test_range_and_conditional_headers_are_forwarded(self, mock_s3_client):
+        my_services.get_object_stream("test-bucket", "test-object", "bytes=0-9", '"abc"')
+        
+        mock_s3_client.get_object.assert_called_once_with(
+            Bucket="test-bucket", Key="test-object", Range="bytes=0-9", IfNoneMatch='"abc"'
+        )
+    
+    @patch('my_services.s3_client')
+    def test_client_error_propagates(self, mock_s3_client):
+        mock_s3_client.get_object.side_effect = ClientError(
+            error_response={'Error': {'Code': 'NoSuchKey', 'Message': 'Key does not exist'}},
+            operation_name='GetObject'
         )
         
-        assert result is False
+        with pytest.raises(ClientError):
+            my_services.get_object_stream("test-bucket", "test-object")
+
+
+class TestIterObjectBody:
+    
+    def test_yields_chunks_and_closes_body(self):
+        body = MagicMock()
+        body.iter_chunks.return_value = iter([b"ab", b"cd"])
+        
+        chunks = list(my_services.iter_object_body(body, chunk_size=2))
+        
+        assert chunks == [b"ab", b"cd"]
+        body.iter_chunks.assert_called_once_with(2)
+        body.close.assert_called_once()
+    
+    def test_closes_body_when_abandoned(self):
+        body = MagicMock()
+        body.iter_chunks.return_value = iter([b"ab", b"cd"])
+        
+        iterator = my_services.iter_object_body(body)
+        next(iterator)
+        iterator.close()
+        
+        body.close.assert_called_once()
 
 
 class TestListFilesInS3:
@@ -126,9 +407,110 @@ class TestListFilesInS3:
             operation_name='list_objects_v2'
         )
         
-        result = my_services.list_files_in_s3("test-bucket")
+        with pytest.raises(BucketNotFound):
+            my_services.list_files_in_s3("test-bucket")
+
+
+class TestListPagination:
+    
+    @patch('my_services.s3_client')
+    def test_list_files_follows_continuation_tokens(self, mock_s3_client):
+        mock_s3_client.list_objects_v2.side_effect = [
+            {'Contents': [{'Key': 'a'}, {'Key': 'b'}], 'IsTruncated': True,
+             'NextContinuationToken': 'token-1'},
+            {'Contents': [{'Key': 'c'}], 'IsTruncated': False},
+        ]
         
-        assert result == []
+        result = my_services.list_files_in_s3("test-bucket", prefix="logs/")
+        
+        assert result == ['a', 'b', 'c']
+        assert mock_s3_client.list_objects_v2.call_args_list[1].kwargs == {
+            'Bucket': 'test-bucket', 'Prefix': 'logs/', 'ContinuationToken': 'token-1'
+        }
+    
+    @patch('my_services.s3_client')
+    def test_iter_files_is_lazy(self, mock_s3_client):
+        mock_s3_client.list_objects_v2.side_effect = [
+            {'Contents': [{'Key': 'a'}], 'IsTruncated': True, 'NextContinuationToken': 't'},
+            {'Contents': [{'Key': 'b'}], 'IsTruncated': False},
+        ]
+        
+        iterator = my_services.iter_files_in_s3("test-bucket")
+        
+        assert next(iterator) == 'a'
+        assert mock_s3_client.list_objects_v2.call_count == 1
+        assert list(iterator) == ['b']
+    
+    @patch('my_services.s3_client')
+    def test_list_files_page_returns_single_page(self, mock_s3_client):
+        mock_s3_client.list_objects_v2.return_value = {
+            'Contents': [{'Key': 'docs/readme.txt'}],
+            'CommonPrefixes': [{'Prefix': 'docs/img/'}],
+            'IsTruncated': True,
+            'NextContinuationToken': 'next',
+        }
+        
+        result = my_services.list_files_page("test-bucket", "docs/", "/", 1, "prev")
+        
+        assert result == {
+            'files': ['docs/readme.txt'],
+            'common_prefixes': ['docs/img/'],
+            'is_truncated': True,
+            'next_continuation_token': 'next',
+        }
+        mock_s3_client.list_objects_v2.assert_called_once_with(
+            Bucket="test-bucket", Prefix="docs/", Delimiter="/", MaxKeys=1, ContinuationToken="prev"
+        )
+    
+    @patch('my_services.s3_client')
+    def test_list_files_page_client_error(self, mock_s3_client):
+        mock_s3_client.list_objects_v2.side_effect = ClientError(
+            error_response={'Error': {'Code': 'NoSuchBucket', 'Message': 'Bucket does not exist'}},
+            operation_name='list_objects_v2'
+        )
+        
+        with pytest.raises(BucketNotFound):
+            my_services.list_files_page("test-bucket")
+    
+    @patch('my_services.s3_client')
+    def test_list_files_page_untyped_error_returns_empty_page(self, mock_s3_client):
+        mock_s3_client.list_objects_v2.side_effect = ClientError(
+            error_response={'Error': {'Code': 'AccessDenied', 'Message': 'Access Denied'}},
+            operation_name='list_objects_v2'
+        )
+        
+        result = my_services.list_files_page("test-bucket")
+        
+        assert result['files'] == []
+        assert result['is_truncated'] is False
+    
+    @patch('my_services.s3_client')
+    def test_detail_lists_objects_instead_of_files(self, mock_s3_client):
+        modified = datetime(2024, 5, 1, tzinfo=timezone.utc)
+        mock_s3_client.list_objects_v2.return_value = {
+            'Contents': [{'Key': 'a', 'Size': 3, 'ETag': '"e1"', 'LastModified': modified,
+                          'StorageClass': 'STANDARD'},
+                         {'Key': 'b'}],
+        }
+        
+        result = my_services.list_files_page("test-bucket", detail=True)
+        
+        assert 'files' not in result
+        assert result['objects'] == [
+            {'key': 'a', 'size': 3, 'etag': '"e1"', 'last_modified': modified, 'storage_class': 'STANDARD'},
+            {'key': 'b', 'size': 0, 'etag': None, 'last_modified': None, 'storage_class': None},
+        ]
+    
+    @patch('my_services.s3_client')
+    def test_detail_full_listing_follows_pages(self, mock_s3_client):
+        mock_s3_client.list_objects_v2.side_effect = [
+            {'Contents': [{'Key': 'a', 'Size': 1}], 'IsTruncated': True, 'NextContinuationToken': 't'},
+            {'Contents': [{'Key': 'b', 'Size': 2}], 'IsTruncated': False},
+        ]
+        
+        result = my_services.list_files_in_s3("test-bucket", detail=True)
+        
+        assert [(entry['key'], entry['size']) for entry in result] == [('a', 1), ('b', 2)]
 
 
 class TestDeleteFileFromS3:
@@ -154,9 +536,444 @@ class TestDeleteFileFromS3:
             operation_name='delete_object'
         )
         
-        result = my_services.delete_file_from_s3(
-            bucket_name="test-bucket",
-            object_name="test-object"
+        with pytest.raises(ObjectNotFound):
+            my_services.delete_file_from_s3(
+                bucket_name="test-bucket",
+                object_name="test-object"
+            )
+
+class TestRunInExecutor:
+    
+    def test_runs_blocking_call_off_the_event_loop_thread(self):
+        async def call():
+            return await my_services.run_in_executor(threading.current_thread)
+        
+        worker = asyncio.run(call())
+        
+        assert worker is not threading.main_thread()
+        assert worker.name.startswith("s3-worker")
+    
+    def test_passes_arguments_through(self):
+        result = asyncio.run(my_services.run_in_executor(divmod, 7, 2))
+        
+        assert result == (3, 1)
+    
+    def test_concurrency_is_bounded_by_pool_size(self):
+        executor = ThreadPoolExecutor(max_workers=2)
+        lock = threading.Lock()
+        running = {"now": 0, "peak": 0}
+        
+        def blocking_call():
+            with lock:
+                running["now"] += 1
+                running["peak"] = max(running["peak"], running["now"])
+            time.sleep(0.02)
+            with lock:
+                running["now"] -= 1
+        
+        async def call_many():
+            await asyncio.gather(*[my_services.run_in_executor(blocking_call) for _ in range(8)])
+        
+        with patch('my_services.executor', executor):
+            asyncio.run(call_many())
+        executor.shutdown()
+        
+        assert running["peak"] == 2
+
+
+class TestBoundedMap:
+    
+    def test_results_keep_input_order(self):
+        def slow_square(n):
+            time.sleep(0.01 * (5 - n))
+            return n * n
+        
+        assert list(my_services.bounded_map(slow_square, range(5), max_workers=3)) == [0, 1, 4, 9, 16]
+    
+    def test_input_is_consumed_lazily(self):
+        consumed = []
+        
+        def items():
+            for n in range(100):
+                consumed.append(n)
+                yield n
+        
+        results = my_services.bounded_map(lambda n: n, items(), max_workers=2)
+        next(results)
+        
+        assert len(consumed) <= 5
+        results.close()
+
+
+class TestDeleteFilesInS3:
+    
+    @patch('my_services.s3_client')
+    def test_keys_are_sent_in_batches_of_1000(self, mock_s3_client):
+        mock_s3_client.delete_objects.return_value = {}
+        keys = [f"key-{i}" for i in range(2500)]
+        
+        results = my_services.delete_files_in_s3("test-bucket", keys)
+        
+        batch_sizes = sorted(len(c.kwargs['Delete']['Objects'])
+                             for c in mock_s3_client.delete_objects.call_args_list)
+        assert batch_sizes == [500, 1000, 1000]
+        assert [r['key'] for r in results] == keys
+        assert all(r['deleted'] for r in results)
+    
+    @patch('my_services.s3_client')
+    def test_partial_failures_are_reported_per_key(self, mock_s3_client):
+        mock_s3_client.delete_objects.return_value = {
+            'Errors': [{'Key': 'b', 'Code': 'AccessDenied', 'Message': 'Access Denied'}]
+        }
+        
+        results = my_services.delete_files_in_s3("test-bucket", ["a", "b"])
+        
+        assert results == [
+            {'key': 'a', 'deleted': True, 'error': None},
+            {'key': 'b', 'deleted': False, 'error': 'Access Denied'},
+        ]
+    
+    @patch('my_services.s3_client')
+    def test_failed_batch_marks_every_key(self, mock_s3_client):
+        mock_s3_client.delete_objects.side_effect = ClientError(
+            error_response={'Error': {'Code': 'NoSuchBucket', 'Message': 'Bucket does not exist'}},
+            operation_name='DeleteObjects'
         )
         
-        assert result is False
\ No newline at end of file
+        results = my_services.delete_files_in_s3("test-bucket", ["a", "b"])
+        
+        assert [r['deleted'] for r in results] == [False, False]
+        assert all('NoSuchBucket' in r['error'] for r in results)
+    
+    @patch('my_services.s3_client')
+    def test_prefix_lists_keys_to_delete(self, mock_s3_client):
+        mock_s3_client.list_objects_v2.return_value = {'Contents': [{'Key': 'logs/a'}, {'Key': 'logs/b'}]}
+        mock_s3_client.delete_objects.return_value = {}
+        
+        summary = my_services.delete_prefix_in_s3("test-bucket", "logs/")
+        
+        assert summary == {'deleted_count': 2, 'failed_count': 0, 'failures': []}
+        objects = mock_s3_client.delete_objects.call_args.kwargs['Delete']['Objects']
+        assert [o['Key'] for o in objects] == ['logs/a', 'logs/b']
+        mock_s3_client.list_objects_v2.assert_called_once_with(Bucket="test-bucket", Prefix="logs/")
+    
+    @patch('my_services.s3_client')
+    def test_prefix_delete_keeps_only_the_first_failures(self, mock_s3_client):
+        mock_s3_client.list_objects_v2.return_value = {'Contents': [{'Key': f'logs/{i}'} for i in range(5)]}
+        mock_s3_client.delete_objects.return_value = {
+            'Errors': [{'Key': f'logs/{i}', 'Code': 'AccessDenied'} for i in range(1, 5)]
+        }
+        
+        with patch('my_services.FAILURE_LIMIT', 2):
+            summary = my_services.delete_prefix_in_s3("test-bucket", "logs/")
+        
+        assert summary['deleted_count'] == 1
+        assert summary['failed_count'] == 4
+        assert [f['key'] for f in summary['failures']] == ['logs/1', 'logs/2']
+
+
+class TestMetadataCache:
+    
+    @patch('my_services.s3_client')
+    def test_repeated_listing_is_served_from_cache(self, mock_s3_client):
+        mock_s3_client.list_objects_v2.return_value = {'Contents': [{'Key': 'a'}], 'IsTruncated': False}
+        
+        first = my_services.list_files_in_s3("test-bucket", prefix="logs/")
+        second = my_services.list_files_in_s3("test-bucket", prefix="logs/")
+        
+        assert first == second == ['a']
+        assert mock_s3_client.list_objects_v2.call_count == 1
+        assert my_services.get_cache_stats()['listing']['hits'] == 1
+    
+    @patch('my_services.s3_client')
+    def test_upload_invalidates_matching_listings(self, mock_s3_client, temp_file):
+        mock_s3_client.list_objects_v2.return_value = {'Contents': [], 'IsTruncated': False}
+        my_services.list_files_in_s3("test-bucket", prefix="logs/")
+        my_services.list_files_in_s3("test-bucket", prefix="docs/")
+        
+        my_services.upload_file_to_s3(temp_file, "test-bucket", "logs/new.txt")
+        my_services.list_files_in_s3("test-bucket", prefix="logs/")
+        my_services.list_files_in_s3("test-bucket", prefix="docs/")
+        
+        assert mock_s3_client.list_objects_v2.call_count == 3
+    
+    @patch('my_services.s3_client')
+    def test_delete_invalidates_metadata(self, mock_s3_client):
+        mock_s3_client.head_object.return_value = {'ContentLength': 3, 'ETag': '"abc"'}
+        my_services.head_file_in_s3("test-bucket", "a.txt")
+        my_services.head_file_in_s3("test-bucket", "a.txt")
+        
+        my_services.delete_file_from_s3("test-bucket", "a.txt")
+        my_services.head_file_in_s3("test-bucket", "a.txt")
+        
+        assert mock_s3_client.head_object.call_count == 2
+    
+    @patch('my_services.s3_client')
+    def test_head_missing_object_is_not_cached(self, mock_s3_client):
+        mock_s3_client.head_object.side_effect = ClientError(
+            {'Error': {'Code': '404', 'Message': 'Not Found'}}, 'HeadObject')
+        
+        assert my_services.head_file_in_s3("test-bucket", "missing.txt") is None
+        assert my_services.head_file_in_s3("test-bucket", "missing.txt") is None
+        assert mock_s3_client.head_object.call_count == 2
+    
+    @patch('my_services.s3_client')
+    def test_head_reports_access_denied(self, mock_s3_client):
+        mock_s3_client.head_object.side_effect = ClientError(
+            {'Error': {'Code': '403', 'Message': 'Forbidden'}}, 'HeadObject')
+        
+        with pytest.raises(S3ServiceError) as excinfo:
+            my_services.head_file_in_s3("test-bucket", "secret.txt")
+        
+        assert excinfo.value.status_code == 403
+    
+    @patch('my_services.s3_client')
+    def test_head_reports_throttling(self, mock_s3_client):
+        mock_s3_client.head_object.side_effect = ClientError(
+            {'Error': {'Code': 'SlowDown', 'Message': 'Slow Down'},
+             'ResponseMetadata': {'HTTPStatusCode': 503}}, 'HeadObject')
+        
+        with pytest.raises(Throttled):
+            my_services.head_file_in_s3("test-bucket", "a.txt")
+    
+    @patch('my_services.s3_client')
+    def test_cache_can_be_disabled(self, mock_s3_client):
+        mock_s3_client.list_objects_v2.return_value = {'Contents': [], 'IsTruncated': False}
+        
+        with patch.object(my_services.settings, 'cache_enabled', False):
+            my_services.list_files_in_s3("test-bucket")
+            my_services.list_files_in_s3("test-bucket")
+        
+        assert mock_s3_client.list_objects_v2.call_count == 2
+
+
+class TestUploadFilesToS3:
+    
+    @patch('my_services.s3_client')
+    def test_small_files_use_put_object(self, mock_s3_client):
+        files = [("a.txt", BytesIO(b"a")), ("b.txt", BytesIO(b"bb"))]
+        
+        results = my_services.upload_files_to_s3(files, "test-bucket", max_workers=2)
+        
+        assert [r['object_name'] for r in results] == ["a.txt", "b.txt"]
+        assert all(r['uploaded'] for r in results)
+        assert results[1]['size'] == 2
+        assert mock_s3_client.put_object.call_count == 2
+        mock_s3_client.upload_fileobj.assert_not_called()
+    
+    @patch('my_services.s3_client')
+    def test_large_files_use_transfer_manager(self, mock_s3_client):
+        large = BytesIO(b"x" * my_services.settings.multipart_threshold)
+        
+        results = my_services.upload_files_to_s3([("big.bin", large)], "test-bucket")
+        
+        assert results[0]['uploaded'] is True
+        mock_s3_client.upload_fileobj.assert_called_once_with(large, "test-bucket", "big.bin", Config=ANY)
+    
+    @patch('my_services.s3_client')
+    def test_failures_are_reported_per_file(self, mock_s3_client):
+        mock_s3_client.put_object.side_effect = [
+            {}, ClientError({'Error': {'Code': 'AccessDenied', 'Message': 'Denied'}}, 'PutObject')]
+        files = [("a.txt", BytesIO(b"a")), ("b.txt", BytesIO(b"b"))]
+        
+        results = my_services.upload_files_to_s3(files, "test-bucket", max_workers=1)
+        
+        assert results[0]['uploaded'] is True
+        assert results[1]['uploaded'] is False
+        assert 'AccessDenied' in results[1]['error']
+
+
+class TestIterArchiveMembers:
+    
+    def test_leading_slashes_are_stripped_from_member_names(self):
+        assert my_services._batch_object_name("in/", "./a/b.txt") == "in/a/b.txt"
+        assert my_services._batch_object_name("", "/abs.txt") == "abs.txt"
+        assert my_services._batch_object_name("", ".hidden") == ".hidden"
+    
+    def test_unreadable_archive_raises_value_error(self):
+        with pytest.raises(ValueError):
+            list(my_services.iter_archive_members(BytesIO(b"not an archive")))
+    
+    def test_zip_members_are_read_in_place(self):
+        archive = BytesIO()
+        with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zip_file:
+            zip_file.writestr("a.txt", b"alpha" * 1000)
+        
+        [(name, member)] = my_services.iter_archive_members(archive)
+        
+        assert name == "a.txt"
+        assert isinstance(member, zipfile.ZipExtFile)
+        assert member.read() == b"alpha" * 1000
+    
+    def test_large_tar_members_are_spooled_to_disk(self, tmp_path):
+        archive = BytesIO()
+        with tarfile.open(fileobj=archive, mode="w") as tar_file:
+            info = tarfile.TarInfo("big.bin")
+            info.size = 4096
+            tar_file.addfile(info, BytesIO(b"x" * 4096))
+        archive.seek(0)
+        
+        with patch('my_services.spool_manager', my_spool.SpoolManager(str(tmp_path), 1024, 1 << 20)):
+            [(name, member)] = my_services.iter_archive_members(archive)
+            
+            assert member.rolled_over
+            assert member.read() == b"x" * 4096
+            member.close()
+            assert my_services.spool_manager.disk_bytes == 0
+    
+    def test_tar_member_over_spool_quota_raises(self, tmp_path):
+        archive = BytesIO()
+        with tarfile.open(fileobj=archive, mode="w") as tar_file:
+            info = tarfile.TarInfo("big.bin")
+            info.size = 4096
+            tar_file.addfile(info, BytesIO(b"x" * 4096))
+        archive.seek(0)
+        
+        with patch('my_services.spool_manager', my_spool.SpoolManager(str(tmp_path), 1024, 2048)):
+            with pytest.raises(my_spool.SpoolQuotaExceeded):
+                list(my_services.iter_archive_members(archive))
+            
+            assert my_services.spool_manager.disk_bytes == 0
+
+
+@pytest.fixture
+def signing_client():
+    client = boto3.client('s3', region_name='us-east-1', aws_access_key_id='testing',
+                          aws_secret_access_key='testing', config=my_services.build_client_config())
+    with patch('my_services.s3_client', client):
+        yield client
+
+
+@pytest.mark.usefixtures("signing_client")
+class TestPresign:
+    
+    def test_upload_url_is_cached_for_identical_requests(self):
+        first = my_services.presign_upload_url("test-bucket", "a.txt", 600, "text/plain")
+        second = my_services.presign_upload_url("test-bucket", "a.txt", 600, "text/plain")
+        other = my_services.presign_upload_url("test-bucket", "a.txt", 600, "image/png")
+        
+        assert first["url"] == second["url"]
+        assert first["expires_at"] == second["expires_at"]
+        assert other["url"] != first["url"]
+        assert first["headers"] == {"Content-Type": "text/plain"}
+    
+    def test_urls_use_sigv4(self):
+        presigned = my_services.presign_download_url("test-bucket", "a.txt", 600)
+        
+        assert "X-Amz-Signature=" in presigned["url"]
+        assert "X-Amz-Expires=600" in presigned["url"]
+    
+    def test_reuse_can_be_disabled(self):
+        with patch.object(my_services.settings, 'presign_reuse_seconds', 0):
+            my_services.presign_download_url("test-bucket", "a.txt", 600)
+        
+        assert len(my_services.presign_cache) == 0
+    
+    def test_content_type_allowlist(self):
+        with patch.object(my_services.settings, 'presign_content_types', ["image/*", "video/mp4"]):
+            my_services.check_content_type("image/png")
+            my_services.check_content_type("video/mp4")
+            with pytest.raises(ValueError):
+                my_services.check_content_type("text/html")
+            with pytest.raises(ValueError):
+                my_services.check_content_type(None)
+    
+    @patch('my_services.s3_client')
+    def test_missing_credentials_return_none(self, mock_s3_client):
+        mock_s3_client.generate_presigned_url.side_effect = NoCredentialsError()
+        
+        assert my_services.presign_download_url("test-bucket", "a.txt", 600) is None
+    
+    @patch('my_services.s3_client')
+    def test_multipart_signs_one_url_per_part(self, mock_s3_client):
+        mock_s3_client.create_multipart_upload.return_value = {'UploadId': 'upload-1'}
+        mock_s3_client.generate_presigned_url.side_effect = lambda method, Params, ExpiresIn: (
+            f"https://s3/{Params['Key']}?partNumber={Params['PartNumber']}")
+        
+        upload = my_services.presign_multipart_upload("test-bucket", "big.bin", 3, 600)
+        
+        assert upload['upload_id'] == 'upload-1'
+        assert [part['part_number'] for part in upload['parts']] == [1, 2, 3]
+        assert upload['parts'][2]['url'].endswith("partNumber=3")
+    
+    @patch('my_services.s3_client')
+    def test_multipart_start_failure_returns_none(self, mock_s3_client):
+        mock_s3_client.create_multipart_upload.side_effect = ClientError(
+            {'Error': {'Code': 'AccessDenied', 'Message': 'Denied'}}, 'CreateMultipartUpload')
+        
+        assert my_services.presign_multipart_upload("test-bucket", "big.bin", 3) is None
+    
+    @patch('my_services.s3_client')
+    def test_complete_sorts_parts(self, mock_s3_client):
+        my_services.complete_multipart_upload_in_s3(
+            "test-bucket", "big.bin", "upload-1",
+            [{'part_number': 2, 'etag': '"b"'}, {'part_number': 1, 'etag': '"a"'}])
+        
+        parts = mock_s3_client.complete_multipart_upload.call_args.kwargs['MultipartUpload']['Parts']
+        assert [part['PartNumber'] for part in parts] == [1, 2]
+
+
+class TestCopyFileInS3:
+    
+    @patch('my_services.s3_client')
+    def test_small_object_uses_copy_object(self, mock_s3_client):
+        mock_s3_client.head_object.return_value = {'ContentLength': 10, 'ETag': '"abc"'}
+        
+        assert my_services.copy_file_in_s3("src-bucket", "a.txt", "dst-bucket", "b.txt") is True
+        
+        mock_s3_client.copy_object.assert_called_once()
+        mock_s3_client.upload_part_copy.assert_not_called()
+    
+    @patch('my_services.s3_client')
+    def test_large_object_copies_parts_pinned_to_etag(self, mock_s3_client):
+        mock_s3_client.head_object.return_value = {
+            'ContentLength': 25, 'ETag': '"abc"', 'ContentType': 'video/mp4', 'Metadata': {'k': 'v'}}
+        mock_s3_client.create_multipart_upload.return_value = {'UploadId': 'upload-1'}
+        mock_s3_client.upload_part_copy.side_effect = lambda **kwargs: {
+            'CopyPartResult': {'ETag': f'"{kwargs["PartNumber"]}"'}}
+        
+        with patch.object(my_services.settings, 'copy_multipart_threshold', 10), \
+                patch.object(my_services.settings, 'copy_part_size', 10), \
+                patch('my_services.adaptive_part_size', lambda size, part_size: part_size):
+            assert my_services.copy_file_in_s3("src-bucket", "a.bin", "dst-bucket", "b.bin") is True
+        
+        mock_s3_client.create_multipart_upload.assert_called_once_with(
+            Bucket="dst-bucket", Key="b.bin", Metadata={'k': 'v'}, ContentType='video/mp4')
+        calls = sorted(mock_s3_client.upload_part_copy.call_args_list, key=lambda c: c.kwargs['PartNumber'])
+        assert [c.kwargs['CopySourceRange'] for c in calls] == ['bytes=0-9', 'bytes=10-19', 'bytes=20-24']
+        assert all(c.kwargs['CopySourceIfMatch'] == '"abc"' for c in calls)
+        parts = mock_s3_client.complete_multipart_upload.call_args.kwargs['MultipartUpload']['Parts']
+        assert [part['PartNumber'] for part in parts] == [1, 2, 3]
+    
+    @patch('my_services.s3_client')
+    def test_failed_part_aborts_the_upload(self, mock_s3_client):
+        mock_s3_client.head_object.return_value = {'ContentLength': 25, 'ETag': '"abc"'}
+        mock_s3_client.create_multipart_upload.return_value = {'UploadId': 'upload-1'}
+        mock_s3_client.upload_part_copy.side_effect = ClientError(
+            {'Error': {'Code': 'PreconditionFailed', 'Message': 'Changed'}}, 'UploadPartCopy')
+        
+        with patch.object(my_services.settings, 'copy_multipart_threshold', 10), \
+                patch('my_services.adaptive_part_size', lambda size, part_size: 10):
+            assert my_services.copy_file_in_s3("src-bucket", "a.bin", "dst-bucket", "b.bin") is False
+        
+        mock_s3_client.abort_multipart_upload.assert_called_once_with(
+            Bucket="dst-bucket", Key="b.bin", UploadId="upload-1")
+        mock_s3_client.complete_multipart_upload.assert_not_called()
+    
+    @patch('my_services.s3_client')
+    def test_move_keeps_source_when_copy_fails(self, mock_s3_client):
+        mock_s3_client.head_object.side_effect = ClientError(
+            {'Error': {'Code': '404', 'Message': 'Not Found'}}, 'HeadObject')
+        
+        with pytest.raises(ObjectNotFound):
+            my_services.move_file_in_s3("src-bucket", "a.txt", "dst-bucket", "a.txt")
+        
+        mock_s3_client.delete_object.assert_not_called()
+    
+    def test_move_onto_itself_raises(self):
+        with pytest.raises(ValueError):
+            my_services.move_file_in_s3("bucket", "a.txt", "bucket", "a.txt")
+    
+    def test_prefix_copy_into_source_prefix_raises(self):
+        with pytest.raises(ValueError):
+            my_services.copy_prefix_in_s3("bucket", "in/", "bucket", "in/copy/")
@@ -0,0 +1,34 @@
+import pytest
+from pydantic import ValidationError
+
+from my_settings import Settings
+
+
+class TestSettingsFromEnv:
+    
+    def test_defaults_without_environment(self, monkeypatch):
+        monkeypatch.delenv("S3_SERVICE_MAX_WORKERS", raising=False)
+        
+        settings = Settings.from_env()
+        
+        assert settings.max_workers == 10
+    
+    def test_reads_prefixed_environment_variables(self, monkeypatch):
+        monkeypatch.setenv("S3_SERVICE_MAX_WORKERS", "4")
+        
+        settings = Settings.from_env()
+        
+        assert settings.max_workers == 4
+    
+    def test_invalid_value_is_rejected(self, monkeypatch):
+        monkeypatch.setenv("S3_SERVICE_MAX_WORKERS", "many")
+        
+        with pytest.raises(ValidationError):
+            Settings.from_env()
+    
+    def test_bucket_regions_are_parsed_from_pairs(self, monkeypatch):
+        monkeypatch.setenv("S3_SERVICE_BUCKET_REGIONS", "eu-bucket=eu-west-1, us-bucket = us-west-2")
+        
+        settings = Settings.from_env()
+        
+        assert settings.bucket_regions == {"eu-bucket": "eu-west-1", "us-bucket": "us-west-2"}
@@ -0,0 +1,192 @@
+import asyncio
+import gc
+import os
+import threading
+
+import pytest
+
+from my_spool import (SpoolManager, SpoolQuotaExceeded, atomic_path, safe_path, sweep_directory,
+                      wait_for_room)
+
+
+def _spool_files(directory):
+    return [name for name in os.listdir(directory) if name.startswith("spool-")]
+
+
+class TestSpool:
+    
+    def test_small_bodies_stay_in_memory(self, tmp_path):
+        manager = SpoolManager(str(tmp_path), memory_limit=100, max_disk_bytes=1000)
+        
+        with manager.spool() as spool:
+            spool.write(b"x" * 100)
+            spool.seek(0)
+        
+            assert spool.read() == b"x" * 100
+            assert not spool.rolled_over
+            assert _spool_files(tmp_path) == []
+            assert manager.stats()['disk_bytes'] == 0
+    
+    def test_rollover_to_a_unique_file_and_cleanup_on_close(self, tmp_path):
+        manager = SpoolManager(str(tmp_path), memory_limit=10, max_disk_bytes=1000)
+        first, second = manager.spool(), manager.spool()
+        
+        for spool in (first, second):
+            spool.write(b"a" * 8)
+            spool.write(b"b" * 8)
+        
+        assert first.rolled_over and second.rolled_over
+        assert len(_spool_files(tmp_path)) == 2
+        assert manager.stats()['disk_bytes'] == 32
+        assert manager.stats()['files'] == 2
+        first.seek(0)
+        assert first.read() == b"a" * 8 + b"b" * 8
+        
+        first.close()
+        second.close()
+        
+        assert _spool_files(tmp_path) == []
+        assert manager.stats()['disk_bytes'] == 0
+        assert manager.stats()['files'] == 0
+        assert manager.stats()['peak_disk_bytes'] == 32
+    
+    def test_garbage_collected_spool_is_removed(self, tmp_path):
+        manager = SpoolManager(str(tmp_path), memory_limit=1, max_disk_bytes=1000)
+        spool = manager.spool()
+        spool.write(b"data")
+        
+        del spool
+        gc.collect()
+        
+        assert _spool_files(tmp_path) == []
+        assert manager.stats()['disk_bytes'] == 0
+    
+    def test_overwrite_in_place_does_not_charge_quota_again(self, tmp_path):
+        manager = SpoolManager(str(tmp_path), memory_limit=1, max_disk_bytes=10)
+        
+        with manager.spool() as spool:
+            spool.write(b"0123456789")
+            spool.seek(0)
+            spool.write(b"abcde")
+        
+            assert manager.stats()['disk_bytes'] == 10
+            spool.seek(0)
+            assert spool.read() == b"abcde56789"
+    
+    def test_quota_is_enforced_across_spools(self, tmp_path):
+        manager = SpoolManager(str(tmp_path), memory_limit=4, max_disk_bytes=10)
+        first = manager.spool()
+        first.write(b"x" * 8)
+        
+        with manager.spool() as second:
+            with pytest.raises(SpoolQuotaExceeded):
+                second.write(b"y" * 8)
+        
+        assert manager.stats()['rejections'] == 1
+        first.close()
+        with manager.spool() as third:
+            third.write(b"z" * 8)
+    
+    def test_wait_for_room_resumes_once_space_is_freed(self, tmp_path):
+        manager = SpoolManager(str(tmp_path), memory_limit=4, max_disk_bytes=10)
+        holder = manager.spool()
+        holder.write(b"x" * 8)
+        threading.Timer(0.1, holder.close).start()
+        
+        with manager.spool() as spool:
+            asyncio.run(wait_for_room(spool, 8, timeout=5))
+            spool.write(b"y" * 8)
+    
+    def test_wait_for_room_times_out(self, tmp_path):
+        manager = SpoolManager(str(tmp_path), memory_limit=4, max_disk_bytes=10)
+        holder = manager.spool()
+        holder.write(b"x" * 8)
+        
+        with manager.spool() as spool:
+            with pytest.raises(SpoolQuotaExceeded):
+                asyncio.run(wait_for_room(spool, 8, timeout=0.1))
+        holder.close()
+        
+        assert manager.stats()['rejections'] == 1
+    
+    def test_orphans_of_dead_processes_are_removed(self, tmp_path):
+        (tmp_path / "spool-999999999-abc").write_bytes(b"left behind")
+        (tmp_path / f"spool-{os.getpid()}-def").write_bytes(b"ours")
+        (tmp_path / "unrelated.txt").write_bytes(b"keep")
+        
+        SpoolManager(str(tmp_path), memory_limit=1, max_disk_bytes=10)
+        
+        assert sorted(os.listdir(tmp_path)) == [f"spool-{os.getpid()}-def", "unrelated.txt"]
+
+
+class TestSafePath:
+    
+    def test_nested_keys_get_their_directories(self, tmp_path):
+        path = safe_path(str(tmp_path), "a/b/c.txt")
+        
+        assert path == os.path.join(str(tmp_path), "a", "b", "c.txt")
+        assert os.path.isdir(tmp_path / "a" / "b")
+    
+    @pytest.mark.parametrize("name", ["", "/etc/passwd", "../secret", "a/../../b", "a//b", "a/./b", "a/"])
+    def test_unsafe_names_are_rejected(self, tmp_path, name):
+        with pytest.raises(ValueError):
+            safe_path(str(tmp_path / "downloads"), name)
+    
+    def test_symlink_escape_is_rejected(self, tmp_path):
+        root = tmp_path / "downloads"
+        root.mkdir()
+        os.symlink(str(tmp_path), str(root / "link"))
+        
+        with pytest.raises(ValueError):
+            safe_path(str(root), "link/file.txt")
+
+
+class TestAtomicPath:
+    
+    def test_replaces_target_on_success(self, tmp_path):
+        target = tmp_path / "file.txt"
+        target.write_bytes(b"old")
+        
+        with atomic_path(str(target)) as tmp:
+            with open(tmp, "wb") as f:
+                f.write(b"new")
+            assert target.read_bytes() == b"old"
+        
+        assert target.read_bytes() == b"new"
+        assert os.listdir(tmp_path) == ["file.txt"]
+    
+    def test_failure_keeps_target_and_removes_partial(self, tmp_path):
+        target = tmp_path / "file.txt"
+        target.write_bytes(b"old")
+        
+        with pytest.raises(RuntimeError):
+            with atomic_path(str(target)) as tmp:
+                with open(tmp, "wb") as f:
+                    f.write(b"partial")
+                raise RuntimeError("download failed")
+        
+        assert target.read_bytes() == b"old"
+        assert os.listdir(tmp_path) == ["file.txt"]
+    
+    def test_concurrent_writers_use_distinct_paths(self, tmp_path):
+        target = str(tmp_path / "file.txt")
+        
+        with atomic_path(target) as first, atomic_path(target) as second:
+            assert first != second
+
+
+class TestSweepDirectory:
+    
+    def test_removes_only_expired_files(self, tmp_path):
+        (tmp_path / "nested").mkdir()
+        old, fresh = tmp_path / "nested" / "old.txt", tmp_path / "fresh.txt"
+        old.write_bytes(b"old")
+        fresh.write_bytes(b"fresh")
+        os.utime(old, (1000, 1000))
+        os.utime(fresh, (5000, 5000))
+        
+        removed = sweep_directory(str(tmp_path), max_age_seconds=1000, now=5500)
+        
+        assert removed == 1
+        assert not old.exists()
+        assert fresh.exists()
@@ -0,0 +1,55 @@
+import json
+import os
+
+import botocore
+
+from my_startup import ModelCacheLoader
+
+
+class TestModelCacheLoader:
+    
+    def test_second_loader_reads_the_disk_cache(self, tmp_path):
+        first = ModelCacheLoader(str(tmp_path))
+        model = first.load_service_model("s3", "service-2")
+        endpoints = first.load_data("endpoints")
+        
+        cache_dir = tmp_path / f"botocore-{botocore.__version__}"
+        assert len(os.listdir(cache_dir)) == 2
+        second = ModelCacheLoader(str(tmp_path))
+        with patch_file_loader(second):
+            assert second.load_service_model("s3", "service-2") == model
+            assert second.load_data("endpoints") == endpoints
+    
+    def test_entries_for_other_search_paths_are_not_used(self, tmp_path):
+        ModelCacheLoader(str(tmp_path)).load_data("partitions")
+        cache_dir = tmp_path / f"botocore-{botocore.__version__}"
+        path = cache_dir / os.listdir(cache_dir)[0]
+        entry = json.loads(path.read_text())
+        entry['value'][0] = {"stale": True}
+        path.write_text(json.dumps(entry))
+        
+        custom = ModelCacheLoader(str(tmp_path), extra_search_paths=[str(tmp_path / "models")])
+        
+        assert "stale" not in custom.load_data("partitions")
+        assert ModelCacheLoader(str(tmp_path)).load_data("partitions") == {"stale": True}
+    
+    def test_empty_cache_dir_disables_the_disk_cache(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        loader = ModelCacheLoader("")
+        
+        assert loader.load_service_model("s3", "paginators-1")["pagination"]
+        assert os.listdir(tmp_path) == []
+
+
+class patch_file_loader:
+    """Fail the test if the loader touches botocore's own data files."""
+
+    def __init__(self, loader):
+        self.loader = loader
+
+    def __enter__(self):
+        self.original = self.loader.file_loader
+        self.loader.file_loader = None
+
+    def __exit__(self, *exc_info):
+        self.loader.file_loader = self.original
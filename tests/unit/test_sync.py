@@ -0,0 +1,101 @@
+import hashlib
+import os
+from datetime import datetime, timezone
+
+import pytest
+
+from my_sync import iter_local_files, iter_remote_objects, plan, transfer_reason
+
+
+def _write(root, key, content=b"x", mtime=1_700_000_000):
+    path = root.joinpath(*key.split("/"))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(content)
+    os.utime(path, (mtime, mtime))
+
+
+def _remote(key, size=1, mtime=1_700_000_000, etag="0" * 32):
+    return {'key': key, 'size': size, 'mtime': mtime, 'etag': etag}
+
+
+class TestLocalWalk:
+    
+    def test_walks_in_s3_key_order(self, tmp_path):
+        for key in ("z", "a0", "a/x", "a-b", "b/c/d"):
+            _write(tmp_path, key)
+        
+        keys = [entry['key'] for entry in iter_local_files(str(tmp_path))]
+        
+        assert keys == sorted(keys) == ["a-b", "a/x", "a0", "b/c/d", "z"]
+    
+    def test_skips_partial_downloads(self, tmp_path):
+        _write(tmp_path, "a.txt")
+        _write(tmp_path, ".a.txt.k2j4.part")
+        
+        assert [entry['key'] for entry in iter_local_files(str(tmp_path))] == ["a.txt"]
+
+
+class TestRemoteObjects:
+    
+    def test_strips_prefix_and_skips_folder_markers(self):
+        modified = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        pages = [{'Contents': [{'Key': 'site/', 'Size': 0, 'LastModified': modified},
+                               {'Key': 'site/a.txt', 'Size': 3, 'LastModified': modified, 'ETag': '"abc"'}]},
+                 {}]
+        
+        assert list(iter_remote_objects(pages, "site")) == [
+            {'key': 'a.txt', 'size': 3, 'mtime': modified.timestamp(), 'etag': 'abc'}]
+
+
+class TestPlan:
+    
+    def test_push_uploads_new_and_changed_files(self):
+        local = [{'key': 'a', 'size': 1, 'mtime': 10}, {'key': 'b', 'size': 2, 'mtime': 10},
+                 {'key': 'c', 'size': 1, 'mtime': 20}, {'key': 'd', 'size': 1, 'mtime': 10}]
+        remote = [_remote('b', size=1, mtime=10), _remote('c', mtime=10), _remote('d', mtime=10.5),
+                  _remote('e')]
+        
+        actions = [(a['action'], a['key'], a['reason']) for a in plan(local, remote, "push")]
+        
+        assert actions == [("upload", "a", "missing"), ("upload", "b", "size"), ("upload", "c", "newer"),
+                           ("skip", "d", None)]
+    
+    def test_delete_removes_extraneous_destination_files(self):
+        local = [{'key': 'a', 'size': 1, 'mtime': 10}]
+        remote = [_remote('b')]
+        
+        assert [(a['action'], a['key']) for a in plan(local, remote, "push", delete=True)] == \
+            [("upload", "a"), ("delete", "b")]
+        assert [(a['action'], a['key']) for a in plan(local, remote, "pull", delete=True)] == \
+            [("delete", "a"), ("download", "b")]
+    
+    def test_pull_downloads_newer_objects(self):
+        local = [{'key': 'a', 'size': 1, 'mtime': 10}]
+        
+        assert [a['action'] for a in plan(local, [_remote('a', mtime=20)], "pull")] == ["download"]
+        assert [a['action'] for a in plan(local, [_remote('a', mtime=5)], "pull")] == ["skip"]
+    
+    def test_rejects_unknown_modes(self):
+        with pytest.raises(ValueError):
+            list(plan([], [], "sideways"))
+        with pytest.raises(ValueError):
+            list(plan([], [], "push", compare="guess"))
+
+
+class TestTransferReason:
+    
+    def test_checksum_compares_md5_with_etag(self, tmp_path):
+        _write(tmp_path, "a", b"abc", mtime=100)
+        local = next(iter_local_files(str(tmp_path)))
+        md5 = hashlib.md5(b"abc").hexdigest()
+        
+        assert transfer_reason(local, _remote("a", 3, 1, md5), "push", "checksum", str(tmp_path)) is None
+        assert transfer_reason(local, _remote("a", 3, 999, "f" * 32), "push", "checksum",
+                               str(tmp_path)) == "checksum"
+    
+    def test_multipart_etags_fall_back_to_mtime(self, tmp_path):
+        _write(tmp_path, "a", b"abc", mtime=100)
+        local = next(iter_local_files(str(tmp_path)))
+        
+        assert transfer_reason(local, _remote("a", 3, 50, "f" * 32 + "-2"), "push", "checksum",
+                               str(tmp_path)) == "newer"
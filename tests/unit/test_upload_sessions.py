@@ -0,0 +1,146 @@
+import threading
+
+import pytest
+
+from my_upload_sessions import MemorySessionStore, SessionStore, SQLiteSessionStore, Sweeper, create_session_store
+
+
+def _session(session_id="s1", updated_at=100.0):
+    return {'session_id': session_id, 'bucket_name': 'test-bucket', 'object_name': 'big.bin',
+            'upload_id': f'upload-{session_id}', 'content_type': None, 'created_at': 100.0,
+            'updated_at': updated_at, 'parts': {}}
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        yield MemorySessionStore()
+    else:
+        store = SQLiteSessionStore(str(tmp_path / "sessions.db"))
+        yield store
+        store.close()
+
+
+class TestSessionStores:
+    
+    def test_create_and_get(self, store):
+        store.create(_session())
+        
+        session = store.get("s1")
+        
+        assert session['upload_id'] == 'upload-s1'
+        assert session['parts'] == {}
+        assert store.get("missing") is None
+    
+    def test_parts_are_recorded_and_replaced(self, store):
+        store.create(_session())
+        
+        store.add_part("s1", 2, '"b"', 5, 200.0)
+        store.add_part("s1", 1, '"a"', 5, 201.0)
+        store.add_part("s1", 2, '"b2"', 3, 202.0)
+        
+        session = store.get("s1")
+        assert session['parts'] == {1: {'etag': '"a"', 'size': 5}, 2: {'etag': '"b2"', 'size': 3}}
+        assert session['updated_at'] == 202.0
+    
+    def test_add_part_to_unknown_session_fails(self, store):
+        assert store.add_part("missing", 1, '"a"', 5, 200.0) is False
+    
+    def test_delete_removes_session_and_parts(self, store):
+        store.create(_session())
+        store.add_part("s1", 1, '"a"', 5, 200.0)
+        
+        store.delete("s1")
+        store.create(_session())
+        
+        assert store.get("s1")['parts'] == {}
+    
+    def test_list_sessions_filters_idle_sessions(self, store):
+        store.create(_session("old", updated_at=100.0))
+        store.create(_session("new", updated_at=500.0))
+        
+        stale = store.list_sessions(updated_before=300.0)
+        
+        assert [session['session_id'] for session in stale] == ["old"]
+        assert len(store.list_sessions()) == 2
+    
+    def test_returned_sessions_are_copies(self, store):
+        store.create(_session())
+        
+        store.get("s1")['parts'][1] = {'etag': 'x', 'size': 1}
+        
+        assert store.get("s1")['parts'] == {}
+    
+    def test_parallel_parts_are_all_recorded(self, store):
+        store.create(_session())
+        threads = [threading.Thread(target=store.add_part, args=("s1", n, f'"{n}"', 1, 200.0 + n))
+                   for n in range(1, 41)]
+        
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        assert sorted(store.get("s1")['parts']) == list(range(1, 41))
+
+
+class TestSessionStoreInterface:
+    
+    def test_incomplete_store_cannot_be_created(self):
+        class PartialStore(SessionStore):
+            def create(self, session):
+                pass
+        
+        with pytest.raises(TypeError):
+            PartialStore()
+
+
+class TestSQLiteSessionStore:
+    
+    def test_sessions_survive_reopening(self, tmp_path):
+        path = str(tmp_path / "sessions.db")
+        first = SQLiteSessionStore(path)
+        first.create(_session())
+        first.add_part("s1", 1, '"a"', 5, 200.0)
+        first.close()
+        
+        second = SQLiteSessionStore(path)
+        
+        assert second.get("s1")['parts'] == {1: {'etag': '"a"', 'size': 5}}
+        second.close()
+
+
+class TestCreateSessionStore:
+    
+    def test_unknown_kind_is_rejected(self, tmp_path):
+        with pytest.raises(ValueError):
+            create_session_store("redis", str(tmp_path / "x.db"))
+
+
+class TestSweeper:
+    
+    def test_sweep_runs_periodically_until_stopped(self):
+        calls = threading.Semaphore(0)
+        
+        def sweep():
+            calls.release()
+            return 0
+        
+        sweeper = Sweeper(sweep, interval=0.01)
+        sweeper.start()
+        assert calls.acquire(timeout=5)
+        assert calls.acquire(timeout=5)
+        sweeper.stop(timeout=5)
+    
+    def test_sweep_errors_do_not_stop_the_thread(self):
+        calls = threading.Semaphore(0)
+        
+        def sweep():
+            calls.release()
+            raise RuntimeError("boom")
+        
+        sweeper = Sweeper(sweep, interval=0.01)
+        sweeper.start()
+        assert calls.acquire(timeout=5)
+        assert calls.acquire(timeout=5)
+        sweeper.stop(timeout=5)